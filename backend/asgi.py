@@ -3,6 +3,11 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving the site through this module (e.g. ``uvicorn backend.asgi:application``)
+enables the live notification stream at /api/notifications/stream/. That path
+is answered by a bare ASGI app so an open connection holds no thread; under
+WSGI the browser falls back to polling the unread count.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from core_blood_system.notification_events import notification_stream_app, stream_path  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == stream_path():
+        return await notification_stream_app(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -1,4 +1,6 @@
 import os
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -7,6 +9,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-key-for-dev')
 
+# Test runs (manage.py test) keep runtime state out of the project directory
+TESTING = sys.argv[1:2] == ['test']
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
@@ -26,7 +31,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core_blood_system.sessions.SessionRefreshMiddleware',  # SessionMiddleware with coalesced expiry saves
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -86,6 +91,13 @@ else:
             conn_max_age=600
         )
     }
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        # Transactions take the write lock up front, so concurrent writers
+        # queue for it instead of failing with "database is locked"
+        DATABASES['default'].setdefault('OPTIONS', {}).update({
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        })
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -225,7 +237,12 @@ if not DEBUG:
 SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript access to session cookie
 SESSION_COOKIE_SAMESITE = 'Lax'  # CSRF protection
 SESSION_COOKIE_AGE = 3600  # 1 hour session timeout
-SESSION_SAVE_EVERY_REQUEST = True  # Refresh session on every request
+# Idle sessions are extended by SessionRefreshMiddleware (core_blood_system/sessions.py),
+# which re-saves them once this fraction of their age has passed
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = 0.1
+SESSION_ENGINE = 'core_blood_system.sessions'  # cached_db: cache reads, database fallback
+SESSION_CACHE_ALIAS = 'sessions'
 
 # CSRF Protection
 CSRF_COOKIE_HTTPONLY = False  # Allow JavaScript to read CSRF token if needed
@@ -242,7 +259,7 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
-# Rate Limiting with Cache
+# Cache
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -250,9 +267,59 @@ CACHES = {
         'OPTIONS': {
             'MAX_ENTRIES': 1000
         }
+    },
+    # Shared by all worker processes on the host. In production set
+    # SESSION_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+    # SESSION_CACHE_LOCATION=redis://...: the file cache lists its whole
+    # directory on every write, so it is kept small (sessions it culls
+    # are read back from the database)
+    'sessions': {
+        'BACKEND': os.environ.get('SESSION_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', str(BASE_DIR / 'cache' / 'sessions')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000
+        }
+    },
+}
+if TESTING:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blood-management-sessions',
+        'TIMEOUT': None,
     }
+
+# Rate Limiting (core_blood_system/rate_limiter.py)
+# 'sqlite' keeps counters in RATE_LIMIT_DATABASE, shared by all worker
+# processes; 'cache' uses CACHES['default'] (only atomic on Redis/Memcached)
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'sqlite')
+RATE_LIMIT_DATABASE = os.environ.get('RATE_LIMIT_DATABASE', str(BASE_DIR / 'ratelimit.sqlite3'))
+if TESTING:
+    RATE_LIMIT_DATABASE = os.path.join(tempfile.mkdtemp(prefix='ratelimit-'), 'ratelimit.sqlite3')
+
+# Per-view overrides of the @rate_limit defaults: a rate, or rates by user role
+RATE_LIMITS = {
+    'donor_search_api': {'admin': '600/m', 'default': '120/m'},
 }
 
+# Failed logins for one username from one address before that username is
+# locked out from that address, and for how long (successful logins are
+# not counted, so staff sharing a hospital NAT do not lock each other out)
+LOGIN_FAILURE_RATE = os.environ.get('LOGIN_FAILURE_RATE', '10/h')
+LOGIN_BLOCK_SECONDS = int(os.environ.get('LOGIN_BLOCK_SECONDS', 900))
+
+# Appointment Scheduling
+# Donors per time slot, by location name with a default; individual slots
+# can be changed in the admin (AppointmentSlot.capacity)
+APPOINTMENT_SLOT_CAPACITY = {
+    'default': int(os.environ.get('APPOINTMENT_SLOT_CAPACITY', 4)),
+}
+
+# Demand Forecasting
+# Write the nightly proposed thresholds straight to BloodInventory instead
+# of only showing them on the Configure Thresholds page
+DEMAND_FORECAST_AUTO_APPLY = os.environ.get('DEMAND_FORECAST_AUTO_APPLY', 'False') == 'True'
+
 # Logging Configuration
 import os
 # Create logs directory if it doesn't exist
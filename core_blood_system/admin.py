@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import (
     CustomUser, Donor, BloodRequest, BloodDonation, BloodInventory,
-    BloodUnit, NotificationPreference, NotificationLog, DonorEligibility
+    BloodUnit, NotificationPreference, NotificationLog, DonorEligibility,
+    AppointmentSlot, DemandForecast
 )
 
 
@@ -53,11 +54,10 @@ class DonorAdmin(admin.ModelAdmin):
     
     def is_eligible_display(self, obj):
         """Display eligibility status in admin list"""
-        if obj.is_eligible():
+        status = obj.get_eligibility_status()
+        if status['eligible']:
             return "✅ Eligible"
-        else:
-            days = obj.days_until_eligible()
-            return f"❌ Wait {days} days"
+        return f"❌ {status['reason']}"
     is_eligible_display.short_description = 'Eligibility Status'
 
 
@@ -92,6 +92,17 @@ class BloodRequestAdmin(admin.ModelAdmin):
         if obj:
             return self.readonly_fields + ['created_at', 'updated_at']
         return self.readonly_fields
+    
+    def save_model(self, request, obj, form, change):
+        from .unit_allocation import reallocate_units, sync_request_allocation
+        
+        super().save_model(request, obj, form, change)
+        if 'status' in form.changed_data:
+            # Reserve, use or release blood units for the new status
+            sync_request_allocation(obj)
+        elif obj.status == 'approved' and {'blood_type', 'units_needed'} & set(form.changed_data):
+            # Reserved units must match the new blood type and quantity
+            reallocate_units(obj)
 
 
 # Blood Donation Admin
@@ -136,6 +147,19 @@ class BloodInventoryAdmin(admin.ModelAdmin):
     is_low_stock.short_description = 'Low Stock'
 
 
+# Demand Forecast Admin
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ['blood_type', 'through_date', 'proposed_critical_threshold',
+                    'proposed_minimum_threshold', 'proposed_optimal_level', 'updated_at']
+    ordering = ['blood_type']
+    
+    # Forecasts are written by the nightly update (see update_demand_forecasts)
+    readonly_fields = ['blood_type', 'through_date', 'state', 'daily_demand', 'daily_supply',
+                       'proposed_critical_threshold', 'proposed_minimum_threshold',
+                       'proposed_optimal_level', 'updated_at']
+
+
 
 # Blood Unit Admin
 @admin.register(BloodUnit)
@@ -144,6 +168,7 @@ class BloodUnitAdmin(admin.ModelAdmin):
                     'volume_ml', 'storage_location', 'is_expiring_soon', 'is_expired']
     list_filter = ['blood_type', 'status', 'donation_date', 'expiration_date']
     search_fields = ['unit_number', 'donation__donor__first_name', 'donation__donor__last_name']
+    raw_id_fields = ['donation', 'blood_request']
     date_hierarchy = 'donation_date'
     ordering = ['-donation_date']
     
@@ -152,7 +177,7 @@ class BloodUnitAdmin(admin.ModelAdmin):
             'fields': ('unit_number', 'blood_type', 'status', 'volume_ml')
         }),
         ('Donation Details', {
-            'fields': ('donation', 'donation_date', 'expiration_date')
+            'fields': ('donation', 'donation_date', 'expiration_date', 'blood_request')
         }),
         ('Storage', {
             'fields': ('storage_location', 'notes')
@@ -257,3 +282,15 @@ class DonorEligibilityAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ['assessment_date']
+
+
+# Appointment Slot Admin
+@admin.register(AppointmentSlot)
+class AppointmentSlotAdmin(admin.ModelAdmin):
+    list_display = ['location', 'date', 'time_slot', 'capacity', 'booked']
+    list_filter = ['location', 'time_slot']
+    date_hierarchy = 'date'
+    ordering = ['date', 'time_slot']
+    
+    # booked is maintained by the booking functions (see reconcile_appointment_slots)
+    readonly_fields = ['booked']
@@ -10,12 +10,18 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+from functools import lru_cache
 import pyotp
 import qrcode
 from io import BytesIO
 import base64
 import secrets
 
+from core_blood_system.log_buffer import log_writer
+
+# Distinct user agent strings whose parsed device info is kept
+USER_AGENT_CACHE_SIZE = 1024
+
 
 # ==========================================
 # TWO-FACTOR AUTHENTICATION HELPERS
@@ -162,7 +168,7 @@ def send_verification_email(verification, request):
 # ==========================================
 
 def log_user_activity(user, action, request, success=True, details=''):
-    """Log a user activity"""
+    """Log a user activity (written behind the request by log_buffer)"""
     from core_blood_system.models import UserActivityLog
     from core_blood_system.security import get_client_ip
     
@@ -172,7 +178,7 @@ def log_user_activity(user, action, request, success=True, details=''):
     # Parse device info from user agent
     device_info = parse_device_info(user_agent)
     
-    return UserActivityLog.objects.create(
+    activity = UserActivityLog(
         user=user,
         action=action,
         ip_address=ip_address,
@@ -181,8 +187,12 @@ def log_user_activity(user, action, request, success=True, details=''):
         success=success,
         details=details
     )
+    log_writer.add(activity)
+    return activity
 
 
+# A handful of browsers account for nearly every request
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
 def parse_device_info(user_agent):
     """Parse device information from user agent string"""
     if not user_agent:
@@ -286,11 +296,11 @@ def terminate_all_sessions_except_current(user, current_session_key):
 # ==========================================
 
 def log_admin_action(admin_user, action_type, obj, request, changes=None, reason=''):
-    """Log an admin action"""
+    """Log an admin action (written behind the request by log_buffer)"""
     from core_blood_system.models import AdminAuditLog
     from core_blood_system.security import get_client_ip
     
-    return AdminAuditLog.objects.create(
+    entry = AdminAuditLog(
         admin_user=admin_user,
         action_type=action_type,
         model_name=obj.__class__.__name__,
@@ -300,3 +310,5 @@ def log_admin_action(admin_user, action_type, obj, request, changes=None, reason
         ip_address=get_client_ip(request),
         reason=reason
     )
+    log_writer.add(entry)
+    return entry
@@ -1,82 +1,178 @@
 """
 Advanced Analytics for Blood Management System
 """
-from django.db.models import Count, Sum, Avg, Q
+from django.conf import settings
+from django.db.models import Count, Sum
 from django.utils import timezone
 from datetime import timedelta
-from .models import Donor, BloodRequest, BloodDonation, BloodInventory
+from .models import Donor, BloodRequest, BloodDonation, BloodInventory, AnalyticsSnapshot
+from .dashboard_stats import donor_statistics, request_statistics, donation_statistics
 
 
-def get_dashboard_analytics():
-    """
-    Get comprehensive analytics for admin dashboard
-    """
-    now = timezone.now()
-    last_30_days = now - timedelta(days=30)
-    last_7_days = now - timedelta(days=7)
-    
-    analytics = {
-        # Overall Statistics
-        'total_donors': Donor.objects.count(),
-        'active_donors': Donor.objects.filter(is_available=True).count(),
-        'total_requests': BloodRequest.objects.count(),
-        'total_donations': BloodDonation.objects.count(),
-        
-        # Recent Activity (Last 30 days)
-        'new_donors_30d': Donor.objects.filter(created_at__gte=last_30_days).count(),
-        'new_requests_30d': BloodRequest.objects.filter(created_at__gte=last_30_days).count(),
-        'donations_30d': BloodDonation.objects.filter(donation_date__gte=last_30_days.date()).count(),
+# ============================================
+# ANALYTICS SNAPSHOT
+# ============================================
+
+# Seconds a section may be served after its source tables changed
+SNAPSHOT_STALENESS = getattr(settings, 'ANALYTICS_SNAPSHOT_STALENESS', 60)
+
+# Seconds after which a section is recomputed even without writes
+# (rolling windows such as "last 30 days" move with the clock)
+SNAPSHOT_MAX_AGE = getattr(settings, 'ANALYTICS_SNAPSHOT_MAX_AGE', 3600)
+
+
+def build_donor_analytics():
+    """Donor figures for the dashboards"""
+    stats = donor_statistics()
+    blood_type_distribution = list(
+        Donor.objects.values('blood_type')
+        .annotate(count=Count('id'))
+        .order_by('-count')
+    )
+    
+    return {
+        'total_donors': stats['total'],
+        'active_donors': stats['available'],
+        'new_donors_30d': stats['new_30d'],
+        'new_donors_this_month': stats['new_this_month'],
+        'donors_by_blood_type': blood_type_distribution,
+        'blood_type_distribution': blood_type_distribution,
+    }
+
+
+def build_request_analytics():
+    """Blood request figures for the dashboards"""
+    stats = request_statistics()
+    
+    return {
+        'total_requests': stats['total'],
+        'new_requests_30d': stats['new_30d'],
         
         # Request Status Breakdown
-        'pending_requests': BloodRequest.objects.filter(status='pending').count(),
-        'approved_requests': BloodRequest.objects.filter(status='approved').count(),
-        'fulfilled_requests': BloodRequest.objects.filter(status='fulfilled').count(),
-        'cancelled_requests': BloodRequest.objects.filter(status='cancelled').count(),
+        'pending_requests': stats['pending'],
+        'approved_requests': stats['approved'],
+        'fulfilled_requests': stats['fulfilled'],
+        'cancelled_requests': stats['cancelled'],
+        'request_status': list(BloodRequest.objects.values('status').annotate(count=Count('id'))),
         
         # Urgency Breakdown
-        'critical_requests': BloodRequest.objects.filter(urgency='critical', status='pending').count(),
-        'high_urgency_requests': BloodRequest.objects.filter(urgency='high', status='pending').count(),
-        
-        # Blood Type Distribution
-        'donors_by_blood_type': list(
-            Donor.objects.values('blood_type')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        ),
+        'critical_requests': stats['critical_pending'],
+        'high_urgency_requests': stats['high_pending'],
         
         'requests_by_blood_type': list(
             BloodRequest.objects.values('blood_type')
             .annotate(count=Count('id'))
             .order_by('-count')
         ),
+        'requests_trend': get_requests_trend(days=30),
+    }
+
+
+def build_donation_analytics():
+    """Donation figures for the dashboards"""
+    from .enhancements import get_monthly_trends
+    
+    stats = donation_statistics()
+    
+    return {
+        'total_donations': stats['total'],
+        'donations_30d': stats['last_30d'],
+        'donations_this_month': stats['this_month'],
+        'donations_last_month': stats['last_month'],
+        'donation_status': list(BloodDonation.objects.values('status').annotate(count=Count('id'))),
         
-        # Donation Statistics
-        'total_units_donated': BloodDonation.objects.aggregate(
-            total=Sum('units_donated')
-        )['total'] or 0,
-        
-        'avg_units_per_donation': BloodDonation.objects.aggregate(
-            avg=Avg('units_donated')
-        )['avg'] or 0,
-        
-        # Inventory Status
-        'low_stock_count': BloodInventory.objects.filter(
-            units_available__lt=F('minimum_threshold')
-        ).count() if BloodInventory.objects.exists() else 0,
+        # Units from approved donations only
+        'total_units_donated': stats['approved_units'],
+        'avg_units_per_donation': stats['avg_units'],
         
         # Top Donors (by donation count)
-        'top_donors': list(
-            Donor.objects.annotate(
+        'top_donors': [
+            {'id': donor.id, 'name': f"{donor.first_name} {donor.last_name}",
+             'blood_type': donor.blood_type, 'donation_count': donor.donation_count}
+            for donor in Donor.objects.annotate(
                 donation_count=Count('donations')
-            ).filter(donation_count__gt=0)
-            .order_by('-donation_count')[:5]
-        ),
+            ).filter(donation_count__gt=0).order_by('-donation_count')[:5]
+        ],
         
-        # Recent Trends
-        'requests_trend': get_requests_trend(days=30),
+        'monthly_trends': get_monthly_trends(6),
         'donations_trend': get_donations_trend(days=30),
     }
+
+
+def build_inventory_analytics():
+    """Inventory figures for the dashboards"""
+    inventory = [
+        {'blood_type': inv.blood_type, 'units_available': inv.units_available,
+         'minimum_threshold': inv.minimum_threshold, 'is_low_stock': inv.is_low_stock(),
+         'status': inv.get_status()}
+        for inv in BloodInventory.objects.all()
+    ]
+    low_stock = sum(1 for inv in inventory if inv['is_low_stock'])
+    
+    return {
+        'inventory_status': inventory,
+        'low_stock_items': low_stock,
+        'low_stock_count': low_stock,
+    }
+
+
+SNAPSHOT_SECTIONS = {
+    'donors': build_donor_analytics,
+    'requests': build_request_analytics,
+    'donations': build_donation_analytics,
+    'inventory': build_inventory_analytics,
+}
+
+
+def refresh_analytics_section(section):
+    """Recompute one section and store it in the snapshot table"""
+    started = timezone.now()
+    data = SNAPSHOT_SECTIONS[section]()
+    snapshot, _ = AnalyticsSnapshot.objects.update_or_create(
+        section=section,
+        defaults={'data': data, 'refreshed_at': started},
+    )
+    # Reload so values match what a later read from the table returns
+    snapshot.refresh_from_db(fields=['data'])
+    return snapshot
+
+
+def rebuild_analytics_snapshot():
+    """Full rebuild of every section (scheduled)"""
+    for section in SNAPSHOT_SECTIONS:
+        refresh_analytics_section(section)
+
+
+def mark_analytics_dirty(*sections):
+    """Record a write to the tables behind `sections` (called from signals)"""
+    AnalyticsSnapshot.objects.filter(section__in=sections).update(changed_at=timezone.now())
+
+
+def get_dashboard_analytics():
+    """
+    Get comprehensive analytics for admin dashboard
     
+    Served from the snapshot table in one query. A section is recomputed
+    on read only when it is missing, has changed and is older than
+    SNAPSHOT_STALENESS, or is older than SNAPSHOT_MAX_AGE.
+    """
+    now = timezone.now()
+    snapshots = {snapshot.section: snapshot for snapshot in AnalyticsSnapshot.objects.all()}
+    
+    analytics = {}
+    refreshed = []
+    for section in SNAPSHOT_SECTIONS:
+        snapshot = snapshots.get(section)
+        if (
+            snapshot is None
+            or (snapshot.is_dirty and now - snapshot.refreshed_at > timedelta(seconds=SNAPSHOT_STALENESS))
+            or now - snapshot.refreshed_at > timedelta(seconds=SNAPSHOT_MAX_AGE)
+        ):
+            snapshot = refresh_analytics_section(section)
+        analytics.update(snapshot.data)
+        refreshed.append(snapshot.refreshed_at)
+    
+    analytics['refreshed_at'] = min(refreshed).isoformat()
     return analytics
 
 
@@ -194,36 +290,17 @@ def get_request_fulfillment_metrics():
     """
     Calculate blood request fulfillment metrics
     """
-    total_requests = BloodRequest.objects.count()
-    fulfilled = BloodRequest.objects.filter(status='fulfilled').count()
-    pending = BloodRequest.objects.filter(status='pending').count()
-    cancelled = BloodRequest.objects.filter(status='cancelled').count()
-    
-    # Average time to fulfill (for fulfilled requests)
-    fulfilled_requests = BloodRequest.objects.filter(
-        status='fulfilled',
-        fulfilled_date__isnull=False
-    )
-    
-    avg_fulfillment_time = None
-    if fulfilled_requests.exists():
-        total_time = sum([
-            (req.fulfilled_date - req.created_at).days
-            for req in fulfilled_requests
-        ])
-        avg_fulfillment_time = total_time / fulfilled_requests.count()
+    stats = request_statistics()
     
     metrics = {
-        'total_requests': total_requests,
-        'fulfilled_count': fulfilled,
-        'pending_count': pending,
-        'cancelled_count': cancelled,
-        'fulfillment_rate': (fulfilled / total_requests * 100) if total_requests > 0 else 0,
-        'avg_fulfillment_days': round(avg_fulfillment_time, 1) if avg_fulfillment_time else None,
+        'total_requests': stats['total'],
+        'fulfilled_count': stats['fulfilled'],
+        'pending_count': stats['pending'],
+        'cancelled_count': stats['cancelled'],
+        'fulfillment_rate': stats['fulfillment_rate'],
+        # Averaged in the database over the exact creation-to-fulfilment interval
+        'avg_fulfillment_days': stats['avg_fulfillment_days'],
     }
     
     return metrics
 
-
-# Import F for the low_stock_count query
-from django.db.models import F
@@ -4,14 +4,16 @@ API Views for AJAX requests and mobile app integration
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
 from .models import Donor, BloodRequest, BloodInventory
 from .utils import check_donor_eligibility, get_compatible_blood_types
+from .search_index import full_text_search
+from .security import rate_limit
 import json
 
 
 @login_required
 @require_http_methods(["GET"])
+@rate_limit(max_attempts=120, window_minutes=1, key='user')
 def donor_search_api(request):
     """
     AJAX endpoint for real-time donor search
@@ -25,12 +27,7 @@ def donor_search_api(request):
 
     # Apply filters
     if query:
-        donors = donors.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query) |
-            Q(phone_number__icontains=query)
-        )
+        donors = full_text_search(donors, query)
 
     if blood_type:
         donors = donors.filter(blood_type=blood_type)
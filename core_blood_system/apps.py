@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreBloodSystemConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core_blood_system"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import security  # noqa: F401  (failed-login receiver)
@@ -26,9 +26,37 @@ app.conf.beat_schedule = {
         'task': 'core_blood_system.tasks.send_appointment_reminders',
         'schedule': crontab(hour=9, minute=0),  # Daily at 9:00 AM
     },
-    'mark-expired-blood-units-daily': {
+    'mark-expired-blood-units': {
         'task': 'core_blood_system.tasks.mark_expired_units',
-        'schedule': crontab(hour=0, minute=0),  # Daily at midnight
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    'reconcile-inventory-hourly': {
+        'task': 'core_blood_system.tasks.reconcile_inventory',
+        'schedule': crontab(minute=15),  # Hourly at :15
+    },
+    'update-demand-forecasts-daily': {
+        'task': 'core_blood_system.tasks.update_demand_forecasts',
+        'schedule': crontab(hour=1, minute=0),  # Daily at 1:00 AM
+    },
+    'refresh-inventory-simulation': {
+        'task': 'core_blood_system.tasks.refresh_inventory_simulation',
+        'schedule': crontab(minute='5,35'),  # Every 30 minutes
+    },
+    'reconcile-notification-counts-daily': {
+        'task': 'core_blood_system.tasks.reconcile_notification_counts',
+        'schedule': crontab(hour=2, minute=30),  # Daily at 2:30 AM
+    },
+    'optimize-search-indexes-daily': {
+        'task': 'core_blood_system.tasks.optimize_search_indexes',
+        'schedule': crontab(hour=2, minute=0),  # Daily at 2:00 AM
+    },
+    'rebuild-analytics-snapshot': {
+        'task': 'core_blood_system.tasks.rebuild_analytics_snapshot',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    },
+    'purge-old-reports-daily': {
+        'task': 'core_blood_system.tasks.purge_old_reports',
+        'schedule': crontab(hour=3, minute=0),  # Daily at 3:00 AM
     },
     'check-low-stock-daily': {
         'task': 'core_blood_system.tasks.check_low_stock',
@@ -9,16 +9,100 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.utils import timezone
+from datetime import date
 from io import BytesIO
+import logging
 import os
 
+from .render_cache import get_or_render, open_rendered
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the certificate layout changes so cached PDFs are re-rendered
+CERTIFICATE_TEMPLATE_VERSION = 1
+
+
+def certificate_inputs(donation):
+    """Everything drawn on a donation's certificate"""
+    issued_on = timezone.localtime(donation.approved_at).date() if donation.approved_at else donation.donation_date
+    return {
+        'donation_id': donation.id,
+        'donor_name': f"{donation.donor.first_name} {donation.donor.last_name}",
+        'blood_type': donation.blood_type,
+        'units': donation.units_donated,
+        'donation_date': donation.donation_date.isoformat(),
+        'hospital_name': donation.hospital_name,
+        'issued_on': issued_on.isoformat(),
+    }
+
+
+def certificate_path(donation):
+    """Path of the donation's certificate PDF, rendered on a cache miss"""
+    return get_or_render(
+        'certificate', CERTIFICATE_TEMPLATE_VERSION, certificate_inputs(donation),
+        render_certificate, 'pdf',
+    )
+
+
+def open_certificate(donation):
+    """The donation's certificate PDF opened for reading, rendered on a cache miss"""
+    return open_rendered(
+        'certificate', CERTIFICATE_TEMPLATE_VERSION, certificate_inputs(donation),
+        render_certificate, 'pdf',
+    )
+
 
 def generate_donation_certificate(donation):
     """
     Generate a professional donation certificate PDF
     """
+    with open_certificate(donation) as pdf:
+        return BytesIO(pdf.read())
+
+
+def prerender_certificates(donations):
+    """
+    Render certificates ahead of the first download
+    
+    Returns:
+        number of certificates processed
+    """
+    count = 0
+    for donation in donations:
+        certificate_path(donation)
+        count += 1
+    return count
+
+
+def dispatch_certificate_prerender(donation_ids):
+    """
+    Pre-render certificates for newly approved donations. Queued on
+    Celery when available; otherwise rendered in-process, which takes
+    a few milliseconds per certificate.
+    """
+    from .models import BloodDonation
+    
+    try:
+        from .tasks import prerender_certificates as prerender_task
+        prerender_task.delay(list(donation_ids))
+        return
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to queue certificate pre-render: {str(e)}")
+    
+    try:
+        prerender_certificates(
+            BloodDonation.objects.filter(id__in=donation_ids, status='approved').select_related('donor')
+        )
+    except Exception as e:
+        logger.error(f"Certificate pre-render failed: {str(e)}")
+
+
+def render_certificate(inputs):
+    """Draw the certificate for `inputs` (see certificate_inputs) and return the PDF bytes"""
     buffer = BytesIO()
     
     # Create PDF
@@ -57,7 +141,7 @@ def generate_donation_certificate(donation):
     # Donor Name (Large and Bold)
     p.setFont("Helvetica-Bold", 28)
     p.setFillColor(colors.HexColor('#dc3545'))
-    donor_name = f"{donation.donor.first_name} {donation.donor.last_name}"
+    donor_name = inputs['donor_name']
     p.drawCentredString(width/2, height-3.4*inch, donor_name)
     
     # Decorative underline for name
@@ -74,9 +158,9 @@ def generate_donation_certificate(donation):
     y_position = height - 4.2*inch
     
     details_text = [
-        f"has generously donated {donation.units_donated} unit(s) of {donation.blood_type} blood",
-        f"on {donation.donation_date.strftime('%B %d, %Y')}",
-        f"at {donation.hospital_name}"
+        f"has generously donated {inputs['units']} unit(s) of {inputs['blood_type']} blood",
+        f"on {date.fromisoformat(inputs['donation_date']).strftime('%B %d, %Y')}",
+        f"at {inputs['hospital_name']}"
     ]
     
     for text in details_text:
@@ -99,11 +183,11 @@ def generate_donation_certificate(donation):
     # Certificate Number
     p.setFont("Helvetica", 10)
     p.setFillColor(colors.HexColor('#6c757d'))
-    cert_number = f"Certificate No: BMS-{donation.id:06d}"
+    cert_number = f"Certificate No: BMS-{inputs['donation_id']:06d}"
     p.drawString(1*inch, 1.2*inch, cert_number)
     
     # Issue Date
-    issue_date = f"Issued on: {timezone.now().strftime('%B %d, %Y')}"
+    issue_date = f"Issued on: {date.fromisoformat(inputs['issued_on']).strftime('%B %d, %Y')}"
     p.drawRightString(width-1*inch, 1.2*inch, issue_date)
     
     # Signature Line
@@ -124,8 +208,7 @@ def generate_donation_certificate(donation):
     p.showPage()
     p.save()
     
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
 
 def download_donation_certificate(request, donation_id):
@@ -138,15 +221,12 @@ def download_donation_certificate(request, donation_id):
     try:
         donation = BloodDonation.objects.get(id=donation_id)
         
-        # Generate certificate
-        pdf_buffer = generate_donation_certificate(donation)
-        
-        # Create response
-        response = HttpResponse(pdf_buffer, content_type='application/pdf')
+        # Serve the cached certificate (rendered on first request)
         filename = f"Blood_Donation_Certificate_{donation.donor.last_name}_{donation.donation_date}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return FileResponse(
+            open_certificate(donation),
+            as_attachment=True, filename=filename, content_type='application/pdf',
+        )
         
     except BloodDonation.DoesNotExist:
         from django.shortcuts import redirect
@@ -0,0 +1,126 @@
+"""
+Dashboard Statistics
+Status, role and type breakdowns computed in one aggregate query per table
+"""
+from datetime import timedelta
+
+from django.db.models import Q, F, Count, Sum, Avg, ExpressionWrapper, DurationField
+from django.utils import timezone
+
+from .models import (
+    CustomUser, Donor, BloodRequest, BloodDonation, MatchedDonor, BLOOD_TYPE_CHOICES,
+)
+
+
+def count_breakdown(queryset, **buckets):
+    """
+    Count rows per bucket in a single query
+    
+    Args:
+        queryset: rows to count
+        buckets: name -> Q filter for each bucket
+    
+    Returns:
+        dict with 'total' and one count per bucket
+    """
+    return queryset.aggregate(
+        total=Count('pk'),
+        **{name: Count('pk', filter=condition) for name, condition in buckets.items()}
+    )
+
+
+def user_statistics():
+    """User counts by role and today's logins"""
+    return count_breakdown(
+        CustomUser.objects.all(),
+        admins=Q(role='admin'),
+        users=Q(role='user'),
+        donors=Q(role='donor'),
+        active_today=Q(last_login__date=timezone.now().date()),
+    )
+
+
+def donor_statistics():
+    """Donor counts: availability, eligibility, recent sign-ups and blood types"""
+    from .donor_matching import eligible_donor_filter
+    
+    now = timezone.now()
+    stats = count_breakdown(
+        Donor.objects.all(),
+        available=Q(is_available=True),
+        eligible=eligible_donor_filter(),
+        new_30d=Q(created_at__gte=now - timedelta(days=30)),
+        new_this_month=Q(created_at__gte=now.date().replace(day=1)),
+        **{
+            f'available_{blood_type}': Q(blood_type=blood_type, is_available=True)
+            for blood_type, _ in BLOOD_TYPE_CHOICES
+        }
+    )
+    stats['available_by_blood_type'] = {
+        blood_type: stats.pop(f'available_{blood_type}') for blood_type, _ in BLOOD_TYPE_CHOICES
+    }
+    return stats
+
+
+def request_statistics():
+    """
+    Blood request counts by status and urgency, plus the average time
+    from creation to fulfilment computed in the database
+    """
+    fulfilled = Q(status='fulfilled', fulfilled_date__isnull=False)
+    
+    stats = BloodRequest.objects.aggregate(
+        total=Count('pk'),
+        pending=Count('pk', filter=Q(status='pending')),
+        approved=Count('pk', filter=Q(status='approved')),
+        fulfilled=Count('pk', filter=Q(status='fulfilled')),
+        cancelled=Count('pk', filter=Q(status='cancelled')),
+        critical_pending=Count('pk', filter=Q(urgency='critical', status='pending')),
+        high_pending=Count('pk', filter=Q(urgency='high', status='pending')),
+        new_30d=Count('pk', filter=Q(created_at__gte=timezone.now() - timedelta(days=30))),
+        avg_fulfillment_time=Avg(
+            ExpressionWrapper(F('fulfilled_date') - F('created_at'), output_field=DurationField()),
+            filter=fulfilled,
+        ),
+    )
+    
+    avg_time = stats.pop('avg_fulfillment_time')
+    stats['avg_fulfillment_days'] = (
+        round(avg_time.total_seconds() / 86400, 1) if avg_time is not None else None
+    )
+    stats['fulfillment_rate'] = (stats['fulfilled'] / stats['total'] * 100) if stats['total'] else 0
+    return stats
+
+
+def donation_statistics():
+    """Donation counts by status and period, and units donated"""
+    today = timezone.now().date()
+    this_month_start = today.replace(day=1)
+    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
+    
+    stats = BloodDonation.objects.aggregate(
+        total=Count('pk'),
+        pending=Count('pk', filter=Q(status='pending')),
+        approved=Count('pk', filter=Q(status='approved')),
+        rejected=Count('pk', filter=Q(status='rejected')),
+        last_30d=Count('pk', filter=Q(donation_date__gte=today - timedelta(days=30))),
+        this_month=Count('pk', filter=Q(donation_date__gte=this_month_start)),
+        last_month=Count('pk', filter=Q(
+            donation_date__gte=last_month_start, donation_date__lt=this_month_start
+        )),
+        approved_units=Sum('units_donated', filter=Q(status='approved')),
+        avg_units=Avg('units_donated'),
+    )
+    stats['approved_units'] = stats['approved_units'] or 0
+    stats['avg_units'] = stats['avg_units'] or 0
+    return stats
+
+
+def match_statistics():
+    """Matched donor counts by response status"""
+    return count_breakdown(
+        MatchedDonor.objects.all(),
+        accepted=Q(status='accepted'),
+        declined=Q(status='declined'),
+        pending=Q(status__in=['matched', 'notified']),
+    )
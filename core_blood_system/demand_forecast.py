@@ -0,0 +1,287 @@
+"""
+Demand Forecasting
+Forecasts daily demand and supply per blood type and proposes inventory thresholds
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import BLOOD_TYPE_CHOICES, BloodDonation, BloodInventory, BloodRequest, DemandForecast
+
+logger = logging.getLogger(__name__)
+
+BLOOD_TYPES = [blood_type for blood_type, _ in BLOOD_TYPE_CHOICES]
+BLOOD_TYPE_INDEX = {blood_type: i for i, blood_type in enumerate(BLOOD_TYPES)}
+
+# Smoothing weights for the level, weekday season and squared error
+LEVEL_SMOOTHING = getattr(settings, 'FORECAST_LEVEL_SMOOTHING', 0.1)
+SEASON_SMOOTHING = getattr(settings, 'FORECAST_SEASON_SMOOTHING', 0.05)
+ERROR_SMOOTHING = 0.05
+
+# Days used to initialise the state on a rebuild
+WARMUP_DAYS = 28
+
+# Days forecast ahead (the simulator looks six weeks out)
+FORECAST_HORIZON_DAYS = 42
+
+CRITICAL_DAYS = 1
+LEAD_TIME_DAYS = getattr(settings, 'FORECAST_LEAD_TIME_DAYS', 3)
+REVIEW_DAYS = getattr(settings, 'FORECAST_REVIEW_DAYS', 7)
+SERVICE_LEVEL_Z = 1.65  # lead-time demand covered ~95% of the time
+
+
+def daily_series(rows, start, days):
+    """(blood types x days) array of units per day from (blood_type, date, units) rows"""
+    series = np.zeros((len(BLOOD_TYPES), days))
+    if not rows:
+        return series
+    blood_types, dates, units = zip(*rows)
+    type_index = np.array([BLOOD_TYPE_INDEX.get(blood_type, -1) for blood_type in blood_types])
+    day_index = (np.array(dates, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    keep = (type_index >= 0) & (day_index >= 0) & (day_index < days)
+    np.add.at(series, (type_index[keep], day_index[keep]), np.array(units, dtype=float)[keep])
+    return series
+
+
+def _day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def demand_rows(start, end):
+    """(blood_type, day, units) for requests created from start to end, cancelled ones left out"""
+    since, until = _day_bounds(start, end)
+    return list(
+        BloodRequest.objects.exclude(status='cancelled')
+        .filter(created_at__gte=since, created_at__lt=until)
+        .values_list('blood_type', TruncDate('created_at'), 'units_needed')
+    )
+
+
+def supply_rows(start, end):
+    """(blood_type, day, units) for donations approved from start to end"""
+    since, until = _day_bounds(start, end)
+    return list(
+        BloodDonation.objects.filter(status='approved')
+        .annotate(approved_on=Coalesce('approved_at', 'created_at'))
+        .filter(approved_on__gte=since, approved_on__lt=until)
+        .values_list('blood_type', TruncDate('approved_on'), 'units_donated')
+    )
+
+
+def first_history_date():
+    """Day of the earliest demand or supply record, None without history"""
+    firsts = [
+        BloodRequest.objects.exclude(status='cancelled').order_by('created_at')
+        .values_list('created_at', flat=True).first(),
+        BloodDonation.objects.filter(status='approved').order_by('created_at')
+        .values_list('created_at', flat=True).first(),
+    ]
+    firsts = [timezone.localtime(first).date() for first in firsts if first]
+    return min(firsts) if firsts else None
+
+
+def initial_state(series, start_weekday):
+    """Level, weekday season and error variance from the first WARMUP_DAYS"""
+    warm = series[:, :WARMUP_DAYS]
+    weekdays = (start_weekday + np.arange(warm.shape[1])) % 7
+    level = warm.mean(axis=1)
+    totals = np.zeros((len(series), 7))
+    np.add.at(totals.T, weekdays, warm.T)
+    counts = np.bincount(weekdays, minlength=7)
+    season = np.where(counts > 0, totals / np.maximum(counts, 1) - level[:, None], 0.0)
+    return {'level': level, 'season': season, 'mse': warm.var(axis=1)}
+
+
+def smooth(series, state, start_weekday, alpha=None, gamma=None):
+    """
+    Fold the days of `series` into `state`, every blood type at once
+
+    Returns:
+        (new state, one-day-ahead forecasts made before each day was seen)
+    """
+    alpha = LEVEL_SMOOTHING if alpha is None else alpha
+    gamma = SEASON_SMOOTHING if gamma is None else gamma
+    level = state['level'].copy()
+    season = state['season'].copy()
+    mse = state['mse'].copy()
+
+    fitted = np.empty_like(series)
+    for day in range(series.shape[1]):
+        weekday = (start_weekday + day) % 7
+        fitted[:, day] = level + season[:, weekday]
+        error = series[:, day] - fitted[:, day]
+        level += alpha * error
+        season[:, weekday] += gamma * error
+        mse += ERROR_SMOOTHING * (error ** 2 - mse)
+    return {'level': level, 'season': season, 'mse': mse}, np.clip(fitted, 0, None)
+
+
+def project(state, start_weekday, horizon=FORECAST_HORIZON_DAYS):
+    """(blood types x horizon) forecast starting on a day with weekday `start_weekday`"""
+    weekdays = (start_weekday + np.arange(horizon)) % 7
+    return np.clip(state['level'][:, None] + state['season'][:, weekdays], 0, None)
+
+
+def propose_thresholds(demand, mse):
+    """
+    (critical, minimum, optimal) int arrays from a demand forecast and its
+    one-day error variance
+
+    critical: expected demand over CRITICAL_DAYS
+    minimum: expected demand over the resupply lead time plus safety stock
+    optimal: minimum plus expected demand over the review period
+    """
+    critical = np.ceil(demand[:, :CRITICAL_DAYS].sum(axis=1))
+    safety_stock = SERVICE_LEVEL_Z * np.sqrt(np.maximum(mse, 0) * LEAD_TIME_DAYS)
+    minimum = np.ceil(demand[:, :LEAD_TIME_DAYS].sum(axis=1) + safety_stock)
+    optimal = np.ceil(minimum + demand[:, LEAD_TIME_DAYS:LEAD_TIME_DAYS + REVIEW_DAYS].sum(axis=1))
+
+    # Keep critical < minimum < optimal, as BloodInventory.get_status expects
+    critical = np.maximum(critical, 1)
+    minimum = np.maximum(minimum, critical + 1)
+    optimal = np.maximum(optimal, minimum + 1)
+    return critical.astype(int), minimum.astype(int), optimal.astype(int)
+
+
+def _pack(state, i):
+    return {'level': float(state['level'][i]), 'season': state['season'][i].tolist(), 'mse': float(state['mse'][i])}
+
+
+def _unpack(forecasts, series):
+    return {
+        'level': np.array([forecasts[bt].state[series]['level'] for bt in BLOOD_TYPES]),
+        'season': np.array([forecasts[bt].state[series]['season'] for bt in BLOOD_TYPES]),
+        'mse': np.array([forecasts[bt].state[series]['mse'] for bt in BLOOD_TYPES]),
+    }
+
+
+def update_forecasts(today=None, rebuild=False, apply=None):
+    """
+    Bring the cached forecasts up to yesterday (run nightly)
+
+    Only the days since the cached through_date are read and folded in
+    (request and approval dates only move forward); with rebuild=True (or
+    no complete cache) the whole history is refit.
+
+    Args:
+        apply: also write the proposed thresholds to BloodInventory
+               (default: settings.DEMAND_FORECAST_AUTO_APPLY)
+
+    Returns:
+        dict {blood_type: DemandForecast}, empty without any history
+    """
+    today = today or timezone.localdate()
+    end = today - timedelta(days=1)
+    forecasts = {forecast.blood_type: forecast for forecast in DemandForecast.objects.all()}
+    through_dates = {forecast.through_date for forecast in forecasts.values()}
+    incremental = not rebuild and set(forecasts) == set(BLOOD_TYPES) and len(through_dates) == 1
+
+    if incremental:
+        start = through_dates.pop() + timedelta(days=1)
+        if start > end:
+            return forecasts
+        demand_state, supply_state = _unpack(forecasts, 'demand'), _unpack(forecasts, 'supply')
+    else:
+        start = first_history_date()
+        if start is None or start > end:
+            return {}
+
+    days = (end - start).days + 1
+    demand = daily_series(demand_rows(start, end), start, days)
+    supply = daily_series(supply_rows(start, end), start, days)
+    if not incremental:
+        demand_state = initial_state(demand, start.weekday())
+        supply_state = initial_state(supply, start.weekday())
+    demand_state, _ = smooth(demand, demand_state, start.weekday())
+    supply_state, _ = smooth(supply, supply_state, start.weekday())
+
+    next_weekday = today.weekday()
+    demand_forecast = project(demand_state, next_weekday)
+    supply_forecast = project(supply_state, next_weekday)
+    critical, minimum, optimal = propose_thresholds(demand_forecast, demand_state['mse'])
+
+    with transaction.atomic():
+        for i, blood_type in enumerate(BLOOD_TYPES):
+            forecasts[blood_type], _ = DemandForecast.objects.update_or_create(
+                blood_type=blood_type,
+                defaults={
+                    'through_date': end,
+                    'state': {'demand': _pack(demand_state, i), 'supply': _pack(supply_state, i)},
+                    'daily_demand': np.round(demand_forecast[i], 3).tolist(),
+                    'daily_supply': np.round(supply_forecast[i], 3).tolist(),
+                    'proposed_critical_threshold': int(critical[i]),
+                    'proposed_minimum_threshold': int(minimum[i]),
+                    'proposed_optimal_level': int(optimal[i]),
+                },
+            )
+
+    logger.info(f"Demand forecasts updated through {end} ({days} days folded in)")
+    if apply is None:
+        apply = getattr(settings, 'DEMAND_FORECAST_AUTO_APPLY', False)
+    if apply:
+        apply_thresholds(forecasts.values())
+    return forecasts
+
+
+def apply_thresholds(forecasts=None):
+    """
+    Write proposed thresholds to BloodInventory
+
+    Returns:
+        list of blood types whose thresholds changed
+    """
+    forecasts = DemandForecast.objects.all() if forecasts is None else forecasts
+    changed = []
+    with transaction.atomic():
+        for forecast in forecasts:
+            updated = BloodInventory.objects.filter(blood_type=forecast.blood_type).exclude(
+                critical_threshold=forecast.proposed_critical_threshold,
+                minimum_threshold=forecast.proposed_minimum_threshold,
+                optimal_level=forecast.proposed_optimal_level,
+            ).update(
+                critical_threshold=forecast.proposed_critical_threshold,
+                minimum_threshold=forecast.proposed_minimum_threshold,
+                optimal_level=forecast.proposed_optimal_level,
+            )
+            if updated:
+                changed.append(forecast.blood_type)
+    if changed:
+        logger.info(f"Applied forecast thresholds for {changed}")
+    return changed
+
+
+def backtest(demand, start_weekday, holdout_days):
+    """
+    One-day-ahead forecast error over the last `holdout_days` of a
+    (blood types x days) history, against seasonal naive (same weekday
+    last week) and training-mean baselines
+
+    Returns:
+        dict {method: {'mae': ..., 'rmse': ...}}
+    """
+    train = demand[:, :-holdout_days]
+    state, _ = smooth(train, initial_state(train, start_weekday), start_weekday)
+    _, fitted = smooth(demand[:, -holdout_days:], state, (start_weekday + train.shape[1]) % 7)
+
+    actual = demand[:, -holdout_days:]
+    baselines = {
+        'smoothing': fitted,
+        'seasonal_naive': demand[:, -holdout_days - 7:-7],
+        'mean': np.repeat(train.mean(axis=1, keepdims=True), holdout_days, axis=1),
+    }
+    return {
+        method: {
+            'mae': float(np.abs(actual - forecast).mean()),
+            'rmse': float(np.sqrt(((actual - forecast) ** 2).mean())),
+        }
+        for method, forecast in baselines.items()
+    }
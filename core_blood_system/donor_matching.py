@@ -2,11 +2,18 @@
 Automated Donor Matching System
 Matches blood requests with eligible donors based on multiple criteria
 """
+from collections import defaultdict
 from datetime import datetime, timedelta
-from django.db.models import Q
-from .models import Donor, BloodRequest, BLOOD_TYPE_CHOICES
+from django.db.models import Q, F, Case, When, Value, Count, IntegerField
+from django.db.models.functions import Lower, StrIndex
+from django.db.models.lookups import GreaterThan
+from .models import Donor, BloodRequest
 from .notifications import send_blood_request_notification
 from .sms_notifications import send_urgent_blood_request_sms
+from .geolocation import nearest_donors, distance_between
+from .eligibility_checker import EligibilityChecker
+from .eligibility_engine import evaluate_donor, UNAVAILABLE, INTERVAL, TOO_YOUNG, TOO_OLD
+from .analytics import mark_analytics_dirty
 
 
 # Blood compatibility matrix
@@ -33,30 +40,22 @@ def check_donor_eligibility(donor):
     """
     Check if donor is eligible to donate blood
     
-    Eligibility criteria:
+    Eligibility criteria (see eligibility_engine):
     - Must be available
-    - Must wait at least 56 days (8 weeks) since last donation
-    - Age between 18-65 years (if date_of_birth available)
+    - Must have passed the donation interval (56 days after the last
+      donation, 84 for female donors) unless overridden by an admin
+    - Age between 18-65 years (if date_of_birth available) unless
+      overridden by an admin
     """
-    # Check availability
-    if not donor.is_available:
+    result = evaluate_donor(donor)
+    if result.reasons == UNAVAILABLE:
         return False, "Donor marked as unavailable"
-    
-    # Check last donation date (56-day rule)
-    if donor.last_donation_date:
-        days_since_donation = (datetime.now().date() - donor.last_donation_date).days
-        if days_since_donation < 56:
-            days_remaining = 56 - days_since_donation
-            return False, f"Must wait {days_remaining} more days since last donation"
-    
-    # Check age eligibility (if date_of_birth is available)
-    if donor.date_of_birth:
-        age = (datetime.now().date() - donor.date_of_birth).days // 365
-        if age < 18:
-            return False, "Donor must be at least 18 years old"
-        if age > 65:
-            return False, "Donor must be under 65 years old"
-    
+    if result.reasons == INTERVAL:
+        return False, f"Must wait {result.days_remaining} more days since last donation"
+    if result.reasons == TOO_YOUNG:
+        return False, "Donor must be at least 18 years old"
+    if result.reasons == TOO_OLD:
+        return False, "Donor must be under 65 years old"
     return True, "Eligible"
 
 
@@ -86,67 +85,134 @@ def calculate_distance_score(donor, blood_request):
     return score
 
 
-def find_matching_donors(blood_request, max_donors=50):
+def eligible_donor_filter(today=None):
+    """
+    Database-side equivalent of check_donor_eligibility
+
+    Returns a Q object covering availability, the donation interval
+    (a range on the indexed next_eligible_date column), the 18-65 age
+    window and the admin override, so eligibility can be applied inside
+    a single query instead of donor by donor in Python.
+    """
+    today = today or datetime.now().date()
+
+    # age = days_alive // 365 must fall in [18, 65]
+    oldest_birth_date = today - timedelta(days=66 * 365)
+    youngest_birth_date = today - timedelta(days=18 * 365)
+
+    return Q(is_available=True) & (
+        Q(is_eligible_override=True) | (
+            (Q(next_eligible_date__isnull=True) | Q(next_eligible_date__lte=today))
+            & (Q(date_of_birth__isnull=True) | Q(date_of_birth__gt=oldest_birth_date, date_of_birth__lte=youngest_birth_date))
+        )
+    )
+
+
+def annotate_match_ranking(queryset, blood_request):
+    """
+    Annotate donors with the ranking columns used by find_matching_donors
+
+    - exact_match: 1 when the donor has the requested blood type
+    - proximity_score: same scoring as calculate_distance_score, computed
+      in SQL (city in hospital address = 100, state = 50)
+    """
+    hospital_address = Lower(Value(blood_request.hospital_address or ''))
+
+    return queryset.annotate(
+        exact_match=Case(
+            When(blood_type=blood_request.blood_type, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        proximity_score=(
+            Case(
+                When(GreaterThan(StrIndex(hospital_address, Lower('city')), 0), then=Value(100)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            + Case(
+                When(GreaterThan(StrIndex(hospital_address, Lower('state')), 0), then=Value(50)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ),
+    )
+
+
+def find_matching_donors(blood_request, max_donors=50, radius_km=None):
     """
     Find eligible donors for a blood request
     
+    Eligibility, ranking and the limit all run inside the database:
+    one ordered/limited query for the top donors and one aggregate for
+    the eligible/ineligible counts.
+    
+    When `radius_km` is given and the hospital is geocoded, donors are
+    taken from the spatial grid index instead: exact blood type matches
+    within the radius first, nearest first, then other compatible types.
+    
     Returns:
-        dict with 'eligible_donors', 'ineligible_donors', and 'reasons'
+        dict with 'eligible_donors', 'eligible_count', 'ineligible_count'
+        and 'compatible_blood_types'. Each donor carries `distance_km`
+        (None when either side is not geocoded).
     """
     # Get compatible blood types
     compatible_types = get_compatible_blood_types(blood_request.blood_type)
     
-    # Find donors with compatible blood types
-    potential_donors = Donor.objects.filter(
-        blood_type__in=compatible_types
-    ).order_by('-last_donation_date')  # Prioritize those who haven't donated recently
+    potential_donors = Donor.objects.filter(blood_type__in=compatible_types)
+    eligible_filter = eligible_donor_filter()
     
-    eligible_donors = []
-    ineligible_donors = []
-    
-    for donor in potential_donors:
-        is_eligible, reason = check_donor_eligibility(donor)
-        
-        if is_eligible:
-            # Calculate proximity score
-            proximity_score = calculate_distance_score(donor, blood_request)
-            
-            eligible_donors.append({
-                'donor': donor,
-                'proximity_score': proximity_score,
-                'exact_match': donor.blood_type == blood_request.blood_type,
-            })
-        else:
-            ineligible_donors.append({
-                'donor': donor,
-                'reason': reason,
-            })
-    
-    # Sort eligible donors by:
-    # 1. Exact blood type match
-    # 2. Proximity score
-    # 3. Last donation date (older = higher priority)
-    eligible_donors.sort(
-        key=lambda x: (
-            x['exact_match'],
-            x['proximity_score'],
-            x['donor'].last_donation_date or datetime.min.date()
-        ),
-        reverse=True
+    counts = potential_donors.aggregate(
+        total=Count('id'),
+        eligible=Count('id', filter=eligible_filter),
     )
     
-    # Limit to max_donors
-    eligible_donors = eligible_donors[:max_donors]
+    if radius_km is not None and blood_request.hospital_latitude is not None:
+        eligible_donors = _find_donors_within_radius(
+            potential_donors.filter(eligible_filter), blood_request, max_donors, radius_km
+        )
+    else:
+        # Sort eligible donors by:
+        # 1. Exact blood type match
+        # 2. Proximity score
+        # 3. Last donation date (most recent first, never donated last)
+        eligible_donors = list(
+            annotate_match_ranking(potential_donors.filter(eligible_filter), blood_request)
+            .order_by(
+                '-exact_match',
+                '-proximity_score',
+                F('last_donation_date').desc(nulls_last=True),
+                'id',
+            )[:max_donors]
+        )
+        for donor in eligible_donors:
+            donor.distance_km = distance_between(donor, blood_request)
     
     return {
-        'eligible_donors': [item['donor'] for item in eligible_donors],
+        'eligible_donors': eligible_donors,
         'eligible_count': len(eligible_donors),
-        'ineligible_donors': ineligible_donors,
-        'ineligible_count': len(ineligible_donors),
+        'ineligible_count': counts['total'] - counts['eligible'],
         'compatible_blood_types': compatible_types,
     }
 
 
+def _find_donors_within_radius(eligible_donors, blood_request, max_donors, radius_km):
+    """Nearest eligible donors within the radius, exact blood type first"""
+    latitude = blood_request.hospital_latitude
+    longitude = blood_request.hospital_longitude
+    
+    donors = nearest_donors(
+        eligible_donors.filter(blood_type=blood_request.blood_type),
+        latitude, longitude, radius_km, limit=max_donors,
+    )
+    if len(donors) < max_donors:
+        donors += nearest_donors(
+            eligible_donors.exclude(blood_type=blood_request.blood_type),
+            latitude, longitude, radius_km, limit=max_donors - len(donors),
+        )
+    return donors
+
+
 def notify_matching_donors(blood_request, send_sms=True, send_email=True):
     """
     Find and notify all matching donors for a blood request
@@ -171,8 +237,7 @@ def notify_matching_donors(blood_request, send_sms=True, send_email=True):
     email_sent = 0
     if send_email:
         try:
-            send_blood_request_notification(blood_request, eligible_donors)
-            email_sent = len(eligible_donors)
+            email_sent = send_blood_request_notification(blood_request, eligible_donors)
         except Exception as e:
             print(f"Email notification failed: {str(e)}")
     
@@ -198,11 +263,45 @@ def get_donor_next_eligible_date(donor):
     """
     Calculate when a donor will be eligible to donate again
     """
-    if not donor.last_donation_date:
+    if not donor.next_eligible_date:
         return datetime.now().date()  # Eligible now
     
-    next_eligible = donor.last_donation_date + timedelta(days=56)
-    return next_eligible
+    return donor.next_eligible_date
+
+
+def backfill_next_eligible_dates(queryset=None, batch_size=500, dry_run=False):
+    """
+    Correct next_eligible_date where it is out of step with
+    last_donation_date and gender (rows written by bulk_create, raw SQL,
+    or before the column was maintained for female donors)
+    
+    Reads only (id, last_donation_date, gender, next_eligible_date) and
+    updates the mismatched rows grouped by their corrected date.
+    
+    Returns:
+        number of donors corrected (or that would be, with dry_run)
+    """
+    if queryset is None:
+        queryset = Donor.objects.all()
+    
+    corrections = defaultdict(list)
+    rows = queryset.values_list('id', 'last_donation_date', 'gender', 'next_eligible_date')
+    for donor_id, last_donation_date, gender, stored in rows.iterator(chunk_size=2000):
+        expected = None
+        if last_donation_date:
+            expected = last_donation_date + timedelta(days=EligibilityChecker.donation_interval_days(gender))
+        if stored != expected:
+            corrections[expected].append(donor_id)
+    
+    if not dry_run:
+        for expected, donor_ids in corrections.items():
+            for start in range(0, len(donor_ids), batch_size):
+                Donor.objects.filter(id__in=donor_ids[start:start + batch_size]).update(
+                    next_eligible_date=expected
+                )
+        if corrections:
+            mark_analytics_dirty('donors', 'donations')
+    return sum(len(donor_ids) for donor_ids in corrections.values())
 
 
 def get_eligible_donors_for_blood_type(blood_type, location=None):
@@ -213,8 +312,8 @@ def get_eligible_donors_for_blood_type(blood_type, location=None):
     compatible_types = get_compatible_blood_types(blood_type)
     
     donors = Donor.objects.filter(
+        eligible_donor_filter(),
         blood_type__in=compatible_types,
-        is_available=True
     )
     
     if location:
@@ -222,13 +321,7 @@ def get_eligible_donors_for_blood_type(blood_type, location=None):
             Q(city__icontains=location) | Q(state__icontains=location)
         )
     
-    eligible_donors = []
-    for donor in donors:
-        is_eligible, reason = check_donor_eligibility(donor)
-        if is_eligible:
-            eligible_donors.append(donor)
-    
-    return eligible_donors
+    return list(donors)
 
 
 def resend_notifications_to_donors(blood_request):
@@ -244,27 +337,13 @@ def get_matching_statistics():
     """
     Get statistics about donor matching system
     """
-    from .models import Donor, BloodRequest
-    
-    total_donors = Donor.objects.count()
-    available_donors = Donor.objects.filter(is_available=True).count()
-    
-    # Count eligible donors (those who can donate now)
-    eligible_count = 0
-    for donor in Donor.objects.filter(is_available=True):
-        is_eligible, _ = check_donor_eligibility(donor)
-        if is_eligible:
-            eligible_count += 1
+    from .dashboard_stats import donor_statistics
     
-    # Blood type distribution
-    blood_type_stats = {}
-    for blood_type, _ in BLOOD_TYPE_CHOICES:
-        count = Donor.objects.filter(blood_type=blood_type, is_available=True).count()
-        blood_type_stats[blood_type] = count
+    stats = donor_statistics()
     
     return {
-        'total_donors': total_donors,
-        'available_donors': available_donors,
-        'eligible_donors': eligible_count,
-        'blood_type_distribution': blood_type_stats,
+        'total_donors': stats['total'],
+        'available_donors': stats['available'],
+        'eligible_donors': stats['eligible'],
+        'blood_type_distribution': stats['available_by_blood_type'],
     }
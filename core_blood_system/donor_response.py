@@ -3,8 +3,10 @@ Donor Response and Confirmation System
 Allows donors to accept/decline blood donation requests
 """
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from .models import Donor, BloodRequest, CustomUser
+from .dashboard_stats import count_breakdown
 
 
 class DonorResponse(models.Model):
@@ -141,11 +143,18 @@ def get_response_statistics(blood_request=None):
     else:
         responses = DonorResponse.objects.all()
     
-    total = responses.count()
-    accepted = responses.filter(response_status='accepted').count()
-    declined = responses.filter(response_status='declined').count()
-    pending = responses.filter(response_status='pending').count()
-    completed = responses.filter(response_status='completed').count()
+    stats = count_breakdown(
+        responses,
+        accepted=Q(response_status='accepted'),
+        declined=Q(response_status='declined'),
+        pending=Q(response_status='pending'),
+        completed=Q(response_status='completed'),
+    )
+    total = stats['total']
+    accepted = stats['accepted']
+    declined = stats['declined']
+    pending = stats['pending']
+    completed = stats['completed']
     
     acceptance_rate = (accepted / total * 100) if total > 0 else 0
     
@@ -4,17 +4,18 @@ Validates donor eligibility based on health and timing criteria
 """
 from datetime import date, timedelta
 from django.utils import timezone
+from . import eligibility_engine as engine
 
 
 class EligibilityChecker:
     """Utility class for checking donor eligibility"""
     
     # Eligibility constants
-    MIN_AGE = 18
-    MAX_AGE = 65
+    MIN_AGE = engine.MIN_AGE
+    MAX_AGE = engine.MAX_AGE
     MIN_WEIGHT_KG = 50
-    MALE_DONATION_INTERVAL_DAYS = 56
-    FEMALE_DONATION_INTERVAL_DAYS = 84
+    MALE_DONATION_INTERVAL_DAYS = engine.MALE_DONATION_INTERVAL_DAYS
+    FEMALE_DONATION_INTERVAL_DAYS = engine.FEMALE_DONATION_INTERVAL_DAYS
     ILLNESS_RECOVERY_DAYS = 14
     
     # Disqualifying health conditions
@@ -39,12 +40,13 @@ class EligibilityChecker:
         Returns:
             dict: {'eligible': bool, 'reason': str or None}
         """
-        if age < EligibilityChecker.MIN_AGE:
+        reason = engine.age_reasons([age])[0]
+        if reason == engine.TOO_YOUNG:
             return {
                 'eligible': False,
                 'reason': f'Donor must be at least {EligibilityChecker.MIN_AGE} years old'
             }
-        elif age > EligibilityChecker.MAX_AGE:
+        elif reason == engine.TOO_OLD:
             return {
                 'eligible': False,
                 'reason': f'Donor must be {EligibilityChecker.MAX_AGE} years or younger'
@@ -69,6 +71,11 @@ class EligibilityChecker:
             }
         return {'eligible': True, 'reason': None}
     
+    @staticmethod
+    def donation_interval_days(gender):
+        """Days required between donations for a gender"""
+        return int(engine.donation_intervals(engine.female_codes([gender or '']))[0])
+    
     @staticmethod
     def check_donation_interval(last_donation_date, gender):
         """
@@ -86,18 +93,12 @@ class EligibilityChecker:
             return {'eligible': True, 'reason': None, 'next_eligible_date': None}
         
         # Determine required interval based on gender
-        if gender and gender.lower() == 'female':
-            required_interval = EligibilityChecker.FEMALE_DONATION_INTERVAL_DAYS
-        else:
-            required_interval = EligibilityChecker.MALE_DONATION_INTERVAL_DAYS
+        female = engine.female_codes([gender or ''])
+        required_interval = int(engine.donation_intervals(female)[0])
+        days_remaining = int(engine.interval_days_remaining([last_donation_date], female)[0])
         
-        # Calculate days since last donation
-        days_since_donation = (date.today() - last_donation_date).days
-        
-        if days_since_donation < required_interval:
-            days_remaining = required_interval - days_since_donation
+        if days_remaining > 0:
             next_eligible_date = date.today() + timedelta(days=days_remaining)
-            
             return {
                 'eligible': False,
                 'reason': f'Must wait {required_interval} days between donations. {days_remaining} days remaining.',
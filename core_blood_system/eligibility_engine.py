@@ -0,0 +1,164 @@
+"""
+Eligibility Engine
+Evaluates donor eligibility for a whole population at once from columnar
+data (NumPy arrays), and one donor at a time through the same rules.
+
+The rules, in the order a reason code is reported:
+- Donor must be marked available (UNAVAILABLE)
+- The donation interval must have passed: 56 days after the last
+  donation, 84 for female donors (INTERVAL)
+- Age, as whole 365-day years, must be 18-65 when the date of birth is
+  known (TOO_YOUNG, TOO_OLD)
+
+The admin override waives the interval and age rules but not
+availability. Dates are datetime64[D] arrays with NaT for missing values.
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+MIN_AGE = 18
+MAX_AGE = 65
+MALE_DONATION_INTERVAL_DAYS = 56
+FEMALE_DONATION_INTERVAL_DAYS = 84
+
+# Reason codes (int8)
+ELIGIBLE = 0
+UNAVAILABLE = 1
+INTERVAL = 2
+TOO_YOUNG = 3
+TOO_OLD = 4
+
+REASON_LABELS = {
+    ELIGIBLE: 'eligible',
+    UNAVAILABLE: 'unavailable',
+    INTERVAL: 'interval',
+    TOO_YOUNG: 'too_young',
+    TOO_OLD: 'too_old',
+}
+
+EligibilityResult = namedtuple('EligibilityResult', ['eligible', 'reasons', 'days_remaining'])
+
+
+def _today(today):
+    return np.datetime64(today or date.today(), 'D')
+
+
+def to_dates(values):
+    """Array of datetime64[D] from dates, with None as NaT"""
+    return np.asarray(values, dtype='datetime64[D]')
+
+
+def female_codes(genders):
+    """Boolean gender codes (True for female) from gender strings"""
+    genders = np.asarray(genders, dtype=str)
+    return np.char.lower(genders) == 'female'
+
+
+def donation_intervals(female):
+    """Days required between donations for each gender code"""
+    return np.where(female, FEMALE_DONATION_INTERVAL_DAYS, MALE_DONATION_INTERVAL_DAYS)
+
+
+def age_reasons(ages):
+    """TOO_YOUNG / TOO_OLD / ELIGIBLE for ages in whole years"""
+    ages = np.asarray(ages)
+    reasons = np.zeros(ages.shape, dtype=np.int8)
+    reasons[ages < MIN_AGE] = TOO_YOUNG
+    reasons[ages > MAX_AGE] = TOO_OLD
+    return reasons
+
+
+def ages_on(birth_dates, today=None):
+    """Age in whole 365-day years, -1 where the birth date is unknown"""
+    birth_dates = to_dates(birth_dates)
+    days = (_today(today) - birth_dates).astype(np.int64)
+    return np.where(np.isnat(birth_dates), -1, days // 365)
+
+
+def interval_days_remaining(last_donation_dates, female, today=None):
+    """Days until the donation interval has passed (0 if it has)"""
+    last_donation_dates = to_dates(last_donation_dates)
+    next_dates = last_donation_dates + donation_intervals(female).astype('timedelta64[D]')
+    remaining = (next_dates - _today(today)).astype(np.int64)
+    return np.where(np.isnat(last_donation_dates) | (remaining < 0), 0, remaining)
+
+
+def evaluate(birth_dates, last_donation_dates, female, available=None, override=None, today=None):
+    """
+    Evaluate every donor in one pass
+
+    Args:
+        birth_dates: datetime64[D] array (NaT if unknown)
+        last_donation_dates: datetime64[D] array (NaT if never donated)
+        female: boolean array of gender codes
+        available: boolean array, all True if omitted
+        override: boolean array of admin overrides, all False if omitted
+        today: date to evaluate on (default: today)
+
+    Returns:
+        EligibilityResult of arrays: eligible (bool), reasons (int8 reason
+        codes) and days_remaining (days until the interval has passed)
+    """
+    birth_dates = to_dates(birth_dates)
+    days_remaining = interval_days_remaining(last_donation_dates, female, today)
+
+    ages = ages_on(birth_dates, today)
+    reasons = np.where(ages < 0, ELIGIBLE, age_reasons(ages)).astype(np.int8)
+    reasons[days_remaining > 0] = INTERVAL
+
+    if override is not None:
+        override = np.asarray(override, dtype=bool)
+        reasons[override] = ELIGIBLE
+        days_remaining = np.where(override, 0, days_remaining)
+    if available is not None:
+        reasons[~np.asarray(available, dtype=bool)] = UNAVAILABLE
+
+    return EligibilityResult(reasons == ELIGIBLE, reasons, days_remaining)
+
+
+def evaluate_donor(donor, today=None):
+    """
+    Evaluate a single Donor (or any object with the same fields)
+
+    Returns:
+        EligibilityResult of scalars: eligible, reason code, days_remaining
+    """
+    result = evaluate(
+        [donor.date_of_birth],
+        [donor.last_donation_date],
+        female_codes([donor.gender or '']),
+        available=[donor.is_available],
+        override=[getattr(donor, 'is_eligible_override', False)],
+        today=today,
+    )
+    return EligibilityResult(bool(result.eligible[0]), int(result.reasons[0]), int(result.days_remaining[0]))
+
+
+def evaluate_queryset(queryset, today=None):
+    """
+    Evaluate the donors of a queryset from a single column projection
+
+    Returns:
+        (ids, EligibilityResult) with ids as an int64 array in queryset order
+    """
+    rows = list(queryset.values_list(
+        'id', 'date_of_birth', 'last_donation_date', 'gender', 'is_available', 'is_eligible_override',
+    ))
+    if not rows:
+        empty = np.zeros(0, dtype=bool)
+        return np.zeros(0, dtype=np.int64), EligibilityResult(
+            empty, np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int64)
+        )
+
+    ids, birth_dates, last_donation_dates, genders, available, override = zip(*rows)
+    result = evaluate(
+        to_dates(birth_dates),
+        to_dates(last_donation_dates),
+        female_codes([gender or '' for gender in genders]),
+        available=np.array(available, dtype=bool),
+        override=np.array(override, dtype=bool),
+        today=today,
+    )
+    return np.array(ids, dtype=np.int64), result
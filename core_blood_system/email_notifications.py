@@ -2,16 +2,180 @@
 Email Notification Service
 Handles email notifications using Django email backend
 """
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.core.mail import send_mail, EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
+from django.utils.html import escape
+from types import SimpleNamespace
 from .models import NotificationLog, NotificationPreference, CustomUser
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================
+# BULK DISPATCH
+# ============================================
+
+# Stand-in for the recipient while a bulk template is rendered once;
+# the tokens are replaced with each recipient's name afterwards
+RECIPIENT_FIRST_NAME = '__RECIPIENT_FIRST_NAME__'
+RECIPIENT_LAST_NAME = '__RECIPIENT_LAST_NAME__'
+RECIPIENT_PLACEHOLDER = SimpleNamespace(first_name=RECIPIENT_FIRST_NAME, last_name=RECIPIENT_LAST_NAME)
+
+# Messages handed to the mail connection at a time
+BULK_EMAIL_BATCH_SIZE = 500
+
+
+def _personalize(text, first_name, last_name, html=False):
+    """Swap the placeholder tokens for a recipient's name"""
+    if html:
+        first_name, last_name = escape(first_name), escape(last_name)
+    return text.replace(RECIPIENT_FIRST_NAME, first_name).replace(RECIPIENT_LAST_NAME, last_name)
+
+
+def _opted_out_user_ids(user_ids, preference_field):
+    """Ids of users who switched `preference_field` off, in as few queries as possible"""
+    opted_out = set()
+    for i in range(0, len(user_ids), 2000):
+        opted_out.update(
+            NotificationPreference.objects.filter(
+                user_id__in=user_ids[i:i + 2000], **{preference_field: False}
+            ).values_list('user_id', flat=True)
+        )
+    return opted_out
+
+
+def dispatch_bulk_email(recipients, notification_type, subject, template_name, context,
+                        preference_field=None, connection=None):
+    """
+    Send one templated notification to many users
+    
+    - preferences for the whole recipient set are fetched up front
+    - the HTML and text templates are rendered once, with
+      RECIPIENT_PLACEHOLDER standing in for the recipient; only the name
+      is filled in per message
+    - every message goes through one reused mail connection
+    - NotificationLog rows are written with bulk_create
+    
+    Args:
+        recipients: iterable of (user, email, first_name, last_name)
+        template_name: template path without extension (.html / .txt)
+        context: template context; put RECIPIENT_PLACEHOLDER where the
+            template expects the recipient (e.g. context['donor'])
+        preference_field: NotificationPreference field that must not be
+            False for a user to receive the email
+    
+    Returns:
+        number of emails sent
+    """
+    recipients = [r for r in recipients if r[0] is not None and r[1]]
+    if preference_field and recipients:
+        opted_out = _opted_out_user_ids([r[0].id for r in recipients], preference_field)
+        recipients = [r for r in recipients if r[0].id not in opted_out]
+    if not recipients:
+        return 0
+    
+    html_template = render_to_string(f'{template_name}.html', context)
+    text_template = render_to_string(f'{template_name}.txt', context)
+    
+    messages = []
+    for user, email, first_name, last_name in recipients:
+        msg = EmailMultiAlternatives(
+            subject=subject,
+            body=_personalize(text_template, first_name or '', last_name or ''),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        msg.attach_alternative(
+            _personalize(html_template, first_name or '', last_name or '', html=True), "text/html"
+        )
+        messages.append(msg)
+    
+    return _send_logged(messages, [r[0] for r in recipients], notification_type, subject, connection)
+
+
+def _send_logged(messages, users, notification_type, subject, connection=None):
+    """
+    Send prepared messages over one connection, BULK_EMAIL_BATCH_SIZE at
+    a time, and bulk_create a NotificationLog row per message
+    
+    Returns:
+        number of emails sent
+    """
+    connection = connection or get_connection()
+    logs = []
+    sent_count = 0
+    
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open mail connection for {notification_type}: {str(e)}")
+        NotificationLog.objects.bulk_create([
+            NotificationLog(
+                user=user, notification_type=notification_type, channel='email',
+                recipient=msg.to[0], subject=subject, message=msg.body,
+                status='failed', error_message=str(e),
+            )
+            for user, msg in zip(users, messages)
+        ], batch_size=BULK_EMAIL_BATCH_SIZE)
+        return 0
+    
+    try:
+        for i in range(0, len(messages), BULK_EMAIL_BATCH_SIZE):
+            batch = messages[i:i + BULK_EMAIL_BATCH_SIZE]
+            for msg in batch:
+                msg.connection = connection
+            results = _send_batch(connection, batch)
+            
+            now = timezone.now()
+            for user, msg, error in zip(users[i:i + BULK_EMAIL_BATCH_SIZE], batch, results):
+                logs.append(NotificationLog(
+                    user=user,
+                    notification_type=notification_type,
+                    channel='email',
+                    recipient=msg.to[0],
+                    subject=subject,
+                    message=msg.body,
+                    status='failed' if error else 'sent',
+                    error_message=error or '',
+                    sent_at=None if error else now,
+                ))
+                if not error:
+                    sent_count += 1
+    finally:
+        connection.close()
+        NotificationLog.objects.bulk_create(logs, batch_size=BULK_EMAIL_BATCH_SIZE)
+    
+    return sent_count
+
+
+def _send_batch(connection, messages):
+    """
+    Send a batch over the open connection
+    Falls back to one message at a time to find out which ones failed
+    
+    Returns:
+        list with an error string (or None) per message
+    """
+    try:
+        connection.send_messages(messages)
+        return [None] * len(messages)
+    except Exception as e:
+        logger.warning(f"Bulk email batch failed ({str(e)}), retrying messages individually")
+    
+    results = []
+    for msg in messages:
+        try:
+            connection.send_messages([msg])
+            results.append(None)
+        except Exception as e:
+            logger.error(f"Failed to send email to {msg.to[0]}: {str(e)}")
+            results.append(str(e))
+    return results
+
+
 class EmailNotificationService:
     """Handle email notifications using Django email backend"""
     
@@ -20,62 +184,21 @@ class EmailNotificationService:
         """Send urgent blood need notification to matching donors"""
         subject = f"🩸 Urgent: {blood_type} Blood Needed"
         
-        sent_count = 0
-        for donor in donors:
-            if not donor.user:
-                continue
-            
-            # Check preferences
-            prefs = NotificationPreference.objects.filter(user=donor.user).first()
-            if prefs and not prefs.urgent_blood_email:
-                continue
-            
-            context = {
-                'donor': donor,
-                'blood_type': blood_type,
-                'urgency': urgency,
-                'contact_phone': getattr(settings, 'BLOOD_BANK_CONTACT', 'Blood Bank'),
-            }
-            
-            try:
-                html_message = render_to_string('notifications/urgent_blood_email.html', context)
-                plain_message = render_to_string('notifications/urgent_blood_email.txt', context)
-                
-                msg = EmailMultiAlternatives(
-                    subject=subject,
-                    body=plain_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[donor.email]
-                )
-                msg.attach_alternative(html_message, "text/html")
-                msg.send()
-                
-                # Log success
-                NotificationLog.objects.create(
-                    user=donor.user,
-                    notification_type='urgent_blood',
-                    channel='email',
-                    recipient=donor.email,
-                    subject=subject,
-                    message=plain_message,
-                    status='sent',
-                    sent_at=timezone.now()
-                )
-                sent_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to send urgent blood email to {donor.email}: {str(e)}")
-                # Log failure
-                NotificationLog.objects.create(
-                    user=donor.user,
-                    notification_type='urgent_blood',
-                    channel='email',
-                    recipient=donor.email,
-                    subject=subject,
-                    message=plain_message,
-                    status='failed',
-                    error_message=str(e)
-                )
+        context = {
+            'donor': RECIPIENT_PLACEHOLDER,
+            'blood_type': blood_type,
+            'urgency': urgency,
+            'contact_phone': getattr(settings, 'BLOOD_BANK_CONTACT', 'Blood Bank'),
+        }
+        
+        sent_count = dispatch_bulk_email(
+            [(donor.user, donor.email, donor.first_name, donor.last_name) for donor in donors],
+            notification_type='urgent_blood',
+            subject=subject,
+            template_name='notifications/urgent_blood_email',
+            context=context,
+            preference_field='urgent_blood_email',
+        )
         
         logger.info(f"Sent {sent_count} urgent blood notifications for {blood_type}")
         return sent_count
@@ -84,15 +207,16 @@ class EmailNotificationService:
     def send_low_stock_alert(inventory):
         """Send low stock alert to all admin users"""
         # Get all admin users
-        admin_users = CustomUser.objects.filter(role='admin')
+        admin_users = list(CustomUser.objects.filter(role='admin'))
         
-        if not admin_users.exists():
+        if not admin_users:
             logger.warning("No admin users found to send low stock alert")
             return False
         
         subject = f"⚠️ Low Stock Alert: {inventory.blood_type} Blood"
         
         context = {
+            'admin': RECIPIENT_PLACEHOLDER,
             'inventory': inventory,
             'blood_type': inventory.blood_type,
             'current_quantity': inventory.units_available,
@@ -100,52 +224,14 @@ class EmailNotificationService:
             'status': inventory.get_status(),
         }
         
-        sent_count = 0
-        for admin in admin_users:
-            # Check preferences
-            prefs = NotificationPreference.objects.filter(user=admin).first()
-            if prefs and not prefs.low_stock_email:
-                continue
-            
-            try:
-                html_message = render_to_string('notifications/low_stock_alert.html', context)
-                plain_message = render_to_string('notifications/low_stock_alert.txt', context)
-                
-                msg = EmailMultiAlternatives(
-                    subject=subject,
-                    body=plain_message,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[admin.email]
-                )
-                msg.attach_alternative(html_message, "text/html")
-                msg.send()
-                
-                # Log success
-                NotificationLog.objects.create(
-                    user=admin,
-                    notification_type='low_stock',
-                    channel='email',
-                    recipient=admin.email,
-                    subject=subject,
-                    message=plain_message,
-                    status='sent',
-                    sent_at=timezone.now()
-                )
-                sent_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to send low stock alert to {admin.email}: {str(e)}")
-                # Log failure
-                NotificationLog.objects.create(
-                    user=admin,
-                    notification_type='low_stock',
-                    channel='email',
-                    recipient=admin.email,
-                    subject=subject,
-                    message=plain_message,
-                    status='failed',
-                    error_message=str(e)
-                )
+        sent_count = dispatch_bulk_email(
+            [(admin, admin.email, admin.first_name, admin.last_name) for admin in admin_users],
+            notification_type='low_stock',
+            subject=subject,
+            template_name='notifications/low_stock_alert',
+            context=context,
+            preference_field='low_stock_email',
+        )
         
         logger.info(f"Sent {sent_count} low stock alerts for {inventory.blood_type}")
         return sent_count > 0
@@ -219,59 +305,48 @@ class EmailNotificationService:
     @staticmethod
     def send_appointment_reminder(appointment):
         """Send appointment reminder email (24 hours before)"""
-        if not appointment.user:
-            return False
+        return EmailNotificationService.send_appointment_reminders([appointment]) == 1
+    
+    @staticmethod
+    def send_appointment_reminders(appointments, connection=None):
+        """
+        Send reminder emails for many appointments over one mail connection
         
-        prefs = NotificationPreference.objects.filter(user=appointment.user).first()
-        if prefs and not prefs.appointment_reminder_email:
-            return False
+        Preferences are read in one query and NotificationLog rows are
+        written with bulk_create; load the appointments with
+        select_related('donor', 'user'). Returns number of emails sent
+        """
+        appointments = [a for a in appointments if a.user_id and a.donor.email]
+        if appointments:
+            opted_out = _opted_out_user_ids([a.user_id for a in appointments], 'appointment_reminder_email')
+            appointments = [a for a in appointments if a.user_id not in opted_out]
+        if not appointments:
+            return 0
         
         subject = f"🩸 Reminder: Blood Donation Appointment Tomorrow"
         
-        context = {
-            'appointment': appointment,
-            'donor': appointment.donor,
-        }
-        
-        try:
-            html_message = render_to_string('notifications/appointment_confirmation.html', context)
-            plain_message = render_to_string('notifications/appointment_confirmation.txt', context)
-            
+        messages = []
+        for appointment in appointments:
+            context = {
+                'appointment': appointment,
+                'donor': appointment.donor,
+            }
             msg = EmailMultiAlternatives(
                 subject=subject,
-                body=plain_message,
+                body=render_to_string('notifications/appointment_confirmation.txt', context),
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 to=[appointment.donor.email]
             )
-            msg.attach_alternative(html_message, "text/html")
-            msg.send()
-            
-            NotificationLog.objects.create(
-                user=appointment.user,
-                notification_type='appointment_reminder',
-                channel='email',
-                recipient=appointment.donor.email,
-                subject=subject,
-                message=plain_message,
-                status='sent',
-                sent_at=timezone.now()
-            )
-            logger.info(f"Sent appointment reminder to {appointment.donor.email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send appointment reminder to {appointment.donor.email}: {str(e)}")
-            NotificationLog.objects.create(
-                user=appointment.user,
-                notification_type='appointment_reminder',
-                channel='email',
-                recipient=appointment.donor.email,
-                subject=subject,
-                message=plain_message,
-                status='failed',
-                error_message=str(e)
+            msg.attach_alternative(
+                render_to_string('notifications/appointment_confirmation.html', context), "text/html"
             )
-            return False
+            messages.append(msg)
+        
+        sent_count = _send_logged(
+            messages, [a.user for a in appointments], 'appointment_reminder', subject, connection
+        )
+        logger.info(f"Sent {sent_count}/{len(messages)} appointment reminder emails")
+        return sent_count
     
     @staticmethod
     def send_request_status_notification(blood_request, status):
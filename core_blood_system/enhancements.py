@@ -2,51 +2,234 @@
 Top 5 Enhancements - Core Logic
 Blood Management System
 """
-from django.db import models
-from django.db.models import Count, Q, Sum, Avg, F
+from django.db import models, transaction
+from django.db.models import Count, Q, Sum, Avg, F, OuterRef, Subquery, Case, When, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, timedelta
 import qrcode
 from io import BytesIO
 from django.core.files import File
-import uuid
 import json
+import hashlib
+import hmac
+from django.conf import settings
+from .geolocation import distance_between
+from .notification_events import publish_notifications, publish_unread_changed
 
 
 # ============================================
 # 1. APPOINTMENT SCHEDULING SYSTEM
 # ============================================
 
+# Statuses that hold a place in an appointment slot
+ACTIVE_APPOINTMENT_STATUSES = ['scheduled', 'confirmed']
+
+
+class SlotUnavailable(Exception):
+    """The requested appointment slot has no places left"""
+
+
+def slot_capacity(location):
+    """Default number of donors per time slot at a location"""
+    capacities = getattr(settings, 'APPOINTMENT_SLOT_CAPACITY', 1)
+    if isinstance(capacities, int):
+        return capacities
+    return capacities.get(location, capacities.get('default', 1))
+
+
+def get_slot_availability(location, start_date, end_date):
+    """
+    Remaining places per day and time slot at a location
+    
+    Reads the AppointmentSlot rows of the whole range in one query; days
+    and slots without a row have the location's default capacity.
+    
+    Returns:
+        dict {date: {time_slot: remaining places}} for start_date..end_date
+    """
+    from .models import AppointmentSlot, DonationAppointment
+    
+    default = slot_capacity(location)
+    time_slots = [slot[0] for slot in DonationAppointment.TIME_SLOT_CHOICES]
+    availability = {
+        start_date + timedelta(days=offset): dict.fromkeys(time_slots, default)
+        for offset in range((end_date - start_date).days + 1)
+    }
+    
+    slots = AppointmentSlot.objects.filter(
+        location=location, date__gte=start_date, date__lte=end_date
+    ).values_list('date', 'time_slot', 'capacity', 'booked')
+    for day, time_slot, capacity, booked in slots:
+        availability[day][time_slot] = max(0, capacity - booked)
+    
+    return availability
+
+
+def get_month_availability(location, year, month):
+    """Remaining places per day and time slot for a calendar month"""
+    start_date = datetime(year, month, 1).date()
+    end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return get_slot_availability(location, start_date, end_date)
+
+
 def get_available_time_slots(date, location):
     """Get available time slots for a specific date and location"""
-    from .models import DonationAppointment
+    remaining = get_slot_availability(location, date, date)[date]
+    return [time_slot for time_slot, places in remaining.items() if places > 0]
+
+
+def reserve_appointment_slot(location, date, time_slot):
+    """
+    Take one place in a slot; returns False if it is full
     
-    booked_slots = DonationAppointment.objects.filter(
-        appointment_date=date,
-        location=location,
-        status__in=['scheduled', 'confirmed']
-    ).values_list('time_slot', flat=True)
+    The place is taken by a single conditional UPDATE, so concurrent
+    bookings can never push a slot past its capacity. Call it in the
+    same transaction as the appointment write it accounts for.
+    """
+    from .models import AppointmentSlot
     
-    all_slots = [slot[0] for slot in DonationAppointment.TIME_SLOT_CHOICES]
-    available = [slot for slot in all_slots if slot not in booked_slots]
+    # get_or_create retries the lookup when a concurrent insert wins
+    slot, _ = AppointmentSlot.objects.get_or_create(
+        location=location, date=date, time_slot=time_slot,
+        defaults={'capacity': slot_capacity(location)}
+    )
+    return AppointmentSlot.objects.filter(pk=slot.pk, booked__lt=F('capacity')).update(
+        booked=F('booked') + 1
+    ) == 1
+
+
+def release_appointment_slot(location, date, time_slot):
+    """Give back one place in a slot"""
+    from .models import AppointmentSlot
     
-    return available
+    AppointmentSlot.objects.filter(
+        location=location, date=date, time_slot=time_slot, booked__gt=0
+    ).update(booked=F('booked') - 1)
 
 
-def create_appointment(donor, user, date, time_slot, location, address, notes=''):
-    """Create a new donation appointment"""
+def book_appointment_slot(donor, user, date, time_slot, location, address, notes=''):
+    """Reserve a place and create the appointment, or raise SlotUnavailable"""
     from .models import DonationAppointment
     
-    appointment = DonationAppointment.objects.create(
-        donor=donor,
-        user=user,
-        appointment_date=date,
-        time_slot=time_slot,
-        location=location,
-        address=address,
-        notes=notes,
-        status='scheduled'
-    )
+    with transaction.atomic():
+        if not reserve_appointment_slot(location, date, time_slot):
+            raise SlotUnavailable(f'{location} has no places left on {date} at {time_slot}')
+        return DonationAppointment.objects.create(
+            donor=donor,
+            user=user,
+            appointment_date=date,
+            time_slot=time_slot,
+            location=location,
+            address=address,
+            notes=notes,
+            status='scheduled'
+        )
+
+
+def move_appointment(appointment, date, time_slot):
+    """Reschedule an appointment, moving its place to the new slot"""
+    from .models import DonationAppointment
+    
+    old_date, old_time_slot = appointment.appointment_date, appointment.time_slot
+    with transaction.atomic():
+        # Only the request that actually moves the appointment moves its place
+        moved = DonationAppointment.objects.filter(
+            pk=appointment.pk, appointment_date=old_date, time_slot=old_time_slot
+        ).update(appointment_date=date, time_slot=time_slot, reminder_sent=False, updated_at=timezone.now())
+        if moved and appointment.status in ACTIVE_APPOINTMENT_STATUSES and (date, time_slot) != (old_date, old_time_slot):
+            if not reserve_appointment_slot(appointment.location, date, time_slot):
+                raise SlotUnavailable(f'{appointment.location} has no places left on {date} at {time_slot}')
+            release_appointment_slot(appointment.location, old_date, old_time_slot)
+    
+    if not moved:
+        appointment.refresh_from_db()
+        return appointment
+    appointment.appointment_date = date
+    appointment.time_slot = time_slot
+    appointment.reminder_sent = False
+    return appointment
+
+
+def set_appointment_status(appointment, status):
+    """Change an appointment's status, taking or giving back its place"""
+    from .models import DonationAppointment
+    
+    old_status = appointment.status
+    with transaction.atomic():
+        changed = DonationAppointment.objects.filter(pk=appointment.pk, status=old_status).update(
+            status=status, updated_at=timezone.now()
+        )
+        was_active = old_status in ACTIVE_APPOINTMENT_STATUSES
+        now_active = status in ACTIVE_APPOINTMENT_STATUSES
+        if changed and now_active and not was_active:
+            if not reserve_appointment_slot(appointment.location, appointment.appointment_date, appointment.time_slot):
+                raise SlotUnavailable(
+                    f'{appointment.location} has no places left on {appointment.appointment_date} '
+                    f'at {appointment.time_slot}'
+                )
+        elif changed and was_active and not now_active:
+            release_appointment_slot(appointment.location, appointment.appointment_date, appointment.time_slot)
+    
+    if not changed:
+        appointment.refresh_from_db()
+        return appointment
+    appointment.status = status
+    return appointment
+
+
+def reconcile_slot_bookings(repair=True):
+    """
+    Compare every slot's booked counter with the appointment table and
+    optionally repair drift (from admin edits, raw SQL, cascades)
+    
+    Returns:
+        dict {(location, date, time_slot): (recorded, actual)} of slots that drifted
+    """
+    from .models import AppointmentSlot, DonationAppointment
+    
+    actual = {
+        (location, day, time_slot): count
+        for location, day, time_slot, count in DonationAppointment.objects.filter(
+            status__in=ACTIVE_APPOINTMENT_STATUSES
+        ).values('location', 'appointment_date', 'time_slot').annotate(
+            count=Count('id')
+        ).values_list('location', 'appointment_date', 'time_slot', 'count')
+    }
+    recorded = {
+        (location, day, time_slot): booked
+        for location, day, time_slot, booked in AppointmentSlot.objects.values_list(
+            'location', 'date', 'time_slot', 'booked'
+        )
+    }
+    
+    drift = {
+        key: (recorded.get(key, 0), count)
+        for key, count in {**dict.fromkeys(recorded, 0), **actual}.items()
+        if recorded.get(key, 0) != count
+    }
+    
+    if repair:
+        for (location, day, time_slot), (_, count) in drift.items():
+            with transaction.atomic():
+                slot, _ = AppointmentSlot.objects.select_for_update().get_or_create(
+                    location=location, date=day, time_slot=time_slot,
+                    defaults={'capacity': max(count, slot_capacity(location))}
+                )
+                # Recount under the row lock so bookings since the scan are included
+                slot.booked = DonationAppointment.objects.filter(
+                    location=location, appointment_date=day, time_slot=time_slot,
+                    status__in=ACTIVE_APPOINTMENT_STATUSES
+                ).count()
+                slot.capacity = max(slot.capacity, slot.booked)
+                slot.save(update_fields=['booked', 'capacity'])
+    
+    return drift
+
+
+def create_appointment(donor, user, date, time_slot, location, address, notes=''):
+    """Create a new donation appointment (raises SlotUnavailable when full)"""
+    appointment = book_appointment_slot(donor, user, date, time_slot, location, address, notes)
     
     # Create in-app notification
     create_notification(
@@ -80,40 +263,9 @@ def create_appointment(donor, user, date, time_slot, location, address, notes=''
 
 def send_appointment_reminders():
     """Send reminders for appointments happening tomorrow"""
-    from .models import DonationAppointment
-    
-    tomorrow = timezone.now().date() + timedelta(days=1)
+    from .reminder_pipeline import run_appointment_reminders
     
-    appointments = DonationAppointment.objects.filter(
-        appointment_date=tomorrow,
-        status__in=['scheduled', 'confirmed'],
-        reminder_sent=False
-    )
-    
-    for appointment in appointments:
-        # Send email reminder
-        send_email_notification(
-            to_email=appointment.donor.email,
-            subject='Reminder: Blood Donation Appointment Tomorrow',
-            message=f"""
-            Dear {appointment.donor.first_name},
-            
-            This is a reminder about your blood donation appointment:
-            
-            Date: {appointment.appointment_date}
-            Time: {appointment.get_time_slot_display()}
-            Location: {appointment.location}
-            Address: {appointment.address}
-            
-            Please arrive 10 minutes early.
-            
-            Thank you!
-            """
-        )
-        
-        # Mark as sent
-        appointment.reminder_sent = True
-        appointment.save()
+    return run_appointment_reminders()
 
 
 # ============================================
@@ -124,17 +276,45 @@ def create_notification(user, notification_type, title, message, link=''):
     """Create an in-app notification"""
     from .models import Notification
     
-    notification = Notification.objects.create(
-        user=user,
-        notification_type=notification_type,
-        title=title,
-        message=message,
-        link=link
-    )
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            user=user,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            link=link
+        )
+        adjust_unread_count([user.pk], 1)
+    
+    # Push to the user's open live-notification connections
+    transaction.on_commit(lambda: publish_notifications([notification]))
     
     return notification
 
 
+def adjust_unread_count(user_ids, delta):
+    """
+    Add delta to the unread notification counter of each user
+    
+    Applied as a single UPDATE with an F() expression, so concurrent
+    changes are never lost. Call it in the same transaction as the
+    notification write it accounts for. A decrement stops at zero without
+    computing a negative intermediate, which an unsigned column rejects.
+    """
+    from .models import CustomUser
+    
+    if not user_ids or not delta:
+        return
+    if delta > 0:
+        count = F('unread_notifications') + delta
+    else:
+        count = Case(
+            When(unread_notifications__gte=-delta, then=F('unread_notifications') + delta),
+            default=Value(0),
+        )
+    CustomUser.objects.filter(pk__in=user_ids).update(unread_notifications=count)
+
+
 def get_unread_notifications(user):
     """Get unread notifications for a user"""
     from .models import Notification
@@ -147,12 +327,79 @@ def mark_notification_read(notification_id):
     from .models import Notification
     
     try:
-        notification = Notification.objects.get(id=notification_id)
-        notification.is_read = True
-        notification.save()
-        return True
+        user_id = Notification.objects.values_list('user_id', flat=True).get(id=notification_id)
     except Notification.DoesNotExist:
         return False
+    
+    # Only the request that actually flips is_read decrements the counter
+    with transaction.atomic():
+        if Notification.objects.filter(id=notification_id, is_read=False).update(is_read=True):
+            adjust_unread_count([user_id], -1)
+    publish_unread_changed(user_id)
+    return True
+
+
+def mark_all_notifications_read(user):
+    """Mark all of a user's notifications as read"""
+    from .models import Notification
+    
+    with transaction.atomic():
+        marked = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+        adjust_unread_count([user.pk], -marked)
+    publish_unread_changed(user.pk)
+    return marked
+
+
+def delete_notification(notification):
+    """Delete a notification, keeping the unread counter in step"""
+    from .models import Notification
+    
+    with transaction.atomic():
+        deleted, _ = Notification.objects.filter(pk=notification.pk, is_read=False).delete()
+        if deleted:
+            adjust_unread_count([notification.user_id], -1)
+        else:
+            Notification.objects.filter(pk=notification.pk).delete()
+    publish_unread_changed(notification.user_id)
+
+
+def reconcile_unread_counts(repair=True):
+    """
+    Compare every user's unread counter with the Notification table and
+    optionally repair drift (from admin edits, raw SQL, cascades)
+    
+    Returns:
+        dict {user_id: (recorded, actual)} of counters that drifted
+    """
+    from .models import CustomUser, Notification
+    
+    actual = dict(
+        Notification.objects.filter(is_read=False)
+        .values('user_id')
+        .annotate(unread=Count('id'))
+        .values_list('user_id', 'unread')
+    )
+    recorded = dict(
+        CustomUser.objects.filter(Q(unread_notifications__gt=0) | Q(pk__in=list(actual)))
+        .values_list('pk', 'unread_notifications')
+    )
+    
+    drift = {
+        user_id: (count, actual.get(user_id, 0))
+        for user_id, count in recorded.items()
+        if count != actual.get(user_id, 0)
+    }
+    
+    if repair and drift:
+        # Recount in the UPDATE itself so writes since the scan are included
+        unread = Notification.objects.filter(
+            user_id=OuterRef('pk'), is_read=False
+        ).order_by().values('user_id').annotate(unread=Count('id')).values('unread')
+        CustomUser.objects.filter(pk__in=list(drift)).update(
+            unread_notifications=Coalesce(Subquery(unread), 0)
+        )
+    
+    return drift
 
 
 def send_email_notification(to_email, subject, message):
@@ -188,10 +435,10 @@ def match_donors_to_request(blood_request):
         is_available=True
     )
     
-    # Check last donation date (must be at least 56 days ago)
-    min_date = timezone.now().date() - timedelta(days=56)
+    # Check the donation interval (56 days, 84 for female donors)
+    today = timezone.now().date()
     eligible_donors = compatible_donors.filter(
-        Q(last_donation_date__lte=min_date) | Q(last_donation_date__isnull=True)
+        Q(next_eligible_date__lte=today) | Q(next_eligible_date__isnull=True)
     )
     
     matches = []
@@ -205,6 +452,7 @@ def match_donors_to_request(blood_request):
             donor=donor,
             defaults={
                 'match_score': score,
+                'distance_km': distance_between(donor, blood_request),
                 'status': 'matched'
             }
         )
@@ -242,7 +490,11 @@ def calculate_match_score(donor, blood_request):
             score -= 5  # Long time since last donation
     
     # Location proximity (if available)
-    if donor.city == blood_request.hospital_name:
+    distance_km = distance_between(donor, blood_request)
+    if distance_km is not None:
+        if distance_km <= 10:
+            score += 10
+    elif donor.city and donor.city.lower() in blood_request.hospital_address.lower():
         score += 10
     
     return min(score, 100)  # Cap at 100
@@ -290,128 +542,110 @@ def notify_matched_donors(blood_request):
 # ============================================
 
 def get_dashboard_analytics():
-    """Get comprehensive analytics for dashboard"""
-    from .models import Donor, BloodRequest, BloodDonation, BloodInventory
+    """Get comprehensive analytics for dashboard (served from the analytics snapshot)"""
+    from .analytics import get_dashboard_analytics as get_snapshot_analytics
     
-    today = timezone.now().date()
-    this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    
-    analytics = {
-        # Donor Statistics
-        'total_donors': Donor.objects.count(),
-        'active_donors': Donor.objects.filter(is_available=True).count(),
-        'new_donors_this_month': Donor.objects.filter(created_at__gte=this_month_start).count(),
-        
-        # Blood Request Statistics
-        'total_requests': BloodRequest.objects.count(),
-        'pending_requests': BloodRequest.objects.filter(status='pending').count(),
-        'fulfilled_requests': BloodRequest.objects.filter(status='fulfilled').count(),
-        'critical_requests': BloodRequest.objects.filter(urgency='critical', status='pending').count(),
-        
-        # Donation Statistics
-        'total_donations': BloodDonation.objects.count(),
-        'donations_this_month': BloodDonation.objects.filter(donation_date__gte=this_month_start).count(),
-        'donations_last_month': BloodDonation.objects.filter(
-            donation_date__gte=last_month_start,
-            donation_date__lt=this_month_start
-        ).count(),
-        'total_units_donated': BloodDonation.objects.filter(status='approved').aggregate(
-            total=Sum('units_donated')
-        )['total'] or 0,
-        
-        # Blood Type Distribution
-        'blood_type_distribution': Donor.objects.values('blood_type').annotate(
-            count=Count('id')
-        ).order_by('-count'),
-        
-        # Inventory Status
-        'inventory_status': list(BloodInventory.objects.all()),
-        'low_stock_items': BloodInventory.objects.filter(
-            units_available__lt=F('minimum_threshold')
-        ).count(),
-        
-        # Monthly Trends (last 6 months)
-        'monthly_trends': get_monthly_trends(6),
-    }
-    
-    return analytics
+    return get_snapshot_analytics()
 
 
 def get_monthly_trends(months=6):
     """Get donation trends for the last N months"""
+    from django.db.models.functions import TruncMonth
     from .models import BloodDonation
     
-    trends = []
-    today = timezone.now().date()
+    # First day of each of the last N months, oldest first
+    month_starts = [timezone.now().date().replace(day=1)]
+    for _ in range(months - 1):
+        month_starts.insert(0, (month_starts[0] - timedelta(days=1)).replace(day=1))
     
-    for i in range(months):
-        month_start = (today.replace(day=1) - timedelta(days=30*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        donations = BloodDonation.objects.filter(
-            donation_date__gte=month_start,
-            donation_date__lte=month_end,
+    totals = {
+        row['month'].strftime('%Y-%m'): row
+        for row in BloodDonation.objects.filter(
+            donation_date__gte=month_starts[0],
             status='approved'
-        )
-        
+        ).annotate(month=TruncMonth('donation_date'))
+        .values('month')
+        .annotate(donations=Count('id'), units=Sum('units_donated'))
+    }
+    
+    trends = []
+    for month_start in month_starts:
+        row = totals.get(month_start.strftime('%Y-%m'), {})
         trends.append({
             'month': month_start.strftime('%B %Y'),
-            'donations': donations.count(),
-            'units': donations.aggregate(total=Sum('units_donated'))['total'] or 0
+            'donations': row.get('donations', 0),
+            'units': row.get('units') or 0
         })
     
-    return list(reversed(trends))
+    return trends
 
 
 # ============================================
 # 5. QR CODE SYSTEM
 # ============================================
 
-def generate_qr_code(qr_type, related_object, data=None):
-    """Generate QR code for donors, certificates, or blood bags"""
-    from .models import QRCode
-    
-    # Generate unique code
-    code = f"{qr_type.upper()}-{uuid.uuid4().hex[:12].upper()}"
-    
-    # Prepare data
-    qr_data = {
-        'code': code,
-        'type': qr_type,
-        'generated_at': timezone.now().isoformat(),
-    }
-    
-    if data:
-        qr_data.update(data)
-    
-    # Create QR code image
+# Bump whenever the QR image parameters change so cached PNGs are re-rendered
+QR_TEMPLATE_VERSION = 1
+
+
+def render_qr_png(payload):
+    """Encode a QR payload as a PNG image and return the bytes"""
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
         box_size=10,
         border=4,
     )
-    qr.add_data(json.dumps(qr_data))
+    qr.add_data(json.dumps(payload, sort_keys=True))
     qr.make(fit=True)
     
     img = qr.make_image(fill_color="black", back_color="white")
     
-    # Save to BytesIO
     buffer = BytesIO()
     img.save(buffer, format='PNG')
-    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def qr_code_for(qr_type, related_object, data=None):
+    """
+    Deterministic QR code string for an object and its data
+    
+    Keyed with SECRET_KEY so codes cannot be guessed from donor details.
+    """
+    message = json.dumps(
+        [qr_type, getattr(related_object, 'pk', None), data or {}], sort_keys=True, default=str
+    )
+    digest = hmac.new(settings.SECRET_KEY.encode(), message.encode(), hashlib.sha256).hexdigest()
+    return f"{qr_type.upper()}-{digest[:12].upper()}"
+
+
+def generate_qr_code(qr_type, related_object, data=None):
+    """
+    Generate QR code for donors, certificates, or blood bags
+    
+    The code is derived from the content, so asking again for the same
+    object and data returns the existing QRCode without re-rendering;
+    the PNG itself comes from the content-addressed render cache.
+    """
+    from .models import QRCode
+    from .render_cache import open_rendered
     
-    # Create QRCode record
-    qr_code = QRCode.objects.create(
+    code = qr_code_for(qr_type, related_object, data)
+    existing = QRCode.objects.filter(code=code).first()
+    if existing and existing.qr_image:
+        return existing
+    
+    # Encoded payload (the timestamp is stored but not encoded, so the image is stable)
+    payload = {'code': code, 'type': qr_type}
+    if data:
+        payload.update(data)
+    
+    qr_code = existing or QRCode(
         qr_type=qr_type,
         code=code,
-        data=qr_data
+        data={**payload, 'generated_at': timezone.now().isoformat()},
     )
     
-    # Save image
-    qr_code.qr_image.save(f'{code}.png', File(buffer), save=True)
-    
     # Link to related object
     if qr_type == 'donor' and hasattr(related_object, 'qr_codes'):
         qr_code.donor = related_object
@@ -420,7 +654,9 @@ def generate_qr_code(qr_type, related_object, data=None):
     elif qr_type == 'appointment' and hasattr(related_object, 'qr_codes'):
         qr_code.appointment = related_object
     
-    qr_code.save()
+    # Save image and record in one write
+    with open_rendered('qr', QR_TEMPLATE_VERSION, payload, render_qr_png, 'png') as png:
+        qr_code.qr_image.save(f'{code}.png', File(png), save=True)
     
     return qr_code
 
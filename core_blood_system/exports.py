@@ -0,0 +1,171 @@
+"""
+Streaming Exports
+Writes donor and blood request lists to CSV or Excel row by row, so an
+export uses bounded memory whatever the size of the registry
+"""
+import csv
+import itertools
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+
+from .models import BloodRequest, PURPOSE_CHOICES
+
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+# Rows inspected to estimate the Excel column widths
+WIDTH_SAMPLE_SIZE = 200
+MAX_COLUMN_WIDTH = 60
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Leading characters that make Excel and Sheets read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_formula(value):
+    """Quote user-entered text that would otherwise run as a spreadsheet formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def _choice(choices):
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+
+# (header, field, formatter) for each exported column
+DONOR_EXPORT_COLUMNS = [
+    ('First Name', 'first_name', None),
+    ('Last Name', 'last_name', None),
+    ('Blood Type', 'blood_type', None),
+    ('Email', 'email', None),
+    ('Phone', 'phone_number', None),
+    ('City', 'city', None),
+    ('State', 'state', None),
+    ('Available', 'is_available', lambda value: 'Yes' if value else 'No'),
+    ('Last Donation', 'last_donation_date', lambda value: _date(value) or 'Never'),
+]
+
+REQUEST_EXPORT_COLUMNS = [
+    ('Patient Name', 'patient_name', None),
+    ('Blood Type', 'blood_type', None),
+    ('Purpose', 'purpose', _choice(PURPOSE_CHOICES)),
+    ('Units', 'units_needed', None),
+    ('Urgency', 'urgency', _choice(BloodRequest.URGENCY_CHOICES)),
+    ('Hospital', 'hospital_name', None),
+    ('Status', 'status', _choice(BloodRequest.STATUS_CHOICES)),
+    ('Date', 'created_at', _date),
+]
+
+
+def export_headers(columns):
+    """Header row: a running number followed by the column titles"""
+    return ['#'] + [header for header, _, _ in columns]
+
+
+def export_rows(queryset, columns, chunk_size=None):
+    """
+    Yield formatted export rows without loading the queryset
+
+    Only the exported fields are selected (values_list) and rows are
+    fetched chunk by chunk with iterator(), so no model instances or
+    full result lists are kept in memory. Text cells are passed through
+    escape_formula.
+    """
+    fields = [field for _, field, _ in columns]
+    formatters = [formatter for _, _, formatter in columns]
+
+    values = queryset.values_list(*fields).iterator(chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+    for idx, row in enumerate(values, start=1):
+        yield [idx] + [
+            escape_formula(formatter(value) if formatter else value)
+            for formatter, value in zip(formatters, row)
+        ]
+
+
+def estimate_column_widths(headers, sample_rows):
+    """Column widths from the headers and a sample of rows"""
+    widths = [len(str(header)) for header in headers]
+    for row in sample_rows:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(str(value)) if value is not None else 0)
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, headers, rows):
+    """Stream rows to the client as CSV while they are read"""
+    writer = csv.writer(_Echo())
+    lines = itertools.chain([writer.writerow(headers)], (writer.writerow(row) for row in rows))
+
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def xlsx_response(filename, title, headers, rows, header_color='FF0000'):
+    """
+    Write rows to a write-only workbook and stream the file to the client
+
+    openpyxl's write-only mode serialises each row as it is appended
+    instead of holding every cell; the finished file is spooled to disk
+    and sent in blocks by FileResponse.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+
+    # Column widths must be set before the first row is written
+    sample = list(itertools.islice(rows, WIDTH_SAMPLE_SIZE))
+    for i, width in enumerate(estimate_column_widths(headers, sample), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    # Styled header row
+    header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type='solid')
+    header_font = Font(bold=True, color='FFFFFF', size=12)
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    header_row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
+
+    for row in itertools.chain(sample, rows):
+        ws.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def export_response(export_format, filename, title, queryset, columns, header_color='FF0000'):
+    """CSV or Excel export of a queryset, streamed in bounded memory"""
+    headers = export_headers(columns)
+    rows = export_rows(queryset, columns)
+
+    if export_format == 'csv':
+        return csv_response(f'{filename}.csv', headers, rows)
+    return xlsx_response(f'{filename}.xlsx', title, headers, rows, header_color)
@@ -0,0 +1,312 @@
+"""
+Offline Geolocation and Spatial Donor Index
+Geocodes donors and hospitals against a built-in gazetteer and runs
+"donors within N km, nearest first" queries through an indexed grid
+"""
+import math
+import re
+
+from django.db.models import Q, F, Value, FloatField, ExpressionWrapper
+
+
+# ============================================
+# GAZETTEER
+# ============================================
+
+# Approximate centre coordinates (latitude, longitude) of Kenyan towns
+# and county headquarters. County names are included so a donor's
+# "state" can be geocoded when the city is not listed.
+GAZETTEER = {
+    # Major towns
+    'nairobi': (-1.2864, 36.8172),
+    'mombasa': (-4.0435, 39.6682),
+    'kisumu': (-0.0917, 34.7680),
+    'nakuru': (-0.3031, 36.0800),
+    'eldoret': (0.5143, 35.2698),
+    'thika': (-1.0333, 37.0693),
+    'malindi': (-3.2192, 40.1169),
+    'kitale': (1.0157, 35.0062),
+    'garissa': (-0.4532, 39.6461),
+    'kakamega': (0.2827, 34.7519),
+    'nyeri': (-0.4201, 36.9476),
+    'machakos': (-1.5177, 37.2634),
+    'meru': (0.0463, 37.6559),
+    'kericho': (-0.3689, 35.2863),
+    'embu': (-0.5310, 37.4576),
+    'kisii': (-0.6817, 34.7667),
+    'naivasha': (-0.7167, 36.4333),
+    'lamu': (-2.2717, 40.9020),
+    'isiolo': (0.3546, 37.5822),
+    'lodwar': (3.1191, 35.5973),
+    'marsabit': (2.3284, 37.9899),
+    'wajir': (1.7471, 40.0573),
+    'mandera': (3.9366, 41.8670),
+    'voi': (-3.3961, 38.5561),
+    'kitui': (-1.3670, 38.0106),
+    'bungoma': (0.5635, 34.5606),
+    'busia': (0.4608, 34.1115),
+    'homa bay': (-0.5273, 34.4571),
+    'migori': (-1.0634, 34.4731),
+    'narok': (-1.0876, 35.8771),
+    'kajiado': (-1.8524, 36.7768),
+    'nanyuki': (0.0167, 37.0667),
+    'muranga': (-0.7210, 37.1526),
+    'kiambu': (-1.1714, 36.8356),
+    'kerugoya': (-0.4989, 37.2803),
+    'nyahururu': (0.0389, 36.3639),
+    'kapsabet': (0.2039, 35.1050),
+    'bomet': (-0.7813, 35.3416),
+    'siaya': (0.0607, 34.2881),
+    'vihiga': (0.0760, 34.7226),
+    'webuye': (0.6077, 34.7709),
+    'kilifi': (-3.6305, 39.8499),
+    'kwale': (-4.1737, 39.4521),
+    'hola': (-1.5000, 40.0300),
+    'maralal': (1.0968, 36.6981),
+    'kapenguria': (1.2389, 35.1119),
+    'iten': (0.6703, 35.5081),
+    'kabarnet': (0.4919, 35.7430),
+    'rumuruti': (0.2725, 36.5380),
+    'ol kalou': (-0.2706, 36.3783),
+    'chuka': (-0.3333, 37.6500),
+    'wote': (-1.7833, 37.6333),
+    'mwatate': (-3.5050, 38.3780),
+    'taveta': (-3.3981, 37.6772),
+    'nyamira': (-0.5633, 34.9358),
+    'eldama ravine': (0.0500, 35.7167),
+    'ruiru': (-1.1466, 36.9609),
+    'kikuyu': (-1.2464, 36.6629),
+    'athi river': (-1.4563, 36.9781),
+    'ngong': (-1.3527, 36.6699),
+    'kitengela': (-1.4737, 36.9605),
+    'limuru': (-1.1136, 36.6426),
+    'karatina': (-0.4833, 37.1333),
+    'mumias': (0.3358, 34.4883),
+
+    # Counties (headquarters)
+    'uasin gishu': (0.5143, 35.2698),
+    'trans nzoia': (1.0157, 35.0062),
+    'turkana': (3.1191, 35.5973),
+    'taita taveta': (-3.5050, 38.3780),
+    'laikipia': (0.2725, 36.5380),
+    'kirinyaga': (-0.4989, 37.2803),
+    'nyandarua': (-0.2706, 36.3783),
+    'nandi': (0.2039, 35.1050),
+    'tana river': (-1.5000, 40.0300),
+    'samburu': (1.0968, 36.6981),
+    'west pokot': (1.2389, 35.1119),
+    'elgeyo marakwet': (0.6703, 35.5081),
+    'baringo': (0.4919, 35.7430),
+    'tharaka nithi': (-0.3333, 37.6500),
+    'makueni': (-1.7833, 37.6333),
+}
+
+_ADDRESS_PATTERN = re.compile(
+    r'\b(' + '|'.join(
+        re.escape(name) for name in sorted(GAZETTEER, key=len, reverse=True)
+    ) + r')\b'
+)
+
+
+def normalize_place_name(name):
+    """Lower-case a place name and strip punctuation and a 'county' suffix"""
+    if not name:
+        return ''
+    name = name.lower().replace("'", '').replace('-', ' ')
+    name = re.sub(r'\s+', ' ', name).strip()
+    if name.endswith(' county'):
+        name = name[:-len(' county')]
+    return name
+
+
+def geocode(city, state=''):
+    """
+    Geocode a city/state pair against the gazetteer
+    Falls back to the state (county) when the city is not listed
+
+    Returns:
+        (latitude, longitude) tuple or None
+    """
+    for name in (city, state):
+        coordinates = GAZETTEER.get(normalize_place_name(name))
+        if coordinates:
+            return coordinates
+    return None
+
+
+def geocode_address(address):
+    """
+    Geocode a free-text address (e.g. a hospital address) by finding
+    the first gazetteer place name mentioned in it
+
+    Returns:
+        (latitude, longitude) tuple or None
+    """
+    match = _ADDRESS_PATTERN.search(normalize_place_name(address))
+    if match:
+        return GAZETTEER[match.group(1)]
+    return None
+
+
+# ============================================
+# DISTANCE
+# ============================================
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_between(donor, blood_request):
+    """Distance in km from a donor to the request's hospital, or None"""
+    if donor.latitude is None or blood_request.hospital_latitude is None:
+        return None
+    return haversine_km(
+        donor.latitude, donor.longitude,
+        blood_request.hospital_latitude, blood_request.hospital_longitude,
+    )
+
+
+def approximate_distance_sq_expression(latitude, longitude):
+    """
+    SQL expression proportional to the squared distance (in degrees) from
+    a point, using an equirectangular projection. Only arithmetic, so it
+    runs on every database backend; good for ordering nearby rows.
+    """
+    lon_scale = math.cos(math.radians(latitude))
+    d_lat = F('latitude') - Value(latitude)
+    d_lon = (F('longitude') - Value(longitude)) * Value(lon_scale)
+    return ExpressionWrapper(d_lat * d_lat + d_lon * d_lon, output_field=FloatField())
+
+
+# ============================================
+# GRID INDEX
+# ============================================
+
+# Cell size of the spatial grid in degrees (~11 km at the equator)
+GRID_SIZE_DEGREES = 0.1
+GRID_COLUMNS = int(round(360 / GRID_SIZE_DEGREES))
+
+
+def grid_position(latitude, longitude):
+    """(row, column) of the grid cell containing a point"""
+    row = int(math.floor((latitude + 90) / GRID_SIZE_DEGREES))
+    col = int(math.floor((longitude + 180) / GRID_SIZE_DEGREES)) % GRID_COLUMNS
+    return row, col
+
+
+def grid_cell(latitude, longitude):
+    """Integer bucket id of the grid cell containing a point"""
+    if latitude is None or longitude is None:
+        return None
+    row, col = grid_position(latitude, longitude)
+    return row * GRID_COLUMNS + col
+
+
+def _ring_filter(center_row, center_col, ring, max_row_offset, max_col_offset):
+    """
+    Q filter selecting the cells at Chebyshev distance `ring` from the
+    centre cell, clipped to the search box. Whole rows become indexed
+    range scans; the side cells become a single IN lookup.
+    """
+    query = Q()
+    single_cells = []
+
+    col_low = center_col - min(ring, max_col_offset)
+    col_high = center_col + min(ring, max_col_offset)
+
+    for row_offset in range(-min(ring, max_row_offset), min(ring, max_row_offset) + 1):
+        row = center_row + row_offset
+        base = row * GRID_COLUMNS
+        if abs(row_offset) == ring:
+            query |= Q(geo_cell__gte=base + col_low, geo_cell__lte=base + col_high)
+        elif ring <= max_col_offset:
+            single_cells.extend([base + center_col - ring, base + center_col + ring])
+
+    if single_cells:
+        query |= Q(geo_cell__in=single_cells)
+    return query
+
+
+def _ring_clearance_km(latitude, longitude, center_row, center_col, ring):
+    """
+    Minimum distance from the query point to any cell outside the block
+    of rings 0..ring, i.e. the distance guaranteed by stopping now
+    """
+    lat_low = (center_row - ring) * GRID_SIZE_DEGREES - 90
+    lat_high = (center_row + ring + 1) * GRID_SIZE_DEGREES - 90
+    lon_low = (center_col - ring) * GRID_SIZE_DEGREES - 180
+    lon_high = (center_col + ring + 1) * GRID_SIZE_DEGREES - 180
+
+    widest_lat = max(abs(lat_low), abs(lat_high))
+    km_per_degree_lon = KM_PER_DEGREE_LAT * math.cos(math.radians(min(widest_lat, 89.9)))
+
+    return min(
+        (latitude - lat_low) * KM_PER_DEGREE_LAT,
+        (lat_high - latitude) * KM_PER_DEGREE_LAT,
+        (longitude - lon_low) * km_per_degree_lon,
+        (lon_high - longitude) * km_per_degree_lon,
+    )
+
+
+def nearest_donors(queryset, latitude, longitude, radius_km, limit=50):
+    """
+    Find donors from `queryset` within `radius_km` of a point, nearest first
+
+    Searches the grid ring by ring outwards from the point's cell. Each
+    ring is one indexed query on geo_cell, ordered by approximate
+    distance and limited in the database; candidates are then refined
+    with the exact haversine distance. The search stops as soon as the
+    next ring cannot contain anything closer than what was found.
+
+    Returns:
+        list of donors, each with a `distance_km` attribute
+    """
+    center_row, center_col = grid_position(latitude, longitude)
+
+    radius_deg_lat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    radius_deg_lon = radius_deg_lat / cos_lat
+    max_row_offset = int(math.ceil(radius_deg_lat / GRID_SIZE_DEGREES))
+    max_col_offset = int(math.ceil(radius_deg_lon / GRID_SIZE_DEGREES))
+
+    # Bounding box prefilter on the raw coordinates as well
+    queryset = queryset.filter(
+        latitude__gte=latitude - radius_deg_lat,
+        latitude__lte=latitude + radius_deg_lat,
+        longitude__gte=longitude - radius_deg_lon,
+        longitude__lte=longitude + radius_deg_lon,
+    ).annotate(approx_distance=approximate_distance_sq_expression(latitude, longitude))
+
+    found = []
+    for ring in range(0, max(max_row_offset, max_col_offset) + 1):
+        candidates = queryset.filter(
+            _ring_filter(center_row, center_col, ring, max_row_offset, max_col_offset)
+        ).order_by('approx_distance', 'id')
+        if limit:
+            candidates = candidates[:limit]
+
+        for donor in candidates:
+            donor.distance_km = haversine_km(latitude, longitude, donor.latitude, donor.longitude)
+            if donor.distance_km <= radius_km:
+                found.append(donor)
+
+        found.sort(key=lambda d: (d.distance_km, d.id))
+        if limit:
+            found = found[:limit]
+            if len(found) == limit and found[-1].distance_km <= _ring_clearance_km(
+                latitude, longitude, center_row, center_col, ring
+            ):
+                break
+
+    return found
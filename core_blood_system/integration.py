@@ -2,11 +2,14 @@
 Integration Module
 Connects all new features together for seamless workflow
 """
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from .models import BloodRequest, BloodDonation, Donor
-from .donor_matching import find_matching_donors, notify_matching_donors
-from .donor_response import create_donor_responses, get_accepted_donors_for_request
+from .donor_response import get_accepted_donors_for_request
+from .matching_pipeline import start_matching_job
 from .laboratory import create_blood_test
+from .unit_allocation import sync_request_allocation
 from .notifications import (
     send_donor_registration_confirmation,
     send_request_status_update,
@@ -22,46 +25,27 @@ def process_new_blood_request(blood_request, auto_notify=True):
     """
     Complete workflow when a new blood request is created
     
-    Steps:
-    1. Find matching donors
-    2. Create response records
-    3. Send notifications (email + SMS for urgent)
-    4. Return results
+    Matching, MatchedDonor records and notifications (email + SMS for
+    urgent requests) run in the background; this only queues the job.
+    
+    Returns:
+        dict with 'success', 'message', 'job_id' and 'job'
     """
     result = {
         'success': False,
         'message': '',
-        'matching_donors': 0,
-        'notifications_sent': 0,
+        'job_id': None,
     }
     
     try:
-        # Find matching donors
-        matching_result = find_matching_donors(blood_request)
-        eligible_donors = matching_result['eligible_donors']
-        
-        if not eligible_donors:
-            result['message'] = 'No eligible donors found for this blood type'
-            return result
-        
-        # Create response records for tracking
-        create_donor_responses(blood_request, eligible_donors)
-        
-        # Send notifications if auto_notify is True
-        if auto_notify:
-            notification_result = notify_matching_donors(
-                blood_request,
-                send_sms=(blood_request.urgency in ['high', 'critical']),
-                send_email=True
-            )
-            
-            result['notifications_sent'] = notification_result['email_sent']
-            result['sms_sent'] = notification_result.get('sms_sent', 0)
+        job = start_matching_job(blood_request, send_email=auto_notify, send_sms=(
+            auto_notify and blood_request.urgency in ['high', 'critical']
+        ))
         
         result['success'] = True
-        result['matching_donors'] = len(eligible_donors)
-        result['message'] = f'Found {len(eligible_donors)} eligible donors'
-        result['donors'] = eligible_donors
+        result['job_id'] = str(job.job_id)
+        result['job'] = job
+        result['message'] = 'Donor matching started'
         
     except Exception as e:
         result['message'] = f'Error processing request: {str(e)}'
@@ -170,8 +154,8 @@ def process_request_status_change(blood_request, new_status, notify=True):
     
     Steps:
     1. Update status
-    2. Send notification to requester
-    3. If fulfilled, update inventory
+    2. Reserve, use or release blood units (see unit_allocation)
+    3. Send notification to requester
     """
     result = {
         'success': False,
@@ -185,7 +169,9 @@ def process_request_status_change(blood_request, new_status, notify=True):
         if new_status == 'fulfilled':
             blood_request.fulfilled_date = timezone.now()
         
-        blood_request.save()
+        with transaction.atomic():
+            blood_request.save()
+            result['units'] = sync_request_allocation(blood_request)
         
         # Send notification
         if notify:
@@ -207,7 +193,7 @@ def check_and_alert_low_stock():
     from .models import BloodInventory, CustomUser
     
     low_stock_items = BloodInventory.objects.filter(
-        units_available__lt=models.F('minimum_threshold')
+        units_available__lt=F('minimum_threshold')
     )
     
     if low_stock_items.exists():
@@ -247,26 +233,20 @@ def send_eligibility_reminders():
     Send reminders to donors who are now eligible to donate again
     (Run this as a scheduled task - daily)
     """
-    from datetime import timedelta
-    from .donor_matching import get_donor_next_eligible_date
-    
     today = timezone.now().date()
     
-    # Find donors whose eligibility date is today
+    # Find donors whose eligibility date is today (an index lookup)
     donors = Donor.objects.filter(
         is_available=True,
-        last_donation_date__isnull=False
+        next_eligible_date=today
     )
     
     reminded_count = 0
-    for donor in donors:
-        next_eligible = get_donor_next_eligible_date(donor)
-        
-        if next_eligible == today:
-            try:
-                send_eligibility_notification_sms(donor, next_eligible)
-                reminded_count += 1
-            except:
-                pass  # SMS might not be configured
+    for donor in donors.iterator():
+        try:
+            send_eligibility_notification_sms(donor, donor.next_eligible_date)
+            reminded_count += 1
+        except:
+            pass  # SMS might not be configured
     
     return reminded_count
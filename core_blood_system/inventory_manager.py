@@ -2,10 +2,157 @@
 Inventory Management Utilities
 Handles blood unit tracking, expiration management, and inventory updates
 """
+from collections import Counter
 from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
-from django.db.models import Q
-from .models import BloodUnit, BloodInventory, BloodDonation
+from django.db.models import Q, F, Count
+from .models import BloodUnit, BloodInventory, BloodDonation, BLOOD_TYPE_CHOICES
+from .analytics import mark_analytics_dirty
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Units expired per transaction by the sweeper
+EXPIRY_SWEEP_CHUNK_SIZE = getattr(settings, 'EXPIRY_SWEEP_CHUNK_SIZE', 500)
+
+# Minimum time between low stock alerts for one blood type
+LOW_STOCK_ALERT_INTERVAL = timedelta(hours=24)
+
+
+class InventoryLedger:
+    """
+    BloodInventory.units_available is a counter of BloodUnit rows with
+    status 'available'. Every unit status transition applies an atomic
+    F() delta to it in the same transaction as the unit change, so the
+    count never has to be recomputed with COUNT(*).
+    """
+    
+    @staticmethod
+    def apply_deltas(deltas):
+        """Apply {blood_type: delta} to the inventory counters"""
+        if not any(deltas.values()):
+            return
+        now = timezone.now()
+        for blood_type, delta in deltas.items():
+            if not delta:
+                continue
+            updated = BloodInventory.objects.filter(blood_type=blood_type).update(
+                units_available=F('units_available') + delta, last_updated=now
+            )
+            if not updated:
+                BloodInventory.objects.get_or_create(
+                    blood_type=blood_type, defaults={'units_available': 0}
+                )
+                BloodInventory.objects.filter(blood_type=blood_type).update(
+                    units_available=F('units_available') + delta, last_updated=now
+                )
+        
+        # Counter updates bypass model signals
+        mark_analytics_dirty('inventory')
+    
+    @staticmethod
+    def transition_deltas(old_blood_type, old_status, new_blood_type, new_status):
+        """Counter deltas for one unit changing from (type, status) to (type, status)"""
+        deltas = Counter()
+        if old_status == 'available':
+            deltas[old_blood_type] -= 1
+        if new_status == 'available':
+            deltas[new_blood_type] += 1
+        return deltas
+    
+    @staticmethod
+    def record_transition(old_blood_type, old_status, new_blood_type, new_status):
+        """Apply the deltas for one saved unit (see BloodUnit.save)"""
+        InventoryLedger.apply_deltas(
+            InventoryLedger.transition_deltas(old_blood_type, old_status, new_blood_type, new_status)
+        )
+    
+    @staticmethod
+    def transition_units(queryset, new_status, **fields):
+        """
+        Move every unit in `queryset` to `new_status` (also setting any
+        extra `fields`) and apply the matching inventory deltas in the same
+        transaction
+        
+        Units are updated with one conditional UPDATE per (blood type,
+        old status) group, and deltas are taken from the rows each UPDATE
+        actually changed, so two concurrent transitions of the same unit
+        are only counted once.
+        
+        Returns:
+            number of units changed
+        """
+        with transaction.atomic():
+            groups = {}
+            for unit_id, blood_type, old_status in queryset.exclude(status=new_status).values_list(
+                'id', 'blood_type', 'status'
+            ):
+                groups.setdefault((blood_type, old_status), []).append(unit_id)
+            
+            now = timezone.now()
+            deltas = Counter()
+            changed = 0
+            for (blood_type, old_status), unit_ids in groups.items():
+                count = 0
+                for i in range(0, len(unit_ids), 500):
+                    count += BloodUnit.objects.filter(id__in=unit_ids[i:i + 500], status=old_status).update(
+                        status=new_status, updated_at=now, **fields
+                    )
+                changed += count
+                for blood_type_key, delta in InventoryLedger.transition_deltas(
+                    blood_type, old_status, blood_type, new_status
+                ).items():
+                    deltas[blood_type_key] += delta * count
+            
+            InventoryLedger.apply_deltas(deltas)
+        
+        return changed
+    
+    @staticmethod
+    def reconcile(repair=True):
+        """
+        Compare every counter with the actual number of available units
+        and optionally repair drift (from admin edits, raw SQL, deletes)
+        
+        Inventory rows are locked before units are counted, so unit
+        transitions committing meanwhile apply their delta on top of the
+        repaired value instead of being lost.
+        
+        Returns:
+            dict {blood_type: (recorded, actual)} of counters that drifted
+        """
+        drift = {}
+        with transaction.atomic():
+            inventory = {
+                inv.blood_type: inv
+                for inv in BloodInventory.objects.select_for_update().order_by('blood_type')
+            }
+            actual = dict(
+                BloodUnit.objects.filter(status='available')
+                .values('blood_type')
+                .annotate(units=Count('id'))
+                .values_list('blood_type', 'units')
+            )
+            
+            for blood_type, _ in BLOOD_TYPE_CHOICES:
+                inv = inventory.get(blood_type)
+                recorded = inv.units_available if inv else 0
+                expected = actual.get(blood_type, 0)
+                if recorded == expected or (inv is None and expected == 0):
+                    continue
+                
+                drift[blood_type] = (recorded, expected)
+                if repair:
+                    BloodInventory.objects.update_or_create(
+                        blood_type=blood_type,
+                        defaults={'units_available': expected},
+                    )
+        
+        if drift:
+            logger.warning(f"Inventory drift {'repaired' if repair else 'detected'}: {drift}")
+        return drift
 
 
 class InventoryManager:
@@ -15,45 +162,81 @@ class InventoryManager:
     def update_inventory_from_donation(donation):
         """
         Update inventory when donation is approved
-        Creates BloodUnit and updates BloodInventory counts
+        Creates one BloodUnit per unit donated; the ledger updates counts
         """
         if donation.status != 'approved':
             return None
         
-        # Create blood unit
-        unit = BloodUnit.objects.create(
-            blood_type=donation.blood_type,
-            donation=donation,
-            donation_date=donation.donation_date,
-            expiration_date=donation.donation_date + timedelta(days=42),
-            unit_number=f"BU-{donation.id}-{int(timezone.now().timestamp())}",
-            volume_ml=450 * donation.units_donated,
-            status='available'
-        )
+        # One blood unit per unit donated; BloodUnit.save applies the
+        # inventory delta in the same transaction
+        stamp = int(timezone.now().timestamp())
+        with transaction.atomic():
+            units = [
+                BloodUnit.objects.create(
+                    blood_type=donation.blood_type,
+                    donation=donation,
+                    donation_date=donation.donation_date,
+                    expiration_date=donation.donation_date + timedelta(days=42),
+                    unit_number=f"BU-{donation.id}-{stamp}-{i + 1}",
+                    volume_ml=450,
+                    status='available'
+                )
+                for i in range(max(donation.units_donated, 1))
+            ]
         
-        # Update inventory count
-        inventory, created = BloodInventory.objects.get_or_create(
-            blood_type=donation.blood_type,
-            defaults={'units_available': 0, 'minimum_threshold': 5}
-        )
+        # Check for low stock once the caller's transaction commits, so no
+        # write lock is held over the mail and a failed send keeps the units
+        blood_type = donation.blood_type
+        transaction.on_commit(lambda: InventoryManager.send_low_stock_alerts([blood_type]))
         
-        # Recalculate available units
-        inventory.units_available = BloodUnit.objects.filter(
-            blood_type=donation.blood_type,
-            status='available'
-        ).count()
-        inventory.save()
-        
-        # Check for low stock and send alert if needed
-        if inventory.is_low_stock():
-            # Check if we haven't sent an alert in the last 24 hours
-            if not inventory.alert_sent_at or (timezone.now() - inventory.alert_sent_at).days >= 1:
-                from .email_notifications import EmailNotificationService
-                EmailNotificationService.send_low_stock_alert(inventory)
-                inventory.alert_sent_at = timezone.now()
-                inventory.save()
-        
-        return unit
+        return units
+    
+    @staticmethod
+    def sweep_expired_units(chunk_size=None, today=None):
+        """
+        Mark available units past their expiration date as expired
+        
+        Works through the (status, expiration_date, id) index in chunks of
+        EXPIRY_SWEEP_CHUNK_SIZE units, one transaction each. Every chunk
+        expires its units with a conditional UPDATE per blood type and
+        applies the inventory delta of the rows it actually changed, so
+        overlapping runs (Celery beat and the command) never count a unit
+        twice and locks are only held for one chunk.
+        
+        Returns:
+            Counter {blood_type: units expired}
+        """
+        chunk_size = chunk_size or EXPIRY_SWEEP_CHUNK_SIZE
+        expired = BloodUnit.objects.filter(
+            status='available', expiration_date__lt=today or date.today()
+        ).order_by('expiration_date', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Overlapping sweeps take different chunks instead of waiting
+            expired = expired.select_for_update(skip_locked=True)
+        
+        totals = Counter()
+        while True:
+            with transaction.atomic():
+                rows = list(expired.values_list('id', 'blood_type')[:chunk_size])
+                by_type = {}
+                for unit_id, blood_type in rows:
+                    by_type.setdefault(blood_type, []).append(unit_id)
+                
+                now = timezone.now()
+                changed = Counter()
+                for blood_type, unit_ids in by_type.items():
+                    changed[blood_type] = BloodUnit.objects.filter(
+                        id__in=unit_ids, status='available'
+                    ).update(status='expired', updated_at=now)
+                InventoryLedger.apply_deltas({blood_type: -count for blood_type, count in changed.items()})
+            
+            totals.update(changed)
+            if len(rows) < chunk_size:
+                break
+        
+        if totals:
+            logger.info(f"Expired {sum(totals.values())} blood units: {dict(totals)}")
+        return totals
     
     @staticmethod
     def mark_expired_units():
@@ -61,28 +244,42 @@ class InventoryManager:
         Mark expired units (run as scheduled task)
         Returns count of units marked as expired
         """
-        today = date.today()
+        return sum(InventoryManager.sweep_expired_units().values())
+    
+    @staticmethod
+    def send_low_stock_alerts(blood_types=None):
+        """
+        Alert admins about blood types below their minimum threshold, at
+        most once per LOW_STOCK_ALERT_INTERVAL per type
         
-        # Find and mark expired units
-        expired_count = BloodUnit.objects.filter(
-            status='available',
-            expiration_date__lt=today
-        ).update(status='expired')
-        
-        # Update inventory counts for affected blood types
-        if expired_count > 0:
-            from .models import BLOOD_TYPE_CHOICES
-            for blood_type_tuple in BLOOD_TYPE_CHOICES:
-                blood_type = blood_type_tuple[0]
-                inventory = BloodInventory.objects.filter(blood_type=blood_type).first()
-                if inventory:
-                    inventory.units_available = BloodUnit.objects.filter(
-                        blood_type=blood_type,
-                        status='available'
-                    ).count()
-                    inventory.save()
+        The alert slot is claimed with a conditional UPDATE of
+        alert_sent_at, so concurrent checks send one alert.
         
-        return expired_count
+        Returns:
+            list of blood types alerted
+        """
+        from .email_notifications import EmailNotificationService
+        
+        inventory = BloodInventory.objects.filter(units_available__lt=F('minimum_threshold'))
+        if blood_types is not None:
+            inventory = inventory.filter(blood_type__in=list(blood_types))
+        
+        alerted = []
+        for item in inventory:
+            now = timezone.now()
+            claimed = BloodInventory.objects.filter(pk=item.pk).filter(
+                Q(alert_sent_at__isnull=True) | Q(alert_sent_at__lte=now - LOW_STOCK_ALERT_INTERVAL)
+            ).update(alert_sent_at=now)
+            if not claimed:
+                continue
+            if EmailNotificationService.send_low_stock_alert(item):
+                alerted.append(item.blood_type)
+            else:
+                # Nobody was told; let the next check try again
+                BloodInventory.objects.filter(pk=item.pk, alert_sent_at=now).update(
+                    alert_sent_at=item.alert_sent_at
+                )
+        return alerted
     
     @staticmethod
     def use_blood_unit(unit_number):
@@ -90,23 +287,10 @@ class InventoryManager:
         Mark a blood unit as used and decrement inventory
         Returns True if successful, False otherwise
         """
-        try:
-            unit = BloodUnit.objects.get(unit_number=unit_number, status='available')
-            unit.status = 'used'
-            unit.save()
-            
-            # Update inventory count
-            inventory = BloodInventory.objects.filter(blood_type=unit.blood_type).first()
-            if inventory:
-                inventory.units_available = BloodUnit.objects.filter(
-                    blood_type=unit.blood_type,
-                    status='available'
-                ).count()
-                inventory.save()
-            
-            return True
-        except BloodUnit.DoesNotExist:
-            return False
+        return InventoryLedger.transition_units(
+            BloodUnit.objects.filter(unit_number=unit_number, status='available'),
+            'used'
+        ) == 1
     
     @staticmethod
     def get_expiring_units(days=7):
@@ -0,0 +1,279 @@
+"""
+Inventory Simulator
+Monte Carlo outlook of shortages and expiry wastage per blood type over the next six weeks
+"""
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .demand_forecast import BLOOD_TYPES
+from .donor_matching import BLOOD_COMPATIBILITY
+from .models import AnalyticsSnapshot, BloodUnit, DemandForecast
+from .unit_allocation import UNIVERSAL_DONOR_TYPE
+
+logger = logging.getLogger(__name__)
+
+SHELF_LIFE_DAYS = 42
+SIMULATION_HORIZON_DAYS = 42
+SIMULATION_TRIALS = getattr(settings, 'INVENTORY_SIMULATION_TRIALS', 4000)
+SIMULATION_BATCH_SIZE = 500
+SIMULATION_WORKERS = getattr(settings, 'INVENTORY_SIMULATION_WORKERS', min(4, os.cpu_count() or 1))
+
+# Seconds a stored simulation is served before a read queues a refresh
+SIMULATION_MAX_AGE = getattr(settings, 'INVENTORY_SIMULATION_MAX_AGE', 3600)
+
+SNAPSHOT_SECTION = 'inventory_simulation'
+
+
+def _issue_plan():
+    """(recipient index, donor type indices in preference order), fewest donor types first"""
+    plan = []
+    for recipient in sorted(BLOOD_TYPES, key=lambda blood_type: len(BLOOD_COMPATIBILITY[blood_type])):
+        compatible = BLOOD_COMPATIBILITY[recipient]
+        donors = sorted(
+            compatible,
+            key=lambda donor: (donor != recipient, donor == UNIVERSAL_DONOR_TYPE, BLOOD_TYPES.index(donor)),
+        )
+        plan.append((BLOOD_TYPES.index(recipient), np.array([BLOOD_TYPES.index(donor) for donor in donors])))
+    return plan
+
+
+ISSUE_PLAN = _issue_plan()
+
+
+def issue_units(stock, need, donors):
+    """
+    Take `need` units per trial from the `donors` columns of `stock`
+    (trials x days to expiry x types), soonest expiring first and in
+    donor order within a day; modifies stock in place
+
+    Returns:
+        units that could not be supplied, per trial
+    """
+    queue = stock[:, :, donors].reshape(len(stock), -1)
+    taken = np.cumsum(queue, axis=1, dtype=np.int32)
+    issued = np.minimum(need, taken[:, -1])
+    np.minimum(taken, issued[:, None], out=taken)
+    queue[:, 1:] -= taken[:, 1:] - taken[:, :-1]
+    queue[:, 0] -= taken[:, 0]
+    stock[:, :, donors] = queue.reshape(stock.shape[0], stock.shape[1], -1)
+    return need - issued
+
+
+def simulate_batch(stock, demand, supply, trials, seed):
+    """
+    Run `trials` trajectories from one stock (types x days to expiry) with
+    daily demand and supply rates (types x horizon), every trial at once
+
+    Each day donated units arrive with a full shelf life, requested units
+    are issued as unit_allocation does (recipients who can take the
+    fewest types first) and units on their last day expire.
+
+    Returns:
+        dict of per-type totals over the batch: shortage_trials,
+        shortage_units, expired_units, demand_units, supply_units
+    """
+    rng = np.random.default_rng(seed)
+    types, horizon = demand.shape
+    # Days before types keeps each day's units for all types together
+    state = np.repeat(stock.T[None, :, :], trials, axis=0).astype(np.int32)
+
+    short = np.zeros((trials, types), dtype=np.int64)
+    expired = np.zeros((trials, types), dtype=np.int64)
+    requested = np.zeros(types, dtype=np.int64)
+    donated = np.zeros(types, dtype=np.int64)
+
+    for day in range(horizon):
+        arrivals = rng.poisson(supply[:, day], size=(trials, types))
+        state[:, -1, :] += arrivals
+        donated += arrivals.sum(axis=0)
+
+        needs = rng.poisson(demand[:, day], size=(trials, types))
+        requested += needs.sum(axis=0)
+        for recipient, donors in ISSUE_PLAN:
+            need = needs[:, recipient]
+            if need.any():
+                short[:, recipient] += issue_units(state, need, donors)
+
+        expired += state[:, 0, :]
+        state[:, :-1, :] = state[:, 1:, :]
+        state[:, -1, :] = 0
+
+    return {
+        'shortage_trials': (short > 0).sum(axis=0),
+        'shortage_units': short.sum(axis=0),
+        'expired_units': expired.sum(axis=0),
+        'demand_units': requested,
+        'supply_units': donated,
+    }
+
+
+def _simulate_batch(args):
+    return simulate_batch(*args)
+
+
+def current_stock(today=None):
+    """(types x days to expiry) counts of available, unexpired units"""
+    today = today or date.today()
+    stock = np.zeros((len(BLOOD_TYPES), SHELF_LIFE_DAYS + 1), dtype=np.int64)
+    rows = (
+        BloodUnit.objects.filter(status='available', expiration_date__gte=today)
+        .values('blood_type', 'expiration_date')
+        .annotate(units=Count('id'))
+        .order_by()
+        .values_list('blood_type', 'expiration_date', 'units')
+    )
+    for blood_type, expiration_date, units in rows:
+        if blood_type in BLOOD_TYPES:
+            days_left = min((expiration_date - today).days, SHELF_LIFE_DAYS)
+            stock[BLOOD_TYPES.index(blood_type), days_left] += units
+    return stock
+
+
+def _rates(daily, offset, horizon):
+    """`horizon` daily rates from a forecast `offset` days in, repeating its last week past the end"""
+    daily = np.asarray(daily, dtype=float)
+    if not len(daily):
+        return np.zeros(horizon)
+    days = offset + np.arange(horizon)
+    week = min(7, len(daily))
+    past_end = days >= len(daily)
+    days[past_end] = len(daily) - week + (days[past_end] - (len(daily) - week)) % week
+    return daily[days]
+
+
+def forecast_rates(today=None, horizon=SIMULATION_HORIZON_DAYS):
+    """
+    (demand, supply) daily rate arrays (types x horizon) from the cached
+    DemandForecast rows, and the day they were forecast through
+    """
+    today = today or date.today()
+    demand = np.zeros((len(BLOOD_TYPES), horizon))
+    supply = np.zeros((len(BLOOD_TYPES), horizon))
+    through_date = None
+    for forecast in DemandForecast.objects.all():
+        if forecast.blood_type not in BLOOD_TYPES:
+            continue
+        i = BLOOD_TYPES.index(forecast.blood_type)
+        offset = max((today - forecast.through_date).days - 1, 0)
+        demand[i] = _rates(forecast.daily_demand, offset, horizon)
+        supply[i] = _rates(forecast.daily_supply, offset, horizon)
+        through_date = forecast.through_date
+    return demand, supply, through_date
+
+
+def run_simulation(trials=None, workers=None, horizon=SIMULATION_HORIZON_DAYS, today=None, seed=None):
+    """
+    Simulate the next `horizon` days from current stock and forecasts,
+    in batches of SIMULATION_BATCH_SIZE trials run on a process pool
+    when workers > 1
+
+    Returns:
+        JSON-ready dict with a 'blood_types' list of shortage probability,
+        expected shortage and expected expired units per blood type
+    """
+    started = time.perf_counter()
+    trials = trials or SIMULATION_TRIALS
+    workers = SIMULATION_WORKERS if workers is None else workers
+    today = today or date.today()
+
+    stock = current_stock(today)
+    demand, supply, through_date = forecast_rates(today, horizon)
+
+    sizes = [min(SIMULATION_BATCH_SIZE, trials - start) for start in range(0, trials, SIMULATION_BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    batches = [(stock, demand, supply, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as pool:
+            results = list(pool.map(_simulate_batch, batches))
+    else:
+        results = [simulate_batch(*batch) for batch in batches]
+
+    totals = {key: sum(result[key] for result in results) for key in results[0]}
+    blood_types = [
+        {
+            'blood_type': blood_type,
+            'units_available': int(stock[i].sum()),
+            'shortage_probability': round(float(totals['shortage_trials'][i]) / trials, 4),
+            'expected_shortage_units': round(float(totals['shortage_units'][i]) / trials, 2),
+            'expected_expired_units': round(float(totals['expired_units'][i]) / trials, 2),
+            'expected_demand_units': round(float(totals['demand_units'][i]) / trials, 2),
+            'expected_supply_units': round(float(totals['supply_units'][i]) / trials, 2),
+        }
+        for i, blood_type in enumerate(BLOOD_TYPES)
+    ]
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'start_date': today.isoformat(),
+        'end_date': (today + timedelta(days=horizon - 1)).isoformat(),
+        'horizon_days': horizon,
+        'trials': trials,
+        'forecast_through': through_date.isoformat() if through_date else None,
+        'runtime_ms': round((time.perf_counter() - started) * 1000, 1),
+        'blood_types': blood_types,
+    }
+
+
+def refresh_inventory_simulation(**kwargs):
+    """Rerun the simulation and store it in the snapshot table, shared by all web workers"""
+    started = timezone.now()
+    data = run_simulation(**kwargs)
+    AnalyticsSnapshot.objects.update_or_create(
+        section=SNAPSHOT_SECTION,
+        defaults={'data': data, 'refreshed_at': started},
+    )
+    logger.info(f"Inventory simulation refreshed ({data['trials']} trials, {data['runtime_ms']} ms)")
+    return data
+
+
+def dispatch_simulation_refresh():
+    """Queue tasks.refresh_inventory_simulation; False when Celery is not available"""
+    try:
+        from .tasks import refresh_inventory_simulation as refresh_task
+        refresh_task.delay()
+        return True
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to queue inventory simulation refresh: {str(e)}")
+    return False
+
+
+def get_inventory_simulation():
+    """
+    The stored simulation, with 'stale' set when it is older than
+    SIMULATION_MAX_AGE. The first reader of a stale result claims the
+    refresh by moving refreshed_at on and queues it; without Celery (or
+    a broker) that reader reruns it in this process. Without a stored
+    result it is simulated here, single-process.
+    """
+    snapshot = AnalyticsSnapshot.objects.filter(section=SNAPSHOT_SECTION).first()
+    if snapshot is None:
+        return dict(refresh_inventory_simulation(workers=1), stale=False)
+
+    now = timezone.now()
+    max_age = timedelta(seconds=SIMULATION_MAX_AGE)
+    if now - snapshot.refreshed_at > max_age:
+        claimed = AnalyticsSnapshot.objects.filter(
+            pk=snapshot.pk, refreshed_at=snapshot.refreshed_at,
+        ).update(refreshed_at=now)
+        if claimed and not dispatch_simulation_refresh():
+            try:
+                return dict(refresh_inventory_simulation(workers=1), stale=False)
+            except Exception as e:
+                logger.error(f"Inventory simulation refresh failed: {str(e)}")
+                # Let the next reader try again
+                AnalyticsSnapshot.objects.filter(pk=snapshot.pk, refreshed_at=now).update(
+                    refreshed_at=snapshot.refreshed_at
+                )
+
+    generated_at = parse_datetime(snapshot.data.get('generated_at') or '')
+    return dict(snapshot.data, stale=generated_at is None or now - generated_at > max_age)
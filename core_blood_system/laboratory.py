@@ -3,6 +3,7 @@ Laboratory Testing Module
 Manages blood testing, quality control, and disease screening
 """
 from django.db import models
+from django.db.models import Count, Q
 from django.utils import timezone
 from .models import BloodDonation, Donor
 
@@ -244,17 +245,26 @@ def get_test_statistics():
     """
     Get statistics about blood tests
     """
-    total_tests = BloodTest.objects.count()
-    passed = BloodTest.objects.filter(overall_result='pass').count()
-    failed = BloodTest.objects.filter(overall_result='fail').count()
-    pending = BloodTest.objects.filter(status__in=['pending', 'in_progress']).count()
+    stats = BloodTest.objects.aggregate(
+        total=Count('pk'),
+        passed=Count('pk', filter=Q(overall_result='pass')),
+        failed=Count('pk', filter=Q(overall_result='fail')),
+        pending=Count('pk', filter=Q(status__in=['pending', 'in_progress'])),
+        hiv_positive=Count('pk', filter=Q(hiv_test='fail')),
+        hep_b_positive=Count('pk', filter=Q(hepatitis_b_test='fail')),
+        hep_c_positive=Count('pk', filter=Q(hepatitis_c_test='fail')),
+    )
+    total_tests = stats['total']
+    passed = stats['passed']
+    failed = stats['failed']
+    pending = stats['pending']
     
     pass_rate = (passed / total_tests * 100) if total_tests > 0 else 0
     
     # Disease-specific statistics
-    hiv_positive = BloodTest.objects.filter(hiv_test='fail').count()
-    hep_b_positive = BloodTest.objects.filter(hepatitis_b_test='fail').count()
-    hep_c_positive = BloodTest.objects.filter(hepatitis_c_test='fail').count()
+    hiv_positive = stats['hiv_positive']
+    hep_b_positive = stats['hep_b_positive']
+    hep_c_positive = stats['hep_c_positive']
     
     return {
         'total_tests': total_tests,
@@ -0,0 +1,161 @@
+"""
+Write-Behind Log Buffer
+Activity and audit log rows are queued in memory and written with
+bulk_create by a background thread, so logging adds no INSERT to the
+request it describes.
+
+The buffer is flushed when it holds LOG_BUFFER_SIZE rows, otherwise
+LOG_BUFFER_DELAY seconds after the first queued row, and always at
+interpreter exit (atexit runs on a graceful worker shutdown). Rows
+queued in a process that is killed outright are lost. auto_now_add
+timestamps record the flush time, at most LOG_BUFFER_DELAY late.
+
+A model's rows go in one bulk INSERT. If it fails they are retried one
+at a time: rows the database rejects (IntegrityError, DataError) are
+logged and discarded, and the rest are requeued when the database
+itself is unavailable.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.db import DataError, IntegrityError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Rows that trigger an early flush
+LOG_BUFFER_SIZE = 100
+
+# Seconds a queued row may wait for its flush
+LOG_BUFFER_DELAY = 2.0
+
+# Rows held while the database is unreachable before the request
+# that queues one more writes the buffer itself
+LOG_BUFFER_LIMIT = 10000
+
+# Errors a row raises however often it is retried
+ROW_ERRORS = (IntegrityError, DataError)
+
+
+class BufferedLogWriter:
+    """Queues unsaved model instances and bulk-inserts them in the background"""
+
+    def __init__(self, size=None, delay=None):
+        self.size = size or LOG_BUFFER_SIZE
+        self.delay = delay or LOG_BUFFER_DELAY
+        self._lock = threading.Lock()
+        self._rows = []
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def add(self, instance):
+        with self._lock:
+            self._rows.append(instance)
+            pending = len(self._rows)
+        if pending >= LOG_BUFFER_LIMIT:
+            # The flusher is not keeping up (or not running): write inline
+            self.flush()
+            return
+        self._ensure_thread()
+        if pending == 1 or pending >= self.size:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
+
+    def flush(self):
+        """Write every queued row now; returns the number written"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+
+        by_model = defaultdict(list)
+        for row in rows:
+            by_model[type(row)].append(row)
+        written = 0
+        unwritten = []
+        error = None
+        for model, instances in by_model.items():
+            try:
+                # One transaction per model, so a failure writes none of its rows
+                with transaction.atomic():
+                    model.objects.bulk_create(instances, batch_size=500)
+                written += len(instances)
+            except Exception:
+                count, requeue, row_error = self._write_rows(model, instances)
+                written += count
+                unwritten.extend(requeue)
+                error = row_error or error
+
+        if unwritten:
+            with self._lock:
+                self._rows[:0] = unwritten
+                dropped = len(self._rows) - LOG_BUFFER_LIMIT
+                if dropped > 0:
+                    del self._rows[:dropped]
+            logger.error(f"Log buffer flush failed, requeued {len(unwritten)} rows: {str(error)}")
+            if dropped > 0:
+                logger.error(f"Log buffer full, dropped {dropped} oldest rows")
+        return written
+
+    def _write_rows(self, model, instances):
+        """
+        Retry a failed batch one row at a time
+
+        Returns:
+            (rows written, rows to requeue, error that stopped the retry)
+        """
+        written = 0
+        for i, row in enumerate(instances):
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([row])
+            except ROW_ERRORS as e:
+                logger.error(f"Log buffer discarded a {model.__name__} row the database rejects: {str(e)}")
+            except Exception as e:
+                # The database is unavailable: keep this row and the rest
+                return written, instances[i:], e
+            else:
+                written += 1
+        return written, [], None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='log-buffer', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait()
+            self._wake.clear()
+            if self._stopping:
+                break
+            # Let a burst collect unless the size threshold was reached
+            deadline = time.monotonic() + self.delay
+            while self.pending() < self.size and time.monotonic() < deadline and not self._stopping:
+                self._wake.wait(max(0, deadline - time.monotonic()))
+                self._wake.clear()
+            close_old_connections()
+            self.flush()
+            connection.close()
+            if self.pending():
+                self._wake.set()
+
+    def close(self):
+        """Stop the flusher and write what is left (registered with atexit)"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.delay + 5)
+        self.flush()
+
+
+log_writer = BufferedLogWriter()
+atexit.register(log_writer.close)
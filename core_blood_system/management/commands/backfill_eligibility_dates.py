@@ -0,0 +1,30 @@
+"""
+Django Management Command: Backfill Eligibility Dates
+Recomputes Donor.next_eligible_date (56 days after the last donation,
+84 for female donors) for rows where it is missing or stale, e.g. after
+bulk imports that bypass Donor.save()
+"""
+from django.core.management.base import BaseCommand
+from core_blood_system.donor_matching import backfill_next_eligible_dates
+
+
+class Command(BaseCommand):
+    help = 'Recompute next eligible donation dates from donation history and gender'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count stale rows without updating them')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Donors updated per statement (default: 500)')
+
+    def handle(self, *args, **options):
+        corrected = backfill_next_eligible_dates(
+            batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
+
+        if not corrected:
+            self.stdout.write(self.style.SUCCESS('All eligibility dates are up to date'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{corrected} donors have a stale eligibility date'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Corrected {corrected} eligibility dates'))
@@ -0,0 +1,108 @@
+"""
+Django Management Command: Benchmark Appointment Booking
+Fires concurrent bookings at one appointment slot, with the old
+check-then-insert booking and with atomic slot reservations, and counts
+how many got in (synthetic donors and appointments are deleted afterwards)
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core_blood_system.enhancements import (
+    SlotUnavailable,
+    book_appointment_slot,
+    get_month_availability,
+    slot_capacity,
+)
+from core_blood_system.models import AppointmentSlot, DonationAppointment, Donor
+
+LOCATION = 'Benchmark Blood Center'
+
+
+def legacy_book(donor, date, time_slot, capacity):
+    """Reference implementation: count the slot's bookings, then insert"""
+    booked = DonationAppointment.objects.filter(
+        appointment_date=date, time_slot=time_slot, location=LOCATION,
+        status__in=['scheduled', 'confirmed']
+    ).count()
+    if booked >= capacity:
+        raise SlotUnavailable(time_slot)
+    time.sleep(0.001)  # the request's remaining work before the insert
+    return DonationAppointment.objects.create(
+        donor=donor, appointment_date=date, time_slot=time_slot,
+        location=LOCATION, address='Benchmark', status='scheduled'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent appointment booking against slot capacity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=120,
+                            help='Concurrent booking requests (default: 120)')
+
+    def handle(self, *args, **options):
+        clients = options['clients']
+        capacity = slot_capacity(LOCATION)
+        donors = Donor.objects.bulk_create([
+            Donor(
+                first_name='Benchmark', last_name=str(i), email=f'slot-benchmark-{i}@example.com',
+                phone_number='0700000000', blood_type='O+',
+                date_of_birth=timezone.now().date() - timedelta(days=30 * 365),
+                address='Benchmark', city='Nairobi', state='Nairobi',
+            )
+            for i in range(clients)
+        ])
+        day = timezone.now().date() + timedelta(days=7)
+        try:
+            for label, book in (
+                ('check then insert', lambda donor, slot: legacy_book(donor, day, slot, capacity)),
+                ('atomic reservation', lambda donor, slot: book_appointment_slot(
+                    donor, None, day, slot, LOCATION, 'Benchmark')),
+            ):
+                slot = '09:00' if label == 'check then insert' else '10:00'
+                booked, rejected, errors, elapsed = self._run(donors, lambda donor: book(donor, slot))
+                style = self.style.SUCCESS if booked <= capacity else self.style.ERROR
+                self.stdout.write(style(
+                    f'{label:<20} {clients} clients, capacity {capacity}: booked {booked}, '
+                    f'turned away {rejected}, errors {errors} ({elapsed * 1000:.0f} ms)'
+                ))
+
+            with CaptureQueriesContext(connection) as queries:
+                get_month_availability(LOCATION, day.year, day.month)
+            self.stdout.write(f'Month availability: {len(queries)} query')
+        finally:
+            DonationAppointment.objects.filter(location=LOCATION).delete()
+            AppointmentSlot.objects.filter(location=LOCATION).delete()
+            Donor.objects.filter(email__startswith='slot-benchmark-').delete()
+
+    def _run(self, donors, book):
+        barrier = threading.Barrier(len(donors))
+        outcomes = []
+
+        def client(donor):
+            close_old_connections()
+            barrier.wait()
+            try:
+                book(donor)
+                outcomes.append('booked')
+            except SlotUnavailable:
+                outcomes.append('rejected')
+            except Exception:
+                outcomes.append('error')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(donor,)) for donor in donors]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return outcomes.count('booked'), outcomes.count('rejected'), outcomes.count('error'), elapsed
@@ -0,0 +1,172 @@
+"""
+Django Management Command: Benchmark Donor Matching
+Compares the set-based matching query with the old per-donor Python loop
+on a synthetic donor registry (rolled back when the run finishes)
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core_blood_system.models import Donor, BloodRequest, CustomUser
+from core_blood_system.donor_matching import (
+    find_matching_donors,
+    get_compatible_blood_types,
+    check_donor_eligibility,
+    calculate_distance_score,
+)
+
+
+CITIES = [
+    ('Nairobi', 'Nairobi'), ('Mombasa', 'Mombasa'), ('Kisumu', 'Kisumu'),
+    ('Nakuru', 'Nakuru'), ('Eldoret', 'Uasin Gishu'), ('Thika', 'Kiambu'),
+    ('Malindi', 'Kilifi'), ('Kitale', 'Trans Nzoia'), ('Garissa', 'Garissa'),
+    ('Nyeri', 'Nyeri'),
+]
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+
+
+def legacy_find_matching_donors(blood_request, max_donors=50):
+    """Reference implementation: the original per-donor loop"""
+    compatible_types = get_compatible_blood_types(blood_request.blood_type)
+    potential_donors = Donor.objects.filter(
+        blood_type__in=compatible_types
+    ).order_by('-last_donation_date')
+
+    eligible_donors = []
+    ineligible_count = 0
+    for donor in potential_donors:
+        is_eligible, reason = check_donor_eligibility(donor)
+        if is_eligible:
+            eligible_donors.append({
+                'donor': donor,
+                'proximity_score': calculate_distance_score(donor, blood_request),
+                'exact_match': donor.blood_type == blood_request.blood_type,
+            })
+        else:
+            ineligible_count += 1
+
+    eligible_donors.sort(
+        key=lambda x: (
+            x['exact_match'],
+            x['proximity_score'],
+            x['donor'].last_donation_date or datetime.min.date()
+        ),
+        reverse=True
+    )
+
+    return {
+        'eligible_donors': [item['donor'] for item in eligible_donors[:max_donors]],
+        'ineligible_count': ineligible_count,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark set-based donor matching against the per-donor loop on a synthetic registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=100000,
+                            help='Number of synthetic donors to generate (default: 100000)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Timed runs per implementation (default: 3)')
+        parser.add_argument('--blood-type', default='A+',
+                            help='Blood type of the synthetic request (default: A+)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            blood_request = self._build_registry(options['donors'], options['blood_type'])
+
+            legacy_time, legacy_result = self._time(legacy_find_matching_donors, blood_request, options['repeat'])
+            new_time, new_result = self._time(find_matching_donors, blood_request, options['repeat'])
+
+            self._check_results(blood_request, legacy_result, new_result)
+
+            self.stdout.write(f"Registry size:      {options['donors']} donors")
+            self.stdout.write(f"Per-donor loop:     {legacy_time * 1000:.1f} ms")
+            self.stdout.write(f"Set-based query:    {new_time * 1000:.1f} ms")
+            self.stdout.write(self.style.SUCCESS(f"Speed-up:           {legacy_time / new_time:.1f}x"))
+
+            # Leave the database untouched
+            transaction.set_rollback(True)
+
+    def _build_registry(self, count, blood_type):
+        rng = random.Random(42)
+        today = date.today()
+
+        requester = CustomUser.objects.create(username=f'benchmark-requester-{int(time.time())}')
+        city, state = CITIES[0]
+        blood_request = BloodRequest.objects.create(
+            requester=requester,
+            patient_name='Benchmark Patient',
+            blood_type=blood_type,
+            units_needed=2,
+            purpose='surgery',
+            urgency='critical',
+            hospital_name='Benchmark Hospital',
+            hospital_address=f'Hospital Road, {city}, {state}',
+            contact_number='0700000000',
+            required_date=today,
+        )
+
+        self.stdout.write(f'Generating {count} synthetic donors...')
+        batch = []
+        for i in range(count):
+            city, state = rng.choice(CITIES)
+            last_donation = None
+            if rng.random() < 0.7:
+                last_donation = today - timedelta(days=rng.randint(1, 720))
+            batch.append(Donor(
+                first_name=f'Donor{i}',
+                last_name='Benchmark',
+                email=f'benchmark-donor-{i}@example.invalid',
+                phone_number='0700000000',
+                gender=rng.choice(['male', 'female']),
+                blood_type=rng.choice(BLOOD_TYPES),
+                date_of_birth=today - timedelta(days=rng.randint(16 * 365, 70 * 365)),
+                address='Synthetic address',
+                city=city,
+                state=state,
+                last_donation_date=last_donation,
+                is_available=rng.random() < 0.85,
+            ))
+            # bulk_create skips Donor.save()
+            batch[-1].next_eligible_date = batch[-1].calculate_next_eligible_date()
+            if len(batch) >= 5000:
+                Donor.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Donor.objects.bulk_create(batch)
+
+        return blood_request
+
+    def _time(self, func, blood_request, repeat):
+        best = None
+        result = None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            result = func(blood_request)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _check_results(self, blood_request, legacy_result, new_result):
+        """Both implementations must agree on counts and ranking keys"""
+        def ranking(donors):
+            return [
+                (donor.blood_type == blood_request.blood_type,
+                 calculate_distance_score(donor, blood_request),
+                 donor.last_donation_date)
+                for donor in donors
+            ]
+
+        if legacy_result['ineligible_count'] != new_result['ineligible_count']:
+            self.stdout.write(self.style.ERROR(
+                f"Ineligible count mismatch: loop={legacy_result['ineligible_count']} "
+                f"query={new_result['ineligible_count']}"
+            ))
+        elif ranking(legacy_result['eligible_donors']) != ranking(new_result['eligible_donors']):
+            self.stdout.write(self.style.ERROR('Ranking mismatch between implementations'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Results match'))
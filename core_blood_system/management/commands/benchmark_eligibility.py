@@ -0,0 +1,80 @@
+"""
+Django Management Command: Benchmark Eligibility
+Times the vectorized eligibility engine on a synthetic donor population
+and compares it with evaluating the same donors one at a time (no
+database access)
+"""
+import time
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core_blood_system import eligibility_engine as engine
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk donor eligibility evaluation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=1000000,
+                            help='Synthetic population size (default: 1000000)')
+        parser.add_argument('--sample', type=int, default=10000,
+                            help='Donors evaluated one at a time for comparison (default: 10000)')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs, the best is reported (default: 5)')
+
+    def handle(self, *args, **options):
+        size = options['donors']
+        today = date.today()
+        rng = np.random.default_rng(42)
+
+        today_day = np.datetime64(today, 'D')
+        birth_dates = today_day - rng.integers(15 * 365, 70 * 365, size).astype('timedelta64[D]')
+        last_donation_dates = today_day - rng.integers(0, 365, size).astype('timedelta64[D]')
+        last_donation_dates[rng.random(size) < 0.3] = np.datetime64('NaT')
+        birth_dates[rng.random(size) < 0.05] = np.datetime64('NaT')
+        female = rng.random(size) < 0.5
+        available = rng.random(size) < 0.9
+        override = rng.random(size) < 0.01
+
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            result = engine.evaluate(birth_dates, last_donation_dates, female, available, override, today)
+            timings.append(time.perf_counter() - start)
+        bulk = min(timings)
+
+        self.stdout.write(f'{size} donors, vectorized: {bulk * 1000:.1f} ms ({size / bulk:,.0f} donors/s)')
+        counts = np.bincount(result.reasons, minlength=len(engine.REASON_LABELS))
+        for code, label in engine.REASON_LABELS.items():
+            self.stdout.write(f'  {label:<12} {counts[code]:>9}')
+
+        sample = min(options['sample'], size)
+        donors = [
+            SimpleNamespace(
+                date_of_birth=None if np.isnat(birth_dates[i]) else birth_dates[i].item(),
+                last_donation_date=None if np.isnat(last_donation_dates[i]) else last_donation_dates[i].item(),
+                gender='female' if female[i] else 'male',
+                is_available=bool(available[i]),
+                is_eligible_override=bool(override[i]),
+            )
+            for i in range(sample)
+        ]
+        start = time.perf_counter()
+        single = [engine.evaluate_donor(donor, today) for donor in donors]
+        per_donor = (time.perf_counter() - start) / sample
+
+        self.stdout.write(
+            f'One at a time: {per_donor * 1e6:.1f} us per donor '
+            f'(~{per_donor * size:.1f} s for {size} donors, {per_donor * size / bulk:.0f}x slower)'
+        )
+        mismatches = sum(
+            1 for i, outcome in enumerate(single)
+            if outcome.reasons != result.reasons[i] or outcome.days_remaining != result.days_remaining[i]
+        )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} of {sample} sampled donors disagree'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {sample} sampled donors agree'))
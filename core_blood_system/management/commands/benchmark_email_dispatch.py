@@ -0,0 +1,180 @@
+"""
+Django Management Command: Benchmark Email Dispatch
+Compares the bulk email dispatcher with the old per-recipient send loop,
+delivering to a local SMTP sink (synthetic data is rolled back)
+"""
+import socketserver
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core_blood_system.models import CustomUser, Donor, NotificationLog, NotificationPreference
+from core_blood_system.email_notifications import EmailNotificationService
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that accepts and discards every message"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-sink')
+                self.reply('250 8BITMIME')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                self.server.message_count += 1
+                self.reply('250 queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.message_count = 0
+
+
+def legacy_send_urgent_blood_notification(donors, blood_type, urgency='high'):
+    """Reference implementation: the original per-recipient loop"""
+    subject = f"🩸 Urgent: {blood_type} Blood Needed"
+
+    sent_count = 0
+    for donor in donors:
+        if not donor.user:
+            continue
+
+        prefs = NotificationPreference.objects.filter(user=donor.user).first()
+        if prefs and not prefs.urgent_blood_email:
+            continue
+
+        context = {
+            'donor': donor,
+            'blood_type': blood_type,
+            'urgency': urgency,
+            'contact_phone': getattr(settings, 'BLOOD_BANK_CONTACT', 'Blood Bank'),
+        }
+        html_message = render_to_string('notifications/urgent_blood_email.html', context)
+        plain_message = render_to_string('notifications/urgent_blood_email.txt', context)
+
+        msg = EmailMultiAlternatives(
+            subject=subject,
+            body=plain_message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[donor.email]
+        )
+        msg.attach_alternative(html_message, "text/html")
+        msg.send()
+
+        NotificationLog.objects.create(
+            user=donor.user,
+            notification_type='urgent_blood',
+            channel='email',
+            recipient=donor.email,
+            subject=subject,
+            message=plain_message,
+            status='sent',
+            sent_at=timezone.now()
+        )
+        sent_count += 1
+
+    return sent_count
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk email dispatch against the per-recipient loop using a local SMTP sink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=10000,
+                            help='Number of synthetic donor recipients (default: 10000)')
+
+    def handle(self, *args, **options):
+        sink = SMTPSink()
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+
+        smtp_settings = {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': sink.server_address[1],
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+        }
+
+        try:
+            with override_settings(**smtp_settings), transaction.atomic():
+                donors = self._build_recipients(options['recipients'])
+
+                results = []
+                for label, func in (
+                    ('Per-recipient loop', legacy_send_urgent_blood_notification),
+                    ('Bulk dispatcher', EmailNotificationService.send_urgent_blood_notification),
+                ):
+                    sink.message_count = 0
+                    logs_before = NotificationLog.objects.count()
+                    start = time.perf_counter()
+                    sent = func(donors, 'O-', 'critical')
+                    elapsed = time.perf_counter() - start
+                    results.append(elapsed)
+                    self.stdout.write(
+                        f'{label + ":":<20}{elapsed * 1000:>10.0f} ms  sent={sent} '
+                        f'delivered={sink.message_count} '
+                        f'logs={NotificationLog.objects.count() - logs_before}'
+                    )
+
+                self.stdout.write(self.style.SUCCESS(f'Speed-up:           {results[0] / results[1]:.1f}x'))
+
+                # Leave the database untouched
+                transaction.set_rollback(True)
+        finally:
+            sink.shutdown()
+            sink.server_close()
+
+    def _build_recipients(self, count):
+        self.stdout.write(f'Generating {count} synthetic donor accounts...')
+        stamp = int(time.time())
+        CustomUser.objects.bulk_create([
+            CustomUser(username=f'bench-{stamp}-{i}', email=f'bench-donor-{i}@example.invalid',
+                       first_name=f'Donor{i}', last_name='Benchmark')
+            for i in range(count)
+        ], batch_size=2000)
+        users = list(CustomUser.objects.filter(username__startswith=f'bench-{stamp}-'))
+
+        # One in ten recipients has opted out of urgent emails
+        NotificationPreference.objects.bulk_create([
+            NotificationPreference(user=user, urgent_blood_email=(i % 10 != 0))
+            for i, user in enumerate(users[::5])
+        ], batch_size=2000)
+
+        adult = date.today() - timedelta(days=30 * 365)
+        Donor.objects.bulk_create([
+            Donor(user=user, first_name=user.first_name, last_name=user.last_name, email=user.email,
+                  phone_number='0700000000', blood_type='O-', date_of_birth=adult,
+                  address='Synthetic address', city='Nairobi', state='Nairobi')
+            for user in users
+        ], batch_size=2000)
+        return list(Donor.objects.filter(user__in=users).select_related('user'))
@@ -0,0 +1,117 @@
+"""
+Django Management Command: Benchmark Geo Search
+Times "eligible donors within N km, nearest first" queries against the
+grid index on a synthetic registry (rolled back when the run finishes)
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core_blood_system.models import Donor
+from core_blood_system.donor_matching import eligible_donor_filter
+from core_blood_system.geolocation import GAZETTEER, grid_cell, haversine_km, nearest_donors
+
+
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+TARGET_P95_MS = 50
+
+
+class Command(BaseCommand):
+    help = 'Benchmark radius donor searches on the spatial grid index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=1000000,
+                            help='Number of synthetic donors to generate (default: 1000000)')
+        parser.add_argument('--queries', type=int, default=200,
+                            help='Number of timed radius queries (default: 200)')
+        parser.add_argument('--radius', type=float, default=25.0,
+                            help='Search radius in km (default: 25)')
+        parser.add_argument('--limit', type=int, default=50,
+                            help='Donors returned per query (default: 50)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        towns = list(GAZETTEER.values())
+
+        with transaction.atomic():
+            self._build_registry(rng, towns, options['donors'])
+            eligible = Donor.objects.filter(eligible_donor_filter())
+
+            timings = []
+            for i in range(options['queries']):
+                latitude, longitude = self._jitter(rng, rng.choice(towns), 0.2)
+                blood_type = rng.choice(BLOOD_TYPES)
+                queryset = eligible.filter(blood_type=blood_type)
+
+                start = time.perf_counter()
+                found = nearest_donors(queryset, latitude, longitude, options['radius'], limit=options['limit'])
+                timings.append((time.perf_counter() - start) * 1000)
+
+                if i == 0:
+                    self._check_result(queryset, latitude, longitude, options['radius'], options['limit'], found)
+
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+            self.stdout.write(f"Registry size:  {options['donors']} donors")
+            self.stdout.write(f"Radius:         {options['radius']} km, top {options['limit']}")
+            self.stdout.write(f'p50:            {p50:.1f} ms')
+            style = self.style.SUCCESS if p95 <= TARGET_P95_MS else self.style.WARNING
+            self.stdout.write(style(f'p95:            {p95:.1f} ms (target {TARGET_P95_MS} ms)'))
+
+            # Leave the database untouched
+            transaction.set_rollback(True)
+
+    def _jitter(self, rng, point, spread):
+        return point[0] + rng.uniform(-spread, spread), point[1] + rng.uniform(-spread, spread)
+
+    def _build_registry(self, rng, towns, count):
+        today = date.today()
+        self.stdout.write(f'Generating {count} synthetic donors...')
+        batch = []
+        for i in range(count):
+            latitude, longitude = self._jitter(rng, rng.choice(towns), 0.5)
+            last_donation = None
+            if rng.random() < 0.7:
+                last_donation = today - timedelta(days=rng.randint(1, 720))
+            batch.append(Donor(
+                first_name=f'Donor{i}',
+                last_name='Benchmark',
+                email=f'benchmark-donor-{i}@example.invalid',
+                phone_number='0700000000',
+                gender=rng.choice(['male', 'female']),
+                blood_type=rng.choice(BLOOD_TYPES),
+                date_of_birth=today - timedelta(days=rng.randint(18 * 365, 60 * 365)),
+                address='Synthetic address',
+                city='Synthetic',
+                state='Synthetic',
+                latitude=latitude,
+                longitude=longitude,
+                geo_cell=grid_cell(latitude, longitude),
+                last_donation_date=last_donation,
+                is_available=rng.random() < 0.85,
+            ))
+            # bulk_create skips Donor.save()
+            batch[-1].next_eligible_date = batch[-1].calculate_next_eligible_date()
+            if len(batch) >= 5000:
+                Donor.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Donor.objects.bulk_create(batch)
+
+    def _check_result(self, queryset, latitude, longitude, radius_km, limit, found):
+        """The index must return the same donors as a full scan"""
+        expected = sorted(
+            (haversine_km(latitude, longitude, lat, lon), pk)
+            for pk, lat, lon in queryset.values_list('id', 'latitude', 'longitude')
+        )
+        expected = [pk for distance, pk in expected if distance <= radius_km][:limit]
+        if expected == [donor.id for donor in found]:
+            self.stdout.write(self.style.SUCCESS('Results match a full scan'))
+        else:
+            self.stdout.write(self.style.ERROR('Result mismatch against a full scan'))
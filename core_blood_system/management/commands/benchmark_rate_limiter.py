@@ -0,0 +1,92 @@
+"""
+Django Management Command: Benchmark Rate Limiter
+Measures the limiter's overhead per request and checks that worker
+processes hitting one limit together admit exactly the limit (uses a
+throwaway counter database)
+"""
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from core_blood_system import rate_limiter
+from core_blood_system.security import rate_limit
+
+
+def _worker(path, hits, limit):
+    with override_settings(RATE_LIMIT_DATABASE=path):
+        start = time.perf_counter()
+        allowed = sum(rate_limiter.hit('contended', 'client', f'{limit}/h').allowed for _ in range(hits))
+        return allowed, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rate limiter overhead and cross-process accuracy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Number of timed requests (default: 5000)')
+        parser.add_argument('--clients', type=int, default=500,
+                            help='Distinct client addresses (default: 500)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Processes hitting one shared limit (default: 4)')
+        parser.add_argument('--limit', type=int, default=1000,
+                            help='Shared limit for the contention test (default: 1000)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ratelimit.sqlite3')
+            with override_settings(RATE_LIMIT_DATABASE=path, RATE_LIMITS={}):
+                self._overhead(options)
+                self._contention(path, options)
+
+    def _overhead(self, options):
+        factory = RequestFactory()
+        requests = [
+            factory.post('/login/', REMOTE_ADDR=f'10.0.{i // 256 % 256}.{i % 256}')
+            for i in range(options['clients'])
+        ]
+
+        def view(request):
+            return HttpResponse()
+
+        limited = rate_limit(max_attempts=10 ** 9, window_minutes=15, scope='benchmark')(view)
+
+        def timed(func):
+            timings = []
+            for i in range(options['requests']):
+                request = requests[i % len(requests)]
+                start = time.perf_counter()
+                func(request)
+                timings.append((time.perf_counter() - start) * 1e6)
+            timings.sort()
+            return statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+        bare_p50, _ = timed(view)
+        p50, p95 = timed(limited)
+        self.stdout.write(f"Overhead per request ({options['requests']} requests, {options['clients']} clients):")
+        self.stdout.write(f'  p50: {p50 - bare_p50:.0f} us')
+        self.stdout.write(f'  p95: {p95 - bare_p50:.0f} us')
+
+    def _contention(self, path, options):
+        workers, limit = options['workers'], options['limit']
+        hits = limit  # every worker alone could use the whole budget
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            results = pool.starmap(_worker, [(path, hits, limit)] * workers)
+
+        allowed = sum(result[0] for result in results)
+        elapsed = max(result[1] for result in results)
+        self.stdout.write(
+            f'Contention: {workers} processes x {hits} hits against one {limit}/h limit, '
+            f'{workers * hits / elapsed:.0f} hits/s'
+        )
+        style = self.style.SUCCESS if allowed == limit else self.style.ERROR
+        self.stdout.write(style(
+            f'  admitted {allowed} (per-process counters would admit up to {workers * limit})'
+        ))
@@ -0,0 +1,125 @@
+"""
+Django Management Command: Benchmark Search
+Times live-search queries (word prefixes, as typed into the search box)
+against the full-text index and the old icontains filters on a synthetic
+registry (rolled back when the run finishes)
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from core_blood_system.models import Donor
+from core_blood_system.search_index import full_text_search, rebuild_search_indexes, search_backend
+
+
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+FIRST_NAMES = [
+    'Jane', 'John', 'Mary', 'Peter', 'Grace', 'James', 'Faith', 'David', 'Mercy', 'Joseph',
+    'Esther', 'Daniel', 'Ann', 'Samuel', 'Lucy', 'Brian', 'Ruth', 'Kevin', 'Joy', 'Dennis',
+]
+LAST_NAMES = [
+    'Wanjiru', 'Otieno', 'Kamau', 'Mwangi', 'Achieng', 'Kiprop', 'Njoroge', 'Wambui', 'Odhiambo',
+    'Chebet', 'Mutua', 'Kariuki', 'Atieno', 'Kimani', 'Nyambura', 'Kipchoge', 'Onyango', 'Muthoni',
+]
+CITIES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika', 'Nyeri', 'Machakos']
+TARGET_P95_MS = 10
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ranked prefix search over donors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=1000000,
+                            help='Number of synthetic donors to generate (default: 1000000)')
+        parser.add_argument('--queries', type=int, default=200,
+                            help='Number of timed searches (default: 200)')
+        parser.add_argument('--limit', type=int, default=50,
+                            help='Results returned per search (default: 50)')
+        parser.add_argument('--baseline-queries', type=int, default=5,
+                            help='Number of timed icontains searches for comparison (default: 5)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        self.stdout.write(f'Search backend: {search_backend() or "icontains"}')
+
+        with transaction.atomic():
+            self._build_registry(rng, options['donors'])
+            # As after the nightly optimize_search_indexes task
+            rebuild_search_indexes('optimize')
+            searches = [self._search_text(rng, options['donors']) for _ in range(options['queries'])]
+
+            timings = []
+            for text in searches:
+                start = time.perf_counter()
+                list(full_text_search(Donor.objects.all(), text).values_list('id', flat=True)[:options['limit']])
+                timings.append((time.perf_counter() - start) * 1000)
+
+            baseline = []
+            for text in searches[:options['baseline_queries']]:
+                start = time.perf_counter()
+                list(Donor.objects.filter(
+                    Q(first_name__icontains=text) | Q(last_name__icontains=text) |
+                    Q(email__icontains=text) | Q(phone_number__icontains=text)
+                ).values_list('id', flat=True)[:options['limit']])
+                baseline.append((time.perf_counter() - start) * 1000)
+
+            timings.sort()
+            p50 = statistics.median(timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+            self.stdout.write(f"Registry size:  {options['donors']} donors, top {options['limit']}")
+            if baseline:
+                self.stdout.write(f'icontains p50:  {statistics.median(baseline):.1f} ms')
+            self.stdout.write(f'Index p50:      {p50:.1f} ms')
+            style = self.style.SUCCESS if p95 <= TARGET_P95_MS else self.style.WARNING
+            self.stdout.write(style(f'Index p95:      {p95:.1f} ms (target {TARGET_P95_MS} ms)'))
+
+            # Leave the database untouched
+            transaction.set_rollback(True)
+
+    def _search_text(self, rng, count):
+        """What someone types: a name prefix, a full name, or a phone prefix"""
+        i = rng.randrange(count)
+        first, last, phone = self._identity(i)
+        kind = rng.random()
+        if kind < 0.4:
+            return f'{first[:3]} {last[:rng.randint(3, len(last))]}'
+        if kind < 0.7:
+            return f'{first} {last}'
+        return phone[:rng.randint(6, 10)]
+
+    def _identity(self, i):
+        return (
+            FIRST_NAMES[i % len(FIRST_NAMES)],
+            LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)],
+            f'07{i:08d}',
+        )
+
+    def _build_registry(self, rng, count):
+        today = date.today()
+        self.stdout.write(f'Generating {count} synthetic donors...')
+        batch = []
+        for i in range(count):
+            first, last, phone = self._identity(i)
+            batch.append(Donor(
+                first_name=first,
+                last_name=last,
+                email=f'{first.lower()}.{last.lower()}{i}@example.invalid',
+                phone_number=phone,
+                gender=rng.choice(['male', 'female']),
+                blood_type=rng.choice(BLOOD_TYPES),
+                date_of_birth=today - timedelta(days=rng.randint(18 * 365, 60 * 365)),
+                address='Synthetic address',
+                city=rng.choice(CITIES),
+                state='Synthetic',
+            ))
+            if len(batch) >= 5000:
+                Donor.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Donor.objects.bulk_create(batch)
@@ -0,0 +1,78 @@
+"""
+Django Management Command: Benchmark Session Writes
+Counts session table queries for a logged-in user polling the unread
+badge over an hour, with the old save-every-request database sessions
+and with cached, coalesced sessions (synthetic data is rolled back)
+"""
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from core_blood_system.models import CustomUser
+
+LEGACY_SESSIONS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'SESSION_SAVE_EVERY_REQUEST': True,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark session table reads and writes per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=60,
+                            help='Simulated browsing time (default: 60)')
+        parser.add_argument('--interval', type=int, default=30,
+                            help='Seconds between badge polls (default: 30)')
+
+    def handle(self, *args, **options):
+        polls = options['minutes'] * 60 // options['interval']
+        legacy_middleware = [
+            'django.contrib.sessions.middleware.SessionMiddleware'
+            if path == 'core_blood_system.sessions.SessionRefreshMiddleware' else path
+            for path in settings.MIDDLEWARE
+        ]
+
+        with override_settings(ALLOWED_HOSTS=['*']):
+            with override_settings(MIDDLEWARE=legacy_middleware, **LEGACY_SESSIONS):
+                legacy = self._run(polls, options['interval'])
+            coalesced = self._run(polls, options['interval'])
+
+        self.stdout.write(f"{polls} badge polls, one every {options['interval']} s:")
+        for label, (reads, writes, elapsed) in (('save every request', legacy), ('cached + coalesced', coalesced)):
+            self.stdout.write(
+                f'  {label:<20} session reads {reads:>4}  writes {writes:>4}  '
+                f'({elapsed / polls * 1000:.2f} ms per request)'
+            )
+        if coalesced[1]:
+            self.stdout.write(self.style.SUCCESS(f'Session writes cut {legacy[1] / coalesced[1]:.0f}x'))
+
+    def _run(self, polls, interval):
+        with transaction.atomic():
+            CustomUser.objects.create_user(username='session-benchmark', password='benchmark-pass-1')
+            client = Client()
+            client.login(username='session-benchmark', password='benchmark-pass-1')
+
+            reads = writes = 0
+            start_clock = time.time()
+            elapsed = 0.0
+            for i in range(polls):
+                with mock.patch('core_blood_system.sessions.time.time', return_value=start_clock + i * interval):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        client.get('/api/notifications/unread-count/')
+                        elapsed += time.perf_counter() - start
+                for query in queries:
+                    if 'django_session' in query['sql']:
+                        if query['sql'].startswith('SELECT'):
+                            reads += 1
+                        else:
+                            writes += 1
+
+            transaction.set_rollback(True)
+        return reads, writes, elapsed
@@ -0,0 +1,136 @@
+"""
+Django Management Command: Benchmark Unit Allocation
+Fires concurrent allocations for separate blood requests at one shared
+stock of units, with a read-then-save allocation and with FEFO
+reservations, and counts units handed to more than one request
+(synthetic users, requests and units are deleted afterwards)
+"""
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from core_blood_system.donor_matching import BLOOD_COMPATIBILITY
+from core_blood_system.inventory_manager import InventoryLedger
+from core_blood_system.models import BloodRequest, BloodUnit, CustomUser
+from core_blood_system.unit_allocation import InsufficientUnits, allocate_units, candidate_units
+
+PREFIX = 'ALLOC-BENCH-'
+
+
+def legacy_allocate(blood_request, units):
+    """Reference implementation: read the soonest-expiring units, then save each one"""
+    claimed = list(candidate_units(blood_request.blood_type)[:units])
+    time.sleep(0.001)  # the request's remaining work before the writes
+    for unit in claimed:
+        unit.status = 'reserved'
+        unit.blood_request = blood_request
+        unit.save()
+    return [unit.id for unit in claimed]
+
+
+def fefo_allocate(blood_request):
+    """Reserve through unit_allocation and report the units this request now holds"""
+    allocate_units(blood_request)
+    return list(blood_request.allocated_units.values_list('id', flat=True))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent FEFO blood unit allocation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200,
+                            help='Concurrent allocations, one request each (default: 200)')
+        parser.add_argument('--units', type=int, default=2,
+                            help='Units needed per request (default: 2)')
+        parser.add_argument('--stock', type=int, default=300,
+                            help='Available units shared by all requests (default: 300)')
+
+    def handle(self, *args, **options):
+        clients, per_request, stock = options['clients'], options['units'], options['stock']
+        blood_types = list(BLOOD_COMPATIBILITY)
+        today = timezone.now().date()
+        requester = CustomUser.objects.create(username=f'{PREFIX}requester')
+
+        try:
+            requests = BloodRequest.objects.bulk_create([
+                BloodRequest(
+                    requester=requester, patient_name=f'{PREFIX}{i}', blood_type=blood_types[i % len(blood_types)],
+                    units_needed=per_request, purpose='surgery', hospital_name='Benchmark',
+                    hospital_address='Benchmark', contact_number='0700000000', required_date=today,
+                    status='approved',
+                )
+                for i in range(clients)
+            ])
+
+            for label, allocate in (
+                ('read then save', lambda blood_request: legacy_allocate(blood_request, per_request)),
+                ('FEFO reservation', fefo_allocate),
+            ):
+                self._stock(stock, blood_types, today)
+                outcomes, claims, elapsed = self._run(requests, allocate)
+                reserved = BloodUnit.objects.filter(unit_number__startswith=PREFIX, status='reserved').count()
+                duplicates = sum(1 for count in claims.values() if count > 1)
+                drift = InventoryLedger.reconcile(repair=True)
+                style = self.style.SUCCESS if not duplicates and not drift else self.style.ERROR
+                self.stdout.write(style(
+                    f'{label:<18} {clients} requests x {per_request} units, stock {stock}: '
+                    f'{outcomes["allocated"]} allocated, {outcomes["short"]} short, {outcomes["error"]} errors, '
+                    f'{reserved} units reserved, {duplicates} units given to two requests, '
+                    f'{len(drift)} inventory counters drifted ({elapsed * 1000:.0f} ms)'
+                ))
+        finally:
+            BloodUnit.objects.filter(unit_number__startswith=PREFIX).delete()
+            BloodRequest.objects.filter(requester=requester).delete()
+            requester.delete()
+            InventoryLedger.reconcile(repair=True)
+
+    def _stock(self, stock, blood_types, today):
+        """Replace the synthetic units with a fresh stock of mixed types and expiry dates"""
+        BloodUnit.objects.filter(unit_number__startswith=PREFIX).delete()
+        BloodUnit.objects.bulk_create([
+            BloodUnit(
+                blood_type=blood_types[i % len(blood_types)], unit_number=f'{PREFIX}{i}',
+                donation_date=today - timedelta(days=10), expiration_date=today + timedelta(days=1 + i % 30),
+                status='available',
+            )
+            for i in range(stock)
+        ])
+        # bulk_create bypasses BloodUnit.save and its ledger deltas
+        InventoryLedger.reconcile(repair=True)
+
+    def _run(self, requests, allocate):
+        barrier = threading.Barrier(len(requests))
+        outcomes = Counter()
+        claims = Counter()
+        lock = threading.Lock()
+
+        def client(blood_request):
+            close_old_connections()
+            barrier.wait()
+            unit_ids = []
+            try:
+                unit_ids = allocate(blood_request)
+                outcome = 'allocated'
+            except InsufficientUnits:
+                outcome = 'short'
+            except Exception:
+                outcome = 'error'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+                claims.update(unit_ids)
+
+        threads = [threading.Thread(target=client, args=(blood_request,)) for blood_request in requests]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return outcomes, claims, elapsed
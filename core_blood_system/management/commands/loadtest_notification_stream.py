@@ -0,0 +1,125 @@
+"""
+Django Management Command: Load Test Notification Stream
+Opens N idle Server-Sent Events connections against backend/asgi.py in a
+single process and event loop, then measures memory per connection and
+how long one notification takes to reach every connection
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from backend.asgi import application
+from core_blood_system.models import CustomUser
+from core_blood_system.enhancements import create_notification
+from core_blood_system.notification_events import broker, stream_path
+
+
+def resident_memory():
+    """Resident set size of this process in bytes (Linux)"""
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class StreamClient:
+    """One EventSource-like connection driven straight through the ASGI app"""
+
+    def __init__(self, cookie):
+        self.cookie = cookie
+        self.disconnect = asyncio.Event()
+        self.connected = asyncio.Event()
+        self.notified = asyncio.Event()
+        self.status = None
+        self.request_sent = False
+
+    async def receive(self):
+        # Empty GET body first, then block until the client goes away
+        if not self.request_sent:
+            self.request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body':
+            body = message.get('body', b'')
+            if body.startswith(b'event: unread'):
+                self.connected.set()
+            elif body.startswith(b'event: notification'):
+                self.notified.set()
+
+    async def run(self):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': stream_path(),
+            'raw_path': stream_path().encode(), 'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'accept', b'text/event-stream'),
+                (b'cookie', f'{settings.SESSION_COOKIE_NAME}={self.cookie}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        await application(scope, self.receive, self.send)
+
+
+class Command(BaseCommand):
+    help = 'Measure how many idle notification stream clients one ASGI worker can hold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2000,
+                            help='Concurrent idle connections to open (default: 2000)')
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.create_user(username=f'loadtest-{int(time.time())}', password='loadtest')
+        client = Client()
+        client.force_login(user)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME].value
+        try:
+            asyncio.run(self._run(user, cookie, options['clients']))
+        finally:
+            user.delete()
+
+    async def _run(self, user, cookie, count):
+        # One warm-up connection so imports and URL resolution are not counted
+        warmup = StreamClient(cookie)
+        warmup_task = asyncio.create_task(warmup.run())
+        await warmup.connected.wait()
+        warmup.disconnect.set()
+        await warmup_task
+
+        baseline = resident_memory()
+        clients = [StreamClient(cookie) for _ in range(count)]
+
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(c.run()) for c in clients]
+        await asyncio.wait_for(asyncio.gather(*(c.connected.wait() for c in clients)), timeout=600)
+        connect_time = time.perf_counter() - start
+        held = resident_memory() - baseline
+
+        self.stdout.write(f"Connected clients:    {broker.connection_count()} (status {clients[0].status})")
+        self.stdout.write(f"Time to connect all:  {connect_time:.1f} s")
+        self.stdout.write(f"Memory held:          {held / 2 ** 20:.1f} MiB ({held / count / 1024:.1f} KiB per connection)")
+
+        # Idle for a moment: no database work happens between heartbeats
+        await asyncio.sleep(1)
+
+        start = time.perf_counter()
+        await sync_to_async(create_notification)(user, 'system', 'Load test', 'Fan-out check')
+        await asyncio.wait_for(asyncio.gather(*(c.notified.wait() for c in clients)), timeout=600)
+        fan_out = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Notification delivered to all {count} clients in {fan_out * 1000:.0f} ms"
+        ))
+
+        for c in clients:
+            c.disconnect.set()
+        await asyncio.wait(tasks, timeout=60)
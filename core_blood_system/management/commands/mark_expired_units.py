@@ -9,13 +9,21 @@ from core_blood_system.inventory_manager import InventoryManager
 class Command(BaseCommand):
     help = 'Mark expired blood units and update inventory counts'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Units expired per transaction (default: EXPIRY_SWEEP_CHUNK_SIZE)')
+
     def handle(self, *args, **options):
         try:
-            expired_count = InventoryManager.mark_expired_units()
+            expired = InventoryManager.sweep_expired_units(chunk_size=options['chunk_size'])
+            alerted = InventoryManager.send_low_stock_alerts(expired.keys()) if expired else []
             
+            for blood_type, count in sorted(expired.items()):
+                self.stdout.write(f'  {blood_type}: {count}')
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Successfully marked {expired_count} blood units as expired'
+                    f'Successfully marked {sum(expired.values())} blood units as expired '
+                    f'({len(alerted)} low stock alerts)'
                 )
             )
         except Exception as e:
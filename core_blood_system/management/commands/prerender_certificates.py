@@ -0,0 +1,33 @@
+"""
+Django Management Command: Pre-render Certificates
+Alternative to the Celery pre-render task for PythonAnywhere scheduled tasks
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core_blood_system.models import BloodDonation
+from core_blood_system.certificates import prerender_certificates
+from core_blood_system.render_cache import evict_render_cache
+
+
+class Command(BaseCommand):
+    help = 'Render certificates for recently approved donations into the render cache and evict old files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Pre-render donations approved in the last N days (default: 7)')
+
+    def handle(self, *args, **options):
+        donations = BloodDonation.objects.filter(
+            status='approved',
+            approved_at__gte=timezone.now() - timedelta(days=options['days']),
+        ).select_related('donor')
+
+        count = prerender_certificates(donations.iterator(chunk_size=500))
+        evicted = evict_render_cache()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Pre-rendered {count} certificates, evicted {evicted} cached files')
+        )
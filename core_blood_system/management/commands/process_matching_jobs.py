@@ -0,0 +1,29 @@
+"""
+Django Management Command: Process Matching Jobs
+Alternative to the Celery matching pipeline for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+
+from core_blood_system.models import MatchingJob
+from core_blood_system.matching_pipeline import run_matching_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued donor matching jobs (match, persist matches, notify donors)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Maximum number of jobs to run (default: 20)')
+
+    def handle(self, *args, **options):
+        job_ids = list(
+            MatchingJob.objects.filter(status='queued')
+            .order_by('created_at')
+            .values_list('job_id', flat=True)[:options['limit']]
+        )
+
+        completed = sum(1 for job_id in job_ids if run_matching_job(job_id))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Processed {completed}/{len(job_ids)} matching jobs')
+        )
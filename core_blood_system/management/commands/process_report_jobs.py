@@ -0,0 +1,30 @@
+"""
+Django Management Command: Process Report Jobs
+Alternative to the Celery report task for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+
+from core_blood_system.models import ReportJob
+from core_blood_system.pdf_reports import run_report_job, purge_old_reports
+
+
+class Command(BaseCommand):
+    help = 'Generate queued PDF reports and delete reports past the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5,
+                            help='Maximum number of reports to generate (default: 5)')
+
+    def handle(self, *args, **options):
+        job_ids = list(
+            ReportJob.objects.filter(status='queued')
+            .order_by('created_at')
+            .values_list('job_id', flat=True)[:options['limit']]
+        )
+
+        completed = sum(1 for job_id in job_ids if run_report_job(job_id))
+        purged = purge_old_reports()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Generated {completed}/{len(job_ids)} reports, purged {purged} old reports')
+        )
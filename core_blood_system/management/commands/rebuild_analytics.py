@@ -0,0 +1,16 @@
+"""
+Django Management Command: Rebuild Analytics Snapshot
+Alternative to Celery task for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+from core_blood_system.analytics import rebuild_analytics_snapshot, SNAPSHOT_SECTIONS
+
+
+class Command(BaseCommand):
+    help = 'Recompute every section of the dashboard analytics snapshot'
+
+    def handle(self, *args, **options):
+        rebuild_analytics_snapshot()
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {len(SNAPSHOT_SECTIONS)} analytics snapshot sections')
+        )
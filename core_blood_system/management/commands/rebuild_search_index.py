@@ -0,0 +1,24 @@
+"""
+Django Management Command: Rebuild Search Index
+Alternative to Celery task for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+from core_blood_system.search_index import rebuild_search_indexes, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or with --optimize, merge) the full-text search indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--optimize', action='store_true',
+                            help='Merge index segments instead of rebuilding from the tables')
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        if backend != 'fts5':
+            self.stdout.write(f'Nothing to do: the {backend or "icontains"} search backend maintains itself')
+            return
+
+        command = 'optimize' if options['optimize'] else 'rebuild'
+        for table in rebuild_search_indexes(command):
+            self.stdout.write(self.style.SUCCESS(f'{command.capitalize()}d search index for {table}'))
@@ -0,0 +1,27 @@
+"""
+Django Management Command: Reconcile Appointment Slots
+Alternative to Celery task for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+from core_blood_system.enhancements import reconcile_slot_bookings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild appointment slot booking counters from the appointment table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        drift = reconcile_slot_bookings(repair=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Appointment slot counters match'))
+            return
+
+        action = 'Would repair' if options['dry_run'] else 'Repaired'
+        for (location, day, time_slot), (recorded, actual) in sorted(drift.items()):
+            self.stdout.write(
+                self.style.WARNING(f'{action} {location} {day} {time_slot}: recorded {recorded}, actual {actual}')
+            )
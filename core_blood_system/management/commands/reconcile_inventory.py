@@ -0,0 +1,27 @@
+"""
+Django Management Command: Reconcile Inventory
+Alternative to Celery task for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+from core_blood_system.inventory_manager import InventoryLedger
+
+
+class Command(BaseCommand):
+    help = 'Compare inventory counters with available blood units and repair any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        drift = InventoryLedger.reconcile(repair=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Inventory counters match available units'))
+            return
+
+        action = 'Would repair' if options['dry_run'] else 'Repaired'
+        for blood_type, (recorded, actual) in sorted(drift.items()):
+            self.stdout.write(
+                self.style.WARNING(f'{action} {blood_type}: recorded {recorded}, actual {actual}')
+            )
@@ -0,0 +1,27 @@
+"""
+Django Management Command: Reconcile Notification Counts
+Alternative to Celery task for PythonAnywhere scheduled tasks
+"""
+from django.core.management.base import BaseCommand
+from core_blood_system.enhancements import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user unread notification counters from the Notification table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        drift = reconcile_unread_counts(repair=not options['dry_run'])
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Unread notification counters match'))
+            return
+
+        action = 'Would repair' if options['dry_run'] else 'Repaired'
+        for user_id, (recorded, actual) in sorted(drift.items()):
+            self.stdout.write(
+                self.style.WARNING(f'{action} user {user_id}: recorded {recorded}, actual {actual}')
+            )
@@ -0,0 +1,40 @@
+"""
+Django Management Command: Update Demand Forecasts
+Alternative to Celery task for PythonAnywhere scheduled tasks
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core_blood_system.demand_forecast import apply_thresholds, update_forecasts
+
+
+class Command(BaseCommand):
+    help = 'Fold new demand and supply into the cached per-blood-type forecasts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Refit from the whole history instead of the days since the last run')
+        parser.add_argument('--apply', action='store_true',
+                            help='Write the proposed thresholds to the blood inventory '
+                                 '(default: DEMAND_FORECAST_AUTO_APPLY)')
+
+    def handle(self, *args, **options):
+        forecasts = update_forecasts(rebuild=options['rebuild'], apply=False)
+        if not forecasts:
+            self.stdout.write(self.style.WARNING('No request or donation history to forecast from'))
+            return
+
+        for blood_type, forecast in sorted(forecasts.items()):
+            self.stdout.write(
+                f'  {blood_type:<3} demand {sum(forecast.daily_demand[:7]):6.1f}/week, '
+                f'supply {sum(forecast.daily_supply[:7]):6.1f}/week, proposed thresholds '
+                f'{forecast.proposed_critical_threshold}/{forecast.proposed_minimum_threshold}/'
+                f'{forecast.proposed_optimal_level}'
+            )
+
+        if options['apply'] or getattr(settings, 'DEMAND_FORECAST_AUTO_APPLY', False):
+            changed = apply_thresholds(forecasts.values())
+            self.stdout.write(self.style.SUCCESS(f'Applied thresholds for {len(changed)} blood types'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Forecasts updated through {next(iter(forecasts.values())).through_date}'
+            ))
@@ -0,0 +1,178 @@
+"""
+Background Matching Pipeline
+Match donors -> persist MatchedDonor rows in bulk -> notify in batches
+
+Each step is a plain function so it can run as a Celery task (see
+tasks.py) or inline from the process_matching_jobs command when Celery
+is not available.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Donor, MatchedDonor, MatchingJob, Notification
+from .donor_matching import find_matching_donors
+from .enhancements import calculate_match_score, adjust_unread_count
+from .notifications import send_blood_request_notification
+from .sms_notifications import send_urgent_blood_request_sms
+from .notification_events import publish_notifications
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on donors matched per request
+MAX_MATCHED_DONORS = getattr(settings, 'MATCHING_MAX_DONORS', 5000)
+
+# Donors notified per batch (one mail connection / task per batch)
+NOTIFICATION_BATCH_SIZE = getattr(settings, 'MATCHING_NOTIFICATION_BATCH_SIZE', 100)
+
+
+def start_matching_job(blood_request, send_email=True, send_sms=None):
+    """
+    Create a MatchingJob and hand it to the task queue once the current
+    transaction commits. Returns immediately.
+    
+    SMS defaults to on for high/critical requests.
+    """
+    if send_sms is None:
+        send_sms = blood_request.urgency in ['high', 'critical']
+    
+    job = MatchingJob.objects.create(
+        blood_request=blood_request,
+        send_email=send_email,
+        send_sms=send_sms,
+    )
+    transaction.on_commit(lambda: dispatch_matching_job(job.job_id))
+    return job
+
+
+def dispatch_matching_job(job_id):
+    """
+    Queue the Celery chain for a job. Without Celery (or with the broker
+    down) the job stays queued for the process_matching_jobs command.
+    """
+    try:
+        from .tasks import enqueue_matching_pipeline
+    except ImportError:
+        logger.info(f"Celery not installed; matching job {job_id} left queued")
+        return False
+    
+    try:
+        enqueue_matching_pipeline(job_id)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to queue matching job {job_id}: {str(e)}")
+        return False
+
+
+def match_and_persist(job_id):
+    """
+    Match eligible donors and store them as MatchedDonor rows in bulk
+    
+    Returns:
+        list of donor id batches to notify
+    """
+    job = MatchingJob.objects.select_related('blood_request').get(job_id=job_id)
+    blood_request = job.blood_request
+    
+    # Claim the job so a Celery worker and the fallback command never both run it
+    claimed = MatchingJob.objects.filter(pk=job.pk, status='queued').update(
+        status='matching', started_at=timezone.now()
+    )
+    if not claimed:
+        logger.info(f"Matching job {job_id} already picked up")
+        return []
+    
+    donors = find_matching_donors(blood_request, max_donors=MAX_MATCHED_DONORS)['eligible_donors']
+    
+    MatchedDonor.objects.bulk_create(
+        [
+            MatchedDonor(
+                blood_request=blood_request,
+                donor=donor,
+                match_score=calculate_match_score(donor, blood_request),
+                distance_km=donor.distance_km,
+            )
+            for donor in donors
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    
+    donor_ids = [donor.id for donor in donors]
+    batches = [
+        donor_ids[i:i + NOTIFICATION_BATCH_SIZE]
+        for i in range(0, len(donor_ids), NOTIFICATION_BATCH_SIZE)
+    ]
+    
+    if batches:
+        MatchingJob.objects.filter(pk=job.pk).update(
+            status='notifying', matched_count=len(donor_ids), batch_count=len(batches),
+        )
+    else:
+        MatchingJob.objects.filter(pk=job.pk).update(
+            status='completed', matched_count=0, completed_at=timezone.now(),
+        )
+    
+    return batches
+
+
+def notify_batch(job_id, donor_ids):
+    """Send one batch of email/SMS notifications and record progress"""
+    job = MatchingJob.objects.select_related('blood_request').get(job_id=job_id)
+    blood_request = job.blood_request
+    
+    donors = list(Donor.objects.filter(id__in=donor_ids).select_related('user'))
+    
+    email_sent = send_blood_request_notification(blood_request, donors) if job.send_email else 0
+    sms_sent = send_urgent_blood_request_sms(blood_request, donors) if job.send_sms else 0
+    
+    user_ids = [donor.user_id for donor in donors if donor.user_id]
+    with transaction.atomic():
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                notification_type='match',
+                title='Blood Request Match',
+                message=f'You match a {blood_request.get_urgency_display()} priority blood request for {blood_request.blood_type}',
+                link=f'/blood-requests/{blood_request.id}/',
+            )
+            for user_id in user_ids
+        ])
+        adjust_unread_count(user_ids, 1)
+    transaction.on_commit(lambda: publish_notifications(notifications))
+    
+    now = timezone.now()
+    MatchedDonor.objects.filter(
+        blood_request=blood_request, donor_id__in=donor_ids, status='matched'
+    ).update(status='notified', notified_at=now)
+    
+    MatchingJob.objects.filter(pk=job.pk).update(
+        batches_done=F('batches_done') + 1,
+        email_sent=F('email_sent') + email_sent,
+        sms_sent=F('sms_sent') + sms_sent,
+    )
+    MatchingJob.objects.filter(
+        pk=job.pk, status='notifying', batches_done__gte=F('batch_count')
+    ).update(status='completed', completed_at=now)
+
+
+def mark_job_failed(job_id, error):
+    """Record a pipeline failure on the job"""
+    MatchingJob.objects.filter(job_id=job_id).update(
+        status='failed', error=str(error), completed_at=timezone.now()
+    )
+
+
+def run_matching_job(job_id):
+    """Run the whole pipeline for a job in the current process"""
+    try:
+        for donor_ids in match_and_persist(job_id):
+            notify_batch(job_id, donor_ids)
+    except Exception as e:
+        logger.error(f"Matching job {job_id} failed: {str(e)}")
+        mark_job_failed(job_id, e)
+        return False
+    return True
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Also merges the two 0007/0008 leaves that both followed 0006
+    dependencies = [
+        ("core_blood_system", "0007_fix_duplicate_alert_sent_at"),
+        ("core_blood_system", "0008_bloodinventory_alert_sent_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bloodrequest",
+            name="hospital_latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="bloodrequest",
+            name="hospital_longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="donor",
+            name="geo_cell",
+            field=models.IntegerField(
+                blank=True,
+                help_text="Spatial grid bucket for radius searches",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="donor",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="donor",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="donor",
+            index=models.Index(
+                fields=["geo_cell", "blood_type"], name="core_blood__geo_cel_6d6bfc_idx"
+            ),
+        ),
+    ]
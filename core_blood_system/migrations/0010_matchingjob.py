@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0009_donor_location_bloodrequest_hospital_location"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MatchingJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "job_id",
+                    models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("matching", "Matching"),
+                            ("notifying", "Notifying"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                    ),
+                ),
+                ("send_email", models.BooleanField(default=True)),
+                ("send_sms", models.BooleanField(default=False)),
+                ("matched_count", models.IntegerField(default=0)),
+                ("batch_count", models.IntegerField(default=0)),
+                ("batches_done", models.IntegerField(default=0)),
+                ("email_sent", models.IntegerField(default=0)),
+                ("sms_sent", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "blood_request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matching_jobs",
+                        to="core_blood_system.bloodrequest",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="core_blood__status_e67dfa_idx",
+                    )
+                ],
+            },
+        ),
+    ]
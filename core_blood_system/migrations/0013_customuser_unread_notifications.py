@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_notifications(apps, schema_editor):
+    CustomUser = apps.get_model("core_blood_system", "CustomUser")
+    Notification = apps.get_model("core_blood_system", "Notification")
+    unread = (
+        Notification.objects.filter(user_id=OuterRef("pk"), is_read=False)
+        .order_by()
+        .values("user_id")
+        .annotate(unread=Count("id"))
+        .values("unread")
+    )
+    CustomUser.objects.filter(notifications__is_read=False).distinct().update(
+        unread_notifications=Coalesce(Subquery(unread), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0012_reportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="unread_notifications",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Denormalized count of unread notifications"
+            ),
+        ),
+        migrations.RunPython(backfill_unread_notifications, migrations.RunPython.noop),
+    ]
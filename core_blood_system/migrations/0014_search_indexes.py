@@ -0,0 +1,100 @@
+# Generated by Django 5.2.8 on 2026-10-17 23:58
+
+from django.db import migrations
+
+# Index DDL is kept here rather than imported, so later app changes
+# cannot alter this migration
+
+# Prefix lengths with their own FTS5 index (longer prefixes expand every
+# matching word, e.g. all the "wanjiru123" tokens of emails)
+FTS5_PREFIX_LENGTHS = "2 3 4 5 6 7 8"
+
+INDEXED_COLUMNS = {
+    "core_blood_system_donor": [
+        "first_name", "last_name", "email", "phone_number", "city", "state",
+    ],
+    "core_blood_system_bloodrequest": [
+        "patient_name", "hospital_name", "hospital_address", "contact_number", "notes",
+    ],
+    "core_blood_system_customuser": [
+        "username", "first_name", "last_name", "email", "phone_number",
+    ],
+}
+
+
+def index_table(table):
+    return f"{table}_search"
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def fts5_create_sql(table, columns):
+    fts = index_table(table)
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', "
+        f"prefix='{FTS5_PREFIX_LENGTHS}')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {column_list} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def fts5_drop_sql(table):
+    fts = index_table(table)
+    return [
+        f"DROP TRIGGER IF EXISTS {fts}_ai",
+        f"DROP TRIGGER IF EXISTS {fts}_ad",
+        f"DROP TRIGGER IF EXISTS {fts}_au",
+        f"DROP TABLE IF EXISTS {fts}",
+    ]
+
+
+def fulltext_create_sql(table, columns):
+    return [f"ALTER TABLE {table} ADD FULLTEXT INDEX {index_table(table)} ({', '.join(columns)})"]
+
+
+def fulltext_drop_sql(table):
+    return [f"ALTER TABLE {table} DROP INDEX {index_table(table)}"]
+
+
+def _statements(connection, create):
+    for table, columns in INDEXED_COLUMNS.items():
+        if connection.vendor == "sqlite" and sqlite_has_fts5(connection):
+            yield from fts5_create_sql(table, columns) if create else fts5_drop_sql(table)
+        elif connection.vendor == "mysql":
+            yield from fulltext_create_sql(table, columns) if create else fulltext_drop_sql(table)
+
+
+def create_search_indexes(apps, schema_editor):
+    for statement in _statements(schema_editor.connection, create=True):
+        schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    for statement in _statements(schema_editor.connection, create=False):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0013_customuser_unread_notifications"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
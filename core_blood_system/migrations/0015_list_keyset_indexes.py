@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("core_blood_system", "0014_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blooddonation",
+            index=models.Index(
+                fields=["donation_date", "id"], name="core_blood__donatio_7a3f9c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bloodrequest",
+            index=models.Index(
+                fields=["created_at", "id"], name="core_blood__created_bbacc1_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bloodrequest",
+            index=models.Index(
+                fields=["requester", "created_at", "id"],
+                name="core_blood__request_b15237_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bloodunit",
+            index=models.Index(
+                fields=["status", "expiration_date", "id"],
+                name="core_blood__status_8238a9_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="customuser",
+            index=models.Index(
+                fields=["date_joined", "id"], name="core_blood__date_jo_c8d597_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donor",
+            index=models.Index(
+                fields=["created_at", "id"], name="core_blood__created_39c8be_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="matcheddonor",
+            index=models.Index(
+                fields=["created_at", "id"], name="core_blood__created_e1f96f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user", "created_at", "id"],
+                name="core_blood__user_id_26b102_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:20
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Donation intervals when this migration was written
+MALE_DONATION_INTERVAL_DAYS = 56
+FEMALE_DONATION_INTERVAL_DAYS = 84
+
+
+def backfill_next_eligible_date(apps, schema_editor):
+    """Gender-aware next_eligible_date for every donor who has donated"""
+    Donor = apps.get_model("core_blood_system", "Donor")
+    corrections = defaultdict(list)
+    rows = Donor.objects.values_list("id", "last_donation_date", "gender", "next_eligible_date")
+    for donor_id, last_donation_date, gender, stored in rows.iterator(chunk_size=2000):
+        expected = None
+        if last_donation_date:
+            interval = FEMALE_DONATION_INTERVAL_DAYS if gender == "female" else MALE_DONATION_INTERVAL_DAYS
+            expected = last_donation_date + timedelta(days=interval)
+        if stored != expected:
+            corrections[expected].append(donor_id)
+    for expected, donor_ids in corrections.items():
+        for start in range(0, len(donor_ids), 500):
+            Donor.objects.filter(id__in=donor_ids[start:start + 500]).update(next_eligible_date=expected)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0015_list_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="donor",
+            index=models.Index(
+                fields=["next_eligible_date"], name="core_blood__next_el_334881_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="donor",
+            index=models.Index(
+                fields=["blood_type", "next_eligible_date"],
+                name="core_blood__blood_t_9d5aa4_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_next_eligible_date, migrations.RunPython.noop),
+    ]
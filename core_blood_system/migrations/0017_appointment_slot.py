@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_appointment_slots(apps, schema_editor):
+    """Slot rows holding the existing scheduled and confirmed bookings"""
+    AppointmentSlot = apps.get_model("core_blood_system", "AppointmentSlot")
+    DonationAppointment = apps.get_model("core_blood_system", "DonationAppointment")
+    capacities = getattr(settings, "APPOINTMENT_SLOT_CAPACITY", 1)
+    if isinstance(capacities, int):
+        capacities = {"default": capacities}
+
+    bookings = (
+        DonationAppointment.objects.filter(status__in=["scheduled", "confirmed"])
+        .values("location", "appointment_date", "time_slot")
+        .annotate(booked=Count("id"))
+    )
+    AppointmentSlot.objects.bulk_create(
+        [
+            AppointmentSlot(
+                location=row["location"],
+                date=row["appointment_date"],
+                time_slot=row["time_slot"],
+                capacity=max(row["booked"], capacities.get(row["location"], capacities.get("default", 1))),
+                booked=row["booked"],
+            )
+            for row in bookings
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0016_donor_next_eligible_date_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AppointmentSlot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("location", models.CharField(max_length=200)),
+                ("date", models.DateField()),
+                (
+                    "time_slot",
+                    models.CharField(
+                        choices=[
+                            ("09:00", "9:00 AM"),
+                            ("10:00", "10:00 AM"),
+                            ("11:00", "11:00 AM"),
+                            ("12:00", "12:00 PM"),
+                            ("13:00", "1:00 PM"),
+                            ("14:00", "2:00 PM"),
+                            ("15:00", "3:00 PM"),
+                            ("16:00", "4:00 PM"),
+                        ],
+                        max_length=5,
+                    ),
+                ),
+                ("capacity", models.PositiveSmallIntegerField()),
+                (
+                    "booked",
+                    models.PositiveSmallIntegerField(
+                        default=0, help_text="Scheduled and confirmed appointments"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date", "time_slot"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("location", "date", "time_slot"),
+                        name="unique_appointment_slot",
+                    ),
+                    models.CheckConstraint(
+                        condition=models.Q(("booked__lte", models.F("capacity"))),
+                        name="appointment_slot_not_overbooked",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(seed_appointment_slots, migrations.RunPython.noop),
+    ]
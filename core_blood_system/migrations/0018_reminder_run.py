@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0017_appointment_slot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "appointment_date",
+                    models.DateField(
+                        help_text="Date of the appointments being reminded"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                            ("interrupted", "Interrupted"),
+                        ],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("chunks_done", models.IntegerField(default=0)),
+                (
+                    "reminded",
+                    models.IntegerField(
+                        default=0, help_text="Appointments in completed chunks"
+                    ),
+                ),
+                ("email_sent", models.IntegerField(default=0)),
+                ("sms_sent", models.IntegerField(default=0)),
+                (
+                    "in_flight",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="Appointments claimed by the chunk being sent",
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+                ("started_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "ordering": ["-started_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["appointment_date", "status"],
+                        name="core_blood__appoint_a0693d_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0018_reminder_run"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bloodunit",
+            name="blood_request",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Request this unit is reserved for or was used on",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="allocated_units",
+                to="core_blood_system.bloodrequest",
+            ),
+        ),
+    ]
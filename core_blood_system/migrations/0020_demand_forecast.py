@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core_blood_system", "0019_blood_unit_request"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DemandForecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "blood_type",
+                    models.CharField(
+                        choices=[
+                            ("A+", "A Positive"),
+                            ("A-", "A Negative"),
+                            ("B+", "B Positive"),
+                            ("B-", "B Negative"),
+                            ("AB+", "AB Positive"),
+                            ("AB-", "AB Negative"),
+                            ("O+", "O Positive"),
+                            ("O-", "O Negative"),
+                        ],
+                        max_length=3,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "through_date",
+                    models.DateField(
+                        help_text="Last day folded into the smoothing state"
+                    ),
+                ),
+                (
+                    "state",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Level, weekday season and error variance per series",
+                    ),
+                ),
+                (
+                    "daily_demand",
+                    models.JSONField(
+                        default=list,
+                        help_text="Forecast units requested per day after through_date",
+                    ),
+                ),
+                (
+                    "daily_supply",
+                    models.JSONField(
+                        default=list,
+                        help_text="Forecast units donated per day after through_date",
+                    ),
+                ),
+                ("proposed_critical_threshold", models.IntegerField(default=0)),
+                ("proposed_minimum_threshold", models.IntegerField(default=0)),
+                ("proposed_optimal_level", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "ordering": ["blood_type"],
+            },
+        ),
+    ]
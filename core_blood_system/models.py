@@ -1,4 +1,6 @@
+import uuid
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import AbstractUser
 
 # Blood type choices
@@ -46,9 +48,16 @@ class CustomUser(AbstractUser):
     address = models.TextField(blank=True, null=True)
     blood_type = models.CharField(max_length=3, choices=BLOOD_TYPE_CHOICES, blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
+    unread_notifications = models.PositiveIntegerField(default=0, help_text="Denormalized count of unread notifications")
     
     def __str__(self):
         return f"{self.username} - {self.get_role_display()}"
+    
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            models.Index(fields=['date_joined', 'id']),
+        ]
 
 
 # Donor Model
@@ -73,86 +82,97 @@ class Donor(models.Model):
     is_eligible_override = models.BooleanField(default=False, help_text="Admin override for eligibility")
     eligibility_notes = models.TextField(blank=True, null=True, help_text="Notes about eligibility status")
 
+    # Location (geocoded from city/state against the offline gazetteer)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geo_cell = models.IntegerField(null=True, blank=True, help_text="Spatial grid bucket for radius searches")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.blood_type}"
 
+    def donation_interval_days(self):
+        """Days required between donations (56, or 84 for female donors)"""
+        from .eligibility_checker import EligibilityChecker
+        return EligibilityChecker.donation_interval_days(self.gender)
+
     def calculate_next_eligible_date(self):
-        """Calculate next eligible donation date (56 days from last donation)"""
+        """Calculate next eligible donation date from the last donation and gender"""
         if self.last_donation_date:
             from datetime import timedelta
-            return self.last_donation_date + timedelta(days=56)
+            return self.last_donation_date + timedelta(days=self.donation_interval_days())
         return None
 
+    def evaluate_eligibility(self):
+        """Evaluate eligibility rules (availability, interval, age, override)"""
+        from .eligibility_engine import evaluate_donor
+        return evaluate_donor(self)
+
     def is_eligible(self):
         """Check if donor is currently eligible to donate"""
-        # Admin override takes precedence
-        if self.is_eligible_override:
-            return True
-
-        # If no last donation date, donor is eligible
-        if not self.last_donation_date:
-            return True
-
-        # Check if 56 days have passed since last donation
-        from datetime import date
-        next_eligible = self.calculate_next_eligible_date()
-        if next_eligible:
-            return date.today() >= next_eligible
-
-        return True
+        return self.evaluate_eligibility().eligible
 
     def days_until_eligible(self):
-        """Calculate days remaining until eligible to donate"""
-        if self.is_eligible():
-            return 0
-
-        from datetime import date
-        next_eligible = self.calculate_next_eligible_date()
-        if next_eligible:
-            days = (next_eligible - date.today()).days
-            return max(0, days)
-
-        return 0
+        """Calculate days remaining until the donation interval has passed"""
+        return self.evaluate_eligibility().days_remaining
 
     def get_eligibility_status(self):
         """Get eligibility status with reason"""
-        if self.is_eligible_override:
-            return {
-                'eligible': True,
-                'reason': 'Admin Override',
-                'badge_class': 'success',
-                'icon': 'check-circle-fill'
-            }
+        from .eligibility_engine import UNAVAILABLE, INTERVAL, TOO_YOUNG
 
-        if self.is_eligible():
+        result = self.evaluate_eligibility()
+        if result.eligible:
             return {
                 'eligible': True,
-                'reason': 'Eligible to Donate',
+                'reason': 'Admin Override' if self.is_eligible_override else 'Eligible to Donate',
                 'badge_class': 'success',
                 'icon': 'check-circle-fill'
             }
+
+        status = {
+            'eligible': False,
+            'badge_class': 'danger',
+            'icon': 'x-circle-fill'
+        }
+        if result.reasons == UNAVAILABLE:
+            status['reason'] = 'Unavailable'
+        elif result.reasons == INTERVAL:
+            status.update(reason=f'Wait {result.days_remaining} more days', next_date=self.next_eligible_date)
+        elif result.reasons == TOO_YOUNG:
+            status['reason'] = 'Under 18'
         else:
-            days = self.days_until_eligible()
-            next_date = self.calculate_next_eligible_date()
-            return {
-                'eligible': False,
-                'reason': f'Wait {days} more days',
-                'next_date': next_date,
-                'badge_class': 'danger',
-                'icon': 'x-circle-fill'
-            }
+            status['reason'] = 'Over 65'
+        return status
+
+    def update_location(self):
+        """Geocode city/state and refresh the spatial grid bucket"""
+        from .geolocation import geocode, grid_cell
+        coordinates = geocode(self.city, self.state)
+        self.latitude, self.longitude = coordinates if coordinates else (None, None)
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
 
     def save(self, *args, **kwargs):
-        """Auto-calculate next eligible date on save"""
-        if self.last_donation_date and not self.is_eligible_override:
-            self.next_eligible_date = self.calculate_next_eligible_date()
+        """Auto-calculate next eligible date and location on save"""
+        # next_eligible_date is what eligibility queries filter on, so it
+        # always follows last_donation_date and gender (the admin override
+        # is a separate flag)
+        self.next_eligible_date = self.calculate_next_eligible_date()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'last_donation_date', 'gender'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'next_eligible_date'}
+        self.update_location()
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['geo_cell', 'blood_type']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['next_eligible_date']),
+            models.Index(fields=['blood_type', 'next_eligible_date']),
+        ]
 
 
 
@@ -193,11 +213,30 @@ class BloodRequest(models.Model):
     fulfilled_date = models.DateTimeField(null=True, blank=True)
     approved_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_requests')
     
+    # Hospital location (geocoded from hospital_address)
+    hospital_latitude = models.FloatField(null=True, blank=True)
+    hospital_longitude = models.FloatField(null=True, blank=True)
+    
     def __str__(self):
         return f"Request for {self.blood_type} - {self.patient_name} ({self.get_purpose_display()})"
     
+    def update_location(self):
+        """Geocode the hospital address against the offline gazetteer"""
+        from .geolocation import geocode_address
+        coordinates = geocode_address(self.hospital_address)
+        self.hospital_latitude, self.hospital_longitude = coordinates if coordinates else (None, None)
+    
+    def save(self, *args, **kwargs):
+        """Geocode the hospital on save"""
+        self.update_location()
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['requester', 'created_at', 'id']),
+        ]
 
 
 # Blood Donation Model
@@ -226,6 +265,9 @@ class BloodDonation(models.Model):
     
     class Meta:
         ordering = ['-donation_date']
+        indexes = [
+            models.Index(fields=['donation_date', 'id']),
+        ]
 
 
 # Blood Inventory Model
@@ -259,6 +301,28 @@ class BloodInventory(models.Model):
         ordering = ['blood_type']
 
 
+class DemandForecast(models.Model):
+    """
+    Cached daily demand and supply forecast for one blood type, carried
+    forward each night from its smoothing state (see demand_forecast)
+    """
+    blood_type = models.CharField(max_length=3, choices=BLOOD_TYPE_CHOICES, unique=True)
+    through_date = models.DateField(help_text="Last day folded into the smoothing state")
+    state = models.JSONField(default=dict, help_text="Level, weekday season and error variance per series")
+    daily_demand = models.JSONField(default=list, help_text="Forecast units requested per day after through_date")
+    daily_supply = models.JSONField(default=list, help_text="Forecast units donated per day after through_date")
+    proposed_critical_threshold = models.IntegerField(default=0)
+    proposed_minimum_threshold = models.IntegerField(default=0)
+    proposed_optimal_level = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['blood_type']
+    
+    def __str__(self):
+        return f"{self.blood_type} forecast through {self.through_date}"
+
+
 
 # ============================================
 # ENHANCEMENT MODELS - TOP 5 FEATURES
@@ -308,6 +372,29 @@ class DonationAppointment(models.Model):
         return f"{self.donor} - {self.appointment_date} at {self.get_time_slot_display()}"
 
 
+class AppointmentSlot(models.Model):
+    """Bookable capacity of one time slot at one location on one day"""
+    location = models.CharField(max_length=200)
+    date = models.DateField()
+    time_slot = models.CharField(max_length=5, choices=DonationAppointment.TIME_SLOT_CHOICES)
+    capacity = models.PositiveSmallIntegerField()
+    booked = models.PositiveSmallIntegerField(default=0, help_text="Scheduled and confirmed appointments")
+
+    class Meta:
+        ordering = ['date', 'time_slot']
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'date', 'time_slot'], name='unique_appointment_slot'),
+            models.CheckConstraint(condition=models.Q(booked__lte=models.F('capacity')), name='appointment_slot_not_overbooked'),
+        ]
+
+    def __str__(self):
+        return f"{self.location} {self.date} {self.time_slot} ({self.booked}/{self.capacity})"
+
+    @property
+    def remaining(self):
+        return max(0, self.capacity - self.booked)
+
+
 # 2. REAL-TIME NOTIFICATIONS SYSTEM
 class Notification(models.Model):
     """In-app notification system"""
@@ -332,6 +419,7 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read']),
+            models.Index(fields=['user', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -363,14 +451,139 @@ class MatchedDonor(models.Model):
         unique_together = ['blood_request', 'donor']
         indexes = [
             models.Index(fields=['blood_request', 'status']),
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
         return f"{self.donor} matched to {self.blood_request} (Score: {self.match_score})"
 
 
-# 4. ANALYTICS DATA (Calculated on-the-fly, no model needed)
-# Analytics will be computed in views using aggregation
+class MatchingJob(models.Model):
+    """Progress of a background match-and-notify run for a blood request"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('matching', 'Matching'),
+        ('notifying', 'Notifying'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    blood_request = models.ForeignKey(BloodRequest, on_delete=models.CASCADE, related_name='matching_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    send_email = models.BooleanField(default=True)
+    send_sms = models.BooleanField(default=False)
+    matched_count = models.IntegerField(default=0)
+    batch_count = models.IntegerField(default=0)
+    batches_done = models.IntegerField(default=0)
+    email_sent = models.IntegerField(default=0)
+    sms_sent = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Matching job {self.job_id} for {self.blood_request} ({self.status})"
+    
+    @property
+    def progress(self):
+        """Percentage of notification batches sent"""
+        if self.status == 'completed':
+            return 100
+        if not self.batch_count:
+            return 0
+        return int(self.batches_done * 100 / self.batch_count)
+
+
+class ReminderRun(models.Model):
+    """Progress of one appointment reminder run, checkpointed per chunk"""
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('interrupted', 'Interrupted'),
+    ]
+
+    appointment_date = models.DateField(help_text="Date of the appointments being reminded")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    chunks_done = models.IntegerField(default=0)
+    reminded = models.IntegerField(default=0, help_text="Appointments in completed chunks")
+    email_sent = models.IntegerField(default=0)
+    sms_sent = models.IntegerField(default=0)
+    in_flight = models.JSONField(default=list, blank=True,
+                                 help_text="Appointments claimed by the chunk being sent")
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['appointment_date', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Reminder run for {self.appointment_date} ({self.status})"
+
+
+# 4. ANALYTICS DATA
+# Dashboard figures are computed with aggregation and kept in a snapshot
+class AnalyticsSnapshot(models.Model):
+    """Materialized dashboard analytics, one row per section"""
+    section = models.CharField(max_length=30, unique=True)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    refreshed_at = models.DateTimeField(help_text="When the data was computed")
+    changed_at = models.DateTimeField(null=True, blank=True, help_text="Last write to the source tables")
+    
+    def __str__(self):
+        return f"Analytics snapshot: {self.section} ({self.refreshed_at})"
+    
+    @property
+    def is_dirty(self):
+        return self.changed_at is not None and self.changed_at >= self.refreshed_at
+
+
+class ReportJob(models.Model):
+    """A large PDF report generated in the background and stored under MEDIA_ROOT"""
+    REPORT_CHOICES = [
+        ('donors', 'Donors List'),
+        ('requests', 'Blood Requests'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    report = models.CharField(max_length=20, choices=REPORT_CHOICES)
+    requested_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='report_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    file = models.FileField(upload_to='reports/', blank=True)
+    row_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_report_display()} report {self.job_id} ({self.status})"
 
 
 # 5. QR CODE SYSTEM
@@ -522,6 +735,9 @@ class BloodUnit(models.Model):
     donation_date = models.DateField()
     expiration_date = models.DateField(help_text="Typically 42 days from donation")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
+    blood_request = models.ForeignKey(BloodRequest, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='allocated_units',
+                                      help_text="Request this unit is reserved for or was used on")
     unit_number = models.CharField(max_length=50, unique=True, 
                                    help_text="Unique identifier")
     volume_ml = models.IntegerField(default=450, help_text="Standard unit volume")
@@ -537,8 +753,38 @@ class BloodUnit(models.Model):
         indexes = [
             models.Index(fields=['blood_type', 'status']),
             models.Index(fields=['expiration_date']),
+            models.Index(fields=['status', 'expiration_date', 'id']),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the inventory ledger has counted for this unit
+        instance._ledger_state = (instance.__dict__.get('blood_type'), instance.__dict__.get('status'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Save and apply the inventory counter delta in the same transaction"""
+        from django.db import transaction
+        from .inventory_manager import InventoryLedger
+        
+        old_blood_type, old_status = getattr(self, '_ledger_state', (None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            InventoryLedger.record_transition(old_blood_type, old_status, self.blood_type, self.status)
+        self._ledger_state = (self.blood_type, self.status)
+    
+    def delete(self, *args, **kwargs):
+        """Delete and take the unit out of the inventory count"""
+        from django.db import transaction
+        from .inventory_manager import InventoryLedger
+        
+        old_blood_type, old_status = getattr(self, '_ledger_state', (self.blood_type, self.status))
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            InventoryLedger.record_transition(old_blood_type, old_status, None, None)
+        return result
+    
     def is_expiring_soon(self):
         """Check if unit expires within 7 days"""
         from datetime import date, timedelta
@@ -0,0 +1,328 @@
+"""
+Live Notification Events
+Pushes unread-count and new-notification events to connected browsers
+over Server-Sent Events when the site runs under ASGI (backend/asgi.py).
+
+Subscribers live in the serving process. Notifications created in that
+process are pushed immediately; ones created elsewhere (a WSGI worker,
+a Celery task or a management command) are picked up by one shared
+watcher query per heartbeat, not one per connection.
+"""
+import asyncio
+import json
+import logging
+import threading
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.db import close_old_connections
+from django.db.models import Max
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments and cross-process watcher queries
+STREAM_HEARTBEAT = 15
+
+# Events buffered per connection before the oldest are dropped
+STREAM_QUEUE_SIZE = 20
+
+# Ids below the newest seen that are checked again, since a notification
+# can commit after one with a higher id (MySQL/InnoDB)
+RESCAN_WINDOW = 100
+
+
+# ============================================
+# STATE / POLLING
+# ============================================
+
+def unread_count(user_id):
+    """A user's unread count, read from the denormalized counter"""
+    from .models import CustomUser
+
+    close_old_connections()
+    return CustomUser.objects.filter(pk=user_id).values_list('unread_notifications', flat=True).first() or 0
+
+
+def recent_notification_ids(user_id):
+    """
+    (floor, ids) for a new connection: the ids the watcher may still
+    announce start above floor, and ids are the user's notifications
+    among them that already exist
+    """
+    from .models import Notification
+
+    close_old_connections()
+    latest = Notification.objects.aggregate(latest=Max('id'))['latest'] or 0
+    floor = max(latest - RESCAN_WINDOW, 0)
+    return floor, set(Notification.objects.filter(user_id=user_id, id__gt=floor).values_list('id', flat=True))
+
+
+def notification_etag(unread):
+    """ETag for the badge poll; changes whenever the unread count changes"""
+    return f'"{unread}"'
+
+
+# ============================================
+# IN-PROCESS BROKER
+# ============================================
+
+class NotificationBroker:
+    """Fan-out of events to the SSE connections held by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(entry)
+        return entry
+
+    def unsubscribe(self, user_id, entry):
+        with self._lock:
+            entries = self._subscribers.get(user_id)
+            if entries:
+                entries.discard(entry)
+                if not entries:
+                    del self._subscribers[user_id]
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._subscribers.values())
+
+    def publish(self, user_id, event):
+        """Queue an event for every connection of a user (callable from any thread)"""
+        with self._lock:
+            entries = list(self._subscribers.get(user_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Event loop already closed; the connection is going away
+                pass
+        return len(entries)
+
+
+def _offer(queue, event):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+broker = NotificationBroker()
+
+
+def notification_payload(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'link': notification.link,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+def publish_notifications(notifications):
+    """Push new notifications to their users' open connections"""
+    for notification in notifications:
+        if notification.pk is None:
+            # bulk_create without returned ids (MySQL): just refresh the count
+            publish_unread_changed(notification.user_id)
+            continue
+        broker.publish(notification.user_id, {
+            'event': 'notification', 'data': notification_payload(notification),
+        })
+
+
+def publish_unread_changed(user_id):
+    """Ask a user's open connections to refresh the unread count"""
+    broker.publish(user_id, {'event': 'refresh'})
+
+
+# ============================================
+# CROSS-PROCESS WATCHER
+# ============================================
+
+def _new_notifications(after_id, seen):
+    """
+    Notifications created since after_id (by any process), oldest first,
+    plus any in the RESCAN_WINDOW ids below it that were not yet `seen`
+
+    Returns:
+        (new watermark, ids seen within the window, notifications)
+    """
+    from .models import Notification
+
+    close_old_connections()
+    if after_id is None:
+        after_id = Notification.objects.aggregate(latest=Max('id'))['latest'] or 0
+        window = Notification.objects.filter(id__gt=after_id - RESCAN_WINDOW)
+        return after_id, set(window.values_list('id', flat=True)), []
+    notifications = list(
+        Notification.objects.filter(id__gt=after_id - RESCAN_WINDOW).exclude(id__in=seen).order_by('id')[:500]
+    )
+    latest = max([after_id] + [notification.id for notification in notifications])
+    seen = {notification_id for notification_id in seen if notification_id > latest - RESCAN_WINDOW}
+    seen.update(notification.id for notification in notifications)
+    return latest, seen, notifications
+
+
+async def watch_notifications(heartbeat=None):
+    """
+    One loop per process: every heartbeat, a single indexed query picks
+    up notifications written by other processes and pushes them to the
+    connections held here. The last RESCAN_WINDOW ids are read again so
+    a notification that commits late is still pushed. Exits when the
+    last connection closes.
+    """
+    heartbeat = heartbeat or STREAM_HEARTBEAT
+    fetch = sync_to_async(_new_notifications, thread_sensitive=False)
+
+    watermark, seen, _ = await fetch(None, None)
+    while broker.connection_count():
+        await asyncio.sleep(heartbeat)
+        try:
+            watermark, seen, notifications = await fetch(watermark, seen)
+        except Exception as e:
+            logger.error(f"Notification watcher query failed: {str(e)}")
+            continue
+        publish_notifications(notifications)
+
+
+_watchers = {}
+
+
+def ensure_watcher(heartbeat=None):
+    """Start the watcher for the running event loop if it is not running"""
+    loop = asyncio.get_running_loop()
+    task = _watchers.get(loop)
+    if task is None or task.done():
+        _watchers[loop] = loop.create_task(watch_notifications(heartbeat))
+
+
+# ============================================
+# SSE STREAM
+# ============================================
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def notification_stream(user_id, heartbeat=None):
+    """
+    Async generator of SSE frames for one connection
+
+    Sends the current unread count first, then a `notification` event
+    for each new notification (once, whichever process announces it
+    first) followed by the new unread count. Idle connections only get
+    a keep-alive comment every heartbeat; the database is read when an
+    event arrives, not on a timer.
+    """
+    heartbeat = heartbeat or STREAM_HEARTBEAT
+    get_unread = sync_to_async(unread_count, thread_sensitive=False)
+
+    entry = broker.subscribe(user_id)
+    _, queue = entry
+    ensure_watcher(heartbeat)
+    try:
+        floor, sent = await sync_to_async(recent_notification_ids, thread_sensitive=False)(user_id)
+        unread = await get_unread(user_id)
+        yield format_event('unread', {'count': unread})
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            notification_id = event['data']['id'] if event['event'] == 'notification' else None
+            # The watcher re-announces notifications already pushed in-process
+            if notification_id is not None and notification_id > floor and notification_id not in sent:
+                sent.add(notification_id)
+                if len(sent) > RESCAN_WINDOW * 2:
+                    floor = min(sent)
+                    sent.discard(floor)
+                yield format_event('notification', event['data'])
+
+            new_unread = await get_unread(user_id)
+            if new_unread != unread:
+                unread = new_unread
+                yield format_event('unread', {'count': unread})
+    finally:
+        broker.unsubscribe(user_id, entry)
+
+
+# ============================================
+# ASGI ENDPOINT
+# ============================================
+
+def stream_path():
+    return reverse('api_notification_stream')
+
+
+def _session_key(scope):
+    """Session id from the request's Cookie header"""
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookie = SimpleCookie()
+            cookie.load(value.decode('latin-1'))
+            morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+            return morsel.value if morsel else None
+    return None
+
+
+async def notification_stream_app(scope, receive, send):
+    """
+    Bare ASGI application for the SSE stream, routed in backend/asgi.py
+
+    Bypasses the Django middleware stack on purpose: through it every
+    open stream would keep a thread of its own and re-save the session.
+    Here the session is only read to authenticate, and an idle
+    connection costs one suspended coroutine.
+    """
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(_session_key(scope))
+    user = await aget_user(SimpleNamespace(session=session))
+
+    if not user.is_authenticated:
+        await send({'type': 'http.response.start', 'status': 401, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    async def pump():
+        async for frame in notification_stream(user.id):
+            await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+
+    streaming = asyncio.ensure_future(pump())
+    try:
+        # Stream until the client disconnects
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+    finally:
+        streaming.cancel()
+        try:
+            await streaming
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -1,7 +1,7 @@
 """
 Email and SMS notification system for Blood Management
 """
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.core.mail import send_mail, EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils.html import strip_tags
@@ -10,10 +10,18 @@ from django.utils.html import strip_tags
 def send_blood_request_notification(blood_request, donors):
     """
     Send email notification to matching donors when a blood request is created
+    All messages go out over a single mail connection
+    
+    Returns:
+        number of emails sent
     """
     subject = f'Urgent: Blood Request for {blood_request.blood_type}'
+    email_messages = []
     
     for donor in donors:
+        if not donor.email:
+            continue
+        
         context = {
             'donor': donor,
             'request': blood_request,
@@ -53,17 +61,18 @@ def send_blood_request_notification(blood_request, donors):
         
         plain_message = strip_tags(html_message)
         
-        try:
-            send_mail(
-                subject,
-                plain_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [donor.email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Failed to send email to {donor.email}: {str(e)}")
+        email = EmailMultiAlternatives(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [donor.email])
+        email.attach_alternative(html_message, "text/html")
+        email_messages.append(email)
+    
+    if not email_messages:
+        return 0
+    
+    try:
+        return get_connection().send_messages(email_messages) or 0
+    except Exception as e:
+        print(f"Failed to send blood request emails: {str(e)}")
+        return 0
 
 
 def send_request_status_update(blood_request):
@@ -0,0 +1,148 @@
+"""
+Keyset Pagination
+List views page by the sort key of the last row shown (?after=) or the
+first (?before=) instead of an OFFSET, so every page is one index range
+scan of PAGE_SIZE rows however deep into the table it is and no COUNT(*)
+is needed.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Rows per page
+PAGE_SIZE = 50
+
+
+class KeysetPage:
+    """One page of a keyset-paginated list (iterable like a queryset)"""
+
+    def __init__(self, object_list, has_next=False, has_previous=False,
+                 next_cursor=None, previous_cursor=None, query=None, prefix='', truncated=False):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.truncated = truncated
+        self._query = query
+        self._prefix = prefix
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _link(self, param, cursor):
+        query = self._query.copy()
+        query.pop(f'{self._prefix}after', None)
+        query.pop(f'{self._prefix}before', None)
+        query[f'{self._prefix}{param}'] = cursor
+        return f'?{query.urlencode()}'
+
+    @property
+    def next_link(self):
+        return self._link('after', self.next_cursor) if self.has_next else None
+
+    @property
+    def previous_link(self):
+        return self._link('before', self.previous_cursor) if self.has_previous else None
+
+
+def _parse_ordering(ordering):
+    return [(key.lstrip('-'), key.startswith('-')) for key in ordering]
+
+
+def encode_cursor(obj, ordering):
+    values = [getattr(obj, field) for field, _ in _parse_ordering(ordering)]
+    payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, cursor, ordering):
+    """Sort key values from a cursor, or None when it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        keys = _parse_ordering(ordering)
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        return [model._meta.get_field(field).to_python(value) for (field, _), value in zip(keys, values)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _beyond(ordering, values, forward):
+    """Q for rows after (forward) or before the given sort key"""
+    keys = _parse_ordering(ordering)
+    condition = Q()
+    for i, (field, descending) in enumerate(keys):
+        lookup = 'lt' if descending == forward else 'gt'
+        clause = Q(**{f'{field}__{lookup}': values[i]})
+        for j in range(i):
+            clause &= Q(**{keys[j][0]: values[j]})
+        condition |= clause
+    return condition
+
+
+def keyset_paginate(request, queryset, ordering, per_page=None, prefix=''):
+    """
+    Return a KeysetPage of queryset ordered by `ordering`
+
+    Args:
+        ordering: field names, '-' for descending, ending in a unique
+            field (e.g. ['-created_at', '-id']); back them with an index
+        prefix: cursor parameter prefix when a view has several lists
+    """
+    per_page = per_page or PAGE_SIZE
+    after = request.GET.get(f'{prefix}after')
+    before = request.GET.get(f'{prefix}before')
+    model = queryset.model
+
+    forward = not before
+    cursor_values = decode_cursor(model, after or before, ordering) if (after or before) else None
+
+    if forward:
+        page_qs = queryset.order_by(*ordering)
+    else:
+        page_qs = queryset.order_by(*[key[1:] if key.startswith('-') else f'-{key}' for key in ordering])
+    if cursor_values is not None:
+        page_qs = page_qs.filter(_beyond(ordering, cursor_values, forward))
+
+    rows = list(page_qs[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if forward:
+        has_next, has_previous = more, cursor_values is not None
+    else:
+        rows.reverse()
+        has_next, has_previous = cursor_values is not None, more
+
+    return KeysetPage(
+        rows,
+        has_next=has_next and bool(rows),
+        has_previous=has_previous and bool(rows),
+        next_cursor=encode_cursor(rows[-1], ordering) if rows else None,
+        previous_cursor=encode_cursor(rows[0], ordering) if rows else None,
+        query=request.GET,
+        prefix=prefix,
+    )
+
+
+def top_results(queryset, per_page=None):
+    """
+    First page of an already ranked queryset (search results); `truncated`
+    tells the template there are more matches than shown
+    """
+    per_page = per_page or PAGE_SIZE
+    rows = list(queryset[:per_page + 1])
+    return KeysetPage(rows[:per_page], truncated=len(rows) > per_page)
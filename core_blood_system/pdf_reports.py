@@ -0,0 +1,316 @@
+"""
+PDF Reports
+Renders donor and blood request reports page by page from chunked
+querysets. Large reports run as a background ReportJob that writes the
+file under MEDIA_ROOT; small ones are returned synchronously.
+"""
+import itertools
+import logging
+import tempfile
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import FileResponse
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from .models import Donor, BloodRequest, ReportJob, PURPOSE_CHOICES
+
+logger = logging.getLogger(__name__)
+
+# Reports with more rows than this are generated in the background
+PDF_SYNC_ROW_LIMIT = getattr(settings, 'PDF_SYNC_ROW_LIMIT', 2000)
+
+# Table rows drawn per page (leaves room for the title and summary)
+PDF_ROWS_PER_PAGE = 32
+
+# Rows fetched from the database per round trip
+PDF_CHUNK_SIZE = 2000
+
+# Days a generated report file is kept
+REPORT_RETENTION_DAYS = getattr(settings, 'REPORT_RETENTION_DAYS', 7)
+
+
+# ============================================
+# STYLES (built once per process)
+# ============================================
+
+@lru_cache(maxsize=None)
+def report_styles():
+    """Sample stylesheet plus the report title styles"""
+    styles = getSampleStyleSheet()
+    for name, color in (('DonorTitle', '#FF0000'), ('RequestTitle', '#DC143C')):
+        styles.add(ParagraphStyle(
+            name,
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor(color),
+            spaceAfter=30,
+            alignment=1,  # Center
+        ))
+    return styles
+
+
+def _list_table_style(header_color, header_size, body_size):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), header_color),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -1), body_size),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ])
+
+
+DONOR_TABLE_STYLE = _list_table_style(colors.red, 12, 10)
+REQUEST_TABLE_STYLE = _list_table_style(colors.crimson, 11, 9)
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.red),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+# ============================================
+# REPORT DEFINITIONS
+# ============================================
+
+_purpose_labels = dict(PURPOSE_CHOICES)
+_urgency_labels = dict(BloodRequest.URGENCY_CHOICES)
+_status_labels = dict(BloodRequest.STATUS_CHOICES)
+
+REPORTS = {
+    'donors': {
+        'title': '🩸 Blood Donors List',
+        'title_style': 'DonorTitle',
+        'filename': 'donors_list.pdf',
+        'total_label': 'Total Donors',
+        'headers': ['#', 'Name', 'Blood Type', 'Phone', 'City', 'Available'],
+        'fields': ['first_name', 'last_name', 'blood_type', 'phone_number', 'city', 'is_available'],
+        'row': lambda first_name, last_name, blood_type, phone, city, available: [
+            f"{first_name} {last_name}", blood_type, phone, city, '✓' if available else '✗',
+        ],
+        'col_widths': [0.5*inch, 2*inch, 1*inch, 1.5*inch, 1.5*inch, 1*inch],
+        'table_style': DONOR_TABLE_STYLE,
+    },
+    'requests': {
+        'title': '🩸 Blood Requests Report',
+        'title_style': 'RequestTitle',
+        'filename': 'blood_requests.pdf',
+        'total_label': 'Total Requests',
+        'headers': ['#', 'Patient', 'Blood Type', 'Purpose', 'Units', 'Urgency', 'Status'],
+        'fields': ['patient_name', 'blood_type', 'purpose', 'units_needed', 'urgency', 'status'],
+        'row': lambda patient, blood_type, purpose, units, urgency, status: [
+            patient, blood_type, _purpose_labels.get(purpose, purpose), str(units),
+            _urgency_labels.get(urgency, urgency), _status_labels.get(status, status),
+        ],
+        'col_widths': [0.4*inch, 1.5*inch, 0.8*inch, 1.2*inch, 0.6*inch, 0.9*inch, 1*inch],
+        'table_style': REQUEST_TABLE_STYLE,
+    },
+}
+
+
+def report_queryset(report, user):
+    """Rows a user may see in a report"""
+    if report == 'donors':
+        return Donor.objects.all()
+    if user.role == 'admin':
+        return BloodRequest.objects.all()
+    return BloodRequest.objects.filter(requester=user)
+
+
+# ============================================
+# RENDERING
+# ============================================
+
+def render_report_pdf(output, report, queryset):
+    """
+    Write a list report to `output` one page at a time
+
+    Rows are read with values_list().iterator() and each page is drawn
+    as its own table straight onto the canvas, so only one page of rows
+    is held in memory however long the report is.
+
+    Returns:
+        number of rows written
+    """
+    spec = REPORTS[report]
+    styles = report_styles()
+    width, height = A4
+    margin = 0.75 * inch
+
+    values = queryset.values_list(*spec['fields']).iterator(chunk_size=PDF_CHUNK_SIZE)
+    rows = (
+        [str(idx)] + spec['row'](*row)
+        for idx, row in enumerate(values, start=1)
+    )
+
+    pdf = canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    total = 0
+    page = 1
+    chunk = list(itertools.islice(rows, PDF_ROWS_PER_PAGE))
+
+    while True:
+        # Look one page ahead so the summary goes on the last page
+        next_chunk = list(itertools.islice(rows, PDF_ROWS_PER_PAGE)) if len(chunk) == PDF_ROWS_PER_PAGE else []
+        total += len(chunk)
+        y = height - margin
+
+        if page == 1:
+            title = Paragraph(spec['title'], styles[spec['title_style']])
+            _, title_height = title.wrapOn(pdf, width - 2 * margin, height)
+            title.drawOn(pdf, margin, y - title_height)
+            y -= title_height + 0.3 * inch
+
+        table = Table([spec['headers']] + chunk, colWidths=spec['col_widths'])
+        table.setStyle(spec['table_style'])
+        table_width, table_height = table.wrapOn(pdf, width - 2 * margin, y - margin)
+        table.drawOn(pdf, (width - table_width) / 2, y - table_height)
+        y -= table_height
+
+        pdf.setFont('Helvetica', 8)
+        pdf.drawRightString(width - margin, margin / 2, f"Page {page}")
+
+        if not next_chunk:
+            footer = Paragraph(
+                f"{spec['total_label']}: {total} | Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}",
+                styles['Normal'],
+            )
+            _, footer_height = footer.wrapOn(pdf, width - 2 * margin, height)
+            footer.drawOn(pdf, margin, y - 0.5 * inch - footer_height)
+            break
+
+        pdf.showPage()
+        chunk = next_chunk
+        page += 1
+
+    pdf.save()
+    return total
+
+
+def render_analytics_pdf(output, analytics):
+    """Write the one-page analytics summary report to `output`"""
+    styles = report_styles()
+    doc = SimpleDocTemplate(output, pagesize=letter)
+
+    summary_table = Table([
+        ['Metric', 'Value'],
+        ['Total Donors', str(analytics['total_donors'])],
+        ['Active Donors', str(analytics['active_donors'])],
+        ['Total Requests', str(analytics['total_requests'])],
+        ['Pending Requests', str(analytics['pending_requests'])],
+        ['Total Donations', str(analytics['total_donations'])],
+        ['Total Units Donated', str(analytics['total_units_donated'])],
+    ], colWidths=[3*inch, 2*inch])
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+
+    doc.build([
+        Paragraph("Blood Management System - Analytics Report", styles['Title']),
+        Spacer(1, 0.3 * inch),
+        summary_table,
+        Spacer(1, 0.5 * inch),
+        Paragraph(f"Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']),
+    ])
+
+
+def pdf_file_response(render, filename, *args):
+    """Render a PDF into a temporary file and stream it back"""
+    output = tempfile.TemporaryFile()
+    render(output, *args)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type='application/pdf')
+
+
+# ============================================
+# BACKGROUND REPORT JOBS
+# ============================================
+
+def start_report_job(report, user):
+    """
+    Create a ReportJob and hand it to the task queue once the current
+    transaction commits. Returns immediately.
+    """
+    job = ReportJob.objects.create(report=report, requested_by=user)
+    transaction.on_commit(lambda: dispatch_report_job(job.job_id))
+    return job
+
+
+def dispatch_report_job(job_id):
+    """
+    Queue the Celery task for a job. Without Celery (or with the broker
+    down) the job stays queued for the process_report_jobs command.
+    """
+    try:
+        from .tasks import generate_pdf_report
+    except ImportError:
+        logger.info(f"Celery not installed; report job {job_id} left queued")
+        return False
+
+    try:
+        generate_pdf_report.delay(str(job_id))
+        return True
+    except Exception as e:
+        logger.error(f"Failed to queue report job {job_id}: {str(e)}")
+        return False
+
+
+def run_report_job(job_id):
+    """Generate a queued report into MEDIA_ROOT in the current process"""
+    job = ReportJob.objects.select_related('requested_by').get(job_id=job_id)
+
+    # Claim the job so a Celery worker and the fallback command never both run it
+    claimed = ReportJob.objects.filter(pk=job.pk, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        logger.info(f"Report job {job_id} already picked up")
+        return False
+
+    try:
+        with tempfile.TemporaryFile() as output:
+            row_count = render_report_pdf(
+                output, job.report, report_queryset(job.report, job.requested_by)
+            )
+            output.seek(0)
+            job.file.save(f"{job.report}_{job.job_id}.pdf", File(output), save=False)
+    except Exception as e:
+        logger.error(f"Report job {job_id} failed: {str(e)}")
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(e), completed_at=timezone.now()
+        )
+        return False
+
+    ReportJob.objects.filter(pk=job.pk).update(
+        status='completed', file=job.file.name, row_count=row_count, completed_at=timezone.now()
+    )
+    return True
+
+
+def purge_old_reports(days=None):
+    """Delete report jobs and their files once past the retention period"""
+    cutoff = timezone.now() - timedelta(days=days or REPORT_RETENTION_DAYS)
+    purged = 0
+    for job in ReportJob.objects.filter(created_at__lt=cutoff).exclude(status__in=['queued', 'running']):
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        purged += 1
+    return purged
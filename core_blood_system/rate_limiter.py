@@ -0,0 +1,198 @@
+"""
+Rate Limiter
+Sliding-window request limits shared by every worker process.
+
+Counters live in a small SQLite database of their own
+(settings.RATE_LIMIT_DATABASE) instead of the per-process LocMemCache,
+so all WSGI workers enforce one budget and lockouts are never evicted.
+Each hit is a single atomic upsert. With RATE_LIMIT_STORE = 'cache' the
+default cache's add()/incr() are used instead, which is atomic on Redis
+and Memcached (not on LocMemCache, the database or file caches).
+
+Rates are written '5/15m' (5 per 15 minutes); units are s, m, h and d.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Expired counters are purged after this many hits per process
+PURGE_EVERY = 1000
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_rate = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$')
+
+RateLimitResult = namedtuple('RateLimitResult', 'allowed count limit retry_after')
+
+
+def parse_rate(rate):
+    """'5/15m' -> (5, 900)"""
+    match = _rate.match(rate)
+    if not match:
+        raise ValueError(f'Invalid rate: {rate!r}')
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * _UNITS[unit]
+
+
+# ============================================
+# STORES
+# ============================================
+
+class SQLiteStore:
+    """Counters in a shared SQLite file (one connection per thread and process)"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._hits = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                'key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def incr(self, key, ttl):
+        now = time.time()
+        conn = self._connection()
+        # An expired row restarts from 1 instead of being incremented
+        value = conn.execute(
+            'INSERT INTO counters (key, value, expires_at) VALUES (?, 1, ?) '
+            'ON CONFLICT(key) DO UPDATE SET '
+            'value = CASE WHEN expires_at > ? THEN value + 1 ELSE 1 END, '
+            'expires_at = CASE WHEN expires_at > ? THEN expires_at ELSE excluded.expires_at END '
+            'RETURNING value',
+            (key, now + ttl, now, now),
+        ).fetchone()[0]
+        self._hits += 1
+        if self._hits % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM counters WHERE expires_at <= ?', (now,))
+        return value
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM counters WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set(self, key, value, ttl):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO counters (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl),
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM counters')
+
+
+class CacheStore:
+    """Counters in the default cache (atomic only on Redis / Memcached)"""
+
+    def incr(self, key, ttl):
+        cache.add(key, 0, ttl)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, ttl)
+            return 1
+
+    def get(self, key):
+        return cache.get(key, 0)
+
+    def set(self, key, value, ttl):
+        cache.set(key, value, ttl)
+
+    def clear(self):
+        cache.clear()
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    if getattr(settings, 'RATE_LIMIT_STORE', 'sqlite') == 'cache':
+        return CacheStore()
+    return SQLiteStore(settings.RATE_LIMIT_DATABASE)
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    if setting.startswith('RATE_LIMIT'):
+        get_store.cache_clear()
+
+
+# ============================================
+# LIMITS
+# ============================================
+
+def hit(scope, identity, rate):
+    """
+    Count one request by `identity` against `scope` and decide whether
+    it is within `rate`
+
+    Sliding window: the current fixed window's count plus the previous
+    window's count weighted by how much of it still overlaps the last
+    `period` seconds. Rejected requests are counted too, so a client
+    that keeps hammering stays limited.
+    """
+    limit, period = parse_rate(rate)
+    store = get_store()
+    now = time.time()
+    window = int(now // period)
+    elapsed = now - window * period
+
+    current = store.incr(f'rl:{scope}:{identity}:{window}', period * 2)
+    previous = store.get(f'rl:{scope}:{identity}:{window - 1}')
+    weight = 1 - elapsed / period
+    count = current + previous * weight
+
+    if count <= limit:
+        return RateLimitResult(True, math.ceil(count), limit, 0)
+
+    if current > limit:
+        retry_after = period - elapsed
+    else:
+        # Until enough of the previous window has slid out
+        retry_after = period * (1 - (limit - current) / previous) - elapsed
+    return RateLimitResult(False, math.ceil(count), limit, max(1, math.ceil(retry_after)))
+
+
+def block(scope, identity, seconds):
+    get_store().set(f'block:{scope}:{identity}', 1, seconds)
+
+
+def is_blocked(scope, identity):
+    return bool(get_store().get(f'block:{scope}:{identity}'))
+
+
+def view_rate(scope, user, default):
+    """
+    Rate for a view from settings.RATE_LIMITS, e.g.
+
+        RATE_LIMITS = {
+            'user_register': '10/h',
+            'donor_search_api': {'admin': '600/m', 'default': '60/m'},
+        }
+
+    A dict picks a rate by the user's role ('anonymous' when logged out).
+    """
+    rate = getattr(settings, 'RATE_LIMITS', {}).get(scope, default)
+    if isinstance(rate, dict):
+        role = getattr(user, 'role', None) if user is not None and user.is_authenticated else 'anonymous'
+        rate = rate.get(role, rate.get('default', default))
+    return rate
@@ -0,0 +1,203 @@
+"""
+Appointment Reminder Pipeline
+Sends tomorrow's appointment reminders in claimed, checkpointed chunks
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .email_notifications import EmailNotificationService
+from .enhancements import ACTIVE_APPOINTMENT_STATUSES
+from .models import DonationAppointment, NotificationLog, ReminderRun
+from .sms_notifications import SMSNotificationService, appointment_reminder_sms_text
+
+logger = logging.getLogger(__name__)
+
+# Appointments claimed and sent per chunk
+REMINDER_CHUNK_SIZE = getattr(settings, 'APPOINTMENT_REMINDER_CHUNK_SIZE', 200)
+
+# A running run not updated for this long is taken to have died
+REMINDER_RUN_STALE_AFTER = timedelta(minutes=getattr(settings, 'APPOINTMENT_REMINDER_STALE_MINUTES', 15))
+
+
+def claim_chunk(run, chunk_size=None, after=0):
+    """
+    Take the next chunk of unreminded appointments for the run's date,
+    with ids above `after` (the run's last claimed id, so reminders that
+    failed in this run are left for the next one). reminder_sent is set
+    before anything is sent, so concurrent runs take different chunks.
+
+    Returns:
+        list of appointments (with donor and user loaded), empty when done
+    """
+    pending = DonationAppointment.objects.filter(
+        appointment_date=run.appointment_date,
+        status__in=ACTIVE_APPOINTMENT_STATUSES,
+        reminder_sent=False,
+        id__gt=after,
+    ).order_by('id')
+    if connection.features.has_select_for_update_skip_locked:
+        # Concurrent runs take different chunks instead of waiting
+        pending = pending.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        ids = list(pending.values_list('id', flat=True)[:chunk_size or REMINDER_CHUNK_SIZE])
+        if not ids:
+            return []
+        DonationAppointment.objects.filter(id__in=ids, reminder_sent=False).update(reminder_sent=True)
+        ReminderRun.objects.filter(pk=run.pk).update(in_flight=ids, updated_at=timezone.now())
+
+    return list(
+        DonationAppointment.objects.filter(id__in=ids).select_related('donor', 'user').order_by('id')
+    )
+
+
+def undelivered(appointment_ids, since, failed_only=False):
+    """
+    Appointments among `appointment_ids` with no reminder logged as sent
+    since `since`; with failed_only, only those with a failed send logged
+    """
+    users = dict(
+        DonationAppointment.objects.filter(id__in=appointment_ids, user__isnull=False)
+        .values_list('id', 'user_id')
+    )
+    logs = NotificationLog.objects.filter(
+        notification_type='appointment_reminder', user_id__in=set(users.values()), created_at__gte=since,
+    )
+    sent = set(logs.filter(status='sent').values_list('user_id', flat=True))
+    failed = set(logs.filter(status='failed').values_list('user_id', flat=True)) if failed_only else None
+    return sorted(
+        appointment_id for appointment_id, user_id in users.items()
+        if user_id not in sent and (failed is None or user_id in failed)
+    )
+
+
+def send_chunk(run, appointments):
+    """
+    Send one chunk's reminders through the batched channels and
+    checkpoint it; reminders that could not be delivered are released
+    for the next run
+    """
+    started = timezone.now()
+    email_sent = EmailNotificationService.send_appointment_reminders(appointments)
+
+    # Everyone booked into the same slot gets the same text
+    by_message = defaultdict(list)
+    for appointment in appointments:
+        if appointment.user_id:
+            by_message[appointment_reminder_sms_text(appointment)].append(appointment.user)
+    sms_sent = sum(
+        SMSNotificationService.send_bulk_sms(users, 'appointment_reminder', message)
+        for message, users in by_message.items()
+    )
+
+    failed = undelivered([appointment.id for appointment in appointments], started, failed_only=True)
+    with transaction.atomic():
+        DonationAppointment.objects.filter(id__in=failed).update(reminder_sent=False)
+        ReminderRun.objects.filter(pk=run.pk).update(
+            chunks_done=F('chunks_done') + 1,
+            reminded=F('reminded') + len(appointments) - len(failed),
+            email_sent=F('email_sent') + email_sent,
+            sms_sent=F('sms_sent') + sms_sent,
+            in_flight=[],
+            updated_at=timezone.now(),
+        )
+    if failed:
+        logger.warning(f"Reminders for appointments {failed} failed; they will be sent by the next run")
+    return email_sent, sms_sent
+
+
+def mark_stale_runs_interrupted(day):
+    """
+    Close runs for a date that died mid-chunk
+
+    Returns:
+        list of appointment ids whose reminders may not have gone out
+    """
+    stale = list(ReminderRun.objects.filter(
+        appointment_date=day, status='running',
+        updated_at__lt=timezone.now() - REMINDER_RUN_STALE_AFTER,
+    ))
+    unconfirmed = []
+    for run in stale:
+        if ReminderRun.objects.filter(pk=run.pk, status='running').update(
+            status='interrupted', completed_at=timezone.now()
+        ):
+            unconfirmed.extend(run.in_flight)
+    if unconfirmed:
+        logger.warning(
+            f"Reminder runs for {day} were interrupted; reminders for appointments "
+            f"{unconfirmed} may not have been sent"
+        )
+    return unconfirmed
+
+
+def resume_unfinished_runs(day):
+    """
+    Release the in_flight appointments of failed or interrupted runs for
+    a date that have no reminder logged as sent, so this run sends them
+
+    Returns:
+        list of appointment ids released
+    """
+    released = []
+    with transaction.atomic():
+        runs = ReminderRun.objects.select_for_update().filter(
+            appointment_date=day, status__in=['failed', 'interrupted'],
+        )
+        for run in runs:
+            if not run.in_flight:
+                continue
+            unsent = undelivered(run.in_flight, run.started_at)
+            DonationAppointment.objects.filter(id__in=unsent).update(reminder_sent=False)
+            ReminderRun.objects.filter(pk=run.pk).update(in_flight=[])
+            released.extend(unsent)
+    if released:
+        logger.info(f"Resending reminders for appointments {released} left unsent by earlier runs for {day}")
+    return released
+
+
+def run_appointment_reminders(day=None, chunk_size=None):
+    """
+    Remind everyone with a scheduled or confirmed appointment on `day`
+    (default: tomorrow) who has not been reminded yet
+
+    Returns:
+        the finished ReminderRun
+    """
+    day = day or timezone.now().date() + timedelta(days=1)
+    mark_stale_runs_interrupted(day)
+    resume_unfinished_runs(day)
+    run = ReminderRun.objects.create(appointment_date=day)
+
+    try:
+        last_id = 0
+        while True:
+            appointments = claim_chunk(run, chunk_size, after=last_id)
+            if not appointments:
+                break
+            last_id = appointments[-1].id
+            send_chunk(run, appointments)
+    except Exception as e:
+        in_flight = ReminderRun.objects.values_list('in_flight', flat=True).get(pk=run.pk)
+        logger.error(
+            f"Reminder run {run.pk} for {day} failed: {str(e)}; reminders for appointments "
+            f"{in_flight} will be resent by the next run if they were not sent"
+        )
+        ReminderRun.objects.filter(pk=run.pk).update(
+            status='failed', error=str(e), completed_at=timezone.now()
+        )
+        raise
+
+    ReminderRun.objects.filter(pk=run.pk).update(status='completed', completed_at=timezone.now())
+    run.refresh_from_db()
+    logger.info(
+        f"Reminder run for {day}: {run.reminded} appointments in {run.chunks_done} chunks "
+        f"({run.email_sent} emails, {run.sms_sent} SMS)"
+    )
+    return run
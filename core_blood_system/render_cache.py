@@ -0,0 +1,144 @@
+"""
+Render Cache
+Content-addressed on-disk store for rendered certificates and QR images.
+Files are keyed by a hash of everything that goes into the render, so a
+repeat request is served from disk and any change to the inputs (or to
+the template version) produces a new key.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the cache size; least recently used files go first
+RENDER_CACHE_MAX_BYTES = getattr(settings, 'RENDER_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+# Eviction scans the directory, so it only runs every N stores
+EVICTION_INTERVAL = 50
+
+_stores_since_eviction = 0
+
+
+def cache_dir():
+    """Root directory of the render cache"""
+    return Path(getattr(settings, 'RENDER_CACHE_DIR', None) or Path(settings.MEDIA_ROOT) / 'render_cache')
+
+
+def render_key(kind, version, inputs):
+    """Stable hash of the render inputs"""
+    payload = json.dumps([kind, version, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_path(kind, key, extension):
+    """Path of a cached file, sharded by the first two hex digits"""
+    return cache_dir() / kind / key[:2] / f'{key}.{extension}'
+
+
+def get_or_render(kind, version, inputs, render, extension):
+    """
+    Return the path of the rendered file for `inputs`, rendering it only
+    on a cache miss
+
+    Args:
+        kind: cache namespace ('certificate', 'qr', ...)
+        version: template version; bump it when the layout changes
+        inputs: JSON-serialisable dict of everything the render uses
+        render: callable(inputs) -> bytes
+        extension: file extension of the rendered file
+    """
+    path = cache_path(kind, render_key(kind, version, inputs), extension)
+
+    if path.exists():
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    content = render(inputs)
+    _store(path, content)
+    return path
+
+
+def open_rendered(kind, version, inputs, render, extension):
+    """
+    Open the rendered file for `inputs` for binary reading (arguments as
+    for get_or_render)
+
+    Eviction can unlink the file between the lookup and the open; it is
+    then rendered again and served from memory. An open file stays
+    readable after it is unlinked.
+    """
+    path = get_or_render(kind, version, inputs, render, extension)
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        content = render(inputs)
+        _store(path, content)
+        return BytesIO(content)
+
+
+def _store(path, content):
+    """Write atomically so readers never see a partial file"""
+    global _stores_since_eviction
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(content)
+        os.replace(tmp_name, path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+    _stores_since_eviction += 1
+    if _stores_since_eviction >= EVICTION_INTERVAL:
+        _stores_since_eviction = 0
+        evict_render_cache()
+
+
+def evict_render_cache(max_bytes=None):
+    """
+    Delete least recently used files until the cache fits in max_bytes
+
+    Returns:
+        number of files deleted
+    """
+    max_bytes = RENDER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = cache_dir()
+    if not root.exists():
+        return 0
+
+    entries = []
+    total = 0
+    for path in root.rglob('*'):
+        if path.is_file():
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    deleted = 0
+    for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+
+    if deleted:
+        logger.info(f"Evicted {deleted} files from the render cache")
+    return deleted
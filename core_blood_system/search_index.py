@@ -0,0 +1,143 @@
+"""
+Full-Text Search Index
+Ranked, prefix-matching search over donors, blood requests and users.
+
+On SQLite each table has an external-content FTS5 index kept in sync by
+triggers (so saves, deletes, bulk_create and queryset.update() are all
+covered). On MySQL the same columns carry an InnoDB FULLTEXT index that
+the engine maintains itself. Other backends fall back to the previous
+OR-ed icontains filters.
+
+Matching is by word prefix: "jan wan" finds "Jane Wanjiru". Text in the
+middle of a word (e.g. the last digits of a phone number) is not
+matched, and single characters only match whole words. MySQL also
+ignores words shorter than innodb_ft_min_token_size (3 by default).
+"""
+import re
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Indexed columns per table (kept in step with migration 0014)
+SEARCH_INDEXES = {
+    'core_blood_system_donor': [
+        'first_name', 'last_name', 'email', 'phone_number', 'city', 'state',
+    ],
+    'core_blood_system_bloodrequest': [
+        'patient_name', 'hospital_name', 'hospital_address', 'contact_number', 'notes',
+    ],
+    'core_blood_system_customuser': [
+        'username', 'first_name', 'last_name', 'email', 'phone_number',
+    ],
+}
+
+# Words taken from one search box entry
+MAX_SEARCH_TERMS = 8
+
+# Searches matching more rows than this list newest first instead of by
+# relevance: bm25 costs a few microseconds per matching row
+SEARCH_RANK_LIMIT = 1000
+
+_word = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Words of a search box entry, lower-cased"""
+    return [term.lower() for term in _word.findall(query or '')][:MAX_SEARCH_TERMS]
+
+
+def index_table(table):
+    return f'{table}_search'
+
+
+def sqlite_has_fts5(conn):
+    """Whether the linked SQLite library was built with FTS5"""
+    with conn.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+@lru_cache(maxsize=None)
+def search_backend():
+    """'fts5', 'fulltext' or None (icontains fallback)"""
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        return 'fts5'
+    if connection.vendor == 'mysql':
+        return 'fulltext'
+    return None
+
+
+def full_text_search(queryset, query):
+    """
+    Filter a queryset to rows matching every word of `query` as a
+    prefix, best matches first (annotated as `search_rank`)
+
+    Broad searches (over SEARCH_RANK_LIMIT matches on SQLite) come back
+    newest first instead.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    model = queryset.model
+    table = model._meta.db_table
+    columns = SEARCH_INDEXES[table]
+    backend = search_backend()
+
+    if backend == 'fts5':
+        fts = index_table(table)
+        match = ' '.join(f'"{term}"*' if len(term) > 1 else f'"{term}"' for term in terms)
+        # Join the index so SQLite drives the query from it
+        matches = queryset.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.{model._meta.pk.column}', f'{fts} MATCH %s'],
+            params=[match],
+        )
+        if _fts5_match_count(fts, match, SEARCH_RANK_LIMIT + 1) > SEARCH_RANK_LIMIT:
+            # Ordered on the index's rowid so FTS5 walks backwards and stops early
+            return matches.extra(order_by=[f'-{fts}.rowid'])
+        return matches.extra(select={'search_rank': f'{fts}.rank'}, order_by=['search_rank'])
+
+    if backend == 'fulltext':
+        match = ' '.join(f'+{term}*' for term in terms)
+        column_list = ', '.join(f'{table}.{column}' for column in columns)
+        rank = RawSQL(f'MATCH ({column_list}) AGAINST (%s IN BOOLEAN MODE)', [match])
+        return queryset.annotate(search_rank=rank).filter(search_rank__gt=0).order_by('-search_rank')
+
+    condition = Q()
+    for term in terms:
+        term_condition = Q()
+        for column in columns:
+            term_condition |= Q(**{f'{column}__icontains': term})
+        condition &= term_condition
+    return queryset.filter(condition)
+
+
+def _fts5_match_count(fts, match, limit):
+    """Number of index matches, counting no further than limit"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH %s LIMIT %s)',
+            [match, limit],
+        )
+        return cursor.fetchone()[0]
+
+
+def rebuild_search_indexes(command='rebuild'):
+    """
+    Rebuild the FTS5 indexes from their tables, or with
+    command='optimize' merge the segments that writes leave behind
+    (SQLite only; InnoDB maintains FULLTEXT indexes itself).
+
+    Returns:
+        tables processed
+    """
+    if search_backend() != 'fts5':
+        return []
+    with connection.cursor() as cursor:
+        for table in SEARCH_INDEXES:
+            fts = index_table(table)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES (%s)", [command])
+    return list(SEARCH_INDEXES)
@@ -3,14 +3,17 @@ Advanced Security Features for Blood Management System
 Protects against common attacks: SQL Injection, XSS, CSRF, Brute Force, etc.
 """
 
-from django.core.cache import cache
-from django.http import HttpResponseForbidden
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.contrib.auth.signals import user_login_failed
 from django.dispatch import receiver
 from functools import wraps
 import logging
+import math
 from datetime import datetime, timedelta
 
+from . import rate_limiter
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,30 +21,44 @@ logger = logging.getLogger(__name__)
 # RATE LIMITING - Prevent Brute Force Attacks
 # ==========================================
 
-def rate_limit(max_attempts=5, window_minutes=15):
+def rate_limit(max_attempts=5, window_minutes=15, key='ip', scope=None, methods=None):
     """
     Rate limiting decorator to prevent brute force attacks
     Usage: @rate_limit(max_attempts=5, window_minutes=15)
+
+    Args:
+        key: 'ip' counts per client address, 'user' per account
+            (anonymous requests fall back to the address)
+        scope: name for settings.RATE_LIMITS overrides (default: view name)
+        methods: only count these HTTP methods, e.g. ('POST',)
     """
     def decorator(view_func):
+        name = scope or view_func.__name__
+        default_rate = f'{max_attempts}/{window_minutes}m'
+
         @wraps(view_func)
         def wrapped_view(request, *args, **kwargs):
-            # Get client IP address
+            if methods and request.method not in methods:
+                return view_func(request, *args, **kwargs)
+
+            user = getattr(request, 'user', None)
             ip_address = get_client_ip(request)
-            cache_key = f'rate_limit_{view_func.__name__}_{ip_address}'
-            
-            # Get current attempt count
-            attempts = cache.get(cache_key, 0)
-            
-            if attempts >= max_attempts:
-                logger.warning(f'Rate limit exceeded for {ip_address} on {view_func.__name__}')
-                return HttpResponseForbidden(
-                    f'Too many attempts. Please try again in {window_minutes} minutes.'
+            if key == 'user' and user is not None and user.is_authenticated:
+                identity = f'user:{user.pk}'
+            else:
+                identity = f'ip:{ip_address}'
+
+            result = rate_limiter.hit(name, identity, rate_limiter.view_rate(name, user, default_rate))
+            if not result.allowed:
+                logger.warning(f'Rate limit exceeded for {identity} on {name}')
+                minutes = math.ceil(result.retry_after / 60)
+                response = HttpResponse(
+                    f'Too many attempts. Please try again in {minutes} minute{"s" if minutes != 1 else ""}.',
+                    status=429,
                 )
-            
-            # Increment attempts
-            cache.set(cache_key, attempts + 1, window_minutes * 60)
-            
+                response['Retry-After'] = str(result.retry_after)
+                return response
+
             return view_func(request, *args, **kwargs)
         return wrapped_view
     return decorator
@@ -61,9 +78,16 @@ def get_client_ip(request):
 # LOGIN ATTEMPT TRACKING
 # ==========================================
 
+def login_identity(ip_address, username):
+    """Failed logins are counted per username and address"""
+    return f'{ip_address}:{(username or "").lower()}'
+
+
 @receiver(user_login_failed)
-def log_failed_login(sender, credentials, request, **kwargs):
+def log_failed_login(sender, credentials, request=None, **kwargs):
     """Log failed login attempts"""
+    if request is None:
+        return
     ip_address = get_client_ip(request)
     username = credentials.get('username', 'unknown')
     
@@ -73,20 +97,20 @@ def log_failed_login(sender, credentials, request, **kwargs):
     )
     
     # Track failed attempts
-    cache_key = f'failed_login_{ip_address}'
-    failed_attempts = cache.get(cache_key, 0) + 1
-    cache.set(cache_key, failed_attempts, 3600)  # 1 hour
+    identity = login_identity(ip_address, username)
+    result = rate_limiter.hit('failed_login', identity, getattr(settings, 'LOGIN_FAILURE_RATE', '10/h'))
     
-    # Block IP after 10 failed attempts
-    if failed_attempts >= 10:
-        cache.set(f'blocked_ip_{ip_address}', True, 86400)  # 24 hours
-        logger.error(f'IP {ip_address} blocked due to excessive failed login attempts')
+    # Lock the username out from this address after too many failures
+    if result.count >= result.limit:
+        rate_limiter.block('login', identity, getattr(settings, 'LOGIN_BLOCK_SECONDS', 900))
+        logger.error(
+            f'Login for {username} from IP {ip_address} blocked due to excessive failed login attempts'
+        )
 
 
-def check_ip_blocked(request):
-    """Check if IP is blocked"""
-    ip_address = get_client_ip(request)
-    return cache.get(f'blocked_ip_{ip_address}', False)
+def check_login_blocked(request, username):
+    """Check if logins for username are blocked from this IP"""
+    return rate_limiter.is_blocked('login', login_identity(get_client_ip(request), username))
 
 
 # ==========================================
@@ -0,0 +1,64 @@
+"""
+Sessions
+Cached sessions whose expiry is only written back now and then.
+
+With SESSION_SAVE_EVERY_REQUEST every page view (and every badge poll)
+updated the session row just to push its expiry forward. Instead,
+SessionRefreshMiddleware re-saves an unmodified session once
+SESSION_REFRESH_FRACTION of its age has passed since it was last saved,
+and SessionStore reads sessions from the SESSION_CACHE_ALIAS cache,
+falling back to the database.
+
+Because a stored expiry can be up to that fraction stale, sessions of
+the default age are stored with the fraction added: with a 1 hour
+SESSION_COOKIE_AGE and a fraction of 0.1 an idle session ends 60 to 66
+minutes after its last request, never sooner.
+"""
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.middleware import SessionMiddleware
+
+# Session key holding when the session was last written (epoch seconds)
+SAVED_AT_KEY = '_saved_at'
+
+
+def refresh_fraction():
+    return getattr(settings, 'SESSION_REFRESH_FRACTION', 0.1)
+
+
+class SessionStore(CachedDBStore):
+    """cached_db sessions that record when they were last saved"""
+
+    def get_session_cookie_age(self):
+        age = settings.SESSION_COOKIE_AGE
+        return age + int(age * refresh_fraction())
+
+    def save(self, must_create=False):
+        self._get_session()[SAVED_AT_KEY] = int(time.time())
+        super().save(must_create)
+
+    def needs_refresh(self):
+        """Whether enough of the session's age has passed to re-save it"""
+        expiry = self.get('_session_expiry')
+        if isinstance(expiry, (datetime, str)):
+            # A fixed expiry date does not move
+            return False
+        saved_at = self.get(SAVED_AT_KEY)
+        if saved_at is None:
+            return True
+        age = expiry or settings.SESSION_COOKIE_AGE
+        return time.time() - saved_at >= age * refresh_fraction()
+
+
+class SessionRefreshMiddleware(SessionMiddleware):
+    """SessionMiddleware that extends idle sessions by coalesced saves"""
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if (session is not None and session.session_key and not session.modified
+                and hasattr(session, 'needs_refresh') and session.needs_refresh()):
+            session.modified = True
+        return super().process_response(request, response)
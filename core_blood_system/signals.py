@@ -1,13 +1,39 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import Donor, Recipient
+from .models import Donor, BloodRequest, BloodDonation, BloodInventory
+from .analytics import mark_analytics_dirty
+import logging
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=Donor)
 def notify_admin_new_donor(sender, instance, created, **kwargs):
     if created:
-        print(f"--- ADMIN NOTIFICATION: New Donor {instance.email} registered! ---")
+        logger.info(f"ADMIN NOTIFICATION: New Donor {instance.email} registered")
 
-@receiver(post_save, sender=Recipient)
-def notify_admin_new_recipient(sender, instance, created, **kwargs):
+@receiver(post_save, sender=BloodRequest)
+def notify_admin_new_request(sender, instance, created, **kwargs):
     if created:
-        print(f"--- ADMIN NOTIFICATION: New Request from {instance.hospital_name} ---")
\ No newline at end of file
+        logger.info(f"ADMIN NOTIFICATION: New Request from {instance.hospital_name}")
+
+@receiver(pre_delete, sender=BloodRequest)
+def release_request_units(sender, instance, **kwargs):
+    # Reserved units would otherwise stay out of stock with no request
+    from .unit_allocation import release_units
+    release_units(instance)
+
+
+# Analytics snapshot sections affected by each model
+ANALYTICS_SECTIONS = {
+    Donor: ['donors', 'donations'],
+    BloodRequest: ['requests'],
+    BloodDonation: ['donations'],
+    BloodInventory: ['inventory'],
+}
+
+@receiver(post_save)
+@receiver(post_delete)
+def mark_analytics_snapshot_dirty(sender, **kwargs):
+    sections = ANALYTICS_SECTIONS.get(sender)
+    if sections:
+        mark_analytics_dirty(*sections)
@@ -9,6 +9,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Numbers per provider request (Africa's Talking takes a recipient list)
+SMS_BATCH_SIZE = 100
+
+
+def appointment_reminder_sms_text(appointment):
+    """Reminder text; the same for every donor booked into one slot"""
+    return (
+        f"🩸 Reminder: Blood donation appointment tomorrow "
+        f"{appointment.appointment_date.strftime('%B %d, %Y')} at {appointment.get_time_slot_display()} "
+        f"at {appointment.location}. Thank you for saving lives! "
+        f"- Blood Bank"
+    )
+
 
 class SMSNotificationService:
     """Handle SMS notifications via Twilio or Africa's Talking"""
@@ -99,6 +112,52 @@ class SMSNotificationService:
             logger.error(f"Africa's Talking SMS failed to {to_number}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def send_sms_africas_talking_batch(numbers, message):
+        """Send one message to several numbers in a single Africa's Talking request"""
+        try:
+            import africastalking
+            
+            africastalking.initialize(
+                settings.AFRICAS_TALKING_USERNAME,
+                settings.AFRICAS_TALKING_API_KEY
+            )
+            response = africastalking.SMS.send(message, list(numbers))
+        except Exception as e:
+            logger.error(f"Africa's Talking batch SMS failed ({len(numbers)} numbers): {str(e)}")
+            return [{'success': False, 'error': str(e)} for _ in numbers]
+        
+        recipients = response.get('SMSMessageData', {}).get('Recipients', [])
+        by_number = {recipient.get('number'): recipient for recipient in recipients}
+        results = []
+        for i, number in enumerate(numbers):
+            recipient = by_number.get(number)
+            if recipient is None and len(recipients) == len(numbers):
+                # Numbers come back normalised; the order is kept
+                recipient = recipients[i]
+            if recipient is None:
+                results.append({'success': False, 'error': 'No recipient status in response'})
+                continue
+            status = recipient.get('status', '')
+            if 'Success' in status or 'Sent' in status:
+                results.append({'success': True, 'external_id': recipient.get('messageId', '')})
+            else:
+                results.append({'success': False, 'error': status})
+        return results
+    
+    @staticmethod
+    def send_provider_batch(numbers, message):
+        """Send one message to several numbers; returns a result dict per number"""
+        provider = SMSNotificationService.get_provider()
+        
+        if provider == 'africas_talking':
+            return SMSNotificationService.send_sms_africas_talking_batch(numbers, message)
+        if provider == 'twilio':
+            return [SMSNotificationService.send_sms_twilio(number, message) for number in numbers]
+        
+        logger.error(f"Unknown SMS provider: {provider}")
+        return [{'success': False, 'error': f'Unknown SMS provider: {provider}'} for _ in numbers]
+    
     @staticmethod
     def send_sms(user, notification_type, message):
         """
@@ -155,18 +214,10 @@ class SMSNotificationService:
             logger.warning(f"Cannot send reminder for appointment {appointment.id}: No user")
             return False
         
-        # Format message
-        message = (
-            f"🩸 Reminder: Blood donation appointment tomorrow "
-            f"{appointment.appointment_date.strftime('%B %d, %Y')} at {appointment.get_time_slot_display()} "
-            f"at {appointment.location}. Thank you for saving lives! "
-            f"- Blood Bank"
-        )
-        
         return SMSNotificationService.send_sms(
             appointment.user,
             'appointment_reminder',
-            message
+            appointment_reminder_sms_text(appointment)
         )
     
     @staticmethod
@@ -234,14 +285,90 @@ class SMSNotificationService:
     @staticmethod
     def send_bulk_sms(users, notification_type, message):
         """
-        Send SMS to multiple users
-        Returns count of successful sends
+        Send one SMS to multiple users
+        
+        Preferences are read in one query, numbers go to the provider
+        SMS_BATCH_SIZE at a time and NotificationLog rows are written with
+        bulk_create. Returns count of successful sends
         """
-        sent_count = 0
+        if not SMSNotificationService.is_configured():
+            logger.warning("SMS service not configured, skipping SMS notification")
+            return 0
         
-        for user in users:
-            if SMSNotificationService.send_sms(user, notification_type, message):
-                sent_count += 1
+        users = [user for user in users if user.phone_number]
+        prefs = {
+            pref.user_id: pref
+            for pref in NotificationPreference.objects.filter(user__in=[user.id for user in users])
+        }
+        users = [
+            user for user in users
+            if user.id not in prefs or 'sms' in prefs[user.id].get_enabled_channels(notification_type)
+        ]
+        
+        sent_count = 0
+        logs = []
+        try:
+            for i in range(0, len(users), SMS_BATCH_SIZE):
+                batch = users[i:i + SMS_BATCH_SIZE]
+                results = SMSNotificationService.send_provider_batch([user.phone_number for user in batch], message)
+                now = timezone.now()
+                for user, result in zip(batch, results):
+                    logs.append(NotificationLog(
+                        user=user,
+                        notification_type=notification_type,
+                        channel='sms',
+                        recipient=user.phone_number,
+                        message=message,
+                        status='sent' if result['success'] else 'failed',
+                        error_message=result.get('error', ''),
+                        external_id=result.get('external_id', ''),
+                        sent_at=now if result['success'] else None
+                    ))
+                    if result['success']:
+                        sent_count += 1
+        finally:
+            NotificationLog.objects.bulk_create(logs, batch_size=500)
         
         logger.info(f"Bulk SMS: Sent {sent_count}/{len(users)} messages for {notification_type}")
         return sent_count
+
+
+def send_urgent_blood_request_sms(blood_request, donors):
+    """
+    Send urgent blood request SMS to a list of matched donors
+    Returns count of successful sends
+    """
+    sent_count = 0
+    
+    for donor in donors:
+        if SMSNotificationService.send_urgent_blood_sms(donor, blood_request.blood_type, blood_request.urgency):
+            sent_count += 1
+    
+    return sent_count
+
+
+def send_donation_thank_you_sms(donation):
+    """Thank a donor by SMS after a completed donation"""
+    donor = donation.donor
+    if not donor.user:
+        return False
+    
+    message = (
+        f"🩸 Thank you {donor.first_name}! Your donation of {donation.blood_type} blood "
+        f"on {donation.donation_date.strftime('%B %d, %Y')} can save up to 3 lives. "
+        f"- Blood Bank"
+    )
+    return SMSNotificationService.send_sms(donor.user, 'donation_thank_you', message)
+
+
+def send_eligibility_notification_sms(donor, eligible_date):
+    """Tell a donor by SMS that they can donate again"""
+    if not donor.user:
+        return False
+    
+    message = (
+        f"🩸 Hi {donor.first_name}, you are eligible to donate blood again from "
+        f"{eligible_date.strftime('%B %d, %Y')}. Book an appointment today! "
+        f"- Blood Bank"
+    )
+    return SMSNotificationService.send_sms(donor.user, 'eligibility_reminder', message)
@@ -2,8 +2,7 @@
 Celery Tasks for Blood Management System
 Scheduled tasks for notifications and inventory management
 """
-from celery import shared_task
-from datetime import date, timedelta
+from celery import shared_task, chain, group
 from django.utils import timezone
 from django.conf import settings
 import logging
@@ -17,65 +16,199 @@ def send_appointment_reminders():
     Send reminders for appointments 24 hours away
     Runs daily at 9:00 AM
     """
-    from .models import DonationAppointment
-    from .email_notifications import EmailNotificationService
-    from .sms_notifications import SMSNotificationService
+    from .reminder_pipeline import run_appointment_reminders
     
-    tomorrow = date.today() + timedelta(days=1)
-    
-    # Get appointments for tomorrow that haven't had reminders sent
-    appointments = DonationAppointment.objects.filter(
-        appointment_date=tomorrow,
-        status='scheduled',
-        reminder_sent=False
+    run = run_appointment_reminders()
+    result = (
+        f"Sent {run.reminded} appointment reminders in {run.chunks_done} chunks "
+        f"({run.email_sent} emails, {run.sms_sent} SMS)"
     )
+    logger.info(result)
+    return result
+
+
+def enqueue_matching_pipeline(job_id):
+    """
+    Queue match -> persist -> notification fan-out for a MatchingJob
+    Raises straight away if the broker is unreachable
+    """
+    job_id = str(job_id)
+    return chain(
+        match_blood_request.s(job_id),
+        fan_out_match_notifications.s(job_id),
+    ).apply_async(retry=False)
+
+
+@shared_task
+def match_blood_request(job_id):
+    """Match donors for a job and persist MatchedDonor rows in bulk"""
+    from .matching_pipeline import match_and_persist, mark_job_failed
+    
+    try:
+        return match_and_persist(job_id)
+    except Exception as e:
+        logger.error(f"Matching job {job_id} failed: {str(e)}")
+        mark_job_failed(job_id, e)
+        raise
+
+
+@shared_task
+def fan_out_match_notifications(batches, job_id):
+    """Start one notification task per donor batch"""
+    if batches:
+        group(notify_match_batch.s(job_id, donor_ids) for donor_ids in batches).apply_async()
+    return len(batches)
+
+
+@shared_task
+def notify_match_batch(job_id, donor_ids):
+    """Send email/SMS notifications for one batch of matched donors"""
+    from .matching_pipeline import notify_batch, mark_job_failed
+    
+    try:
+        notify_batch(job_id, donor_ids)
+    except Exception as e:
+        logger.error(f"Notification batch for matching job {job_id} failed: {str(e)}")
+        mark_job_failed(job_id, e)
+        raise
+    return len(donor_ids)
+
+
+@shared_task
+def mark_expired_units():
+    """
+    Expire available blood units past their expiration date in chunks
+    Safe to overlap with the mark_expired_units command
+    Runs every 5 minutes
+    """
+    from .inventory_manager import InventoryManager
     
-    sent_count = 0
-    email_count = 0
-    sms_count = 0
+    try:
+        expired = InventoryManager.sweep_expired_units()
+        alerted = InventoryManager.send_low_stock_alerts(expired.keys()) if expired else []
+        result = f"Marked {sum(expired.values())} blood units as expired ({len(alerted)} low stock alerts)"
+        logger.info(result)
+        return result
+    except Exception as e:
+        logger.error(f"Failed to mark expired units: {str(e)}")
+        return f"Error: {str(e)}"
+
+
+@shared_task
+def reconcile_inventory():
+    """
+    Repair drift between inventory counters and available blood units
+    Runs hourly
+    """
+    from .inventory_manager import InventoryLedger
     
-    for appointment in appointments:
-        try:
-            # Send email reminder
-            if EmailNotificationService.send_appointment_reminder(appointment):
-                email_count += 1
-            
-            # Send SMS reminder
-            if SMSNotificationService.send_appointment_reminder(appointment):
-                sms_count += 1
-            
-            # Mark reminder as sent
-            appointment.reminder_sent = True
-            appointment.save()
-            sent_count += 1
-            
-        except Exception as e:
-            logger.error(f"Failed to send reminder for appointment {appointment.id}: {str(e)}")
+    drift = InventoryLedger.reconcile()
+    result = f"Reconciled inventory ({len(drift)} blood types repaired)"
+    logger.info(result)
+    return result
+
+
+@shared_task
+def update_demand_forecasts():
+    """
+    Fold yesterday's demand and supply into the cached forecasts
+    Runs daily at 1:00 AM
+    """
+    from .demand_forecast import update_forecasts
     
-    result = f"Sent {sent_count} appointment reminders ({email_count} emails, {sms_count} SMS)"
+    forecasts = update_forecasts()
+    result = f"Updated demand forecasts for {len(forecasts)} blood types"
     logger.info(result)
     return result
 
 
 @shared_task
-def mark_expired_units():
+def refresh_inventory_simulation():
+    """
+    Rerun the six-week shortage and wastage simulation for the dashboard
+    Runs every 30 minutes
+    """
+    from .inventory_simulator import refresh_inventory_simulation as refresh
+    
+    data = refresh()
+    result = f"Simulated {data['trials']} inventory trajectories in {data['runtime_ms']} ms"
+    logger.info(result)
+    return result
+
+
+@shared_task
+def reconcile_notification_counts():
+    """
+    Repair drift between unread notification counters and notifications
+    Runs daily
+    """
+    from .enhancements import reconcile_unread_counts
+    
+    drift = reconcile_unread_counts()
+    result = f"Reconciled unread notification counters ({len(drift)} users repaired)"
+    logger.info(result)
+    return result
+
+
+@shared_task
+def optimize_search_indexes():
+    """
+    Merge the full-text search index segments left by the day's writes
+    Runs daily
+    """
+    from .search_index import rebuild_search_indexes
+    
+    tables = rebuild_search_indexes('optimize')
+    result = f"Optimized {len(tables)} search indexes"
+    logger.info(result)
+    return result
+
+
+@shared_task
+def rebuild_analytics_snapshot():
+    """
+    Recompute every analytics snapshot section
+    Runs every 15 minutes
+    """
+    from .analytics import rebuild_analytics_snapshot as rebuild
+    
+    rebuild()
+    logger.info("Rebuilt analytics snapshot")
+    return "Rebuilt analytics snapshot"
+
+
+@shared_task
+def generate_pdf_report(job_id):
+    """Render a queued PDF report into MEDIA_ROOT"""
+    from .pdf_reports import run_report_job
+    
+    return run_report_job(job_id)
+
+
+@shared_task
+def prerender_certificates(donation_ids):
+    """Render certificates for newly approved donations into the render cache"""
+    from .models import BloodDonation
+    from .certificates import prerender_certificates as prerender
+    
+    count = prerender(
+        BloodDonation.objects.filter(id__in=donation_ids, status='approved').select_related('donor')
+    )
+    return f"Pre-rendered {count} certificates"
+
+
+@shared_task
+def purge_old_reports():
     """
-    Mark expired blood units daily
-    Runs daily at midnight
+    Delete generated reports past the retention period
+    Runs daily at 3:00 AM
     """
-    # Disabled - requires InventoryManager enhancement
-    logger.info("mark_expired_units task disabled - enhancement not deployed")
-    return "Task disabled"
-    # from .inventory_manager import InventoryManager
-    # 
-    # try:
-    #     expired_count = InventoryManager.mark_expired_units()
-    #     result = f"Marked {expired_count} blood units as expired"
-    #     logger.info(result)
-    #     return result
-    # except Exception as e:
-    #     logger.error(f"Failed to mark expired units: {str(e)}")
-    #     return f"Error: {str(e)}"
+    from .pdf_reports import purge_old_reports as purge
+    
+    purged = purge()
+    result = f"Purged {purged} old reports"
+    logger.info(result)
+    return result
 
 
 @shared_task
@@ -85,37 +218,13 @@ def check_low_stock():
     Respects 24-hour notification limit
     Runs daily at 8:00 AM
     """
-    # Disabled - requires enhanced BloodInventory model fields
-    logger.info("check_low_stock task disabled - enhancement not deployed")
-    return "Task disabled"
-    # from .models import BloodInventory, CustomUser
-    # from .email_notifications import EmailNotificationService
-    # 
-    # try:
-    #     low_stock_items = []
-    #     
-    #     # Check all inventory items
-    #     for inventory in BloodInventory.objects.all():
-    #         status = inventory.get_status()
-    #         
-    #         # Check if stock is low or critical
-    #         if status in ['low', 'critical']:
-    #             # Check if we haven't sent an alert in the last 24 hours
-    #             if not inventory.alert_sent_at or (timezone.now() - inventory.alert_sent_at).total_seconds() >= 86400:
-    #                 low_stock_items.append(inventory)
-    #     
-    #     # Send alerts for low stock items
-    #     alert_count = 0
-    #     for inventory in low_stock_items:
-    #         if EmailNotificationService.send_low_stock_alert(inventory):
-    #             inventory.alert_sent_at = timezone.now()
-    #             inventory.save()
-    #             alert_count += 1
-    #     
-    #     result = f"Sent {alert_count} low stock alerts for {len(low_stock_items)} blood types"
-    #     logger.info(result)
-    #     return result
-    #     
-    # except Exception as e:
-    #     logger.error(f"Failed to check low stock: {str(e)}")
-    #     return f"Error: {str(e)}"
+    from .inventory_manager import InventoryManager
+    
+    try:
+        alerted = InventoryManager.send_low_stock_alerts()
+        result = f"Sent {len(alerted)} low stock alerts"
+        logger.info(result)
+        return result
+    except Exception as e:
+        logger.error(f"Failed to check low stock: {str(e)}")
+        return f"Error: {str(e)}"
@@ -1,7 +1,72 @@
-from django.test import TestCase
-from django.template import Template, Context, TemplateSyntaxError
-from django.template.loader import get_template
+import csv
+import io
+import multiprocessing
 import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template, TemplateSyntaxError
+from django.template.loader import get_template
+from django.test import override_settings, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from . import (
+    analytics, certificates, eligibility_engine as engine, email_notifications, matching_pipeline,
+    notification_events, pagination, rate_limiter, render_cache, search_index, utils, views_reports,
+)
+from .dashboard_stats import donor_statistics, request_statistics, user_statistics
+from .demand_forecast import BLOOD_TYPE_INDEX, daily_series, update_forecasts
+from .donor_matching import (
+    backfill_next_eligible_dates, check_donor_eligibility, eligible_donor_filter, find_matching_donors,
+)
+from .eligibility_checker import EligibilityChecker
+from .eligibility_engine import evaluate_queryset
+from .email_notifications import EmailNotificationService
+from .enhancements import (
+    adjust_unread_count, book_appointment_slot, create_notification, generate_qr_code,
+    get_available_time_slots, get_month_availability, move_appointment, reconcile_slot_bookings,
+    reconcile_unread_counts, set_appointment_status, SlotUnavailable,
+)
+from .inventory_manager import InventoryLedger, InventoryManager
+from .inventory_simulator import get_inventory_simulation, issue_units, simulate_batch, SIMULATION_MAX_AGE
+from .log_buffer import BufferedLogWriter
+from .models import (
+    AnalyticsSnapshot, AppointmentSlot, BloodDonation, BloodInventory, BloodRequest, BloodUnit, CustomUser,
+    DemandForecast, DonationAppointment, Donor, MatchedDonor, MatchingJob, Notification, NotificationLog,
+    NotificationPreference, QRCode, ReminderRun, ReportJob,
+)
+from .notification_events import _new_notifications, notification_stream_app
+from .pagination import keyset_paginate
+from .pdf_reports import run_report_job
+from .rate_limiter import view_rate
+from .reminder_pipeline import mark_stale_runs_interrupted, run_appointment_reminders
+from .render_cache import evict_render_cache
+from .search_index import full_text_search
+from .sms_notifications import SMSNotificationService
+from .unit_allocation import allocate_units, InsufficientUnits, sync_request_allocation
+
+
+def make_donor(email, **fields):
+    """An available 30-year-old O+ donor in Nairobi, with `fields` overriding the defaults"""
+    defaults = dict(
+        first_name='Test', last_name='Donor', email=email, phone_number='0700000000',
+        blood_type='O+', date_of_birth=date.today() - timedelta(days=30 * 365),
+        address='Address', city='Nairobi', state='Nairobi',
+    )
+    defaults.update(fields)
+    return Donor.objects.create(**defaults)
 
 
 class TemplateSyntaxBugConditionTest(TestCase):
@@ -100,3 +165,1472 @@ class TemplateSyntaxBugConditionTest(TestCase):
             self.fail(f"TemplateSyntaxError encountered during rendering: {str(e)}. "
                      f"This confirms the bug exists. The malformed tag on line 611 "
                      f"prevents the template from rendering.")
+
+
+class DonorMatchingTest(TestCase):
+    """Set-based donor matching returns the same contract as the old loop"""
+
+    def setUp(self):
+        self.today = date.today()
+        requester = CustomUser.objects.create(username='requester')
+        self.blood_request = BloodRequest.objects.create(
+            requester=requester,
+            patient_name='Patient',
+            blood_type='A+',
+            units_needed=1,
+            purpose='surgery',
+            hospital_name='Kenyatta Hospital',
+            hospital_address='Hospital Road, Nairobi, Nairobi',
+            contact_number='0700000000',
+            required_date=self.today,
+        )
+
+    def _donor(self, email, **fields):
+        return make_donor(email, **{'blood_type': 'A+', 'city': 'Mombasa', 'state': 'Mombasa', **fields})
+
+    def test_eligibility_and_ranking_run_in_database(self):
+        local = self._donor('local@example.com', city='Nairobi', state='Nairobi')
+        exact = self._donor('exact@example.com')
+        compatible = self._donor('compatible@example.com', blood_type='O-', city='Nairobi', state='Nairobi')
+        self._donor('recent@example.com', last_donation_date=self.today - timedelta(days=10))
+        self._donor('unavailable@example.com', is_available=False)
+        self._donor('minor@example.com', date_of_birth=self.today - timedelta(days=16 * 365))
+        self._donor('incompatible@example.com', blood_type='B+')
+
+        with self.assertNumQueries(2):
+            result = find_matching_donors(self.blood_request)
+
+        self.assertEqual(result['eligible_donors'], [local, exact, compatible])
+        self.assertEqual(result['eligible_count'], 3)
+        self.assertEqual(result['ineligible_count'], 3)
+
+    def test_radius_search_uses_geocoded_locations(self):
+        self.assertIsNotNone(self.blood_request.hospital_latitude)
+        nearby = self._donor('nearby@example.com', city='Ruiru', state='Kiambu')
+        local = self._donor('local@example.com', city='Nairobi', state='Nairobi', blood_type='O+')
+        self._donor('far@example.com')  # Mombasa, ~440 km away
+        self._donor('unknown@example.com', city='Nowhere', state='Nowhere')
+
+        result = find_matching_donors(self.blood_request, radius_km=50)
+
+        # Exact blood type first, then other compatible types, nearest first
+        self.assertEqual(result['eligible_donors'], [nearby, local])
+        self.assertLess(result['eligible_donors'][0].distance_km, 50)
+        self.assertAlmostEqual(result['eligible_donors'][1].distance_km, 0, places=3)
+
+
+class MatchingPipelineTest(TestCase):
+    """Blood request creation queues matching instead of notifying inline"""
+
+    def setUp(self):
+        self.requester = CustomUser.objects.create_user(username='requester', password='pass12345')
+        donor_user = CustomUser.objects.create_user(username='donor', password='pass12345')
+        for i in range(3):
+            Donor.objects.create(
+                user=donor_user if i == 0 else None,
+                first_name='Test', last_name='Donor', email=f'donor{i}@example.com',
+                phone_number='0700000000', blood_type='O-',
+                date_of_birth=date.today() - timedelta(days=30 * 365),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+
+    def _post_request(self):
+        self.client.login(username='requester', password='pass12345')
+        return self.client.post('/request-blood/', {
+            'patient_name': 'Patient', 'blood_type': 'O-', 'units_needed': 2,
+            'purpose': 'surgery', 'urgency': 'critical', 'hospital_name': 'Kenyatta Hospital',
+            'hospital_address': 'Hospital Road, Nairobi', 'contact_number': '0700000000',
+            'required_date': date.today().isoformat(),
+        }, HTTP_ACCEPT='application/json')
+
+    def test_request_returns_job_and_pipeline_notifies_in_batches(self):
+        response = self._post_request()
+        self.assertEqual(response.status_code, 202)
+        job = MatchingJob.objects.get(job_id=response.json()['job_id'])
+        self.assertEqual(job.status, 'queued')
+        self.assertFalse(MatchedDonor.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+        with mock.patch.object(matching_pipeline, 'NOTIFICATION_BATCH_SIZE', 2):
+            self.assertTrue(matching_pipeline.run_matching_job(job.job_id))
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['progress'], 100)
+        self.assertEqual(status['matched_count'], 3)
+        self.assertEqual(status['batch_count'], 2)
+        self.assertEqual(status['email_sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(MatchedDonor.objects.filter(status='notified').count(), 3)
+        self.assertEqual(Notification.objects.filter(notification_type='match').count(), 1)
+
+        # A job only ever runs once
+        matching_pipeline.run_matching_job(job.job_id)
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class BulkEmailDispatchTest(TestCase):
+    """Bulk notifications use a fixed number of queries and one connection"""
+
+    def test_urgent_notification_prefetches_preferences_and_bulk_logs(self):
+        for i, name in enumerate(['Amani', 'Baraka', "O'Neil"]):
+            user = CustomUser.objects.create(username=f'donor{i}', email=f'donor{i}@example.com')
+            Donor.objects.create(
+                user=user, first_name=name, last_name='Donor', email=user.email,
+                phone_number='0700000000', blood_type='O-',
+                date_of_birth=date.today() - timedelta(days=30 * 365),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+            if i == 1:
+                NotificationPreference.objects.create(user=user, urgent_blood_email=False)
+        donors = list(Donor.objects.select_related('user').order_by('id'))
+
+        with self.assertNumQueries(2):
+            sent = EmailNotificationService.send_urgent_blood_notification(donors, 'O-', 'critical')
+
+        self.assertEqual(sent, 2)
+        self.assertEqual([m.to for m in mail.outbox], [['donor0@example.com'], ['donor2@example.com']])
+        self.assertIn('Dear Amani Donor', mail.outbox[0].body)
+        self.assertIn('Dear O&#x27;Neil Donor', mail.outbox[1].alternatives[0][0])
+        self.assertEqual(NotificationLog.objects.filter(status='sent').count(), 2)
+
+
+class InventoryLedgerTest(TestCase):
+    """Inventory counters follow blood unit transitions without recounting"""
+
+    def _unit(self, number, blood_type='O-', days_left=30, **kwargs):
+        return BloodUnit.objects.create(
+            blood_type=blood_type, unit_number=number,
+            donation_date=date.today() - timedelta(days=42 - days_left),
+            expiration_date=date.today() + timedelta(days=days_left),
+            **kwargs
+        )
+
+    def _units_available(self, blood_type='O-'):
+        return BloodInventory.objects.get(blood_type=blood_type).units_available
+
+    def test_transitions_apply_deltas(self):
+        self._unit('U1')
+        self._unit('U2')
+        self._unit('U3', days_left=-1)
+        self._unit('U4', blood_type='A+', status='reserved')
+        self.assertEqual(self._units_available(), 3)
+
+        self.assertFalse(InventoryManager.use_blood_unit('missing'))
+        self.assertTrue(InventoryManager.use_blood_unit('U1'))
+        self.assertFalse(InventoryManager.use_blood_unit('U1'))
+        self.assertEqual(InventoryManager.mark_expired_units(), 1)
+        self.assertEqual(self._units_available(), 1)
+
+        unit = BloodUnit.objects.get(unit_number='U4')
+        unit.status = 'available'
+        unit.save()
+        self.assertEqual(self._units_available('A+'), 1)
+
+        unit.delete()
+        self.assertEqual(self._units_available('A+'), 0)
+
+    def test_approval_is_applied_once(self):
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        donor = Donor.objects.create(
+            first_name='Test', last_name='Donor', email='donor@example.com',
+            phone_number='0700000000', blood_type='O-',
+            date_of_birth=date.today() - timedelta(days=30 * 365),
+            address='Address', city='Nairobi', state='Nairobi',
+        )
+        donation = BloodDonation.objects.create(
+            donor=donor, donation_date=date.today(), units_donated=2,
+            blood_type='O-', hospital_name='Hospital',
+        )
+
+        self.client.login(username='admin', password='pass12345')
+        with mock.patch.object(InventoryManager, 'send_low_stock_alerts') as alerts, \
+                mock.patch('core_blood_system.views.dispatch_certificate_prerender'):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.get(f'/donation/approve/{donation.id}/')
+            alerts.assert_not_called()
+            for callback in callbacks:
+                callback()
+            alerts.assert_called_once_with(['O-'])
+        self.client.get(f'/donation/approve/{donation.id}/')
+
+        self.assertEqual(self._units_available(), 2)
+        self.assertEqual(donation.blood_units.count(), 2)
+
+    def test_reconcile_repairs_drift(self):
+        self._unit('U1')
+        BloodInventory.objects.filter(blood_type='O-').update(units_available=7)
+
+        self.assertEqual(InventoryLedger.reconcile(repair=False), {'O-': (7, 1)})
+        self.assertEqual(self._units_available(), 7)
+        self.assertEqual(InventoryLedger.reconcile(), {'O-': (7, 1)})
+        self.assertEqual(self._units_available(), 1)
+        self.assertEqual(InventoryLedger.reconcile(), {})
+
+
+class AnalyticsSnapshotTest(TestCase):
+    """Dashboards read a materialized snapshot refreshed after writes"""
+
+    def test_snapshot_is_one_read_and_refreshes_dirty_sections(self):
+        make_donor('first@example.com', blood_type='O-')
+        self.assertEqual(analytics.get_dashboard_analytics()['total_donors'], 1)
+
+        with self.assertNumQueries(1):
+            data = analytics.get_dashboard_analytics()
+        self.assertEqual(data['total_donors'], 1)
+
+        # Within the staleness bound the previous figures are served
+        make_donor('second@example.com', blood_type='O-')
+        with self.assertNumQueries(1):
+            self.assertEqual(analytics.get_dashboard_analytics()['total_donors'], 1)
+
+        with mock.patch.object(analytics, 'SNAPSHOT_STALENESS', -1):
+            self.assertEqual(analytics.get_dashboard_analytics()['total_donors'], 2)
+
+    def test_approving_a_donation_marks_donations_dirty(self):
+        donation = BloodDonation.objects.create(
+            donor=make_donor('first@example.com', blood_type='O-'), donation_date=date.today(), units_donated=2,
+            blood_type='O-', hospital_name='Hospital',
+        )
+        self.assertEqual(analytics.get_dashboard_analytics()['total_units_donated'], 0)
+
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        self.client.get(f'/donation/approve/{donation.id}/')
+
+        with mock.patch.object(analytics, 'SNAPSHOT_STALENESS', -1):
+            self.assertEqual(analytics.get_dashboard_analytics()['total_units_donated'], 2)
+
+    def test_chart_endpoint_serves_snapshot(self):
+        make_donor('first@example.com', blood_type='O-')
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+
+        response = self.client.get('/analytics/chart-data/?type=blood_type_distribution')
+        self.assertEqual(response.json()['data'], [{'blood_type': 'O-', 'count': 1}])
+        self.assertEqual(self.client.get('/analytics/chart-data/?type=bogus').status_code, 400)
+        self.assertEqual(self.client.get('/analytics/').status_code, 200)
+
+
+class DashboardStatisticsTest(TestCase):
+    """Dashboard breakdowns come from a single aggregate query"""
+
+    def _request(self, requester, status, **kwargs):
+        return BloodRequest.objects.create(
+            requester=requester, patient_name='Patient', blood_type='A+',
+            units_needed=1, purpose='surgery', urgency='critical',
+            hospital_name='Hospital', hospital_address='Nairobi',
+            contact_number='0700000000', required_date=date.today(),
+            status=status, **kwargs
+        )
+
+    def test_request_statistics_in_one_query(self):
+        user = CustomUser.objects.create_user(username='requester', password='pass12345')
+        self._request(user, 'pending')
+        now = timezone.now()
+        for days in (1, 3):
+            blood_request = self._request(user, 'fulfilled')
+            BloodRequest.objects.filter(pk=blood_request.pk).update(
+                created_at=now - timedelta(days=days), fulfilled_date=now
+            )
+
+        with self.assertNumQueries(1):
+            stats = request_statistics()
+
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['pending'], 1)
+        self.assertEqual(stats['critical_pending'], 1)
+        self.assertEqual(stats['fulfilled'], 2)
+        self.assertEqual(stats['avg_fulfillment_days'], 2.0)
+
+    def test_user_list_statistics_in_one_query(self):
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        CustomUser.objects.create_user(username='member', password='pass12345', role='user')
+
+        with self.assertNumQueries(1):
+            stats = user_statistics()
+
+        self.assertEqual((stats['total'], stats['admins'], stats['users']), (2, 1, 1))
+
+
+class StreamingExportTest(TestCase):
+    """Donor exports stream as CSV or a write-only workbook"""
+
+    def setUp(self):
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        for i in range(3):
+            Donor.objects.create(
+                first_name=f'Donor{i}', last_name='Test', email=f'donor{i}@example.com',
+                phone_number='0700000000', blood_type='O+',
+                date_of_birth=date.today() - timedelta(days=30 * 365),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+
+    def test_csv_export_streams_rows(self):
+        response = self.client.get('/export/donors/excel/?format=csv')
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+
+        self.assertEqual(rows[0][:3], ['#', 'First Name', 'Last Name'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][-2:], ['Yes', 'Never'])
+
+    def test_excel_export_is_valid_workbook(self):
+        response = self.client.get('/export/donors/excel/')
+        self.assertTrue(response.streaming)
+        ws = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+
+        self.assertEqual(ws.max_row, 4)
+        self.assertEqual(ws['C2'].value, 'Test')
+        self.assertTrue(ws['A1'].font.bold)
+
+    def test_formula_text_is_quoted(self):
+        Donor.objects.update(first_name='=HYPERLINK("x")', city='@SUM(A1)')
+
+        response = self.client.get('/export/donors/excel/?format=csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[1][1], '\'=HYPERLINK("x")')
+        self.assertEqual(rows[1][6], "'@SUM(A1)")
+
+        response = self.client.get('/export/donors/excel/')
+        ws = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(ws['B2'].value, '\'=HYPERLINK("x")')
+        self.assertEqual(ws['B2'].data_type, 's')
+
+
+class PdfReportTest(TestCase):
+    """PDF reports render page by page; large ones run as a background job"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        for i in range(40):
+            Donor.objects.create(
+                first_name=f'Donor{i}', last_name='Test', email=f'donor{i}@example.com',
+                phone_number='0700000000', blood_type='O+',
+                date_of_birth=date.today() - timedelta(days=30 * 365),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+
+    def test_small_report_renders_paged_pdf(self):
+        response = self.client.get('/export/donors/pdf/')
+        content = b''.join(response.streaming_content)
+
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIn(b'/Count 2', content)
+
+    def test_large_report_is_generated_in_background(self):
+        with mock.patch.object(views_reports, 'PDF_SYNC_ROW_LIMIT', 10):
+            response = self.client.get('/export/donors/pdf/')
+
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, f'/reports/{job.job_id}/')
+        self.assertEqual(job.status, 'queued')
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            self.assertTrue(run_report_job(job.job_id))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.row_count), ('completed', 40))
+
+            status = self.client.get(f'/reports/{job.job_id}/', HTTP_ACCEPT='application/json').json()
+            download = self.client.get(status['download_url'])
+            self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
+            download.close()
+
+
+class RenderCacheTest(TestCase):
+    """Certificates and QR images are rendered once per set of inputs"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root.name)
+        self.settings_override.enable()
+
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        self.donor = Donor.objects.create(
+            first_name='Jane', last_name='Donor', email='jane@example.com',
+            phone_number='0700000000', blood_type='O+',
+            date_of_birth=date.today() - timedelta(days=30 * 365),
+            address='Address', city='Nairobi', state='Nairobi',
+        )
+        self.donation = BloodDonation.objects.create(
+            donor=self.donor, donation_date=date.today(), units_donated=1,
+            blood_type='O+', hospital_name='Kenyatta Hospital',
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def test_certificate_is_rendered_once(self):
+        with mock.patch.object(certificates, 'render_certificate', wraps=certificates.render_certificate) as render:
+            for _ in range(2):
+                response = self.client.get(f'/certificate/download/{self.donation.id}/')
+                self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+                response.close()
+            self.assertEqual(render.call_count, 1)
+
+            # Any change to the drawn inputs is a new cache entry
+            self.donation.units_donated = 2
+            certificates.certificate_path(self.donation)
+            self.assertEqual(render.call_count, 2)
+
+    def test_certificate_evicted_before_open_is_rendered_again(self):
+        get_or_render = render_cache.get_or_render
+
+        def evicted(*args):
+            path = get_or_render(*args)
+            path.unlink()
+            return path
+
+        with mock.patch.object(render_cache, 'get_or_render', side_effect=evicted):
+            response = self.client.get(f'/certificate/download/{self.donation.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        response.close()
+
+    def test_approval_prerenders_certificate(self):
+        with mock.patch.object(certificates, 'render_certificate', wraps=certificates.render_certificate) as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(f'/donation/approve/{self.donation.id}/')
+            self.assertEqual(render.call_count, 1)
+
+            self.donation.refresh_from_db()
+            self.assertTrue(certificates.certificate_path(self.donation).exists())
+            self.assertEqual(render.call_count, 1)
+
+    def test_qr_code_is_reused_and_cache_evicts(self):
+        first = generate_qr_code('donor', self.donor, {'donor_id': self.donor.id})
+        second = generate_qr_code('donor', self.donor, {'donor_id': self.donor.id})
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(QRCode.objects.count(), 1)
+        self.assertTrue(first.qr_image)
+
+        self.assertEqual(evict_render_cache(max_bytes=0), 1)
+
+
+class NotificationStreamTest(TestCase):
+    """Badge updates are pushed over SSE; polling answers 304 when unchanged"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='reader', password='pass12345')
+        self.client.login(username='reader', password='pass12345')
+
+    def test_unread_count_poll_uses_etag(self):
+        response = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.json()['count'], 0)
+        etag = response['ETag']
+
+        response = self.client.get('/api/notifications/unread-count/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        create_notification(self.user, 'system', 'Hello', 'World')
+        response = self.client.get('/api/notifications/unread-count/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_stream_is_not_served_under_wsgi(self):
+        self.assertEqual(self.client.get('/api/notifications/stream/').status_code, 204)
+
+    def test_stream_pushes_published_notifications(self):
+        notification = Notification.objects.create(user=self.user, title='Match', message='Blood needed')
+        counts = iter([0, 1])
+
+        async def consume():
+            stream = notification_events.notification_stream(self.user.id, heartbeat=5)
+            frames = [await stream.__anext__()]
+            notification_events.publish_notifications([notification])
+            frames.append(await stream.__anext__())
+            frames.append(await stream.__anext__())
+            await stream.aclose()
+            return frames
+
+        with mock.patch.object(notification_events, 'unread_count', lambda user_id: next(counts)), \
+                mock.patch.object(notification_events, 'recent_notification_ids', lambda user_id: (0, set())), \
+                mock.patch.object(notification_events, 'ensure_watcher'):
+            frames = async_to_sync(consume)()
+
+        self.assertEqual(frames[0], 'event: unread\ndata: {"count": 0}\n\n')
+        self.assertTrue(frames[1].startswith('event: notification\n'))
+        self.assertIn('"title": "Match"', frames[1])
+        self.assertEqual(frames[2], 'event: unread\ndata: {"count": 1}\n\n')
+        self.assertEqual(notification_events.broker.connection_count(), 0)
+
+    def test_stream_sends_late_ids_once_and_refreshes_count_on_repeats(self):
+        first = Notification.objects.create(user=self.user, title='First', message='Earlier id')
+        second = Notification.objects.create(user=self.user, title='Second', message='Later id')
+        counts = iter([0, 1, 2, 1])
+
+        async def consume():
+            stream = notification_events.notification_stream(self.user.id, heartbeat=5)
+            frames = [await stream.__anext__()]
+            # The higher id arrives first, then the lower one, then a repeat
+            for notification in (second, first, second):
+                notification_events.publish_notifications([notification])
+            for _ in range(5):
+                frames.append(await stream.__anext__())
+            await stream.aclose()
+            return frames
+
+        with mock.patch.object(notification_events, 'unread_count', lambda user_id: next(counts)), \
+                mock.patch.object(notification_events, 'recent_notification_ids', lambda user_id: (0, set())), \
+                mock.patch.object(notification_events, 'ensure_watcher'):
+            frames = async_to_sync(consume)()
+
+        self.assertIn('"title": "Second"', frames[1])
+        self.assertEqual(frames[2], 'event: unread\ndata: {"count": 1}\n\n')
+        self.assertIn('"title": "First"', frames[3])
+        self.assertEqual(frames[4], 'event: unread\ndata: {"count": 2}\n\n')
+        self.assertEqual(frames[5], 'event: unread\ndata: {"count": 1}\n\n')
+
+    def test_watcher_rescans_below_its_watermark(self):
+        first = Notification.objects.create(user=self.user, title='First', message='Committed late')
+        second = Notification.objects.create(user=self.user, title='Second', message='Committed first')
+
+        # The watcher saw the higher id before the lower one committed
+        watermark, seen, notifications = _new_notifications(second.id, {second.id})
+        self.assertEqual((watermark, notifications), (second.id, [first]))
+        self.assertEqual(_new_notifications(watermark, seen)[2], [])
+
+    def test_stream_app_rejects_anonymous_clients(self):
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'path': '/api/notifications/stream/', 'headers': []}
+        async_to_sync(notification_stream_app)(scope, receive, send)
+        self.assertEqual(sent[0]['status'], 401)
+
+
+class UnreadCounterTest(TestCase):
+    """The unread badge count is a counter kept on the user row"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='reader', password='pass12345')
+        self.client.login(username='reader', password='pass12345')
+
+    def unread(self):
+        self.user.refresh_from_db()
+        return self.user.unread_notifications
+
+    def test_counter_follows_notification_writes(self):
+        first = create_notification(self.user, 'system', 'One', 'First')
+        second = create_notification(self.user, 'system', 'Two', 'Second')
+        create_notification(self.user, 'system', 'Three', 'Third')
+        self.assertEqual(self.unread(), 3)
+
+        self.client.get(f'/notifications/mark-read/{first.id}/')
+        self.client.get(f'/notifications/mark-read/{first.id}/')
+        self.assertEqual(self.unread(), 2)
+
+        self.client.get(f'/notifications/delete/{first.id}/')
+        self.assertEqual(self.unread(), 2)
+        self.client.get(f'/notifications/delete/{second.id}/')
+        self.assertEqual(self.unread(), 1)
+
+        self.client.get('/notifications/mark-all-read/')
+        self.assertEqual(self.unread(), 0)
+
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.json()['count'], 0)
+        self.assertFalse([q for q in queries if 'notification"' in q['sql']])
+
+    def test_reconcile_repairs_drift(self):
+        create_notification(self.user, 'system', 'One', 'First')
+        Notification.objects.create(user=self.user, notification_type='system', title='Raw', message='Raw')
+        CustomUser.objects.filter(pk=self.user.pk).update(unread_notifications=7)
+
+        self.assertEqual(reconcile_unread_counts(repair=False), {self.user.pk: (7, 2)})
+        self.assertEqual(self.unread(), 7)
+        reconcile_unread_counts()
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(reconcile_unread_counts(), {})
+
+    def test_decrement_stops_at_zero(self):
+        adjust_unread_count([self.user.pk], 2)
+        adjust_unread_count([self.user.pk], -3)
+        self.assertEqual(self.unread(), 0)
+        adjust_unread_count([self.user.pk], -1)
+        self.assertEqual(self.unread(), 0)
+
+
+class FullTextSearchTest(TestCase):
+    """Search goes through the maintained full-text index"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+
+        def donor(first, last, phone, city='Nairobi'):
+            return Donor.objects.create(
+                first_name=first, last_name=last, email=f'{first}.{last}@example.com'.lower(),
+                phone_number=phone, blood_type='O+', date_of_birth=date(1990, 1, 1),
+                address='Address', city=city, state='Nairobi',
+            )
+
+        self.jane = donor('Jane', 'Wanjiru', '0711000001')
+        self.john = donor('John', 'Kamau', '0722000002', city='Mombasa')
+        self.janet = donor('Janet', 'Otieno', '0733000003')
+
+    def search(self, text):
+        return list(full_text_search(Donor.objects.all(), text))
+
+    def test_prefix_terms_must_all_match(self):
+        self.assertEqual(self.search('jan wan'), [self.jane])
+        self.assertEqual(set(self.search('JAN')), {self.jane, self.janet})
+        self.assertEqual(self.search('0722'), [self.john])
+        self.assertEqual(self.search('mombasa'), [self.john])
+        self.assertEqual(self.search('!!'), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.jane.last_name = 'Achieng'
+        self.jane.email = 'jane.achieng@example.com'
+        self.jane.save()
+        self.assertEqual(self.search('wanjiru'), [])
+        self.assertEqual(self.search('achi'), [self.jane])
+
+        Donor.objects.filter(pk=self.john.pk).update(city='Kisumu')
+        self.assertEqual(self.search('kisumu'), [self.john])
+
+        self.janet.delete()
+        self.assertEqual(self.search('janet'), [])
+
+    def test_broad_searches_list_newest_first(self):
+        with mock.patch.object(search_index, 'SEARCH_RANK_LIMIT', 1):
+            self.assertEqual(self.search('jan'), [self.janet, self.jane])
+
+    def test_views_use_the_index(self):
+        response = self.client.get('/api/donors/search/', {'q': 'jane wanj'})
+        self.assertEqual([d['id'] for d in response.json()], [self.jane.id])
+
+        response = self.client.get('/donor-list/', {'search': 'otieno'})
+        self.assertEqual(list(response.context['donors']), [self.janet])
+
+        response = self.client.get('/users/', {'search': 'adm'})
+        self.assertEqual(list(response.context['users']), [self.admin])
+
+
+class KeysetPaginationTest(TestCase):
+    """List views page on an indexed sort key instead of OFFSET"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        self.donors = [
+            Donor.objects.create(
+                first_name=f'Donor{i}', last_name='Test', email=f'donor{i}@example.com',
+                phone_number='0700000000', blood_type='O+', date_of_birth=date(1990, 1, 1),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+            for i in range(5)
+        ]
+        for donor in self.donors:
+            BloodDonation.objects.create(
+                donor=donor, donation_date=date(2026, 1, 1), units_donated=1,
+                blood_type='O+', hospital_name='Kenyatta Hospital', status='approved', approved_by=self.admin,
+            )
+
+    def test_pages_walk_forward_and_back(self):
+        ordering = ['-created_at', '-id']
+        newest_first = list(reversed(self.donors))
+        factory = RequestFactory()
+
+        pages = []
+        page = keyset_paginate(factory.get('/'), Donor.objects.all(), ordering, per_page=2)
+        pages.append(list(page))
+        while page.has_next:
+            page = keyset_paginate(factory.get('/' + page.next_link), Donor.objects.all(), ordering, per_page=2)
+            pages.append(list(page))
+
+        self.assertEqual(pages, [newest_first[0:2], newest_first[2:4], newest_first[4:]])
+        self.assertTrue(page.has_previous)
+
+        page = keyset_paginate(factory.get('/' + page.previous_link), Donor.objects.all(), ordering, per_page=2)
+        self.assertEqual(list(page), newest_first[2:4])
+        self.assertTrue(page.has_next and page.has_previous)
+
+        # A tampered cursor falls back to the first page
+        page = keyset_paginate(factory.get('/', {'after': 'garbage'}), Donor.objects.all(), ordering, per_page=2)
+        self.assertEqual(list(page), newest_first[0:2])
+
+    def test_list_views_page_results(self):
+        urls = [
+            '/donor-list/', '/blood-requests/', '/patient-list/', '/donation-requests/',
+            '/users/', '/notifications/', '/matching/admin/', '/inventory/expiration/',
+        ]
+        with mock.patch.object(pagination, 'PAGE_SIZE', 2):
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200, url)
+
+            response = self.client.get('/donor-list/')
+            self.assertEqual(len(response.context['donors']), 2)
+            response = self.client.get('/donor-list/' + response.context['donors'].next_link)
+            self.assertEqual(list(response.context['donors']), [self.donors[2], self.donors[1]])
+
+    def test_donation_list_queries_do_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as five_rows:
+            self.client.get('/donation-requests/')
+        self.donors[0].donations.all().delete()
+        with CaptureQueriesContext(connection) as four_rows:
+            self.client.get('/donation-requests/')
+        self.assertEqual(len(five_rows), len(four_rows))
+
+
+def _count_allowed(path, hits):
+    """Worker for RateLimiterTest: hits one shared limit from its own process"""
+    with override_settings(RATE_LIMIT_DATABASE=path):
+        return sum(rate_limiter.hit('shared', 'client', '50/1h').allowed for _ in range(hits))
+
+
+class RateLimiterTest(TestCase):
+    """Limits are sliding windows counted atomically across processes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'ratelimit.sqlite3')
+        self.settings_override = override_settings(RATE_LIMIT_DATABASE=self.path)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_sliding_window(self):
+        start = 6000.0  # start of a 60 s window
+        with mock.patch('core_blood_system.rate_limiter.time.time', return_value=start):
+            results = [rate_limiter.hit('view', 'client', '3/m') for _ in range(4)]
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual(results[-1].retry_after, 60)
+
+        # Halfway through the next window half of the previous 4 still count
+        with mock.patch('core_blood_system.rate_limiter.time.time', return_value=start + 90):
+            self.assertTrue(rate_limiter.hit('view', 'client', '3/m').allowed)
+            rejected = rate_limiter.hit('view', 'client', '3/m')
+        self.assertFalse(rejected.allowed)
+        self.assertEqual(rejected.retry_after, 15)
+
+        with mock.patch('core_blood_system.rate_limiter.time.time', return_value=start + 180):
+            self.assertTrue(rate_limiter.hit('view', 'client', '3/m').allowed)
+
+    def test_limit_is_shared_across_processes(self):
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            allowed = pool.starmap(_count_allowed, [(self.path, 30)] * 4)
+        self.assertEqual(sum(allowed), 50)
+
+    def test_failed_logins_lock_out_one_username_per_address(self):
+        CustomUser.objects.create_user(username='donor', password='pass12345')
+        CustomUser.objects.create_user(username='nurse', password='pass12345')
+
+        with override_settings(LOGIN_FAILURE_RATE='3/15m', LOGIN_BLOCK_SECONDS=60):
+            # Successful logins are not counted
+            for _ in range(4):
+                response = self.client.post('/login/', {'username': 'donor', 'password': 'pass12345'})
+                self.assertEqual(response.status_code, 302)
+                self.client.logout()
+
+            for _ in range(3):
+                self.client.post('/login/', {'username': 'donor', 'password': 'wrong'})
+            response = self.client.post('/login/', {'username': 'donor', 'password': 'pass12345'})
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(self.client.get('/login/').status_code, 200)
+
+            # Other staff behind the same address can still sign in
+            response = self.client.post('/login/', {'username': 'nurse', 'password': 'pass12345'})
+            self.assertEqual(response.status_code, 302)
+
+    def test_rates_by_role(self):
+        admin = CustomUser(username='admin', role='admin')
+        user = CustomUser(username='user', role='user')
+        with override_settings(RATE_LIMITS={'search': {'admin': '600/m', 'default': '60/m'}}):
+            self.assertEqual(view_rate('search', admin, '1/m'), '600/m')
+            self.assertEqual(view_rate('search', user, '1/m'), '60/m')
+            self.assertEqual(view_rate('search', AnonymousUser(), '1/m'), '60/m')
+            self.assertEqual(view_rate('other', admin, '1/m'), '1/m')
+
+
+class LogBufferTest(TestCase):
+    """Log rows are queued and written in bulk, never lost on flush failure"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='reader', password='pass12345')
+
+    def _row(self, i):
+        return NotificationLog(
+            user=self.user, notification_type='login', channel='in_app',
+            recipient='reader', message=f'event {i}',
+        )
+
+    def test_rows_are_written_on_flush_in_one_insert(self):
+        writer = BufferedLogWriter(size=5)
+        with mock.patch.object(writer, '_ensure_thread'):
+            for i in range(3):
+                writer.add(self._row(i))
+            self.assertEqual(NotificationLog.objects.count(), 0)
+            writer._wake.clear()
+
+            writer.add(self._row(3))
+            writer.add(self._row(4))
+            # Reaching the size threshold wakes the flusher
+            self.assertTrue(writer._wake.is_set())
+
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writer.flush(), 5)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(NotificationLog.objects.count(), 5)
+        self.assertEqual(writer.pending(), 0)
+
+    def test_failed_flush_requeues_and_close_writes_the_rest(self):
+        writer = BufferedLogWriter()
+        with mock.patch.object(writer, '_ensure_thread'):
+            writer.add(self._row(0))
+            writer.add(self._row(1))
+
+        with mock.patch.object(NotificationLog.objects, 'bulk_create', side_effect=Exception('database is locked')):
+            self.assertEqual(writer.flush(), 0)
+        self.assertEqual(writer.pending(), 2)
+
+        writer.close()
+        self.assertEqual(NotificationLog.objects.count(), 2)
+
+    def test_rejected_row_is_discarded_and_the_rest_written(self):
+        writer = BufferedLogWriter()
+        rejected = self._row(1)
+        rejected.recipient = None
+        with mock.patch.object(writer, '_ensure_thread'):
+            for row in (self._row(0), rejected, self._row(2)):
+                writer.add(row)
+
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(writer.pending(), 0)
+        self.assertEqual(
+            sorted(NotificationLog.objects.values_list('message', flat=True)), ['event 0', 'event 2'],
+        )
+
+
+class SessionWriteCoalescingTest(TestCase):
+    """Idle sessions are read from cache and re-saved only now and then"""
+
+    def setUp(self):
+        CustomUser.objects.create_user(username='reader', password='pass12345')
+        self.client.login(username='reader', password='pass12345')
+
+    def _session_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q['sql'] for q in queries if 'django_session' in q['sql']]
+
+    def test_polls_do_not_touch_the_session_table(self):
+        for _ in range(10):
+            response, queries = self._session_queries('/api/notifications/unread-count/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(queries, [])
+            self.assertNotIn('sessionid', response.cookies)
+
+    def test_session_is_resaved_after_the_refresh_fraction(self):
+        later = time.time() + settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION + 1
+        with mock.patch('core_blood_system.sessions.time.time', return_value=later):
+            response, queries = self._session_queries('/api/notifications/unread-count/')
+            self.assertEqual(len([q for q in queries if q.startswith('UPDATE')]), 1)
+            self.assertIn('sessionid', response.cookies)
+
+            _, queries = self._session_queries('/api/notifications/unread-count/')
+            self.assertEqual(queries, [])
+
+    def test_idle_timeout_is_never_shorter_than_the_cookie_age(self):
+        # Stored expiry covers the cookie age plus the longest gap between saves
+        stored = Session.objects.get(pk=self.client.session.session_key).expire_date
+        slack = settings.SESSION_COOKIE_AGE * settings.SESSION_REFRESH_FRACTION
+        self.assertGreaterEqual(stored, timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE + slack - 5))
+
+
+class EligibilityCalendarTest(TestCase):
+    """next_eligible_date is maintained per gender and drives eligibility queries"""
+
+    def setUp(self):
+        self.today = date.today()
+
+    def test_interval_depends_on_gender(self):
+        last = self.today - timedelta(days=60)
+        male = make_donor('male@example.com', gender='male', last_donation_date=last)
+        female = make_donor('female@example.com', gender='female', last_donation_date=last)
+        make_donor('never@example.com', gender='female')
+
+        self.assertEqual(male.next_eligible_date, last + timedelta(days=56))
+        self.assertEqual(female.next_eligible_date, last + timedelta(days=84))
+        self.assertTrue(male.is_eligible())
+        self.assertFalse(female.is_eligible())
+        self.assertEqual(donor_statistics()['eligible'], 2)
+
+        female.last_donation_date = self.today - timedelta(days=90)
+        female.save(update_fields=['last_donation_date'])
+        female.refresh_from_db()
+        self.assertTrue(female.is_eligible())
+
+    def test_matching_uses_the_gender_interval(self):
+        last = self.today - timedelta(days=70)
+        male = make_donor('male@example.com', gender='male', last_donation_date=last)
+        female = make_donor('female@example.com', gender='female', last_donation_date=last)
+        requester = CustomUser.objects.create_user(username='requester', password='pass12345')
+        blood_request = BloodRequest.objects.create(
+            requester=requester, patient_name='Patient', blood_type='O+', units_needed=1,
+            purpose='surgery', hospital_name='Hospital', hospital_address='Nairobi',
+            contact_number='0700000000', required_date=self.today,
+        )
+
+        self.assertEqual(check_donor_eligibility(female), (False, 'Must wait 14 more days since last donation'))
+        result = find_matching_donors(blood_request)
+        self.assertEqual(result['eligible_donors'], [male])
+        self.assertEqual(result['ineligible_count'], 1)
+
+    def test_backfill_repairs_rows_written_around_save(self):
+        last = self.today - timedelta(days=30)
+        female = make_donor('female@example.com', gender='female', last_donation_date=last)
+        never = make_donor('never@example.com')
+        Donor.objects.filter(pk=female.pk).update(next_eligible_date=last + timedelta(days=56))
+        Donor.objects.filter(pk=never.pk).update(next_eligible_date=self.today)
+
+        self.assertEqual(backfill_next_eligible_dates(dry_run=True), 2)
+        call_command('backfill_eligibility_dates', stdout=mock.MagicMock())
+        female.refresh_from_db()
+        never.refresh_from_db()
+        self.assertEqual(female.next_eligible_date, last + timedelta(days=84))
+        self.assertIsNone(never.next_eligible_date)
+        self.assertEqual(backfill_next_eligible_dates(), 0)
+
+
+class EligibilityEngineTest(TestCase):
+    """Every eligibility path agrees with the vectorized engine"""
+
+    def setUp(self):
+        self.today = date.today()
+
+    def test_reason_codes_for_a_population(self):
+        days = lambda n: self.today - timedelta(days=n)
+        result = engine.evaluate(
+            engine.to_dates([days(30 * 365), days(30 * 365), days(30 * 365), days(17 * 365), days(70 * 365), None, days(17 * 365)]),
+            engine.to_dates([None, days(10), days(60), None, None, days(10), days(10)]),
+            engine.female_codes(['male', 'male', 'female', 'male', 'female', 'Female', 'male']),
+            available=[True, True, True, True, True, True, False],
+            override=[False, False, False, False, False, True, False],
+            today=self.today,
+        )
+
+        self.assertEqual(result.reasons.tolist(), [
+            engine.ELIGIBLE, engine.INTERVAL, engine.INTERVAL, engine.TOO_YOUNG,
+            engine.TOO_OLD, engine.ELIGIBLE, engine.UNAVAILABLE,
+        ])
+        self.assertEqual(result.days_remaining.tolist(), [0, 46, 24, 0, 0, 0, 46])
+        self.assertTrue(np.array_equal(result.eligible, result.reasons == engine.ELIGIBLE))
+
+    def test_wrappers_and_query_agree_with_engine(self):
+        make_donor('eligible@example.com')
+        make_donor('recent@example.com', gender='female', last_donation_date=self.today - timedelta(days=60))
+        make_donor('minor@example.com', date_of_birth=self.today - timedelta(days=18 * 365 - 1))
+        make_donor('adult@example.com', date_of_birth=self.today - timedelta(days=18 * 365))
+        make_donor('senior@example.com', date_of_birth=self.today - timedelta(days=66 * 365))
+        make_donor('unavailable@example.com', is_available=False)
+        override = make_donor('override@example.com', last_donation_date=self.today - timedelta(days=5),
+                               is_eligible_override=True)
+
+        ids, result = evaluate_queryset(Donor.objects.order_by('id'))
+        eligible_ids = set(ids[result.eligible].tolist())
+        self.assertEqual(eligible_ids, set(Donor.objects.filter(eligible_donor_filter()).values_list('id', flat=True)))
+        self.assertEqual(len(eligible_ids), 3)
+        for donor in Donor.objects.all():
+            expected = donor.id in eligible_ids
+            self.assertEqual(donor.is_eligible(), expected, donor.email)
+            self.assertEqual(check_donor_eligibility(donor)[0], expected, donor.email)
+            self.assertEqual(utils.check_donor_eligibility(donor)[0], expected, donor.email)
+
+        self.assertEqual(override.get_eligibility_status()['reason'], 'Admin Override')
+        recent = Donor.objects.get(email='recent@example.com')
+        self.assertEqual(recent.days_until_eligible(), 24)
+        self.assertEqual(
+            EligibilityChecker.check_donation_interval(recent.last_donation_date, 'female')['next_eligible_date'],
+            recent.next_eligible_date,
+        )
+        self.assertFalse(EligibilityChecker.check_age_eligibility(66)['eligible'])
+        self.assertTrue(EligibilityChecker.check_age_eligibility(65)['eligible'])
+
+
+class AppointmentSlotTest(TestCase):
+    """Bookings take places from per-slot capacity"""
+
+    def setUp(self):
+        self.settings_override = override_settings(APPOINTMENT_SLOT_CAPACITY={'default': 2, 'Small Clinic': 1})
+        self.settings_override.enable()
+        self.day = date.today() + timedelta(days=3)
+        self.user = CustomUser.objects.create_user(username='donor', password='pass12345')
+        self.donors = [
+            Donor.objects.create(
+                first_name='Test', last_name=str(i), email=f'donor{i}@example.com',
+                phone_number='0700000000', blood_type='O+', date_of_birth=date(1990, 1, 1),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def _book(self, donor, time_slot='09:00', location='City Hospital'):
+        return book_appointment_slot(donor, self.user, self.day, time_slot, location, 'Address')
+
+    def test_capacity_and_month_availability(self):
+        self._book(self.donors[0])
+        self._book(self.donors[1])
+        with self.assertRaises(SlotUnavailable):
+            self._book(self.donors[2])
+        self._book(self.donors[2], location='Small Clinic')
+
+        self.assertEqual(DonationAppointment.objects.filter(location='City Hospital').count(), 2)
+        self.assertNotIn('09:00', get_available_time_slots(self.day, 'City Hospital'))
+        self.assertIn('10:00', get_available_time_slots(self.day, 'City Hospital'))
+
+        AppointmentSlot.objects.filter(location='City Hospital').update(capacity=5)
+        with self.assertNumQueries(1):
+            availability = get_month_availability('City Hospital', self.day.year, self.day.month)
+        self.assertEqual(availability[self.day]['09:00'], 3)
+        self.assertEqual(availability[self.day]['16:00'], 2)
+        self.assertEqual(get_month_availability('Small Clinic', self.day.year, self.day.month)[self.day]['09:00'], 0)
+
+    def test_availability_api_rejects_out_of_range_months(self):
+        self.client.login(username='donor', password='pass12345')
+        url = '/api/appointments/availability/'
+        response = self.client.get(url, {'location': 'City Hospital', 'year': self.day.year, 'month': self.day.month})
+        self.assertEqual(response.status_code, 200)
+        for year, month in ((9999, 12), (2026, 13), (0, 1), ('x', 1)):
+            response = self.client.get(url, {'location': 'City Hospital', 'year': year, 'month': month})
+            self.assertEqual(response.status_code, 400)
+
+    def test_cancel_and_reschedule_move_places(self):
+        def booked(time_slot):
+            return AppointmentSlot.objects.get(location='Small Clinic', date=self.day, time_slot=time_slot).booked
+
+        first = self._book(self.donors[0], location='Small Clinic')
+        second = self._book(self.donors[1], time_slot='10:00', location='Small Clinic')
+        with self.assertRaises(SlotUnavailable):
+            move_appointment(second, self.day, '09:00')
+        second.refresh_from_db()
+        self.assertEqual(second.time_slot, '10:00')
+
+        set_appointment_status(first, 'cancelled')
+        self.assertEqual(booked('09:00'), 0)
+        move_appointment(second, self.day, '09:00')
+        self.assertEqual((booked('09:00'), booked('10:00')), (1, 0))
+        with self.assertRaises(SlotUnavailable):
+            set_appointment_status(first, 'confirmed')
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'cancelled')
+
+    def test_reconcile_repairs_drift(self):
+        appointment = self._book(self.donors[0])
+        DonationAppointment.objects.create(
+            donor=self.donors[1], appointment_date=self.day, time_slot='11:00',
+            location='City Hospital', address='Address',
+        )
+        DonationAppointment.objects.filter(pk=appointment.pk).update(status='cancelled')
+
+        drift = reconcile_slot_bookings(repair=False)
+        self.assertEqual(drift, {
+            ('City Hospital', self.day, '09:00'): (1, 0),
+            ('City Hospital', self.day, '11:00'): (0, 1),
+        })
+        call_command('reconcile_appointment_slots', stdout=mock.MagicMock())
+        self.assertEqual(AppointmentSlot.objects.get(time_slot='11:00').booked, 1)
+        self.assertEqual(reconcile_slot_bookings(repair=False), {})
+
+
+class ReminderPipelineTest(TestCase):
+    """Reminders go out in claimed chunks; a rerun sends only what was not delivered"""
+
+    def setUp(self):
+        self.tomorrow = date.today() + timedelta(days=1)
+        self.appointments = []
+        for i in range(5):
+            user = CustomUser.objects.create(username=f'donor{i}', email=f'donor{i}@example.com',
+                                             phone_number=f'+25470000000{i}')
+            donor = Donor.objects.create(
+                user=user, first_name='Donor', last_name=str(i), email=user.email,
+                phone_number=user.phone_number, blood_type='O+', date_of_birth=date(1990, 1, 1),
+                address='Address', city='Nairobi', state='Nairobi',
+            )
+            self.appointments.append(DonationAppointment.objects.create(
+                donor=donor, user=user, appointment_date=self.tomorrow,
+                time_slot='09:00' if i < 3 else '10:00', location='City Hospital', address='Address',
+                status='cancelled' if i == 4 else 'scheduled',
+            ))
+
+    def test_chunks_are_batched_and_flipped(self):
+        def provider_batch(numbers, message):
+            return [{'success': True, 'external_id': number} for number in numbers]
+
+        with override_settings(SMS_PROVIDER='africas_talking'), \
+                mock.patch.object(SMSNotificationService, 'send_provider_batch',
+                                  side_effect=provider_batch) as send_batch:
+            run = run_appointment_reminders(chunk_size=3)
+
+        self.assertEqual((run.status, run.chunks_done, run.reminded), ('completed', 2, 4))
+        self.assertEqual((run.email_sent, run.sms_sent), (4, 4))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'donor{i}@example.com' for i in range(4)])
+        # One provider request per slot text in each chunk
+        self.assertEqual(send_batch.call_count, 2)
+        self.assertEqual(NotificationLog.objects.filter(notification_type='appointment_reminder').count(), 8)
+        self.assertEqual(
+            list(DonationAppointment.objects.order_by('id').values_list('reminder_sent', flat=True)),
+            [True, True, True, True, False],
+        )
+
+    def test_rerun_after_crash_resends_only_the_unsent_chunk(self):
+        send = EmailNotificationService.send_appointment_reminders
+        calls = []
+
+        def crash_on_second_chunk(appointments, connection=None):
+            calls.append(appointments)
+            if len(calls) == 2:
+                raise ConnectionError('mail server went away')
+            return send(appointments, connection)
+
+        with mock.patch.object(EmailNotificationService, 'send_appointment_reminders',
+                               side_effect=crash_on_second_chunk):
+            with self.assertRaises(ConnectionError):
+                run_appointment_reminders(chunk_size=2)
+
+        failed = ReminderRun.objects.get()
+        self.assertEqual((failed.status, failed.chunks_done), ('failed', 1))
+        self.assertEqual(failed.in_flight, [self.appointments[2].id, self.appointments[3].id])
+
+        rerun = run_appointment_reminders(chunk_size=2)
+        self.assertEqual((rerun.status, rerun.reminded), ('completed', 2))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f'donor{i}@example.com' for i in range(4)])
+        failed.refresh_from_db()
+        self.assertEqual(failed.in_flight, [])
+
+        self.assertEqual(run_appointment_reminders(chunk_size=2).reminded, 0)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_failed_sends_are_left_for_the_next_run(self):
+        def refuse_donor1(connection, messages):
+            return ['mailbox unavailable' if m.to[0] == 'donor1@example.com' else None for m in messages]
+
+        with mock.patch.object(email_notifications, '_send_batch', side_effect=refuse_donor1):
+            run = run_appointment_reminders(chunk_size=2)
+        self.assertEqual((run.status, run.reminded), ('completed', 3))
+        self.assertFalse(DonationAppointment.objects.get(pk=self.appointments[1].pk).reminder_sent)
+
+        rerun = run_appointment_reminders(chunk_size=2)
+        self.assertEqual(rerun.reminded, 1)
+        self.assertEqual([m.to[0] for m in mail.outbox], ['donor1@example.com'])
+
+    def test_stale_running_run_is_marked_interrupted(self):
+        stale = ReminderRun.objects.create(appointment_date=self.tomorrow, in_flight=[self.appointments[0].id])
+        ReminderRun.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        ReminderRun.objects.create(appointment_date=self.tomorrow)
+
+        self.assertEqual(mark_stale_runs_interrupted(self.tomorrow), [self.appointments[0].id])
+        self.assertEqual(
+            sorted(ReminderRun.objects.values_list('status', flat=True)), ['interrupted', 'running']
+        )
+
+
+class ExpiredUnitSweeperTest(TestCase):
+    """Expired units are swept in chunks with per-type inventory deltas"""
+
+    def setUp(self):
+        for i, (blood_type, days_left) in enumerate(
+            [('O-', -1), ('O-', -3), ('O-', 5), ('A+', -2), ('A+', -1), ('B+', 10)]
+        ):
+            BloodUnit.objects.create(
+                blood_type=blood_type, unit_number=f'S{i}',
+                donation_date=date.today() - timedelta(days=42 - days_left),
+                expiration_date=date.today() + timedelta(days=days_left),
+            )
+
+    def test_sweep_in_chunks_applies_per_type_deltas(self):
+        with mock.patch.object(InventoryManager, 'send_low_stock_alerts') as alerts:
+            expired = InventoryManager.sweep_expired_units(chunk_size=2)
+        alerts.assert_not_called()
+
+        self.assertEqual(dict(expired), {'O-': 2, 'A+': 2})
+        self.assertEqual(BloodUnit.objects.filter(status='expired').count(), 4)
+        counts = dict(BloodInventory.objects.values_list('blood_type', 'units_available'))
+        self.assertEqual((counts['O-'], counts['A+'], counts['B+']), (1, 0, 1))
+
+        # A rerun finds nothing left to expire
+        self.assertEqual(InventoryManager.sweep_expired_units(chunk_size=2), {})
+        self.assertEqual(InventoryManager.mark_expired_units(), 0)
+
+    def test_low_stock_alert_is_throttled(self):
+        with mock.patch(
+            'core_blood_system.email_notifications.EmailNotificationService.send_low_stock_alert',
+            return_value=True,
+        ) as send:
+            expired = InventoryManager.sweep_expired_units()
+            self.assertEqual(sorted(InventoryManager.send_low_stock_alerts(expired.keys())), ['A+', 'O-'])
+            self.assertEqual(InventoryManager.send_low_stock_alerts(), ['B+'])
+            self.assertEqual(InventoryManager.send_low_stock_alerts(), [])
+        self.assertEqual(send.call_count, 3)
+        self.assertIsNotNone(BloodInventory.objects.get(blood_type='O-').alert_sent_at)
+
+    def test_failed_alert_releases_throttle(self):
+        with mock.patch(
+            'core_blood_system.email_notifications.EmailNotificationService.send_low_stock_alert',
+            return_value=False,
+        ):
+            self.assertEqual(InventoryManager.send_low_stock_alerts(['B+']), [])
+        self.assertIsNone(BloodInventory.objects.get(blood_type='B+').alert_sent_at)
+
+    def test_command_reports_per_type_counts(self):
+        out = io.StringIO()
+        with mock.patch('core_blood_system.inventory_manager.InventoryManager.send_low_stock_alerts',
+                        return_value=[]):
+            call_command('mark_expired_units', '--chunk-size', '3', stdout=out)
+        self.assertIn('A+: 2', out.getvalue())
+        self.assertIn('marked 4 blood units as expired', out.getvalue())
+
+
+class UnitAllocationTest(TestCase):
+    """Compatible units are reserved first-expired-first-out and released or used"""
+
+    def setUp(self):
+        requester = CustomUser.objects.create(username='hospital')
+        self.blood_request = BloodRequest.objects.create(
+            requester=requester, patient_name='Patient', blood_type='A+', units_needed=2,
+            purpose='surgery', hospital_name='Hospital', hospital_address='Address',
+            contact_number='0700000000', required_date=date.today(), status='approved',
+        )
+        for number, blood_type, days_left in [
+            ('U1', 'A+', 10), ('U2', 'O-', 3), ('U3', 'A-', 3), ('U4', 'A+', 3),
+            ('U5', 'B+', 1), ('U6', 'A+', -1), ('U7', 'O+', 20),
+        ]:
+            BloodUnit.objects.create(
+                blood_type=blood_type, unit_number=number,
+                donation_date=date.today() - timedelta(days=42 - days_left),
+                expiration_date=date.today() + timedelta(days=days_left),
+            )
+
+    def _units(self, status):
+        return sorted(BloodUnit.objects.filter(blood_request=self.blood_request, status=status)
+                      .values_list('unit_number', flat=True))
+
+    def test_reserves_soonest_expiring_compatible_units(self):
+        self.assertEqual(allocate_units(self.blood_request), 2)
+        # Same-day ties go to the patient's own type, universal O- last
+        self.assertEqual(self._units('reserved'), ['U3', 'U4'])
+        self.assertEqual(allocate_units(self.blood_request), 0)
+        self.assertEqual(allocate_units(self.blood_request, units=3), 1)
+        self.assertEqual(self._units('reserved'), ['U2', 'U3', 'U4'])
+        self.assertEqual(BloodInventory.objects.get(blood_type='A+').units_available, 2)
+
+    def test_insufficient_stock_rolls_back(self):
+        with self.assertRaises(InsufficientUnits):
+            allocate_units(self.blood_request, units=6)
+        self.assertEqual(BloodUnit.objects.filter(status='reserved').count(), 0)
+
+        self.assertEqual(allocate_units(self.blood_request, units=6, partial=True), 5)
+
+    def test_status_changes_use_or_release_units(self):
+        sync_request_allocation(self.blood_request)
+        self.blood_request.status = 'cancelled'
+        self.assertEqual(sync_request_allocation(self.blood_request), 2)
+        self.assertEqual(self._units('reserved'), [])
+
+        self.blood_request.status = 'fulfilled'
+        self.assertEqual(sync_request_allocation(self.blood_request), 2)
+        self.assertEqual(self._units('used'), ['U3', 'U4'])
+        self.assertEqual(BloodInventory.objects.get(blood_type='A+').units_available, 2)
+        self.assertEqual(InventoryLedger.reconcile(repair=False), {})
+
+    def test_deleting_request_releases_units(self):
+        allocate_units(self.blood_request)
+        self.blood_request.delete()
+        self.assertEqual(BloodUnit.objects.filter(status='reserved').count(), 0)
+        self.assertEqual(BloodUnit.objects.filter(blood_request__isnull=False).count(), 0)
+
+    def test_editing_type_or_units_reallocates(self):
+        allocate_units(self.blood_request)
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+
+        post = {
+            'patient_name': 'Patient', 'blood_type': 'B+', 'units_needed': '1', 'purpose': 'surgery',
+            'purpose_details': '', 'urgency': 'medium', 'hospital_name': 'Hospital',
+            'hospital_address': 'Address', 'contact_number': '0700000000',
+            'required_date': self.blood_request.required_date.isoformat(), 'notes': '',
+        }
+        self.client.post(f'/patient/edit/{self.blood_request.id}/', post)
+        self.assertEqual(self._units('reserved'), ['U5'])
+
+        self.client.post(f'/patient/edit/{self.blood_request.id}/', {**post, 'units_needed': '2'})
+        self.assertEqual(self._units('reserved'), ['U2', 'U5'])
+
+
+class DemandForecastTest(TestCase):
+    """Forecasts are folded forward nightly and propose ordered thresholds"""
+
+    def setUp(self):
+        self.today = date(2026, 3, 2)
+        self.requester = CustomUser.objects.create(username='hospital')
+        # Five weeks of A+ demand: 4 units on weekdays, 1 at weekends
+        for offset in range(35, 0, -1):
+            day = self.today - timedelta(days=offset)
+            self._request(day, 4 if day.weekday() < 5 else 1)
+
+    def _request(self, day, units, blood_type='A+'):
+        blood_request = BloodRequest.objects.create(
+            requester=self.requester, patient_name='Patient', blood_type=blood_type, units_needed=units,
+            purpose='surgery', hospital_name='Hospital', hospital_address='Address',
+            contact_number='0700000000', required_date=day,
+        )
+        BloodRequest.objects.filter(pk=blood_request.pk).update(
+            created_at=timezone.make_aware(datetime(day.year, day.month, day.day, 12))
+        )
+
+    def test_daily_series_sums_units_per_type_and_day(self):
+        start = date(2026, 1, 1)
+        series = daily_series(
+            [('O+', date(2026, 1, 1), 2), ('O+', date(2026, 1, 1), 1), ('B-', date(2026, 1, 3), 4),
+             ('O+', date(2025, 12, 31), 9)],
+            start, 3,
+        )
+        self.assertEqual(series[BLOOD_TYPE_INDEX['O+']].tolist(), [3, 0, 0])
+        self.assertEqual(series[BLOOD_TYPE_INDEX['B-']].tolist(), [0, 0, 4])
+        self.assertEqual(series.sum(), 7)
+
+    def test_incremental_update_matches_rebuild(self):
+        forecasts = update_forecasts(today=self.today)
+        self.assertEqual(forecasts['A+'].through_date, self.today - timedelta(days=1))
+        a_plus = forecasts['A+']
+        # Weekday demand is forecast above weekend demand (today is a Monday)
+        self.assertGreater(a_plus.daily_demand[0], a_plus.daily_demand[5])
+        self.assertLess(a_plus.proposed_critical_threshold, a_plus.proposed_minimum_threshold)
+        self.assertLess(a_plus.proposed_minimum_threshold, a_plus.proposed_optimal_level)
+        self.assertEqual(forecasts['O-'].proposed_critical_threshold, 1)
+
+        self._request(self.today, 6)
+        incremental = update_forecasts(today=self.today + timedelta(days=1))['A+']
+        rebuilt = update_forecasts(today=self.today + timedelta(days=1), rebuild=True)['A+']
+        self.assertEqual(incremental.through_date, self.today)
+        self.assertTrue(np.allclose(incremental.daily_demand, rebuilt.daily_demand))
+        self.assertEqual(update_forecasts(today=self.today + timedelta(days=1))['A+'].pk, rebuilt.pk)
+
+    def test_thresholds_applied_from_settings_and_view(self):
+        BloodInventory.objects.create(blood_type='A+')
+        update_forecasts(today=self.today)
+        forecast = DemandForecast.objects.get(blood_type='A+')
+        self.assertEqual(BloodInventory.objects.get(blood_type='A+').minimum_threshold, 5)
+
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        response = self.client.get('/inventory/configure-thresholds/')
+        self.assertContains(response, 'Apply Forecast Thresholds')
+        self.client.post('/inventory/configure-thresholds/', {'action': 'apply_forecast'})
+        inventory = BloodInventory.objects.get(blood_type='A+')
+        self.assertEqual(
+            (inventory.critical_threshold, inventory.minimum_threshold, inventory.optimal_level),
+            (forecast.proposed_critical_threshold, forecast.proposed_minimum_threshold,
+             forecast.proposed_optimal_level),
+        )
+
+        BloodInventory.objects.filter(blood_type='A+').update(minimum_threshold=50)
+        with override_settings(DEMAND_FORECAST_AUTO_APPLY=True):
+            update_forecasts(today=self.today, rebuild=True)
+        self.assertEqual(BloodInventory.objects.get(blood_type='A+').minimum_threshold,
+                         forecast.proposed_minimum_threshold)
+
+
+class InventorySimulatorTest(TestCase):
+    """Monte Carlo outlook issues units FEFO and counts shortages and expiries"""
+
+    def test_issue_units_fefo_across_compatible_types(self):
+        a_pos, a_neg, o_neg = BLOOD_TYPE_INDEX['A+'], BLOOD_TYPE_INDEX['A-'], BLOOD_TYPE_INDEX['O-']
+        stock = np.zeros((2, 43, 8), dtype=np.int32)
+        stock[:, 1, a_neg] = 2
+        stock[:, 2, [a_pos, o_neg]] = 1
+
+        short = issue_units(stock, np.array([3, 5]), np.array([a_pos, a_neg, o_neg]))
+        self.assertEqual(short.tolist(), [0, 1])
+        # Soonest expiring first, then the patient's own type before O-
+        self.assertEqual(stock[0, :3, [a_pos, a_neg, o_neg]].sum(axis=1).tolist(), [0, 0, 1])
+        self.assertEqual(stock[1].sum(), 0)
+
+    def test_expiry_and_shortage_without_randomness(self):
+        stock = np.zeros((8, 43), dtype=np.int64)
+        stock[BLOOD_TYPE_INDEX['B+'], 3] = 5
+        stock[BLOOD_TYPE_INDEX['B+'], 30] = 2
+        demand = np.zeros((8, 14))
+        supply = np.zeros((8, 14))
+        result = simulate_batch(stock, demand, supply, 10, 0)
+        self.assertEqual(result['expired_units'][BLOOD_TYPE_INDEX['B+']], 50)
+        self.assertEqual(result['shortage_trials'].sum(), 0)
+
+        demand[BLOOD_TYPE_INDEX['O-']] = 5.0
+        result = simulate_batch(stock, demand, supply, 10, 0)
+        # O- patients cannot be given B+
+        self.assertEqual(result['shortage_trials'][BLOOD_TYPE_INDEX['O-']], 10)
+        self.assertEqual(result['expired_units'][BLOOD_TYPE_INDEX['B+']], 50)
+
+    def test_simulation_endpoint_serves_stored_result(self):
+        for i in range(3):
+            BloodUnit.objects.create(
+                blood_type='O+', unit_number=f'SIM{i}', donation_date=date.today() - timedelta(days=40),
+                expiration_date=date.today() + timedelta(days=2),
+            )
+        DemandForecast.objects.create(
+            blood_type='O+', through_date=date.today() - timedelta(days=1),
+            daily_demand=[0.0] * 7, daily_supply=[0.0] * 7,
+        )
+
+        CustomUser.objects.create_user(username='admin', password='pass12345', role='admin')
+        self.client.login(username='admin', password='pass12345')
+        with mock.patch('core_blood_system.inventory_simulator.SIMULATION_WORKERS', 1), \
+                mock.patch('core_blood_system.inventory_simulator.SIMULATION_TRIALS', 50):
+            data = self.client.get('/api/inventory/simulation/').json()
+            again = self.client.get('/api/inventory/simulation/').json()
+
+        self.assertEqual(data['generated_at'], again['generated_at'])
+        self.assertTrue(AnalyticsSnapshot.objects.filter(section='inventory_simulation').exists())
+        o_pos = next(row for row in data['blood_types'] if row['blood_type'] == 'O+')
+        self.assertEqual((o_pos['units_available'], o_pos['expected_expired_units']), (3, 3.0))
+        self.assertEqual(data['trials'], 50)
+
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/inventory/simulation/').status_code, 302)
+
+    def test_stale_simulation_is_served_and_refreshed_once(self):
+        def simulate(**kwargs):
+            return {'generated_at': timezone.now().isoformat(), 'trials': 1, 'runtime_ms': 0}
+
+        old = timezone.now() - timedelta(seconds=SIMULATION_MAX_AGE + 1)
+        with mock.patch('core_blood_system.inventory_simulator.run_simulation', side_effect=simulate) as run:
+            self.assertFalse(get_inventory_simulation()['stale'])
+            self.assertEqual(run.call_args.kwargs, {'workers': 1})
+
+            snapshots = AnalyticsSnapshot.objects.filter(section='inventory_simulation')
+            snapshots.update(data={'generated_at': old.isoformat()}, refreshed_at=old)
+            with mock.patch('core_blood_system.inventory_simulator.dispatch_simulation_refresh',
+                            return_value=True) as dispatch:
+                self.assertEqual(get_inventory_simulation(), {'generated_at': old.isoformat(), 'stale': True})
+                self.assertTrue(get_inventory_simulation()['stale'])
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(dispatch.call_count, 1)
+
+            # Nothing could be queued: the claiming reader reruns it
+            snapshots.update(refreshed_at=old)
+            with mock.patch('core_blood_system.inventory_simulator.dispatch_simulation_refresh',
+                            return_value=False):
+                self.assertFalse(get_inventory_simulation()['stale'])
+            self.assertEqual(run.call_count, 2)
+            self.assertEqual(run.call_args.kwargs, {'workers': 1})
+            self.assertFalse(get_inventory_simulation()['stale'])
@@ -0,0 +1,151 @@
+"""
+Blood Unit Allocation
+Reserve compatible units for a blood request first-expired-first-out ->
+mark them used when the request is fulfilled, or release them back to
+stock when it is cancelled or deleted
+
+Candidates are the available, unexpired units of every type in
+donor_matching.BLOOD_COMPATIBILITY for the patient's blood type, soonest
+expiring first (on the same day the patient's own type goes first and
+O- last). Rows are claimed with select_for_update(skip_locked=True) where
+the database supports it, so parallel allocations take different units
+instead of waiting on each other. Every status change goes through
+InventoryLedger.transition_units, whose conditional UPDATEs only count
+the rows they changed, so a unit is never reserved twice.
+"""
+import logging
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .donor_matching import get_compatible_blood_types
+from .inventory_manager import InventoryLedger
+from .models import BloodRequest, BloodUnit
+
+logger = logging.getLogger(__name__)
+
+UNIVERSAL_DONOR_TYPE = 'O-'
+
+
+class InsufficientUnits(Exception):
+    """Not enough compatible units are available for a request"""
+
+    def __init__(self, blood_type, needed, available):
+        self.blood_type = blood_type
+        self.needed = needed
+        self.available = available
+        super().__init__(
+            f"{needed} units compatible with {blood_type} needed, only {available} available"
+        )
+
+
+def candidate_units(blood_type, today=None):
+    """Available, unexpired units a patient of `blood_type` can receive, in allocation order"""
+    return BloodUnit.objects.filter(
+        status='available',
+        blood_type__in=get_compatible_blood_types(blood_type),
+        expiration_date__gte=today or date.today(),
+    ).annotate(type_rank=Case(
+        When(blood_type=blood_type, then=Value(0)),
+        When(blood_type=UNIVERSAL_DONOR_TYPE, then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )).order_by('expiration_date', 'type_rank', 'id')
+
+
+def allocate_units(blood_request, units=None, partial=False, today=None):
+    """
+    Reserve units for a request on top of those it already holds
+
+    Args:
+        units: units the request should hold in total (default: units_needed)
+        partial: reserve what is available instead of raising InsufficientUnits
+
+    Returns:
+        number of units reserved by this call
+    """
+    wanted = blood_request.units_needed if units is None else units
+    candidates = candidate_units(blood_request.blood_type, today)
+    if connection.features.has_select_for_update_skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+
+    with transaction.atomic():
+        # Allocations for the same request run one at a time
+        list(BloodRequest.objects.select_for_update().filter(pk=blood_request.pk).values_list('pk'))
+        held = BloodUnit.objects.filter(blood_request=blood_request, status='reserved').count()
+
+        reserved = 0
+        while held + reserved < wanted:
+            unit_ids = list(candidates.values_list('id', flat=True)[:wanted - held - reserved])
+            if not unit_ids:
+                break
+            # Units taken by a concurrent allocation meanwhile are skipped
+            # by the conditional update and replaced on the next pass
+            reserved += InventoryLedger.transition_units(
+                BloodUnit.objects.filter(id__in=unit_ids, status='available'),
+                'reserved', blood_request=blood_request,
+            )
+
+        if held + reserved < wanted and not partial:
+            raise InsufficientUnits(blood_request.blood_type, wanted - held, reserved)
+
+    if reserved:
+        logger.info(f"Reserved {reserved} units for blood request {blood_request.pk}")
+    return reserved
+
+
+def release_units(blood_request):
+    """Return a request's reserved units to stock; returns the number released"""
+    return InventoryLedger.transition_units(
+        BloodUnit.objects.filter(blood_request=blood_request, status='reserved'),
+        'available', blood_request=None,
+    )
+
+
+def commit_units(blood_request):
+    """Mark a request's reserved units as used; returns the number used"""
+    return InventoryLedger.transition_units(
+        BloodUnit.objects.filter(blood_request=blood_request, status='reserved'),
+        'used',
+    )
+
+
+def reallocate_units(blood_request):
+    """
+    Release a request's reservations and reserve again for its current
+    blood type and units_needed (after either is edited)
+
+    Returns:
+        number of units reserved
+    """
+    with transaction.atomic():
+        release_units(blood_request)
+        return allocate_units(blood_request, partial=True)
+
+
+def sync_request_allocation(blood_request):
+    """
+    Bring a request's units in line with its status
+
+    approved: reserve what is available
+    fulfilled: reserve any units still missing, then mark them used
+    pending/cancelled: release the reservations
+
+    Returns:
+        number of units reserved, used or released
+    """
+    status = blood_request.status
+    with transaction.atomic():
+        if status == 'approved':
+            return allocate_units(blood_request, partial=True)
+        if status == 'fulfilled':
+            allocate_units(blood_request, partial=True)
+            used = commit_units(blood_request)
+            if used < blood_request.units_needed:
+                logger.warning(
+                    f"Blood request {blood_request.pk} fulfilled with {used} of "
+                    f"{blood_request.units_needed} units from inventory"
+                )
+            return used
+        return release_units(blood_request)
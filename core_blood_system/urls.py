@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views, api_views, views_appointments, views_notifications, views_matching, views_analytics, views_qrcode, views_inventory
+from . import views, api_views, views_appointments, views_notifications, views_matching, views_analytics, views_qrcode, views_inventory, views_reports
 
 urlpatterns = [
     # Home
@@ -52,6 +52,8 @@ urlpatterns = [
     path('export/donors/pdf/', views.export_donors_pdf, name='export_donors_pdf'),
     path('export/requests/excel/', views.export_requests_excel, name='export_requests_excel'),
     path('export/requests/pdf/', views.export_requests_pdf, name='export_requests_pdf'),
+    path('reports/<uuid:job_id>/', views_reports.report_job_status, name='report_job_status'),
+    path('reports/<uuid:job_id>/download/', views_reports.download_report, name='download_report'),
     
     # BLOOD COMPATIBILITY CHECKER
     path('compatibility/', views.blood_compatibility_checker, name='blood_compatibility_checker'),
@@ -81,6 +83,7 @@ urlpatterns = [
     path('appointments/admin/', views_appointments.admin_appointments_list, name='admin_appointments_list'),
     path('appointments/admin/<int:appointment_id>/', views_appointments.admin_appointment_detail, name='admin_appointment_detail'),
     path('appointments/calendar/', views_appointments.appointments_calendar, name='appointments_calendar'),
+    path('api/appointments/availability/', views_appointments.slot_availability_api, name='api_slot_availability'),
     
     # NOTIFICATIONS SYSTEM (Feature 2)
     path('notifications/', views_notifications.notification_center, name='notification_center'),
@@ -90,6 +93,7 @@ urlpatterns = [
     path('notifications/preferences/', views.notification_preferences, name='notification_preferences'),
     path('api/notifications/unread-count/', views_notifications.get_unread_count, name='api_unread_count'),
     path('api/notifications/recent/', views_notifications.get_recent_notifications, name='api_recent_notifications'),
+    path('api/notifications/stream/', views_notifications.notification_stream, name='api_notification_stream'),
     
     # MATCHING SYSTEM (Feature 3)
     path('matching/results/<int:request_id>/', views_matching.match_results, name='match_results'),
@@ -97,6 +101,7 @@ urlpatterns = [
     path('matching/respond/<int:match_id>/', views_matching.donor_response, name='donor_response'),
     path('matching/my-matches/', views_matching.my_matches, name='my_matches'),
     path('matching/admin/', views_matching.admin_matching_dashboard, name='admin_matching_dashboard'),
+    path('api/matching/jobs/<uuid:job_id>/', views_matching.matching_job_status, name='api_matching_job_status'),
     
     # ANALYTICS SYSTEM (Feature 4)
     path('analytics/', views_analytics.analytics_dashboard, name='analytics_dashboard'),
@@ -124,6 +129,7 @@ urlpatterns = [
     path('api/donors/search/', api_views.donor_search_api, name='api_donor_search'),
     path('api/donor/<int:donor_id>/eligibility/', api_views.check_donor_eligibility_api, name='api_donor_eligibility'),
     path('api/inventory/', api_views.blood_inventory_api, name='api_inventory'),
+    path('api/inventory/simulation/', views_inventory.inventory_simulation_api, name='api_inventory_simulation'),
     path('api/compatible-donors/', api_views.compatible_donors_api, name='api_compatible_donors'),
     path('api/request-statistics/', api_views.request_statistics_api, name='api_request_stats'),
     path('api/donor/<int:donor_id>/availability/', api_views.update_donor_availability_api, name='api_update_availability'),
@@ -1,28 +1,28 @@
 """
 Utility functions for Blood Management System
 """
-from datetime import datetime, timedelta
 from django.utils import timezone
+from .eligibility_engine import evaluate_donor, UNAVAILABLE, INTERVAL, TOO_YOUNG, TOO_OLD
 
 
 def check_donor_eligibility(donor):
     """
     Check if a donor is eligible to donate blood
-    Rules:
-    - Must wait 56 days (8 weeks) between whole blood donations
+    Rules (see eligibility_engine):
+    - Must wait 56 days (8 weeks) between whole blood donations, 84 for
+      female donors
+    - Must be aged 18-65
     - Must be marked as available
     """
-    if not donor.is_available:
+    result = evaluate_donor(donor)
+    if result.reasons == UNAVAILABLE:
         return False, "Donor is currently marked as unavailable"
-    
-    if donor.last_donation_date:
-        days_since_last_donation = (timezone.now().date() - donor.last_donation_date).days
-        minimum_wait_days = 56  # 8 weeks
-        
-        if days_since_last_donation < minimum_wait_days:
-            days_remaining = minimum_wait_days - days_since_last_donation
-            return False, f"Must wait {days_remaining} more days before next donation"
-    
+    if result.reasons == INTERVAL:
+        return False, f"Must wait {result.days_remaining} more days before next donation"
+    if result.reasons == TOO_YOUNG:
+        return False, "Donor must be at least 18 years old"
+    if result.reasons == TOO_OLD:
+        return False, "Donor must be 65 years or younger"
     return True, "Eligible to donate"
 
 
@@ -30,11 +30,10 @@ def get_next_eligible_date(donor):
     """
     Calculate the next date when donor will be eligible
     """
-    if not donor.last_donation_date:
+    if not donor.next_eligible_date:
         return timezone.now().date()
     
-    next_date = donor.last_donation_date + timedelta(days=56)
-    return next_date
+    return donor.next_eligible_date
 
 
 def get_compatible_blood_types(blood_type, donation_type='receive'):
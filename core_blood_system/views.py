@@ -1,26 +1,54 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponseForbidden, FileResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from .models import CustomUser, Donor, BloodRequest, BloodDonation, BloodInventory
 from .forms import (UserRegistrationForm, AdminRegistrationForm, CustomLoginForm, 
                     DonorRegistrationForm, BloodRequestForm, BloodDonationForm,
                     BloodRequestStatusForm)
-
-# Import for Excel/PDF exports
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import io
+from .matching_pipeline import start_matching_job
+from .inventory_manager import InventoryManager
+from .analytics import mark_analytics_dirty
+from .dashboard_stats import request_statistics, user_statistics
+from .exports import export_response, DONOR_EXPORT_COLUMNS, REQUEST_EXPORT_COLUMNS
+from .views_reports import pdf_report
+from .certificates import dispatch_certificate_prerender, open_certificate
+from .search_index import full_text_search
+from .pagination import keyset_paginate, top_results
+from .security import rate_limit, check_login_blocked
+from .unit_allocation import reallocate_units
+
+
+# Columns each list template renders (plus the keyset sort columns)
+DONOR_LIST_FIELDS = [
+    'first_name', 'last_name', 'blood_type', 'email', 'phone_number', 'city', 'gender', 'date_of_birth',
+    'last_donation_date', 'next_eligible_date', 'is_eligible_override', 'is_available', 'created_at',
+]
+REQUEST_LIST_FIELDS = [
+    'patient_name', 'blood_type', 'purpose', 'units_needed', 'urgency',
+    'hospital_name', 'required_date', 'status', 'created_at',
+]
+PATIENT_LIST_FIELDS = [
+    'patient_name', 'blood_type', 'purpose', 'purpose_details', 'contact_number',
+    'hospital_name', 'hospital_address', 'created_at',
+    'requester__username', 'requester__date_of_birth',
+]
+DONATION_LIST_FIELDS = [
+    'blood_type', 'units_donated', 'donation_date', 'hospital_name', 'status',
+    'rejection_reason', 'approved_at',
+    'donor__first_name', 'donor__last_name', 'donor__phone_number', 'approved_by__username',
+]
+USER_LIST_FIELDS = [
+    'username', 'is_superuser', 'first_name', 'last_name', 'email', 'phone_number',
+    'blood_type', 'role', 'is_active', 'date_joined',
+]
 
 
 # Home Page
@@ -41,6 +69,7 @@ def home_portal(request):
 
 
 # User Registration
+@rate_limit(max_attempts=10, window_minutes=60, methods=('POST',))
 def user_register(request):
     """Regular user registration"""
     if request.method == 'POST':
@@ -84,6 +113,9 @@ def admin_register(request):
 # Login View
 def user_login(request):
     """User login with personalized welcome message"""
+    if request.method == 'POST' and check_login_blocked(request, request.POST.get('username')):
+        return HttpResponseForbidden('Too many failed login attempts. Please try again later.')
+
     if request.method == 'POST':
         form = CustomLoginForm(request, data=request.POST)
         if form.is_valid():
@@ -187,10 +219,11 @@ def admin_dashboard(request):
         messages.error(request, 'You do not have permission to access this page.')
         return redirect('user_dashboard')
     
-    # Get statistics
+    # Get statistics (one aggregate query per table)
+    request_stats = request_statistics()
     total_donors = Donor.objects.count()
-    total_requests = BloodRequest.objects.count()
-    pending_requests = BloodRequest.objects.filter(status='pending').count()
+    total_requests = request_stats['total']
+    pending_requests = request_stats['pending']
     total_donations = BloodDonation.objects.count()
     total_users = CustomUser.objects.count()
     
@@ -281,17 +314,7 @@ def register_donor(request):
 @login_required
 def donor_list(request):
     """List all donors with search and filter"""
-    donors = Donor.objects.all()
-    
-    # Search functionality
-    search_query = request.GET.get('search', '')
-    if search_query:
-        donors = donors.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone_number__icontains=search_query)
-        )
+    donors = Donor.objects.only(*DONOR_LIST_FIELDS)
     
     # Filter by blood type
     blood_type_filter = request.GET.get('blood_type', '')
@@ -303,6 +326,13 @@ def donor_list(request):
     if availability_filter:
         donors = donors.filter(is_available=(availability_filter == 'available'))
     
+    # Search results come ranked; the plain list pages on (created_at, id)
+    search_query = request.GET.get('search', '')
+    if search_query:
+        donors = top_results(full_text_search(donors, search_query))
+    else:
+        donors = keyset_paginate(request, donors, ['-created_at', '-id'])
+    
     context = {
         'donors': donors,
         'search_query': search_query,
@@ -323,7 +353,17 @@ def request_blood(request):
             blood_request = form.save(commit=False)
             blood_request.requester = request.user
             blood_request.save()
-            messages.success(request, 'Blood request submitted successfully!')
+            
+            # Donor matching and notifications run in the background
+            job = start_matching_job(blood_request)
+            status_url = reverse('api_matching_job_status', args=[job.job_id])
+            if request.headers.get('Accept', '').startswith('application/json'):
+                return JsonResponse(
+                    {'request_id': blood_request.id, 'job_id': str(job.job_id), 'status_url': status_url},
+                    status=202,
+                )
+            
+            messages.success(request, 'Blood request submitted successfully! Matching donors are being notified.')
             return redirect('blood_request_list')
         else:
             messages.error(request, 'Please correct the errors below.')
@@ -337,10 +377,9 @@ def request_blood(request):
 @login_required
 def blood_request_list(request):
     """List all blood requests"""
-    if request.user.role == 'admin':
-        requests = BloodRequest.objects.all()
-    else:
-        requests = BloodRequest.objects.filter(requester=request.user)
+    requests = BloodRequest.objects.only(*REQUEST_LIST_FIELDS)
+    if request.user.role != 'admin':
+        requests = requests.filter(requester=request.user)
     
     # Filter by blood type
     blood_type_filter = request.GET.get('blood_type', '')
@@ -363,7 +402,7 @@ def blood_request_list(request):
         requests = requests.filter(urgency=urgency_filter)
     
     context = {
-        'requests': requests,
+        'requests': keyset_paginate(request, requests, ['-created_at', '-id']),
         'blood_type_filter': blood_type_filter,
         'status_filter': status_filter,
         'purpose_filter': purpose_filter,
@@ -416,69 +455,17 @@ def delete_request(request, request_id):
 # Export Donors to Excel
 @login_required
 def export_donors_excel(request):
-    """Export donor list to Excel - Admin Only"""
+    """Export donor list to Excel or CSV - Admin Only"""
     # Check if user is admin
     if request.user.role != 'admin':
         messages.error(request, 'Only administrators can export donor lists.')
         return redirect('donor_list')
     
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Donors List"
-    
-    # Add header with styling
-    headers = ['#', 'First Name', 'Last Name', 'Blood Type', 'Email', 'Phone', 'City', 'State', 'Available', 'Last Donation']
-    ws.append(headers)
-    
-    # Style header row
-    header_fill = PatternFill(start_color='FF0000', end_color='FF0000', fill_type='solid')
-    header_font = Font(bold=True, color='FFFFFF', size=12)
-    
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Get donors
-    donors = Donor.objects.all()
-    
-    # Add data
-    for idx, donor in enumerate(donors, start=1):
-        ws.append([
-            idx,
-            donor.first_name,
-            donor.last_name,
-            donor.blood_type,
-            donor.email,
-            donor.phone_number,
-            donor.city,
-            donor.state,
-            'Yes' if donor.is_available else 'No',
-            donor.last_donation_date.strftime('%Y-%m-%d') if donor.last_donation_date else 'Never'
-        ])
-    
-    # Adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    # ?format=csv streams CSV; otherwise a write-only Excel workbook
+    return export_response(
+        request.GET.get('format'), 'donors_list', 'Donors List',
+        Donor.objects.all(), DONOR_EXPORT_COLUMNS, header_color='FF0000',
     )
-    response['Content-Disposition'] = 'attachment; filename=donors_list.xlsx'
-    
-    wb.save(response)
-    return response
 
 
 # Export Donors to PDF
@@ -490,222 +477,30 @@ def export_donors_pdf(request):
         messages.error(request, 'Only administrators can export donor lists.')
         return redirect('donor_list')
     
-    # Create response
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename=donors_list.pdf'
-    
-    # Create PDF
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#FF0000'),
-        spaceAfter=30,
-        alignment=1  # Center
-    )
-    
-    # Title
-    title = Paragraph("🩸 Blood Donors List", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.3 * inch))
-    
-    # Get donors
-    donors = Donor.objects.all()
-    
-    # Create table data
-    data = [['#', 'Name', 'Blood Type', 'Phone', 'City', 'Available']]
-    
-    for idx, donor in enumerate(donors, start=1):
-        data.append([
-            str(idx),
-            f"{donor.first_name} {donor.last_name}",
-            donor.blood_type,
-            donor.phone_number,
-            donor.city,
-            '✓' if donor.is_available else '✗'
-        ])
-    
-    # Create table
-    table = Table(data, colWidths=[0.5*inch, 2*inch, 1*inch, 1.5*inch, 1.5*inch, 1*inch])
-    
-    # Style table
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.red),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    
-    elements.append(table)
-    
-    # Add footer
-    elements.append(Spacer(1, 0.5 * inch))
-    footer_text = f"Total Donors: {donors.count()} | Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-    footer = Paragraph(footer_text, styles['Normal'])
-    elements.append(footer)
-    
-    # Build PDF
-    doc.build(elements)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    
-    return response
+    return pdf_report(request, 'donors')
 
 
 # Export Blood Requests to Excel
 @login_required
 def export_requests_excel(request):
-    """Export blood requests to Excel"""
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Blood Requests"
-    
-    # Add header
-    headers = ['#', 'Patient Name', 'Blood Type', 'Purpose', 'Units', 'Urgency', 'Hospital', 'Status', 'Date']
-    ws.append(headers)
-    
-    # Style header
-    header_fill = PatternFill(start_color='DC143C', end_color='DC143C', fill_type='solid')
-    header_font = Font(bold=True, color='FFFFFF', size=12)
-    
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-    
+    """Export blood requests to Excel or CSV"""
     # Get requests
     if request.user.role == 'admin':
         requests = BloodRequest.objects.all()
     else:
         requests = BloodRequest.objects.filter(requester=request.user)
     
-    # Add data
-    for idx, req in enumerate(requests, start=1):
-        ws.append([
-            idx,
-            req.patient_name,
-            req.blood_type,
-            req.get_purpose_display(),
-            req.units_needed,
-            req.get_urgency_display(),
-            req.hospital_name,
-            req.get_status_display(),
-            req.created_at.strftime('%Y-%m-%d')
-        ])
-    
-    # Adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Create response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return export_response(
+        request.GET.get('format'), 'blood_requests', 'Blood Requests',
+        requests, REQUEST_EXPORT_COLUMNS, header_color='DC143C',
     )
-    response['Content-Disposition'] = 'attachment; filename=blood_requests.xlsx'
-    
-    wb.save(response)
-    return response
 
 
 # Export Blood Requests to PDF
 @login_required
 def export_requests_pdf(request):
     """Export blood requests to PDF"""
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename=blood_requests.pdf'
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#DC143C'),
-        spaceAfter=30,
-        alignment=1
-    )
-    
-    # Title
-    title = Paragraph("🩸 Blood Requests Report", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.3 * inch))
-    
-    # Get requests
-    if request.user.role == 'admin':
-        requests = BloodRequest.objects.all()
-    else:
-        requests = BloodRequest.objects.filter(requester=request.user)
-    
-    # Create table
-    data = [['#', 'Patient', 'Blood Type', 'Purpose', 'Units', 'Urgency', 'Status']]
-    
-    for idx, req in enumerate(requests, start=1):
-        data.append([
-            str(idx),
-            req.patient_name,
-            req.blood_type,
-            req.get_purpose_display(),
-            str(req.units_needed),
-            req.get_urgency_display(),
-            req.get_status_display()
-        ])
-    
-    table = Table(data, colWidths=[0.4*inch, 1.5*inch, 0.8*inch, 1.2*inch, 0.6*inch, 0.9*inch, 1*inch])
-    
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.crimson),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-    ]))
-    
-    elements.append(table)
-    
-    # Footer
-    elements.append(Spacer(1, 0.5 * inch))
-    footer_text = f"Total Requests: {requests.count()} | Generated: {timezone.now().strftime('%Y-%m-%d %H:%M')}"
-    footer = Paragraph(footer_text, styles['Normal'])
-    elements.append(footer)
-    
-    doc.build(elements)
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    
-    return response
+    return pdf_report(request, 'requests')
 
 
 # ==========================================
@@ -813,25 +608,20 @@ def donor_search_view(request):
 @login_required
 def download_certificate(request, donation_id):
     """Download donation certificate as PDF"""
-    from .certificates import generate_donation_certificate
-    
     try:
-        donation = BloodDonation.objects.get(id=donation_id)
+        donation = BloodDonation.objects.select_related('donor').get(id=donation_id)
         
         # Check if user has permission to download this certificate
         if request.user.role != 'admin' and donation.donor.user != request.user:
             messages.error(request, 'You do not have permission to download this certificate.')
             return redirect('user_dashboard')
         
-        # Generate certificate
-        pdf_buffer = generate_donation_certificate(donation)
-        
-        # Create response
-        response = HttpResponse(pdf_buffer, content_type='application/pdf')
+        # Serve the cached certificate (rendered on first request)
         filename = f"Blood_Donation_Certificate_{donation.donor.last_name}_{donation.donation_date}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return FileResponse(
+            open_certificate(donation),
+            as_attachment=True, filename=filename, content_type='application/pdf',
+        )
         
     except BloodDonation.DoesNotExist:
         messages.error(request, 'Donation record not found.')
@@ -909,7 +699,7 @@ def patient_list(request):
         return redirect('user_dashboard')
     
     # Get all blood requests (each represents a patient)
-    patients = BloodRequest.objects.all().select_related('requester').order_by('-created_at')
+    patients = BloodRequest.objects.select_related('requester').only(*PATIENT_LIST_FIELDS)
     
     # Search functionality
     search_query = request.GET.get('search', '')
@@ -922,7 +712,7 @@ def patient_list(request):
         )
     
     context = {
-        'patients': patients,
+        'patients': keyset_paginate(request, patients, ['-created_at', '-id']),
         'search_query': search_query,
     }
     return render(request, 'patients/patient_list.html', context)
@@ -938,6 +728,8 @@ def edit_patient(request, request_id):
     blood_request = get_object_or_404(BloodRequest, id=request_id)
     
     if request.method == 'POST':
+        allocated_for = (blood_request.blood_type, blood_request.units_needed)
+        
         # Update patient/request information
         blood_request.patient_name = request.POST.get('patient_name')
         blood_request.blood_type = request.POST.get('blood_type')
@@ -951,7 +743,14 @@ def edit_patient(request, request_id):
         blood_request.required_date = request.POST.get('required_date')
         blood_request.notes = request.POST.get('notes')
         
-        blood_request.save()
+        with transaction.atomic():
+            blood_request.save()
+            blood_request.refresh_from_db(fields=['units_needed'])
+            # Reserved units must match the new blood type and quantity
+            if blood_request.status == 'approved' and (
+                blood_request.blood_type, blood_request.units_needed
+            ) != allocated_for:
+                reallocate_units(blood_request)
         messages.success(request, f'Patient {blood_request.patient_name} information updated successfully!')
         return redirect('patient_list')
     
@@ -984,7 +783,7 @@ def donation_request_list(request):
         return redirect('user_dashboard')
     
     # Get all blood donations
-    donations = BloodDonation.objects.all().select_related('donor', 'donor__user').order_by('-donation_date')
+    donations = BloodDonation.objects.select_related('donor', 'approved_by').only(*DONATION_LIST_FIELDS)
     
     # Filter by status if provided
     status_filter = request.GET.get('status', '')
@@ -1002,7 +801,7 @@ def donation_request_list(request):
         )
     
     context = {
-        'donations': donations,
+        'donations': keyset_paginate(request, donations, ['-donation_date', '-id']),
         'search_query': search_query,
         'status_filter': status_filter,
     }
@@ -1018,23 +817,23 @@ def approve_donation(request, donation_id):
     
     donation = get_object_or_404(BloodDonation, id=donation_id)
     
-    if donation.status == 'approved':
-        messages.warning(request, 'This donation has already been approved.')
-        return redirect('donation_request_list')
-    
-    # Update donation status
-    donation.status = 'approved'
-    donation.approved_by = request.user
-    donation.approved_at = timezone.now()
-    donation.save()
+    # Conditional update so concurrent approvals add the units only once
+    with transaction.atomic():
+        approved = BloodDonation.objects.filter(id=donation.id).exclude(status='approved').update(
+            status='approved', approved_by=request.user, approved_at=timezone.now()
+        )
+        if not approved:
+            messages.warning(request, 'This donation has already been approved.')
+            return redirect('donation_request_list')
+        
+        # Queryset updates bypass the signal that marks the snapshot dirty
+        mark_analytics_dirty('donations')
+        
+        # Add units to blood inventory through the inventory ledger
+        donation.refresh_from_db()
+        InventoryManager.update_inventory_from_donation(donation)
+        transaction.on_commit(lambda: dispatch_certificate_prerender([donation.id]))
     
-    # Add units to blood inventory (simple method)
-    inventory, created = BloodInventory.objects.get_or_create(
-        blood_type=donation.blood_type,
-        defaults={'units_available': 0}
-    )
-    inventory.units_available += donation.units_donated
-    inventory.save()
     messages.success(request, f'Donation approved! {donation.units_donated} unit(s) of {donation.blood_type} added to inventory.')
     
     return redirect('donation_request_list')
@@ -1080,6 +879,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 
 
+@rate_limit(max_attempts=5, window_minutes=60, methods=('POST',))
 def password_reset_request(request):
     """Password reset request view"""
     if request.method == 'POST':
@@ -1258,14 +1058,7 @@ def advanced_search(request):
         donors = Donor.objects.all()
         
         if search_query:
-            donors = donors.filter(
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(phone_number__icontains=search_query) |
-                Q(city__icontains=search_query) |
-                Q(state__icontains=search_query)
-            )
+            donors = full_text_search(donors, search_query)
         
         if blood_type:
             donors = donors.filter(blood_type=blood_type)
@@ -1287,13 +1080,7 @@ def advanced_search(request):
             requests = requests.filter(requester=request.user)
         
         if search_query:
-            requests = requests.filter(
-                Q(patient_name__icontains=search_query) |
-                Q(hospital_name__icontains=search_query) |
-                Q(hospital_address__icontains=search_query) |
-                Q(contact_number__icontains=search_query) |
-                Q(notes__icontains=search_query)
-            )
+            requests = full_text_search(requests, search_query)
         
         if blood_type:
             requests = requests.filter(blood_type=blood_type)
@@ -1345,18 +1132,7 @@ def user_list(request):
         return redirect('user_dashboard')
     
     # Get all users
-    users = CustomUser.objects.all().order_by('-date_joined')
-    
-    # Search functionality
-    search_query = request.GET.get('search', '')
-    if search_query:
-        users = users.filter(
-            Q(username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(phone_number__icontains=search_query)
-        )
+    users = CustomUser.objects.only(*USER_LIST_FIELDS)
     
     # Filter by role
     role_filter = request.GET.get('role', '')
@@ -1370,11 +1146,18 @@ def user_list(request):
     elif status_filter == 'inactive':
         users = users.filter(is_active=False)
     
+    search_query = request.GET.get('search', '')
+    if search_query:
+        users = top_results(full_text_search(users, search_query))
+    else:
+        users = keyset_paginate(request, users, ['-date_joined', '-id'])
+    
     # Statistics
-    total_users = CustomUser.objects.count()
-    admin_count = CustomUser.objects.filter(role='admin').count()
-    user_count = CustomUser.objects.filter(role='user').count()
-    active_today = CustomUser.objects.filter(last_login__date=timezone.now().date()).count()
+    user_stats = user_statistics()
+    total_users = user_stats['total']
+    admin_count = user_stats['admins']
+    user_count = user_stats['users']
+    active_today = user_stats['active_today']
     
     # Blood inventory
     inventory = BloodInventory.objects.all().order_by('blood_type')
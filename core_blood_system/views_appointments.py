@@ -8,8 +8,17 @@ from django.contrib import messages
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django.db.models import Q
+from django.http import JsonResponse
 from .models import DonationAppointment, Donor, CustomUser
-from .enhancements import get_available_time_slots, create_appointment
+from .enhancements import (
+    SlotUnavailable,
+    create_appointment,
+    get_month_availability,
+    move_appointment,
+    set_appointment_status,
+)
+
+VALID_TIME_SLOTS = {slot[0] for slot in DonationAppointment.TIME_SLOT_CHOICES}
 
 
 @login_required
@@ -35,13 +44,11 @@ def book_appointment(request):
             messages.error(request, 'Please select a future date.')
             return redirect('book_appointment')
         
-        # Check if slot is available
-        available_slots = get_available_time_slots(selected_date, location)
-        if time_slot not in available_slots:
-            messages.error(request, 'This time slot is no longer available. Please choose another.')
+        if time_slot not in VALID_TIME_SLOTS:
+            messages.error(request, 'Please choose a valid time slot.')
             return redirect('book_appointment')
         
-        # Create appointment
+        # Create appointment (the place is reserved atomically)
         try:
             appointment = create_appointment(
                 donor=donor,
@@ -54,6 +61,9 @@ def book_appointment(request):
             )
             messages.success(request, f'Appointment booked successfully for {selected_date} at {time_slot}!')
             return redirect('my_appointments')
+        except SlotUnavailable:
+            messages.error(request, 'This time slot is no longer available. Please choose another.')
+            return redirect('book_appointment')
         except Exception as e:
             messages.error(request, f'Error booking appointment: {str(e)}')
     
@@ -73,6 +83,25 @@ def book_appointment(request):
     return render(request, 'appointments/book_appointment.html', context)
 
 
+@login_required
+def slot_availability_api(request):
+    """Remaining places per day and time slot at a location for a month"""
+    location = request.GET.get('location', '')
+    try:
+        year = int(request.GET.get('year', timezone.now().year))
+        month = int(request.GET.get('month', timezone.now().month))
+        availability = get_month_availability(location, year, month)
+    except (ValueError, OverflowError):
+        return JsonResponse({'error': 'Invalid year or month'}, status=400)
+    
+    return JsonResponse({
+        'location': location,
+        'availability': {
+            day.isoformat(): remaining for day, remaining in availability.items()
+        },
+    })
+
+
 @login_required
 def my_appointments(request):
     """View user's appointments"""
@@ -119,8 +148,7 @@ def cancel_appointment(request, appointment_id):
         messages.error(request, 'This appointment cannot be cancelled.')
         return redirect('my_appointments')
     
-    appointment.status = 'cancelled'
-    appointment.save()
+    set_appointment_status(appointment, 'cancelled')
     
     messages.success(request, 'Appointment cancelled successfully.')
     return redirect('my_appointments')
@@ -146,17 +174,16 @@ def reschedule_appointment(request, appointment_id):
             messages.error(request, 'Please select a future date.')
             return redirect('reschedule_appointment', appointment_id=appointment_id)
         
-        # Check availability
-        available_slots = get_available_time_slots(selected_date, appointment.location)
-        if new_time_slot not in available_slots:
-            messages.error(request, 'This time slot is not available.')
+        if new_time_slot not in VALID_TIME_SLOTS:
+            messages.error(request, 'Please choose a valid time slot.')
             return redirect('reschedule_appointment', appointment_id=appointment_id)
         
-        # Update appointment
-        appointment.appointment_date = selected_date
-        appointment.time_slot = new_time_slot
-        appointment.reminder_sent = False
-        appointment.save()
+        # Move the appointment and its place
+        try:
+            move_appointment(appointment, selected_date, new_time_slot)
+        except SlotUnavailable:
+            messages.error(request, 'This time slot is not available.')
+            return redirect('reschedule_appointment', appointment_id=appointment_id)
         
         messages.success(request, 'Appointment rescheduled successfully!')
         return redirect('my_appointments')
@@ -230,22 +257,21 @@ def admin_appointment_detail(request, appointment_id):
     if request.method == 'POST':
         action = request.POST.get('action')
         
-        if action == 'confirm':
-            appointment.status = 'confirmed'
-            appointment.save()
-            messages.success(request, 'Appointment confirmed.')
-        elif action == 'complete':
-            appointment.status = 'completed'
-            appointment.save()
-            messages.success(request, 'Appointment marked as completed.')
-        elif action == 'no_show':
-            appointment.status = 'no_show'
-            appointment.save()
-            messages.warning(request, 'Appointment marked as no-show.')
-        elif action == 'cancel':
-            appointment.status = 'cancelled'
-            appointment.save()
-            messages.info(request, 'Appointment cancelled.')
+        try:
+            if action == 'confirm':
+                set_appointment_status(appointment, 'confirmed')
+                messages.success(request, 'Appointment confirmed.')
+            elif action == 'complete':
+                set_appointment_status(appointment, 'completed')
+                messages.success(request, 'Appointment marked as completed.')
+            elif action == 'no_show':
+                set_appointment_status(appointment, 'no_show')
+                messages.warning(request, 'Appointment marked as no-show.')
+            elif action == 'cancel':
+                set_appointment_status(appointment, 'cancelled')
+                messages.info(request, 'Appointment cancelled.')
+        except SlotUnavailable:
+            messages.error(request, 'This time slot is now full, so the appointment cannot be reinstated.')
         
         return redirect('admin_appointment_detail', appointment_id=appointment_id)
     
@@ -10,9 +10,13 @@ from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Count, Q
 
-from .models import BloodInventory, BloodUnit, BloodDonation, BLOOD_TYPE_CHOICES
+from .models import BloodInventory, BloodUnit, BloodDonation, DemandForecast, BLOOD_TYPE_CHOICES
 from .forms import BloodUnitForm, InventoryThresholdForm
-from .inventory_manager import InventoryManager
+from .inventory_manager import InventoryManager, InventoryLedger
+from .demand_forecast import apply_thresholds
+from .inventory_simulator import get_inventory_simulation
+from .dashboard_stats import count_breakdown
+from .pagination import keyset_paginate
 
 
 def is_admin(user):
@@ -58,19 +62,9 @@ def add_blood_unit(request):
     if request.method == 'POST':
         form = BloodUnitForm(request.POST)
         if form.is_valid():
+            # Saving the unit updates the inventory count
             unit = form.save()
             
-            # Update inventory count
-            inventory, created = BloodInventory.objects.get_or_create(
-                blood_type=unit.blood_type,
-                defaults={'units_available': 0, 'minimum_threshold': 5}
-            )
-            inventory.units_available = BloodUnit.objects.filter(
-                blood_type=unit.blood_type,
-                status='available'
-            ).count()
-            inventory.save()
-            
             messages.success(request, f'Blood unit {unit.unit_number} added successfully')
             return redirect('inventory_dashboard')
     else:
@@ -89,22 +83,24 @@ def expiration_list(request):
     """View all units sorted by expiration date"""
     today = date.today()
     
-    units = BloodUnit.objects.filter(status='available').order_by('expiration_date')
+    units = BloodUnit.objects.filter(status='available').only(
+        'unit_number', 'blood_type', 'donation_date', 'expiration_date', 'volume_ml', 'storage_location',
+    )
     
     # Categorize units
-    expired = units.filter(expiration_date__lt=today)
-    expiring_soon = units.filter(
-        expiration_date__gte=today,
-        expiration_date__lte=today + timedelta(days=7)
-    )
-    good = units.filter(expiration_date__gt=today + timedelta(days=7))
+    categories = {
+        'expired': Q(expiration_date__lt=today),
+        'expiring_soon': Q(expiration_date__gte=today, expiration_date__lte=today + timedelta(days=7)),
+        'good': Q(expiration_date__gt=today + timedelta(days=7)),
+    }
     
+    # Each category pages on its own cursor, soonest expiry first
     context = {
-        'expired': expired,
-        'expiring_soon': expiring_soon,
-        'good': good,
-        'page_title': 'Blood Unit Expiration',
+        name: keyset_paginate(request, units.filter(condition), ['expiration_date', 'id'], prefix=f'{name}_')
+        for name, condition in categories.items()
     }
+    context['counts'] = count_breakdown(units, **categories)
+    context['page_title'] = 'Blood Unit Expiration'
     return render(request, 'inventory/expiration_list.html', context)
 
 
@@ -112,6 +108,11 @@ def expiration_list(request):
 @user_passes_test(is_admin)
 def configure_thresholds(request):
     """Configure inventory thresholds for all blood types"""
+    if request.method == 'POST' and request.POST.get('action') == 'apply_forecast':
+        changed = apply_thresholds()
+        messages.success(request, f'Forecast thresholds applied to {len(changed)} blood types')
+        return redirect('configure_thresholds')
+    
     if request.method == 'POST':
         blood_type = request.POST.get('blood_type')
         inventory = get_object_or_404(BloodInventory, blood_type=blood_type)
@@ -124,19 +125,24 @@ def configure_thresholds(request):
     
     # Get all inventory items
     inventory_items = BloodInventory.objects.all()
+    forecasts = {forecast.blood_type: forecast for forecast in DemandForecast.objects.all()}
     
     # Create forms for each blood type
     forms = []
     for inv in inventory_items:
+        forecast = forecasts.get(inv.blood_type)
         forms.append({
             'blood_type': inv.blood_type,
             'form': InventoryThresholdForm(instance=inv),
             'current_units': inv.units_available,
             'status': inv.get_status(),
+            'forecast': forecast,
+            'weekly_demand': sum(forecast.daily_demand[:7]) if forecast else None,
         })
     
     context = {
         'forms': forms,
+        'forecast_date': next(iter(forecasts.values())).through_date if forecasts else None,
         'page_title': 'Configure Inventory Thresholds',
     }
     return render(request, 'inventory/configure_thresholds.html', context)
@@ -159,6 +165,13 @@ def inventory_api(request):
     return JsonResponse({'inventory': data})
 
 
+@login_required
+@user_passes_test(is_admin)
+def inventory_simulation_api(request):
+    """JSON six-week shortage and wastage outlook, served from the stored simulation"""
+    return JsonResponse(get_inventory_simulation())
+
+
 @login_required
 @user_passes_test(is_admin)
 def mark_unit_used(request, unit_id):
@@ -189,17 +202,9 @@ def mark_unit_expired(request, unit_id):
         messages.error(request, f'Unit {unit.unit_number} is not available')
         return redirect('expiration_list')
     
-    unit.status = 'expired'
-    unit.save()
-    
-    # Update inventory count
-    inventory = BloodInventory.objects.filter(blood_type=unit.blood_type).first()
-    if inventory:
-        inventory.units_available = BloodUnit.objects.filter(
-            blood_type=unit.blood_type,
-            status='available'
-        ).count()
-        inventory.save()
+    if not InventoryLedger.transition_units(BloodUnit.objects.filter(id=unit.id, status='available'), 'expired'):
+        messages.error(request, f'Unit {unit.unit_number} is not available')
+        return redirect('expiration_list')
     
     messages.success(request, f'Unit {unit.unit_number} marked as expired')
     return redirect('expiration_list')
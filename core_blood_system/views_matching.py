@@ -7,8 +7,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
-from .models import BloodRequest, MatchedDonor, Donor
-from .enhancements import match_donors_to_request, notify_matched_donors
+from .models import BloodRequest, MatchedDonor, Donor, MatchingJob
+from .matching_pipeline import start_matching_job
+from .dashboard_stats import match_statistics
+from .pagination import keyset_paginate
 
 
 @login_required
@@ -41,16 +43,37 @@ def trigger_matching(request, request_id):
     
     blood_request = get_object_or_404(BloodRequest, id=request_id)
     
-    # Run matching algorithm
-    matches = match_donors_to_request(blood_request)
+    # Matching and notifications run in the background
+    job = start_matching_job(blood_request)
     
-    # Notify matched donors
-    notify_matched_donors(blood_request)
-    
-    messages.success(request, f'Found {len(matches)} compatible donors and sent notifications!')
+    messages.success(request, f'Matching started (job {job.job_id}). Matched donors will appear here as they are found.')
     return redirect('match_results', request_id=request_id)
 
 
+@login_required
+def matching_job_status(request, job_id):
+    """Poll the progress of a background matching job (JSON)"""
+    job = get_object_or_404(MatchingJob.objects.select_related('blood_request'), job_id=job_id)
+    
+    if request.user.role != 'admin' and job.blood_request.requester != request.user:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    return JsonResponse({
+        'job_id': str(job.job_id),
+        'request_id': job.blood_request_id,
+        'status': job.status,
+        'progress': job.progress,
+        'matched_count': job.matched_count,
+        'batches_done': job.batches_done,
+        'batch_count': job.batch_count,
+        'email_sent': job.email_sent,
+        'sms_sent': job.sms_sent,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+    })
+
+
 @login_required
 def donor_response(request, match_id):
     """Donor responds to a match (accept/decline)"""
@@ -108,7 +131,11 @@ def admin_matching_dashboard(request):
         return redirect('user_dashboard')
     
     # Get all matches
-    matches = MatchedDonor.objects.all().select_related('donor', 'blood_request').order_by('-created_at')
+    matches = MatchedDonor.objects.select_related('donor', 'blood_request').only(
+        'match_score', 'status', 'notified_at', 'responded_at', 'created_at',
+        'donor__first_name', 'donor__last_name', 'donor__phone_number', 'donor__blood_type',
+        'blood_request__patient_name', 'blood_request__hospital_name',
+    )
     
     # Filter by status
     status_filter = request.GET.get('status', '')
@@ -116,12 +143,13 @@ def admin_matching_dashboard(request):
         matches = matches.filter(status=status_filter)
     
     # Statistics
-    total_matches = MatchedDonor.objects.count()
-    accepted_matches = MatchedDonor.objects.filter(status='accepted').count()
-    pending_matches = MatchedDonor.objects.filter(status__in=['matched', 'notified']).count()
+    match_stats = match_statistics()
+    total_matches = match_stats['total']
+    accepted_matches = match_stats['accepted']
+    pending_matches = match_stats['pending']
     
     context = {
-        'matches': matches,
+        'matches': keyset_paginate(request, matches, ['-created_at', '-id']),
         'status_filter': status_filter,
         'total_matches': total_matches,
         'accepted_matches': accepted_matches,
@@ -4,21 +4,33 @@ Views for notification management
 """
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition
 from .models import Notification
-from .enhancements import create_notification, get_unread_notifications, mark_notification_read
+from .pagination import keyset_paginate
+from .enhancements import (
+    create_notification, get_unread_notifications, mark_notification_read,
+    mark_all_notifications_read, delete_notification as remove_notification,
+)
+from .notification_events import (
+    notification_etag, notification_stream as live_notification_events,
+    notification_payload,
+)
 
 
 @login_required
 def notification_center(request):
     """View all notifications for the current user"""
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    unread_count = notifications.filter(is_read=False).count()
+    notifications = Notification.objects.filter(user=request.user).only(
+        'title', 'message', 'notification_type', 'link', 'is_read', 'created_at',
+    )
     
     context = {
-        'notifications': notifications,
-        'unread_count': unread_count,
+        'notifications': keyset_paginate(request, notifications, ['-created_at', '-id']),
+        'unread_count': request.user.unread_notifications,
     }
     
     return render(request, 'notifications/notification_center.html', context)
@@ -28,8 +40,7 @@ def notification_center(request):
 def mark_as_read(request, notification_id):
     """Mark a notification as read"""
     notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.is_read = True
-    notification.save()
+    mark_notification_read(notification.id)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -40,7 +51,7 @@ def mark_as_read(request, notification_id):
 @login_required
 def mark_all_read(request):
     """Mark all notifications as read"""
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    mark_all_notifications_read(request.user)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -52,7 +63,7 @@ def mark_all_read(request):
 def delete_notification(request, notification_id):
     """Delete a notification"""
     notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.delete()
+    remove_notification(notification)
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
@@ -60,11 +71,44 @@ def delete_notification(request, notification_id):
     return redirect('notification_center')
 
 
+def _unread_etag(request):
+    return notification_etag(request.user.unread_notifications)
+
+
 @login_required
+@condition(etag_func=_unread_etag)
 def get_unread_count(request):
-    """API endpoint to get unread notification count"""
-    count = Notification.objects.filter(user=request.user, is_read=False).count()
-    return JsonResponse({'count': count})
+    """
+    API endpoint to get unread notification count
+    Read from the user row already loaded for the request; answers 304
+    Not Modified when the client's ETag is still current
+    """
+    response = JsonResponse({'count': request.user.unread_notifications})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@never_cache
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of unread-count and new-notification events
+    
+    backend/asgi.py normally answers this path without entering Django
+    (see notification_stream_app); this view covers other ASGI entry
+    points. Under WSGI it answers 204 so the browser stops reconnecting
+    and falls back to polling get_unread_count.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    response = StreamingHttpResponse(
+        live_notification_events(user.id), content_type='text/event-stream'
+    )
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required
@@ -72,14 +116,6 @@ def get_recent_notifications(request):
     """API endpoint to get recent notifications"""
     notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:5]
     
-    data = [{
-        'id': n.id,
-        'title': n.title,
-        'message': n.message,
-        'type': n.notification_type,
-        'link': n.link,
-        'is_read': n.is_read,
-        'created_at': n.created_at.strftime('%Y-%m-%d %H:%M'),
-    } for n in notifications]
+    data = [notification_payload(n) for n in notifications]
     
     return JsonResponse({'notifications': data})
@@ -0,0 +1,72 @@
+"""
+PDF Report Views
+Small reports are rendered in the request; large ones are queued as a
+ReportJob and downloaded from the job page once generated
+"""
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.contrib.auth.decorators import login_required
+from django.contrib import messages
+from django.http import FileResponse, JsonResponse
+
+from .models import ReportJob
+from .pdf_reports import (
+    REPORTS, PDF_SYNC_ROW_LIMIT, report_queryset, render_report_pdf,
+    pdf_file_response, start_report_job,
+)
+
+
+def pdf_report(request, report):
+    """Return a PDF report, or queue it in the background when it is large"""
+    queryset = report_queryset(report, request.user)
+
+    if queryset.count() > PDF_SYNC_ROW_LIMIT:
+        job = start_report_job(report, request.user)
+        messages.info(request, 'This report is large and is being generated in the background.')
+        return redirect('report_job_status', job_id=job.job_id)
+
+    return pdf_file_response(render_report_pdf, REPORTS[report]['filename'], report, queryset)
+
+
+def _get_user_job(request, job_id):
+    job = get_object_or_404(ReportJob, job_id=job_id)
+    if request.user.role != 'admin' and job.requested_by_id != request.user.id:
+        return None
+    return job
+
+
+@login_required
+def report_job_status(request, job_id):
+    """Progress page (or JSON) for a background report"""
+    job = _get_user_job(request, job_id)
+    if job is None:
+        messages.error(request, 'You do not have permission to view this report.')
+        return redirect('user_dashboard')
+
+    if request.headers.get('Accept', '').startswith('application/json'):
+        return JsonResponse({
+            'job_id': str(job.job_id),
+            'report': job.report,
+            'status': job.status,
+            'row_count': job.row_count,
+            'error': job.error,
+            'download_url': (
+                reverse('download_report', args=[job.job_id]) if job.status == 'completed' else None
+            ),
+        })
+
+    return render(request, 'reports/report_job.html', {'job': job})
+
+
+@login_required
+def download_report(request, job_id):
+    """Download a generated background report"""
+    job = _get_user_job(request, job_id)
+    if job is None or job.status != 'completed' or not job.file:
+        messages.error(request, 'This report is not available.')
+        return redirect('user_dashboard')
+
+    return FileResponse(
+        job.file.open('rb'), as_attachment=True,
+        filename=REPORTS[job.report]['filename'], content_type='application/pdf',
+    )